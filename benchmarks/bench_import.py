@@ -0,0 +1,105 @@
+"""
+ハンドラーのモジュールの読み込みにかかる時間を計測するベンチマーク
+
+スケジュールで起動するLambdaはほとんどの実行がコールドスタートになり、モジュールの読み込みの時間を毎回払います。
+新しいプロセスで python -X importtime を使ってモジュールを読み込み、読み込み時間と時間のかかったモジュールを表示します。
+読み込み時間が予算を超えた場合、または使う時まで読み込みを遅らせているライブラリ（boto3・requests など）を読み込んだ場合は、
+終了コード1で終了します。
+
+Examples
+--------
+$ python -m benchmarks.bench_import
+$ python -m benchmarks.bench_import --module query_archive_index --budget-ms 100
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from .run_benchmarks import REPO_ROOT
+
+# 読み込むだけで時間がかかるため、初めて使う時まで読み込まないライブラリ
+DEFERRED_MODULES = ("boto3", "botocore", "requests", "urllib3", "pyarrow")
+DEFAULT_BUDGET_MS = 150.0
+
+
+def measure_import(module: str, repeat: int = 5) -> dict:
+    """
+    新しいプロセスでモジュールを読み込み、-X importtime の結果を集計する
+    ディスクのキャッシュやpycの作成の影響を除くため、repeat回のうち最も速かった結果を使う
+
+    Parameters
+    ----------
+    module : str
+      読み込むモジュール名
+    repeat : int
+      読み込む回数
+
+    Returns
+    -------
+    dict
+      cumulative_ms（読み込み時間）、imports（モジュール名 → (自身の時間, 累計時間) のミリ秒）
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([REPO_ROOT, os.path.join(REPO_ROOT, "src")])}
+    best: dict | None = None
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"{module}の読み込みに失敗しました\n{completed.stderr[-4000:]}")
+        imports = _parse_importtime(completed.stderr)
+        result = {"module": module, "cumulative_ms": imports[module][1], "imports": imports}
+        if best is None or result["cumulative_ms"] < best["cumulative_ms"]:
+            best = result
+    assert best is not None
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ハンドラーのモジュールの読み込みにかかる時間を計測します")
+    parser.add_argument("--module", action="append", help="読み込むモジュール名（複数指定可、既定は get_slack_message）")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="読み込み時間の予算（ミリ秒）")
+    parser.add_argument("--repeat", type=int, default=5, help="読み込む回数（最も速かった結果を使う）")
+    parser.add_argument("--top", type=int, default=10, help="表示する時間のかかったモジュールの数")
+    args = parser.parse_args()
+
+    failures: list[str] = []
+    for module in args.module or ["get_slack_message"]:
+        result = measure_import(module, args.repeat)
+        print(f"{module}: {result['cumulative_ms']:.1f}ミリ秒（予算 {args.budget_ms:.0f}ミリ秒）")
+        slowest = sorted(result["imports"].items(), key=lambda item: -item[1][0])[: args.top]
+        for name, (self_ms, cumulative_ms) in slowest:
+            print(f"  {self_ms:8.1f}ミリ秒（累計 {cumulative_ms:8.1f}）  {name}")
+        if result["cumulative_ms"] > args.budget_ms:
+            failures.append(f"{module}: 読み込み時間 {result['cumulative_ms']:.1f}ミリ秒が予算 {args.budget_ms:.0f}ミリ秒を超えました")
+        deferred = [name for name in DEFERRED_MODULES if name in result["imports"]]
+        if len(deferred) > 0:
+            failures.append(f"{module}: 使う時まで読み込まないはずのライブラリを読み込みました: {deferred}")
+
+    if len(failures) > 0:
+        for failure in failures:
+            print(failure)
+        sys.exit(1)
+    print("予算の範囲内でした")
+
+
+def _parse_importtime(stderr: str) -> dict[str, tuple[float, float]]:
+    # "import time: <自身の時間[us]> | <累計[us]> | <インデント><モジュール名>" の形の行を読む
+    imports: dict[str, tuple[float, float]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        imports[fields[2].strip()] = (int(fields[0]) / 1000, int(fields[1]) / 1000)
+    return imports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Slack APIとS3を使わずに、レポートの書式の変換（ReportRenderer）だけの性能を計測するベンチマーク
+
+合成チャンネルのメッセージ・返信・ユーザー情報をメモリ上に作り、書式ごとに変換にかかった時間を表示します。
+
+Examples
+--------
+$ python -m benchmarks.bench_render
+$ python -m benchmarks.bench_render --messages 100000 --format html
+"""
+import argparse
+import time
+
+from mymodules.output import ReportRenderer, create_report_template
+
+from .fake_slack import SyntheticChannel
+
+FORMATS = ("text", "markdown", "html")
+
+
+def create_pages(message_count: int, batch_size: int) -> list[tuple[list[dict], list[list[dict]]]]:
+    """
+    合成チャンネルから、ページごとの親メッセージと返信のリストを作る
+
+    Parameters
+    ----------
+    message_count : int
+      親メッセージの数
+    batch_size : int
+      1ページの親メッセージの数
+
+    Returns
+    -------
+    list[tuple[list[dict], list[list[dict]]]]
+      ページごとの (親メッセージのリスト, 親メッセージごとの返信のリスト)
+    """
+    channel = SyntheticChannel("CBENCH", "bench", message_count, start_ts=1_700_000_000, interval_seconds=60)
+    pages: list[tuple[list[dict], list[list[dict]]]] = []
+    for start in range(0, message_count, batch_size):
+        messages = [channel.message(index) for index in range(start, min(start + batch_size, message_count))]
+        threads = [channel.replies(message["ts"])[1:] if "reply_count" in message else [] for message in messages]
+        pages.append((messages, threads))
+    return pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="レポートの書式の変換だけの性能を計測します")
+    parser.add_argument("--messages", type=int, default=100_000, help="親メッセージの数")
+    parser.add_argument("--batch-size", type=int, default=1000, help="1ページの親メッセージの数")
+    parser.add_argument("--format", action="append", choices=FORMATS, help="計測する書式（複数指定可、省略時は全て）")
+    parser.add_argument("--repeat", type=int, default=3, help="計測する回数（最も速かった回を表示する）")
+    args = parser.parse_args()
+
+    pages = create_pages(args.messages, args.batch_size)
+    users = {f"U{index:05d}": {"id": f"U{index:05d}", "real_name": f"ユーザー{index}"} for index in range(50)}
+    channel = {"id": "CBENCH", "name": "bench"}
+    for name in args.format or FORMATS:
+        renderer = ReportRenderer(create_report_template(name))
+        best_seconds = float("inf")
+        output_chars = 0
+        for _ in range(args.repeat):
+            started_at = time.perf_counter()
+            output_chars = sum(len(renderer.render(channel, messages, threads, users)) for messages, threads in pages)
+            best_seconds = min(best_seconds, time.perf_counter() - started_at)
+        print(
+            f"{name}: {best_seconds:.3f}秒 / {args.messages / best_seconds:,.0f}件/秒 / 出力 {output_chars / 1024 / 1024:.1f}M文字",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
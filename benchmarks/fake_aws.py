@@ -0,0 +1,211 @@
+import io
+import threading
+from types import SimpleNamespace
+from typing import Iterator
+
+
+class InMemoryS3Client:
+    """
+    ベンチマーク用のメモリ上のS3クライアント
+    mymodules.aws が使う boto3 の S3 クライアントのメソッドのみを実装する
+    大きなオブジェクトは中身を保持せずサイズのみを記録し、ベンチマークのメモリ使用量に含めないようにする
+    put_object の条件付き書き込み（IfNoneMatch="*" / IfMatch）はS3と同じく、条件を満たさない場合は PreconditionFailed を返す
+
+    Parameters
+    ----------
+    region_name : str
+      get_bucket_location で返すリージョン
+    max_body_bytes : int
+      この大きさ以下のオブジェクトのみ中身を保持する（チェックポイント・スナップショットなどの読み込みに使う）
+    """
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+        class ClientError(Exception):
+            def __init__(self, code: str, operation_name: str):
+                super().__init__(f"{operation_name}: {code}")
+                self.response = {"Error": {"Code": code}}
+
+    def __init__(self, region_name: str = "ap-northeast-1", max_body_bytes: int = 1024 * 1024):
+        self.__region_name = region_name
+        self.__max_body_bytes = max_body_bytes
+        self.__objects: dict[tuple[str, str], bytes | None] = {}
+        self.__sizes: dict[tuple[str, str], int] = {}
+        self.__etags: dict[tuple[str, str], str] = {}
+        self.__version = 0
+        self.__uploads: dict[str, list[int]] = {}
+        self.__lock = threading.Lock()
+        self.calls: dict[str, int] = {}
+
+    @property
+    def total_bytes(self) -> int:
+        """
+        保存したオブジェクトの合計サイズ
+        """
+        with self.__lock:
+            return sum(self.__sizes.values())
+
+    @property
+    def object_count(self) -> int:
+        with self.__lock:
+            return len(self.__sizes)
+
+    def put_object(
+        self, Bucket: str, Key: str, Body=b"", IfNoneMatch: str | None = None, IfMatch: str | None = None, **kwargs
+    ) -> dict:
+        self.__count("put_object")
+        body = Body.encode("utf-8") if isinstance(Body, str) else bytes(Body)
+        with self.__lock:
+            etag = self.__etags.get((Bucket, Key))
+            if (IfNoneMatch == "*" and etag is not None) or (IfMatch is not None and IfMatch != etag):
+                raise self.exceptions.ClientError("PreconditionFailed", "PutObject")
+            self.__store(Bucket, Key, body)
+            return {"ETag": self.__etags[(Bucket, Key)]}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        self.__count("get_object")
+        with self.__lock:
+            if (Bucket, Key) not in self.__sizes:
+                raise self.exceptions.NoSuchKey(Key)
+            body = self.__objects[(Bucket, Key)]
+            etag = self.__etags[(Bucket, Key)]
+        if body is None:
+            raise ValueError(f"ベンチマークでは{self.__max_body_bytes}バイトを超えるオブジェクトは読み込めません: {Key}")
+        return {"Body": _StreamingBody(body), "ContentLength": len(body), "ETag": etag}
+
+    def get_bucket_location(self, Bucket: str) -> dict:
+        self.__count("get_bucket_location")
+        return {"LocationConstraint": self.__region_name}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs) -> dict:
+        self.__count("create_multipart_upload")
+        upload_id = f"upload-{Bucket}-{Key}"
+        with self.__lock:
+            self.__uploads[upload_id] = []
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes) -> dict:
+        self.__count("upload_part")
+        with self.__lock:
+            self.__uploads[UploadId].append(len(Body))
+        return {"ETag": f'"part-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict) -> dict:
+        self.__count("complete_multipart_upload")
+        with self.__lock:
+            size = sum(self.__uploads.pop(UploadId))
+            self.__objects[(Bucket, Key)] = None
+            self.__sizes[(Bucket, Key)] = size
+            self.__etags[(Bucket, Key)] = self.__next_etag()
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> dict:
+        self.__count("abort_multipart_upload")
+        with self.__lock:
+            self.__uploads.pop(UploadId, None)
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:
+        self.__count("delete_object")
+        with self.__lock:
+            self.__objects.pop((Bucket, Key), None)
+            self.__sizes.pop((Bucket, Key), None)
+            self.__etags.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: dict) -> dict:
+        self.__count("delete_objects")
+        with self.__lock:
+            for obj in Delete["Objects"]:
+                self.__objects.pop((Bucket, obj["Key"]), None)
+                self.__sizes.pop((Bucket, obj["Key"]), None)
+                self.__etags.pop((Bucket, obj["Key"]), None)
+        return {}
+
+    def get_paginator(self, operation_name: str):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+
+        def paginate(Bucket: str, Prefix: str = ""):
+            self.__count("list_objects_v2")
+            with self.__lock:
+                contents = [
+                    {"Key": key, "Size": size} for (bucket, key), size in sorted(self.__sizes.items()) if bucket == Bucket
+                ]
+            yield {"Contents": [content for content in contents if content["Key"].startswith(Prefix)]}
+
+        return SimpleNamespace(paginate=paginate)
+
+    def __store(self, bucket: str, key: str, body: bytes) -> None:
+        # ロックを取ってから呼び出す
+        self.__objects[(bucket, key)] = body if len(body) <= self.__max_body_bytes else None
+        self.__sizes[(bucket, key)] = len(body)
+        self.__etags[(bucket, key)] = self.__next_etag()
+
+    def __next_etag(self) -> str:
+        # 書き込むたびに変わればよいため、中身のハッシュの代わりに連番を使う
+        self.__version += 1
+        return f'"{self.__version}"'
+
+    def __count(self, operation_name: str) -> None:
+        with self.__lock:
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
+
+
+class _StreamingBody(io.BytesIO):
+    """
+    botocore の StreamingBody のうち、mymodules.aws が使うメソッドを持つ読み込み用のストリーム
+    """
+
+    def iter_chunks(self, chunk_size: int = 1024) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class InMemorySSMClient:
+    """
+    ベンチマーク用のメモリ上のSystems Managerクライアント
+
+    Parameters
+    ----------
+    parameters : dict[str, str]
+      パラメータ名 → 値 の辞書
+    """
+
+    class exceptions:
+        class ParameterNotFound(Exception):
+            pass
+
+    def __init__(self, parameters: dict[str, str]):
+        self.__parameters = dict(parameters)
+        self.__lock = threading.Lock()
+        self.calls: dict[str, int] = {}
+
+    def get_parameter(self, Name: str, WithDecryption: bool = False) -> dict:
+        self.__count("get_parameter")
+        with self.__lock:
+            if Name not in self.__parameters:
+                raise self.exceptions.ParameterNotFound(Name)
+            return {"Parameter": {"Name": Name, "Value": self.__parameters[Name]}}
+
+    def get_parameters(self, Names: list[str], WithDecryption: bool = False) -> dict:
+        self.__count("get_parameters")
+        with self.__lock:
+            found = [{"Name": name, "Value": self.__parameters[name]} for name in Names if name in self.__parameters]
+            invalid = [name for name in Names if name not in self.__parameters]
+        return {"Parameters": found, "InvalidParameters": invalid}
+
+    def put_parameter(self, Name: str, Value: str, **kwargs) -> dict:
+        self.__count("put_parameter")
+        with self.__lock:
+            self.__parameters[Name] = Value
+        return {"Version": 1}
+
+    def __count(self, operation_name: str) -> None:
+        with self.__lock:
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
@@ -0,0 +1,395 @@
+import bisect
+import json
+import math
+import socket
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class SyntheticChannel:
+    """
+    ベンチマーク用の合成チャンネル
+    メッセージは保持せず、番号からtsと本文を計算して返すため、100万件のチャンネルでもメモリを使わない
+
+    Attributes
+    ----------
+    id : str
+      チャンネルID
+    name : str
+      チャンネル名
+    message_count : int
+      メッセージの数
+    start_ts : float
+      最も古いメッセージのUNIX時間
+    interval_seconds : float
+      メッセージの間隔（秒）
+    keyword : str
+      match_every件に1件のメッセージの本文に含める検索ワード
+    match_every : int
+      検索ワードを含めるメッセージの間隔
+    thread_every : int
+      返信があるスレッドにするメッセージの間隔（0の場合はスレッドを作らない）
+    replies_per_thread : int
+      スレッド1つあたりの返信の数
+    user_count : int
+      投稿者のユーザーの数
+    """
+
+    id: str
+    name: str
+    message_count: int
+    start_ts: float
+    interval_seconds: float
+    keyword: str = "障害"
+    match_every: int = 10
+    thread_every: int = 20
+    replies_per_thread: int = 3
+    user_count: int = 50
+
+    def ts(self, index: int) -> str:
+        return f"{self.start_ts + index * self.interval_seconds:.6f}"
+
+    def index_range(self, oldest: str | None, latest: str | None) -> tuple[int, int]:
+        """
+        oldestより新しく、latestより古いメッセージの番号の範囲 [lo, hi) を求める
+        """
+        lo = 0
+        hi = self.message_count
+        # Slackと同じく、oldest・latestちょうどのメッセージは含めない（tsの小数の誤差は切り捨てる）
+        if oldest is not None:
+            lo = max(lo, math.floor((float(oldest) - self.start_ts) / self.interval_seconds + 1e-9) + 1)
+        if latest is not None:
+            hi = min(hi, math.ceil((float(latest) - self.start_ts) / self.interval_seconds - 1e-9))
+        return lo, max(lo, hi)
+
+    def message(self, index: int) -> dict:
+        ts = self.ts(index)
+        text = f"{self.name}のメッセージ {index}"
+        if index % self.match_every == 0:
+            text += f" {self.keyword}が発生しました"
+        message = _message_payload(ts, self.user_id(index), text)
+        if self.thread_every > 0 and index % self.thread_every == 0:
+            message["thread_ts"] = ts
+            message["reply_count"] = self.replies_per_thread
+            message["latest_reply"] = self.reply_ts(index, self.replies_per_thread)
+        return message
+
+    def replies(self, parent_ts: str) -> list[dict]:
+        index = round((float(parent_ts) - self.start_ts) / self.interval_seconds)
+        parent = self.message(index)
+        replies = [
+            {
+                **_message_payload(self.reply_ts(index, number), self.user_id(index + number), f"返信 {number}"),
+                "thread_ts": parent_ts,
+                "parent_user_id": parent["user"],
+            }
+            for number in range(1, parent.get("reply_count", 0) + 1)
+        ]
+        return [parent, *replies]
+
+    def reply_ts(self, index: int, number: int) -> str:
+        # 返信は次のメッセージより前に収まるように、間隔を細かく区切る
+        return f"{self.start_ts + index * self.interval_seconds + number * self.interval_seconds / 100:.6f}"
+
+    def user_id(self, index: int) -> str:
+        return f"U{index % self.user_count:05d}"
+
+
+class RecordedChannel:
+    """
+    記録したSlack APIの応答から作るチャンネル
+    SyntheticChannel と同じく、偽のSlack APIサーバーの conversations.history / conversations.replies に使う
+
+    Parameters
+    ----------
+    id : str
+      チャンネルID
+    name : str
+      チャンネル名
+    messages : list[dict]
+      conversations.history で取得したメッセージのリスト（順序は問わない）
+    replies : dict[str, list[dict]]
+      スレッドの親メッセージのts → conversations.replies で取得したメッセージのリスト（親メッセージを先頭に含む）
+    """
+
+    def __init__(self, id: str, name: str, messages: list[dict], replies: dict[str, list[dict]]):
+        self.id = id
+        self.name = name
+        self.__messages = sorted(messages, key=lambda message: float(message["ts"]))
+        self.__ts = [float(message["ts"]) for message in self.__messages]
+        self.__replies = replies
+        self.message_count = len(self.__messages)
+
+    def index_range(self, oldest: str | None, latest: str | None) -> tuple[int, int]:
+        """
+        oldestより新しく、latestより古いメッセージの番号の範囲 [lo, hi) を求める
+        """
+        lo = bisect.bisect_right(self.__ts, float(oldest)) if oldest is not None else 0
+        hi = bisect.bisect_left(self.__ts, float(latest)) if latest is not None else self.message_count
+        return lo, max(lo, hi)
+
+    def message(self, index: int) -> dict:
+        return self.__messages[index]
+
+    def replies(self, parent_ts: str) -> list[dict]:
+        if parent_ts in self.__replies:
+            return self.__replies[parent_ts]
+        # 返信を記録していないスレッドは、親メッセージのみを返す
+        index = bisect.bisect_left(self.__ts, float(parent_ts))
+        return [self.__messages[index]] if index < self.message_count and self.__ts[index] == float(parent_ts) else []
+
+
+def load_recorded_channels(path: str) -> list[RecordedChannel]:
+    """
+    記録したSlack APIの応答のファイルから、チャンネルのリストを作る
+
+    ファイルは次の形のJSONで、messages・replies には Slack API の応答のメッセージをそのまま入れる
+    {"channels": [{"id": "C0123", "name": "general", "messages": [...], "replies": {"<親メッセージのts>": [...]}}]}
+
+    Parameters
+    ----------
+    path : str
+      ファイルのパス
+
+    Returns
+    -------
+    list[RecordedChannel]
+      チャンネルのリスト
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        RecordedChannel(channel["id"], channel["name"], channel.get("messages", []), channel.get("replies", {}))
+        for channel in data["channels"]
+    ]
+
+
+@dataclass
+class FakeSlackConfig:
+    """
+    偽のSlack APIサーバーの設定
+
+    Attributes
+    ----------
+    channels : list[SyntheticChannel or RecordedChannel]
+      合成チャンネル・記録したチャンネルのリスト
+    filler_channel_count : int
+      conversations.list のページングを再現するために追加する、メッセージの無いチャンネルの数
+    latency_ms : float
+      1リクエストごとに待機する時間（ミリ秒）
+    rate_limit_every : int
+      メソッドごとにこの回数に1回、429を返す（0の場合は返さない）
+    retry_after_seconds : int
+      429のRetry-Afterヘッダーの値
+    list_page_size : int
+      conversations.list / users.list の1ページの最大件数
+    user_count : int
+      users.list で返すユーザーの数
+    """
+
+    channels: list[SyntheticChannel | RecordedChannel]
+    filler_channel_count: int = 0
+    latency_ms: float = 0
+    rate_limit_every: int = 0
+    retry_after_seconds: int = 1
+    list_page_size: int = 200
+    user_count: int = 50
+
+
+class FakeSlackServer:
+    """
+    Slack APIの一部を再現するローカルのHTTPサーバー
+    conversations.list / conversations.history / conversations.replies / users.info / users.list / chat.postMessage に応答する
+
+    Parameters
+    ----------
+    config : FakeSlackConfig
+      サーバーの設定
+    """
+
+    def __init__(self, config: FakeSlackConfig):
+        self.config = config
+        self.__channels = {channel.id: channel for channel in config.channels}
+        self.__calls: Counter = Counter()
+        self.__rate_limited: Counter = Counter()
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), self.__create_handler())
+        self.__server.daemon_threads = True
+        self.__thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """
+        SLACK_API_BASE_URL に指定するURL
+        """
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> "FakeSlackServer":
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def reset_stats(self) -> None:
+        with self.__lock:
+            self.__calls.clear()
+            self.__rate_limited.clear()
+
+    def stats(self) -> dict:
+        """
+        メソッドごとのリクエスト数と、429を返した回数を返す
+        """
+        with self.__lock:
+            return {"calls": dict(self.__calls), "rate_limited": dict(self.__rate_limited)}
+
+    def handle(self, api_method: str, params: dict) -> tuple[int, dict, dict]:
+        """
+        1リクエストを処理し、(ステータスコード, ヘッダー, ボディ) を返す
+        """
+        with self.__lock:
+            self.__calls[api_method] += 1
+            count = self.__calls[api_method]
+        if self.config.latency_ms > 0:
+            time.sleep(self.config.latency_ms / 1000)
+        if self.config.rate_limit_every > 0 and count % self.config.rate_limit_every == 0:
+            with self.__lock:
+                self.__rate_limited[api_method] += 1
+            return 429, {"Retry-After": str(self.config.retry_after_seconds)}, {"ok": False, "error": "ratelimited"}
+
+        if api_method == "conversations.list":
+            return 200, {}, self.__conversations_list(params)
+        if api_method == "conversations.history":
+            return 200, {}, self.__conversations_history(params)
+        if api_method == "conversations.replies":
+            channel = self.__channels.get(params.get("channel", ""))
+            if channel is None:
+                return 200, {}, {"ok": False, "error": "channel_not_found"}
+            messages = channel.replies(params["ts"])
+            if params.get("oldest") is not None:
+                # 親メッセージは常に先頭に含め、返信はoldestより新しいもののみを返す
+                messages = messages[:1] + [reply for reply in messages[1:] if float(reply["ts"]) > float(params["oldest"])]
+            return 200, {}, {"ok": True, "messages": messages, "has_more": False}
+        if api_method == "users.info":
+            return 200, {}, {"ok": True, "user": _user(params["user"])}
+        if api_method == "users.list":
+            return 200, {}, self.__users_list(params)
+        if api_method == "chat.postMessage":
+            message = {"type": "message", "ts": f"{time.time():.6f}", "text": params.get("text", "")}
+            return 200, {}, {"ok": True, "channel": params.get("channel"), "ts": message["ts"], "message": message}
+        return 200, {}, {"ok": False, "error": "unknown_method"}
+
+    def __conversations_list(self, params: dict) -> dict:
+        channels = [{"id": channel.id, "name": channel.name, "is_channel": True} for channel in self.config.channels]
+        channels += [
+            {"id": f"CF{number:07d}", "name": f"filler-{number}", "is_channel": True}
+            for number in range(self.config.filler_channel_count)
+        ]
+        return _page(channels, "channels", params, self.config.list_page_size)
+
+    def __users_list(self, params: dict) -> dict:
+        users = [_user(f"U{number:05d}") for number in range(self.config.user_count)]
+        return _page(users, "members", params, self.config.list_page_size)
+
+    def __conversations_history(self, params: dict) -> dict:
+        channel = self.__channels.get(params.get("channel", ""))
+        if channel is None:
+            return {"ok": False, "error": "channel_not_found"}
+        limit = min(int(params.get("limit", 100)), 1000)
+        lo, hi = channel.index_range(params.get("oldest"), params.get("latest"))
+        # 新しいメッセージから順に返し、カーソルには返した件数を入れる
+        offset = int(params.get("cursor") or 0)
+        end = hi - offset
+        start = max(lo, end - limit)
+        messages = [channel.message(index) for index in range(end - 1, start - 1, -1)]
+        has_more = start > lo
+        response: dict = {"ok": True, "messages": messages, "has_more": has_more}
+        response["response_metadata"] = {"next_cursor": str(offset + len(messages)) if has_more else ""}
+        return response
+
+    def __create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # ヘッダーとボディを別々に送るため、Nagleアルゴリズムによる遅延を避ける
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                self.__respond()
+
+            def do_POST(self):
+                self.__respond()
+
+            def log_message(self, format, *args):
+                pass
+
+            def __respond(self):
+                parsed = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > 0:
+                    body = self.rfile.read(length).decode("utf-8")
+                    params.update({key: values[-1] for key, values in parse_qs(body).items()})
+                if parsed.path.startswith("/_bench/"):
+                    # ベンチマークの実行プロセスから、実行ごとのリクエスト数を取得・リセットするためのエンドポイント
+                    status, headers, payload = 200, {}, server.stats()
+                    if parsed.path == "/_bench/reset":
+                        server.reset_stats()
+                else:
+                    status, headers, payload = server.handle(parsed.path.rsplit("/", 1)[-1], params)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _page(items: list[dict], key: str, params: dict, page_size: int) -> dict:
+    limit = min(int(params.get("limit", page_size)), page_size)
+    offset = int(params.get("cursor") or 0)
+    page = items[offset : offset + limit]
+    next_offset = offset + len(page)
+    next_cursor = str(next_offset) if next_offset < len(items) else ""
+    return {"ok": True, key: page, "response_metadata": {"next_cursor": next_cursor}}
+
+
+def _user(user_id: str) -> dict:
+    return {"id": user_id, "name": user_id.lower(), "real_name": f"ユーザー{user_id[1:]}"}
+
+
+def _message_payload(ts: str, user: str, text: str) -> dict:
+    """
+    実際のSlack APIと同じように、本文を blocks にも持つメッセージを作る
+    """
+    return {
+        "client_msg_id": f"{ts.replace('.', '')[-12:]:0>12}-0000-4000-8000-000000000000",
+        "type": "message",
+        "text": text,
+        "user": user,
+        "ts": ts,
+        "blocks": [
+            {
+                "type": "rich_text",
+                "block_id": ts[-5:],
+                "elements": [{"type": "rich_text_section", "elements": [{"type": "text", "text": text}]}],
+            }
+        ],
+        "team": "T00000000",
+    }
@@ -0,0 +1,436 @@
+"""
+Slack APIとS3を使わずに、save_slack_messages_to_s3 をローカルで実行してプロファイルを取るツール
+
+ベンチマークと同じ偽のSlack APIサーバー（合成チャンネル、または記録したSlack APIの応答）とメモリ上のS3に対してハンドラーを1回実行し、
+フェーズごとの実行時間に加えて、指定した場合はCPUプロファイル（cProfile）とメモリのプロファイル（tracemalloc）を取ります。
+結果は benchmarks/results/profile-<日時>-<名前>/ に保存し、--compare で以前の結果と比べられます。
+
+保存するファイル
+  summary.json  実行時間・フェーズごとの時間・API呼び出し回数・時間のかかった関数・メモリを多く確保した行（比較に使う）
+  cpu.pstats    cProfileの結果（python -m pstats や snakeviz で開ける）
+  cpu.txt       cProfileの結果を累計時間順・自身の時間順に並べたもの
+  memory.txt    メモリ使用量が最大に近い時点の、確保したメモリの多い行
+
+--cpu を指定した場合、フェーズごとの時間にはプロファイラーのオーバーヘッドが含まれます。
+比較する場合は同じオプションで取った結果どうしを比べてください。
+
+Examples
+--------
+$ python -m benchmarks.profile_handler --scenario small --cpu --memory
+$ python -m benchmarks.profile_handler --recorded recorded.json --search-words 障害,エラー --cpu
+$ python -m benchmarks.profile_handler --scenario medium --cpu --compare benchmarks/results/profile-20261018T120000-medium
+"""
+import argparse
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from .fake_aws import InMemoryS3Client, InMemorySSMClient
+from .fake_slack import (
+    FakeSlackConfig,
+    FakeSlackServer,
+    SyntheticChannel,
+    load_recorded_channels,
+)
+from .run_benchmarks import (
+    REPO_ROOT,
+    RESULTS_DIR,
+    _bench_request,
+    _git_commit,
+    create_child_env,
+)
+from .scenarios import Scenario, get_scenarios
+
+SUMMARY_FILE = "summary.json"
+
+
+def run_profile(
+    name: str,
+    config: FakeSlackConfig,
+    handler_env: dict[str, str],
+    output_dir: str,
+    cpu: bool = False,
+    memory: bool = False,
+    top: int = 30,
+) -> dict:
+    """
+    偽のSlack APIサーバーを立て、別のプロセスでハンドラーを実行してプロファイルを取る
+
+    Parameters
+    ----------
+    name : str
+      シナリオ名（記録した応答を使う場合はファイル名）
+    config : FakeSlackConfig
+      偽のSlack APIサーバーの設定
+    handler_env : dict[str, str]
+      ハンドラーに渡す環境変数
+    output_dir : str
+      結果を保存するディレクトリ
+    cpu : bool
+      Trueの場合はcProfileでCPUプロファイルを取る
+    memory : bool
+      Trueの場合はtracemallocでメモリのプロファイルを取る
+    top : int
+      summary.json・cpu.txt・memory.txt に含める関数・行の数
+
+    Returns
+    -------
+    dict
+      summary.json の内容
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    server = FakeSlackServer(config).start()
+    try:
+        env = {
+            **create_child_env(server, handler_env),
+            "PROFILE_OUTPUT_DIR": output_dir,
+            "PROFILE_CPU": "1" if cpu else "0",
+            "PROFILE_MEMORY": "1" if memory else "0",
+            "PROFILE_TOP": str(top),
+        }
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.profile_handler", "--child"],
+            cwd=REPO_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    finally:
+        server.stop()
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name}の実行に失敗しました\n{completed.stderr[-4000:]}")
+    with open(os.path.join(output_dir, SUMMARY_FILE)) as f:
+        summary = json.load(f)
+    summary["name"] = name
+    summary["message_count"] = sum(channel.message_count for channel in config.channels)
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def child_main() -> None:
+    """
+    プロファイルの子プロセスとして、ハンドラーを1回実行して結果をファイルに保存する
+    """
+    from mymodules.aws import register_client
+    from mymodules.metrics import get_metrics
+
+    output_dir = os.environ["PROFILE_OUTPUT_DIR"]
+    use_cpu = os.environ.get("PROFILE_CPU") == "1"
+    use_memory = os.environ.get("PROFILE_MEMORY") == "1"
+    top = int(os.environ.get("PROFILE_TOP", "30"))
+
+    snapshotter: _PeakSnapshotter | None = None
+    if use_memory:
+        tracemalloc.start()
+        snapshotter = _PeakSnapshotter()
+        snapshotter.start()
+
+    # AWSの代わりにメモリ上のスタンドインを使う
+    s3_client = InMemoryS3Client()
+    ssm_client = InMemorySSMClient({"python_slack_app_token": "xoxb-profile"})
+    register_client("s3", s3_client)
+    register_client("ssm", ssm_client, region_name=os.environ["REGION"])
+
+    started_at = time.perf_counter()
+    from get_slack_message import save_slack_messages_to_s3
+
+    import_seconds = time.perf_counter() - started_at
+
+    profiles = _ThreadProfiles() if use_cpu else None
+    _bench_request("reset")
+    started_at = time.perf_counter()
+    if profiles is not None:
+        profiles.start()
+    try:
+        save_slack_messages_to_s3({}, None)
+    finally:
+        if profiles is not None:
+            profiles.stop()
+    wall_seconds = time.perf_counter() - started_at
+    slack_stats = _bench_request("stats")
+
+    summary: dict = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "cpu": use_cpu,
+        "memory": use_memory,
+        "import_seconds": round(import_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "phase_seconds": {phase: round(seconds, 3) for phase, seconds in get_metrics().snapshot()["phases"].items()},
+        "slack_api_calls": slack_stats["calls"],
+        "slack_api_total_calls": sum(slack_stats["calls"].values()),
+        "s3_calls": s3_client.calls,
+        "s3_bytes_written": s3_client.total_bytes,
+        # Linuxではキロバイト、macOSではバイト単位
+        "peak_rss_mib": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 * 1024), 1
+        ),
+    }
+    if profiles is not None:
+        stats = profiles.stats()
+        stats.dump_stats(os.path.join(output_dir, "cpu.pstats"))
+        with open(os.path.join(output_dir, "cpu.txt"), "w") as f:
+            f.write(_format_stats(stats, "cumulative", top) + _format_stats(stats, "tottime", top))
+        summary["cpu_functions"] = _top_functions(stats, top)
+    if snapshotter is not None:
+        snapshotter.stop()
+        summary["tracemalloc_peak_mib"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        summary["memory_top"] = _top_allocations(snapshotter.snapshot, top)
+        tracemalloc.stop()
+        with open(os.path.join(output_dir, "memory.txt"), "w") as f:
+            f.write(f"最大 {summary['tracemalloc_peak_mib']}MiB（{snapshotter.snapshot_mib}MiB の時点のスナップショット）\n")
+            for allocation in summary["memory_top"]:
+                f.write(f"{allocation['size_kib']:>12.1f}KiB {allocation['count']:>10}個  {allocation['location']}\n")
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+def compare_profiles(current: dict, previous: dict, top: int = 15) -> list[str]:
+    """
+    2つのプロファイルの結果を比べ、差の大きいものから並べる
+
+    Parameters
+    ----------
+    current : dict
+      今回の summary.json の内容
+    previous : dict
+      比べる summary.json の内容
+    top : int
+      表示する関数・行の数
+
+    Returns
+    -------
+    list[str]
+      表示する行のリスト
+    """
+    lines: list[str] = []
+    if (current["cpu"], current["memory"]) != (previous["cpu"], previous["memory"]):
+        lines.append("注意: --cpu / --memory の指定が異なるため、実行時間はプロファイラーのオーバーヘッドの差を含みます")
+    lines.append(f"実行時間: {previous['wall_seconds']:.3f}秒 → {current['wall_seconds']:.3f}秒")
+    lines.append(f"Slack API: {previous['slack_api_total_calls']}回 → {current['slack_api_total_calls']}回")
+    lines.append(f"最大メモリ: {previous['peak_rss_mib']}MiB → {current['peak_rss_mib']}MiB")
+    lines.append("フェーズごとの時間:")
+    for phase in sorted(set(current["phase_seconds"]) | set(previous["phase_seconds"])):
+        before = previous["phase_seconds"].get(phase, 0)
+        after = current["phase_seconds"].get(phase, 0)
+        lines.append(f"  {phase:<12} {before:8.3f}秒 → {after:8.3f}秒 ({after - before:+.3f})")
+    if "cpu_functions" in current and "cpu_functions" in previous:
+        lines.append("自身の時間の差が大きい関数:")
+        lines += _diff_lines(current["cpu_functions"], previous["cpu_functions"], "function", "tottime", "秒", top)
+    if "memory_top" in current and "memory_top" in previous:
+        lines.append(f"tracemallocの最大: {previous['tracemalloc_peak_mib']}MiB → {current['tracemalloc_peak_mib']}MiB")
+        lines.append("確保したメモリの差が大きい行:")
+        lines += _diff_lines(current["memory_top"], previous["memory_top"], "location", "size_kib", "KiB", top)
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Slack APIとS3を使わずにハンドラーを実行してプロファイルを取ります")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--scenario", default="small", help="実行するベンチマークのシナリオ名")
+    target.add_argument("--recorded", help="記録したSlack APIの応答のファイル（benchmarks.fake_slack.load_recorded_channels の形式）")
+    parser.add_argument("--search-words", default="障害,エラー", help="--recorded の場合の検索ワード（カンマ区切り）")
+    parser.add_argument("--env", action="append", default=[], help="ハンドラーに渡す環境変数（KEY=VALUE、複数指定可）")
+    parser.add_argument("--cpu", action="store_true", help="cProfileでCPUプロファイルを取る")
+    parser.add_argument("--memory", action="store_true", help="tracemallocでメモリのプロファイルを取る（実行は遅くなる）")
+    parser.add_argument("--top", type=int, default=30, help="結果に含める関数・行の数")
+    parser.add_argument("--output", help="結果を保存するディレクトリ（既定は benchmarks/results/profile-<日時>-<名前>）")
+    parser.add_argument("--compare", help="比べる以前の結果のディレクトリ")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main()
+        return
+
+    if args.recorded is not None:
+        name = os.path.splitext(os.path.basename(args.recorded))[0]
+        config, handler_env = _recorded_target(args.recorded, args.search_words)
+    else:
+        scenario: Scenario = get_scenarios([args.scenario])[0]
+        name = scenario.name
+        config, handler_env = scenario.create_config(), scenario.create_env()
+    for item in args.env:
+        key, _, value = item.partition("=")
+        handler_env[key] = value
+    output_dir = args.output or os.path.join(RESULTS_DIR, f"profile-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}-{name}")
+
+    print(f"{name}: メッセージ{sum(channel.message_count for channel in config.channels)}件 ...", flush=True)
+    summary = run_profile(name, config, handler_env, output_dir, cpu=args.cpu, memory=args.memory, top=args.top)
+    print(
+        f"  {summary['wall_seconds']:.2f}秒 / Slack API {summary['slack_api_total_calls']}回 / 最大メモリ {summary['peak_rss_mib']}MiB"
+    )
+    for phase, seconds in sorted(summary["phase_seconds"].items(), key=lambda item: -item[1]):
+        print(f"  {phase:<12} {seconds:8.3f}秒")
+    print(f"結果を保存しました: {output_dir}")
+
+    if args.compare is not None:
+        with open(os.path.join(args.compare, SUMMARY_FILE)) as f:
+            previous = json.load(f)
+        print(f"{args.compare} との比較:")
+        for line in compare_profiles(summary, previous):
+            print(f"  {line}")
+
+
+class _ThreadProfiles:
+    """
+    ハンドラーはスレッドプールでチャンネル・スレッドを並行して取得するため、
+    メインスレッドに加えて、計測中に始まったスレッドごとにもcProfileを有効にしてまとめる
+    """
+
+    def __init__(self):
+        self.__main = cProfile.Profile()
+        self.__profiles: list[cProfile.Profile] = []
+        self.__lock = threading.Lock()
+
+    def start(self) -> None:
+        threading.setprofile(self.__start_thread)
+        self.__main.enable()
+
+    def stop(self) -> None:
+        self.__main.disable()
+        threading.setprofile(None)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.__main)
+        with self.__lock:
+            for profile in self.__profiles:
+                stats.add(profile)
+        return stats
+
+    def __start_thread(self, frame, event, arg) -> None:
+        # 新しいスレッドで最初に呼ばれた時に、そのスレッドのプロファイラーに切り替える
+        profile = cProfile.Profile()
+        with self.__lock:
+            self.__profiles.append(profile)
+        sys.setprofile(None)
+        profile.enable()
+
+
+class _PeakSnapshotter(threading.Thread):
+    """
+    確保しているメモリが最大に近い時点のtracemallocのスナップショットを取るスレッド
+    終わった時点のスナップショットでは解放済みのメモリが含まれないため、増えるたびに取り直す
+    """
+
+    def __init__(self, interval_seconds: float = 0.05, growth: float = 1.1):
+        super().__init__(daemon=True)
+        self.__interval_seconds = interval_seconds
+        self.__growth = growth
+        self.__stopped = threading.Event()
+        self.__snapshot_bytes = 0
+        self.snapshot: tracemalloc.Snapshot | None = None
+
+    @property
+    def snapshot_mib(self) -> float:
+        return round(self.__snapshot_bytes / 1024 / 1024, 1)
+
+    def run(self) -> None:
+        while not self.__stopped.wait(self.__interval_seconds):
+            self.__take_if_grown()
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        self.join()
+        self.__take_if_grown()
+
+    def __take_if_grown(self) -> None:
+        current = tracemalloc.get_traced_memory()[0]
+        if self.snapshot is None or current > self.__snapshot_bytes * self.__growth:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.__snapshot_bytes = current
+
+
+def _recorded_target(path: str, search_words: str) -> tuple[FakeSlackConfig, dict[str, str]]:
+    """
+    記録したSlack APIの応答から、偽のSlack APIサーバーの設定とハンドラーに渡す環境変数を作る
+    投稿先には、記録したチャンネルとは別にメッセージの無いチャンネルを使う
+    """
+    channels = load_recorded_channels(path)
+    report_channel = SyntheticChannel(
+        id="CBREPORT", name="bench-report", message_count=0, start_ts=time.time(), interval_seconds=1
+    )
+    config = FakeSlackConfig(channels=[*channels, report_channel])
+    handler_env = {
+        "REGION": "ap-northeast-1",
+        "SOURCE_CHANNEL_NAME": ",".join(channel.name for channel in channels),
+        "REPORT_CHANNEL_NAME": report_channel.name,
+        "SEARCH_WORDS": search_words,
+        "CHECKPOINT_BACKEND": "none",
+    }
+    return config, handler_env
+
+
+def _short_path(filename: str) -> str:
+    # バージョン間で比べられるように、sys.path からの相対パスにする
+    for root in sorted((path for path in sys.path if path != ""), key=len, reverse=True):
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1 :]
+    return filename
+
+
+def _top_functions(stats: pstats.Stats, top: int) -> list[dict]:
+    """
+    自身の時間・累計時間のそれぞれ上位の関数を、バージョン間で比べられる名前（行番号を含めない）でまとめる
+    """
+    functions: dict[str, dict] = {}
+    for (filename, _, funcname), (_, ncalls, tottime, cumtime, _) in stats.stats.items():  # type: ignore[attr-defined]
+        key = funcname if filename == "~" else f"{_short_path(filename)}:{funcname}"
+        function = functions.setdefault(key, {"function": key, "ncalls": 0, "tottime": 0.0, "cumtime": 0.0})
+        function["ncalls"] += ncalls
+        function["tottime"] += tottime
+        function["cumtime"] += cumtime
+    by_tottime = sorted(functions.values(), key=lambda function: -function["tottime"])[:top]
+    by_cumtime = sorted(functions.values(), key=lambda function: -function["cumtime"])[:top]
+    selected = {function["function"]: function for function in by_tottime + by_cumtime}
+    return [
+        {**function, "tottime": round(function["tottime"], 4), "cumtime": round(function["cumtime"], 4)}
+        for function in sorted(selected.values(), key=lambda function: -function["tottime"])
+    ]
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot | None, top: int) -> list[dict]:
+    if snapshot is None:
+        return []
+    snapshot = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    )
+    return [
+        {
+            "location": f"{_short_path(statistic.traceback[0].filename)}:{statistic.traceback[0].lineno}",
+            "size_kib": round(statistic.size / 1024, 1),
+            "count": statistic.count,
+        }
+        for statistic in snapshot.statistics("lineno")[:top]
+    ]
+
+
+def _format_stats(stats: pstats.Stats, sort_key: str, top: int) -> str:
+    stream = io.StringIO()
+    stats.stream = stream  # type: ignore[attr-defined]
+    stats.sort_stats(sort_key).print_stats(top)
+    return stream.getvalue()
+
+
+def _diff_lines(current: list[dict], previous: list[dict], key: str, value: str, unit: str, top: int) -> list[str]:
+    before = {item[key]: item[value] for item in previous}
+    after = {item[key]: item[value] for item in current}
+    diffs = sorted(
+        ((name, before.get(name, 0), after.get(name, 0)) for name in set(before) | set(after)),
+        key=lambda item: -abs(item[2] - item[1]),
+    )
+    return [f"  {after_value - before_value:+10.3f}{unit}  {name}" for name, before_value, after_value in diffs[:top]]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Slack APIとS3を使わずに、save_slack_messages_to_s3 の性能を計測するベンチマーク
+
+ローカルに偽のSlack APIサーバーを立て、シナリオごとに別のプロセスでハンドラーを実行します。
+実行時間・Slack APIの呼び出し回数・S3の操作回数・最大メモリ使用量を計測し、benchmarks/results に保存します。
+ベースラインの結果を指定すると、悪化したシナリオを表示して終了コード1で終了します。
+
+Examples
+--------
+$ python -m benchmarks.run_benchmarks
+$ python -m benchmarks.run_benchmarks --scenario large --scenario archive
+$ python -m benchmarks.run_benchmarks --save-baseline
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+from .fake_aws import InMemoryS3Client, InMemorySSMClient
+from .fake_slack import FakeSlackServer
+from .scenarios import UNLIMITED_RATE_LIMITS, Scenario, get_scenarios
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+def run_scenario(scenario: Scenario, use_tracemalloc: bool = False) -> dict:
+    """
+    偽のSlack APIサーバーを立て、別のプロセスでハンドラーを実行して計測結果を取得する
+    プロセスを分けることで、シナリオごとにコールドスタートからの実行時間とメモリ使用量を測る
+
+    Parameters
+    ----------
+    scenario : Scenario
+      実行するシナリオ
+    use_tracemalloc : bool
+      Trueの場合はtracemallocでPythonのオブジェクトの最大メモリ使用量も計測する（実行は遅くなる）
+
+    Returns
+    -------
+    dict
+      計測結果
+    """
+    server = FakeSlackServer(scenario.create_config()).start()
+    try:
+        env = {
+            **create_child_env(server, scenario.create_env()),
+            "BENCHMARK_RUNS": str(scenario.runs),
+            "BENCHMARK_TRACEMALLOC": "1" if use_tracemalloc else "0",
+        }
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run_benchmarks", "--child"],
+            cwd=REPO_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    finally:
+        server.stop()
+    if completed.returncode != 0:
+        raise RuntimeError(f"シナリオ{scenario.name}の実行に失敗しました\n{completed.stderr[-4000:]}")
+    result_lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    result = json.loads(result_lines[-1][len(RESULT_PREFIX) :])
+    result["description"] = scenario.description
+    result["message_count"] = sum(scenario.channel_sizes)
+    return result
+
+
+def create_child_env(server: FakeSlackServer, handler_env: dict[str, str]) -> dict[str, str]:
+    """
+    偽のSlack APIサーバーに対してハンドラーを実行する子プロセスの環境変数を作成する
+
+    Parameters
+    ----------
+    server : FakeSlackServer
+      起動した偽のSlack APIサーバー
+    handler_env : dict[str, str]
+      ハンドラーに渡す環境変数
+
+    Returns
+    -------
+    dict[str, str]
+      子プロセスの環境変数
+    """
+    return {
+        **os.environ,
+        **handler_env,
+        "SLACK_API_BASE_URL": server.url,
+        "SLACK_RATE_LIMITS": json.dumps(UNLIMITED_RATE_LIMITS),
+        # フェーズごとの時間は結果のファイルに含めるため、メトリクスは標準出力に書き出さない
+        "METRICS_SINK": "none",
+        "PYTHONPATH": os.pathsep.join([REPO_ROOT, os.path.join(REPO_ROOT, "src")]),
+        # 偽のSlack APIサーバーへのリクエストはプロキシを経由させない
+        "NO_PROXY": "127.0.0.1,localhost",
+        "no_proxy": "127.0.0.1,localhost",
+    }
+
+
+def child_main() -> None:
+    """
+    ベンチマークの子プロセスとして、ハンドラーを実行して計測結果を標準出力に書き出す
+    """
+    from mymodules.aws import register_client
+    from mymodules.metrics import get_metrics
+
+    use_tracemalloc = os.environ.get("BENCHMARK_TRACEMALLOC") == "1"
+    if use_tracemalloc:
+        tracemalloc.start()
+
+    # AWSの代わりにメモリ上のスタンドインを使う
+    s3_client = InMemoryS3Client()
+    ssm_client = InMemorySSMClient({"python_slack_app_token": "xoxb-benchmark"})
+    register_client("s3", s3_client)
+    register_client("ssm", ssm_client, region_name=os.environ["REGION"])
+
+    started_at = time.perf_counter()
+    from get_slack_message import save_slack_messages_to_s3
+
+    import_seconds = time.perf_counter() - started_at
+
+    runs: list[dict] = []
+    for _ in range(int(os.environ["BENCHMARK_RUNS"])):
+        _bench_request("reset")
+        started_at = time.perf_counter()
+        save_slack_messages_to_s3({}, None)
+        wall_seconds = time.perf_counter() - started_at
+        slack_stats = _bench_request("stats")
+        runs.append(
+            {
+                "wall_seconds": round(wall_seconds, 3),
+                "slack_api_calls": slack_stats["calls"],
+                "slack_api_total_calls": sum(slack_stats["calls"].values()),
+                "slack_rate_limited": slack_stats["rate_limited"],
+                "phase_seconds": {phase: round(seconds, 3) for phase, seconds in get_metrics().snapshot()["phases"].items()},
+            }
+        )
+
+    result = {
+        "import_seconds": round(import_seconds, 3),
+        "runs": runs,
+        "wall_seconds": runs[0]["wall_seconds"],
+        "slack_api_total_calls": runs[0]["slack_api_total_calls"],
+        # Linuxではキロバイト、macOSではバイト単位
+        "peak_rss_mib": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 * 1024), 1
+        ),
+        "s3_calls": s3_client.calls,
+        "s3_bytes_written": s3_client.total_bytes,
+        "ssm_calls": ssm_client.calls,
+    }
+    if use_tracemalloc:
+        result["tracemalloc_peak_mib"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+    print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False))
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    ベースラインと比べて悪化したシナリオを探す
+
+    Parameters
+    ----------
+    results : dict
+      今回の計測結果
+    baseline : dict
+      ベースラインの計測結果
+    threshold : float
+      実行時間・メモリ使用量がこの割合を超えて増えた場合に悪化とみなす（0.2なら20%）
+
+    Returns
+    -------
+    list[str]
+      悪化の内容のリスト
+    """
+    regressions: list[str] = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric in ("wall_seconds", "peak_rss_mib"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {previous[metric]} → {current[metric]}")
+        # API呼び出し回数は環境に左右されないため、1回でも増えたら悪化とみなす
+        if current["slack_api_total_calls"] > previous["slack_api_total_calls"]:
+            regressions.append(
+                f"{name}: slack_api_total_calls {previous['slack_api_total_calls']} → {current['slack_api_total_calls']}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Slack APIとS3を使わずにハンドラーの性能を計測します")
+    parser.add_argument("--scenario", action="append", help="実行するシナリオ名（複数指定可、allで全て）")
+    parser.add_argument("--tracemalloc", action="store_true", help="Pythonのオブジェクトの最大メモリ使用量も計測する")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="比較するベースラインの結果のファイル")
+    parser.add_argument("--threshold", type=float, default=0.2, help="悪化とみなす実行時間・メモリ使用量の増加の割合")
+    parser.add_argument("--save-baseline", action="store_true", help="今回の結果をベースラインとして保存する")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main()
+        return
+
+    results: dict = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+    for scenario in get_scenarios(args.scenario):
+        print(f"{scenario.name}: {scenario.description} ...", flush=True)
+        result = run_scenario(scenario, args.tracemalloc)
+        results["scenarios"][scenario.name] = result
+        print(
+            f"  {result['wall_seconds']:.2f}秒 / Slack API {result['slack_api_total_calls']}回 / 最大メモリ {result['peak_rss_mib']}MiB"
+            + "".join(f" / {index + 2}回目 {run['wall_seconds']:.2f}秒" for index, run in enumerate(result["runs"][1:])),
+            flush=True,
+        )
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%dT%H%M%S") + ".json")
+    with open(result_path, "w") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {result_path}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"ベースラインを保存しました: {BASELINE_PATH}")
+        return
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.threshold)
+        if len(regressions) > 0:
+            print("ベースラインより悪化しました:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("ベースラインからの悪化はありませんでした")
+
+
+def _bench_request(action: str) -> dict:
+    with urllib.request.urlopen(f"{os.environ['SLACK_API_BASE_URL'].rsplit('/api', 1)[0]}/_bench/{action}") as response:
+        return json.loads(response.read())
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import time
+from dataclasses import dataclass, field
+
+from .fake_slack import FakeSlackConfig, SyntheticChannel
+
+# ハンドラーが検索する範囲（search_hours = 10000時間）に全てのメッセージが収まるように、400日分に分布させる
+HISTORY_SPAN_SECONDS = 400 * 24 * 60 * 60
+
+# ベンチマークではSlackの上限で待つ時間を測らないよう、クライアント側のレートリミットを実質無効にする
+UNLIMITED_RATE_LIMITS = {
+    "conversations.list": 1_000_000,
+    "conversations.history": 1_000_000,
+    "conversations.replies": 1_000_000,
+    "users.info": 1_000_000,
+    "users.list": 1_000_000,
+    "chat.postMessage": 1_000_000,
+}
+
+
+@dataclass
+class Scenario:
+    """
+    ベンチマークのシナリオ
+
+    Attributes
+    ----------
+    name : str
+      シナリオ名
+    description : str
+      シナリオの説明
+    channel_sizes : list[int]
+      情報取得先のチャンネルごとのメッセージの数
+    env : dict[str, str]
+      ハンドラーに渡す環境変数（既定値を上書きする）
+    latency_ms : float
+      偽のSlack APIの1リクエストあたりの遅延（ミリ秒）
+    rate_limit_every : int
+      偽のSlack APIがメソッドごとにこの回数に1回429を返す（0の場合は返さない）
+    filler_channel_count : int
+      conversations.list に含める、メッセージの無いチャンネルの数
+    runs : int
+      ハンドラーを続けて実行する回数（2回目以降はウォームスタート）
+    default : bool
+      シナリオを指定しなかった場合に実行するかどうか
+    """
+
+    name: str
+    description: str
+    channel_sizes: list[int]
+    env: dict[str, str] = field(default_factory=dict)
+    latency_ms: float = 0
+    rate_limit_every: int = 0
+    filler_channel_count: int = 500
+    runs: int = 2
+    default: bool = True
+
+    def create_config(self) -> FakeSlackConfig:
+        """
+        偽のSlack APIサーバーの設定を作成する
+        """
+        now = time.time()
+        channels = [
+            SyntheticChannel(
+                id=f"CB{number:07d}",
+                name=f"bench-{number}",
+                message_count=size,
+                start_ts=now - HISTORY_SPAN_SECONDS,
+                interval_seconds=HISTORY_SPAN_SECONDS / size,
+            )
+            for number, size in enumerate(self.channel_sizes)
+        ]
+        channels.append(SyntheticChannel(id="CBREPORT", name="bench-report", message_count=0, start_ts=now, interval_seconds=1))
+        return FakeSlackConfig(
+            channels=channels,
+            filler_channel_count=self.filler_channel_count,
+            latency_ms=self.latency_ms,
+            rate_limit_every=self.rate_limit_every,
+        )
+
+    def create_env(self) -> dict[str, str]:
+        """
+        ハンドラーに渡す環境変数を作成する
+        """
+        source_channel_names = ",".join(f"bench-{number}" for number in range(len(self.channel_sizes)))
+        return {
+            "REGION": "ap-northeast-1",
+            "SOURCE_CHANNEL_NAME": source_channel_names,
+            "REPORT_CHANNEL_NAME": "bench-report",
+            "SEARCH_WORDS": "障害,エラー",
+            "CHECKPOINT_BACKEND": "none",
+            **self.env,
+        }
+
+
+SCENARIOS: list[Scenario] = [
+    Scenario("small", "1チャンネル・1万件", [10_000]),
+    Scenario("medium", "1チャンネル・10万件", [100_000]),
+    Scenario("large", "1チャンネル・100万件", [1_000_000], runs=1, default=False),
+    Scenario(
+        "multi_channel",
+        "4チャンネル・各2.5万件を並行して収集",
+        [25_000] * 4,
+        env={"CHANNEL_CONCURRENCY": "4"},
+    ),
+    Scenario("latency", "1チャンネル・1万件、1リクエストあたり20ミリ秒の遅延", [10_000], latency_ms=20),
+    Scenario(
+        "sharded_history",
+        "1チャンネル・10万件、1リクエストあたり20ミリ秒の遅延、履歴を期間ごとに8並行で取得",
+        [100_000],
+        env={"HISTORY_CRAWL_CONCURRENCY": "8"},
+        latency_ms=20,
+        runs=1,
+        default=False,
+    ),
+    Scenario(
+        "rate_limited",
+        "1チャンネル・1万件、各メソッド50回に1回429（Retry-After: 1秒）",
+        [10_000],
+        rate_limit_every=50,
+    ),
+    Scenario(
+        "archive",
+        "1チャンネル・10万件、JSON Lines・Parquetのアーカイブと転置インデックスも保存",
+        [100_000],
+        env={"ARCHIVE_FORMATS": "jsonl,parquet", "ARCHIVE_INDEX": "true"},
+        default=False,
+    ),
+]
+
+
+def get_scenarios(names: list[str] | None) -> list[Scenario]:
+    """
+    シナリオ名からシナリオを取得する
+
+    Parameters
+    ----------
+    names : list[str] or None
+      シナリオ名のリスト。Noneの場合は既定のシナリオ、"all"を含む場合は全てのシナリオ
+
+    Returns
+    -------
+    list[Scenario]
+      シナリオのリスト
+    """
+    if names is None:
+        return [scenario for scenario in SCENARIOS if scenario.default]
+    if "all" in names:
+        return list(SCENARIOS)
+    by_name = {scenario.name: scenario for scenario in SCENARIOS}
+    unknown = [name for name in names if name not in by_name]
+    if len(unknown) > 0:
+        raise ValueError(f"シナリオが見つかりません: {unknown}（{list(by_name)}から指定してください）")
+    return [by_name[name] for name in names]
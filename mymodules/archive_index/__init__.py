@@ -0,0 +1,7 @@
+from .archive_index import ArchiveIndex as ArchiveIndex
+from .archive_index import ArchiveIndexSink as ArchiveIndexSink
+from .storage import IndexStorage as IndexStorage
+from .storage import LocalIndexStorage as LocalIndexStorage
+from .storage import S3IndexStorage as S3IndexStorage
+
+__all__ = ["ArchiveIndex", "ArchiveIndexSink", "IndexStorage", "LocalIndexStorage", "S3IndexStorage"]
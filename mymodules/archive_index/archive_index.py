@@ -0,0 +1,247 @@
+from decimal import Decimal
+
+from mymodules.output import create_run_id
+from mymodules.output.records import iter_records
+from mymodules.slack.matcher import normalize_text
+
+from .segment import SEGMENT_EXTENSION, IndexSegment, SegmentReader
+from .storage import IndexStorage
+from .tokenizer import query_terms
+
+
+class ArchiveIndex:
+    """
+    収集済みのメッセージの転置インデックス
+    収集のたびにセグメントを追加し、セグメントが増えたらまとめて1つに統合する
+    検索はSlack APIを呼ばずにインデックスのみで行う
+
+    セグメントはメッセージ・転置リストをハッシュで分けた複数のファイルに保存し、最後にメッセージIDの一覧（ids）を書き込む。
+    検索ではセグメントごとに、検索ワードのgramを含むファイルと候補のメッセージを含むファイルのみを読み込む。
+    統合（compact）だけは全てのセグメントをメモリに読み込むため、メモリ使用量は max_segments × セグメントの大きさまでになる
+
+    Parameters
+    ----------
+    storage : IndexStorage
+      セグメントを保存するストレージ
+    max_segments : int
+      セグメントがこの数を超えたら compact で1つに統合する
+    """
+
+    def __init__(self, storage: IndexStorage, max_segments: int = 8):
+        self.__storage = storage
+        self.__max_segments = max_segments
+        self.__readers: dict[str, SegmentReader] = {}
+
+    def add(self, records: list[dict], segment_id: str) -> str | None:
+        """
+        レコードを新しいセグメントとして保存します。
+
+        Parameters
+        ----------
+        records : list[dict]
+          アーカイブのレコードのリスト
+        segment_id : str
+          セグメントの名前（同じ実行の中で一意にする）
+
+        Returns
+        -------
+        str or None
+          保存したセグメントの名前。レコードが無い場合はNone
+        """
+        return self.add_segment(IndexSegment.from_records(records), segment_id)
+
+    def add_segment(self, segment: IndexSegment, segment_id: str) -> str | None:
+        """
+        作成済みのセグメントを保存します。
+
+        Parameters
+        ----------
+        segment : IndexSegment
+          保存するセグメント
+        segment_id : str
+          セグメントの名前（同じ実行の中で一意にし、"." を含めない）
+
+        Returns
+        -------
+        str or None
+          保存したセグメントの名前。メッセージが無い場合はNone
+        """
+        if len(segment.docs) == 0:
+            return None
+        # ids を最後に書き込み、全てのファイルを書き終えたセグメントのみが検索の対象になるようにする
+        for part, data in segment.to_parts().items():
+            self.__storage.write_segment(f"{segment_id}.{part}{SEGMENT_EXTENSION}", data)
+        self.__readers.pop(segment_id, None)
+        return segment_id
+
+    def delete(self, segment_names: list[str]) -> None:
+        """
+        セグメントを削除します。
+
+        Parameters
+        ----------
+        segment_names : list[str]
+          削除するセグメントの名前のリスト
+        """
+        if len(segment_names) == 0:
+            return
+        segments = self.__list_segments()
+        files = [file for name in segment_names if name in segments for file in self.__reader(name).files()]
+        self.__storage.delete_segments(files)
+        for name in segment_names:
+            self.__readers.pop(name, None)
+
+    def compact(self) -> bool:
+        """
+        セグメントがmax_segmentsを超えている場合、全てのセグメントを1つに統合します。
+        統合したセグメントを保存してから古いセグメントを削除するため、途中で失敗しても検索結果は欠けません。
+
+        Returns
+        -------
+        bool
+          統合した場合はTrue
+        """
+        segments = self.__list_segments()
+        if len(segments) <= self.__max_segments:
+            return False
+        # 名前順（＝保存した順）に取り込み、同じメッセージは新しいセグメントの内容を優先する
+        merged = IndexSegment()
+        for name in sorted(segments):
+            merged.merge(self.__reader(name).load())
+        merged_name = self.add_segment(merged, f"{create_run_id()}-merged")
+        self.delete([name for name in segments if name != merged_name])
+        return True
+
+    def search(
+        self,
+        words: list[str],
+        oldest: str | None = None,
+        latest: str | None = None,
+        channel_name: str | None = None,
+    ) -> list[dict]:
+        """
+        検索ワードのいずれかを含むメッセージをインデックスから検索します。
+        n-gramで候補を絞り込んだ後、正規化した本文に検索ワードが含まれるかを確認します。
+
+        Parameters
+        ----------
+        words : list[str]
+          検索ワードのリスト
+        oldest : str or None
+          このts以降のメッセージのみを対象にする
+        latest : str or None
+          このts以前のメッセージのみを対象にする
+        channel_name : str or None
+          指定した場合はこのチャンネルのメッセージのみを対象にする
+
+        Returns
+        -------
+        list[dict]
+          一致したメッセージのリスト（ts順）。matched_words に一致した検索ワードが入る
+        """
+        segments = self.__list_segments()
+        normalized_words = {word: normalize_text(word) for word in words if word != ""}
+        matched: dict[str, dict] = {}
+        # 新しいセグメントから順に引き、新しいセグメントにあるメッセージは古いセグメントの内容を使わない
+        newer_ids: set[str] = set()
+        for name in sorted(segments, reverse=True):
+            reader = self.__reader(name)
+            candidates = {word: self.__candidates(reader, word) - newer_ids for word in normalized_words}
+            docs = reader.docs(set().union(*candidates.values()))
+            for word, normalized_word in normalized_words.items():
+                for doc_id in candidates[word]:
+                    if normalized_word in normalize_text(docs[doc_id]["text"]):
+                        matched.setdefault(doc_id, {**docs[doc_id], "matched_words": []})["matched_words"].append(word)
+            newer_ids.update(reader.ids())
+
+        results: list[dict] = []
+        for doc in matched.values():
+            if channel_name is not None and doc["channel_name"] != channel_name:
+                continue
+            if oldest is not None and Decimal(doc["ts"]) < Decimal(oldest):
+                continue
+            if latest is not None and Decimal(doc["ts"]) > Decimal(latest):
+                continue
+            results.append(doc)
+        return sorted(results, key=lambda doc: Decimal(doc["ts"]))
+
+    def __candidates(self, reader: SegmentReader, word: str) -> set[str]:
+        candidates: set[str] | None = None
+        for term in query_terms(word):
+            doc_ids = set(reader.postings(term))
+            candidates = doc_ids if candidates is None else candidates & doc_ids
+            if len(candidates) == 0:
+                break
+        return candidates or set()
+
+    def __list_segments(self) -> set[str]:
+        # ids を書き終えていないセグメントは含めない
+        suffix = f".ids{SEGMENT_EXTENSION}"
+        return {file_name[: -len(suffix)] for file_name, _ in self.__storage.list_segments() if file_name.endswith(suffix)}
+
+    def __reader(self, name: str) -> SegmentReader:
+        if name not in self.__readers:
+            self.__readers[name] = SegmentReader(self.__storage, name)
+        return self.__readers[name]
+
+
+class ArchiveIndexSink:
+    """
+    収集したメッセージと返信をインデックスのセグメントとして保存する出力先
+    mymodules.output.OutputSink を満たす
+
+    ページを受け取るたびにセグメントに追加し、max_docs 件に達したらセグメントとして保存して次のセグメントを始める。
+    保持するのは書きかけのセグメント1つ分（メッセージIDと本文などの検索結果に返す項目、転置リスト）のみ
+
+    Parameters
+    ----------
+    index : ArchiveIndex
+      保存先のインデックス
+    segment_id : str
+      保存するセグメントの名前の先頭（実行ID・チャンネルIDなど、同時に実行される他の出力先と重複しないもの）
+    max_docs : int
+      1つのセグメントに含めるメッセージの数の上限
+    """
+
+    def __init__(self, index: ArchiveIndex, segment_id: str, max_docs: int = 50_000):
+        self.__index = index
+        self.__segment_id = segment_id
+        self.__max_docs = max_docs
+        self.__segment = IndexSegment()
+        self.__names: list[str] = []
+
+    def write_batch(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> None:
+        """
+        メッセージと返信をセグメントに追加します。
+        """
+        for record in iter_records(channel, messages, threads, users):
+            self.__segment.add(record)
+            if len(self.__segment.docs) >= self.__max_docs:
+                self.__flush()
+
+    def close(self) -> list[str]:
+        """
+        書きかけのセグメントを保存します。
+
+        Returns
+        -------
+        list[str]
+          保存したセグメントの名前のリスト
+        """
+        self.__flush()
+        names, self.__names = self.__names, []
+        return names
+
+    def abort(self) -> None:
+        """
+        書きかけのセグメントを破棄し、保存済みのセグメントを削除します。
+        """
+        self.__segment = IndexSegment()
+        self.__index.delete(self.__names)
+        self.__names = []
+
+    def __flush(self) -> None:
+        name = self.__index.add_segment(self.__segment, f"{self.__segment_id}-{len(self.__names):03d}")
+        if name is not None:
+            self.__names.append(name)
+        self.__segment = IndexSegment()
@@ -0,0 +1,214 @@
+import gzip
+import json
+import zlib
+
+from .storage import IndexStorage
+from .tokenizer import tokenize
+
+SEGMENT_EXTENSION = ".json.gz"
+# セグメントのメッセージ・転置リストを分けて保存するファイルの数。検索ではクエリのgramを含むファイルのみを読み込む
+SHARD_COUNT = 16
+
+
+class IndexSegment:
+    """
+    転置インデックス（n-gram → メッセージID）の1つのセグメント
+    メッセージIDは "<チャンネルID>:<ts>" の形式で、メッセージの本文などもセグメント内に保持する
+
+    Parameters
+    ----------
+    docs : dict[str, dict] or None
+      メッセージID → メッセージのレコード
+    postings : dict[str, list[str]] or None
+      n-gram → メッセージIDのリスト
+    """
+
+    def __init__(self, docs: dict[str, dict] | None = None, postings: dict[str, list[str]] | None = None):
+        self.docs: dict[str, dict] = docs if docs is not None else {}
+        self.postings: dict[str, list[str]] = postings if postings is not None else {}
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "IndexSegment":
+        """
+        アーカイブのレコードからセグメントを作成します。
+
+        Parameters
+        ----------
+        records : list[dict]
+          mymodules.output.records.iter_records で作成したレコードのリスト
+
+        Returns
+        -------
+        IndexSegment
+          作成したセグメント
+        """
+        segment = cls()
+        for record in records:
+            segment.add(record)
+        return segment
+
+    def add(self, record: dict) -> None:
+        """
+        レコードをセグメントに追加します。同じメッセージIDが既にある場合は置き換えます。
+
+        Parameters
+        ----------
+        record : dict
+          アーカイブのレコード
+        """
+        doc_id = f"{record['channel_id']}:{record['ts']}"
+        if doc_id in self.docs:
+            self.__remove_postings(doc_id)
+        self.docs[doc_id] = {
+            "channel_id": record["channel_id"],
+            "channel_name": record["channel_name"],
+            "ts": record["ts"],
+            "user_name": record.get("user_name"),
+            "text": record.get("text", ""),
+            "parent_ts": record.get("parent_ts"),
+        }
+        for term in tokenize(record.get("text", "")):
+            self.postings.setdefault(term, []).append(doc_id)
+
+    def merge(self, other: "IndexSegment") -> None:
+        """
+        他のセグメントを取り込みます。同じメッセージIDはotherの内容で置き換えます。
+
+        Parameters
+        ----------
+        other : IndexSegment
+          取り込むセグメント
+        """
+        for doc_id in other.docs:
+            if doc_id in self.docs:
+                self.__remove_postings(doc_id)
+        self.docs.update(other.docs)
+        for term, doc_ids in other.postings.items():
+            self.postings.setdefault(term, []).extend(doc_ids)
+
+    def to_parts(self) -> dict[str, bytes]:
+        """
+        セグメントを、保存するファイルごとのgzip圧縮したJSONに変換します。
+        メッセージと転置リストはキーのハッシュで SHARD_COUNT 個に分け、検索では必要なファイルのみを読めるようにします。
+        "ids" にはメッセージIDの一覧と、中身のあるファイルの番号を入れます。
+
+        Returns
+        -------
+        dict[str, bytes]
+          ファイルの種類（"ids" / "docs-XX" / "postings-XX"）→ 保存用のバイト列。"ids" が最後になる
+        """
+        docs_shards: dict[int, dict[str, dict]] = {}
+        for doc_id, doc in self.docs.items():
+            docs_shards.setdefault(shard_of(doc_id), {})[doc_id] = doc
+        postings_shards: dict[int, dict[str, list[str]]] = {}
+        for term, doc_ids in self.postings.items():
+            if len(doc_ids) > 0:
+                postings_shards.setdefault(shard_of(term), {})[term] = doc_ids
+        parts = {f"docs-{shard:02d}": _dump(docs) for shard, docs in docs_shards.items()}
+        parts.update({f"postings-{shard:02d}": _dump(postings) for shard, postings in postings_shards.items()})
+        parts["ids"] = _dump(
+            {"ids": list(self.docs), "docs_shards": sorted(docs_shards), "postings_shards": sorted(postings_shards)}
+        )
+        return parts
+
+    def __remove_postings(self, doc_id: str) -> None:
+        for term in tokenize(self.docs[doc_id]["text"]):
+            doc_ids = self.postings.get(term)
+            if doc_ids is not None and doc_id in doc_ids:
+                doc_ids.remove(doc_id)
+
+
+class SegmentReader:
+    """
+    保存したセグメントを、検索に必要なファイルだけ読み込みながら引くためのクラス
+    読み込んだファイルは保持し、同じセグメントを続けて検索する場合は読み直さない
+
+    Parameters
+    ----------
+    storage : IndexStorage
+      セグメントを保存したストレージ
+    name : str
+      セグメントの名前
+    """
+
+    def __init__(self, storage: IndexStorage, name: str):
+        self.__storage = storage
+        self.__name = name
+        self.__header: dict | None = None
+        self.__docs: dict[int, dict[str, dict]] = {}
+        self.__postings: dict[int, dict[str, list[str]]] = {}
+
+    def ids(self) -> list[str]:
+        """
+        セグメントに含まれるメッセージIDのリスト
+        """
+        return self.__read_header()["ids"]
+
+    def files(self) -> list[str]:
+        """
+        セグメントを構成するファイルの名前のリスト（"ids" が先頭）
+        """
+        header = self.__read_header()
+        return [
+            self.__file("ids"),
+            *(self.__file(f"docs-{shard:02d}") for shard in header["docs_shards"]),
+            *(self.__file(f"postings-{shard:02d}") for shard in header["postings_shards"]),
+        ]
+
+    def postings(self, term: str) -> list[str]:
+        """
+        gramを含むメッセージIDのリストを、gramを含むファイルのみを読み込んで取得します。
+        """
+        shard = shard_of(term)
+        if shard not in self.__postings:
+            present = shard in self.__read_header()["postings_shards"]
+            self.__postings[shard] = _load(self.__storage.read_segment(self.__file(f"postings-{shard:02d}"))) if present else {}
+        return self.__postings[shard].get(term, [])
+
+    def docs(self, doc_ids: set[str]) -> dict[str, dict]:
+        """
+        メッセージIDのレコードを、そのメッセージを含むファイルのみを読み込んで取得します。
+        """
+        results: dict[str, dict] = {}
+        for doc_id in doc_ids:
+            shard = shard_of(doc_id)
+            if shard not in self.__docs:
+                self.__docs[shard] = _load(self.__storage.read_segment(self.__file(f"docs-{shard:02d}")))
+            results[doc_id] = self.__docs[shard][doc_id]
+        return results
+
+    def load(self) -> IndexSegment:
+        """
+        セグメント全体を読み込みます。セグメントを統合する場合に使います。
+        """
+        header = self.__read_header()
+        docs: dict[str, dict] = {}
+        for shard in header["docs_shards"]:
+            docs.update(_load(self.__storage.read_segment(self.__file(f"docs-{shard:02d}"))))
+        postings: dict[str, list[str]] = {}
+        for shard in header["postings_shards"]:
+            postings.update(_load(self.__storage.read_segment(self.__file(f"postings-{shard:02d}"))))
+        return IndexSegment(docs, postings)
+
+    def __read_header(self) -> dict:
+        if self.__header is None:
+            self.__header = _load(self.__storage.read_segment(self.__file("ids")))
+        return self.__header
+
+    def __file(self, part: str) -> str:
+        return f"{self.__name}.{part}{SEGMENT_EXTENSION}"
+
+
+def shard_of(key: str) -> int:
+    """
+    メッセージIDやgramを保存するファイルの番号を求めます。実行するプロセスによらず同じ値になるようにcrc32を使います。
+    """
+    return zlib.crc32(key.encode("utf-8")) % SHARD_COUNT
+
+
+def _dump(content: object) -> bytes:
+    return gzip.compress(json.dumps(content, ensure_ascii=False).encode("utf-8"))
+
+
+def _load(data: bytes):
+    return json.loads(gzip.decompress(data))
@@ -0,0 +1,94 @@
+import os
+from typing import Protocol
+
+from mymodules.aws import S3
+
+
+class IndexStorage(Protocol):
+    """
+    インデックスのセグメントを保存するストレージのインターフェース
+    1つのセグメントは複数のファイル（"<セグメント名>.<種類>.json.gz"）で構成され、各メソッドはファイル単位で扱う
+    """
+
+    def list_segments(self) -> list[tuple[str, int]]:
+        """
+        保存されているセグメントのファイルの (名前, サイズ) のリストを名前順で返す
+        """
+        ...
+
+    def read_segment(self, name: str) -> bytes:
+        ...
+
+    def write_segment(self, name: str, data: bytes) -> None:
+        ...
+
+    def delete_segments(self, names: list[str]) -> None:
+        ...
+
+
+class S3IndexStorage:
+    """
+    インデックスのセグメントをS3に保存するストレージ
+
+    Parameters
+    ----------
+    s3 : S3
+      保存先のS3
+    bucket_name : str
+      保存先バケット名
+    prefix : str
+      セグメントを保存するキーのプレフィックス
+    """
+
+    def __init__(self, s3: S3, bucket_name: str, prefix: str = "index"):
+        self.__s3 = s3
+        self.__bucket_name = bucket_name
+        self.__prefix = prefix.rstrip("/") + "/segments/"
+
+    def list_segments(self) -> list[tuple[str, int]]:
+        objects = self.__s3.list_objects(self.__bucket_name, self.__prefix)
+        segments = [(obj["Key"][len(self.__prefix) :], obj["Size"]) for obj in objects]
+        return sorted(segments)
+
+    def read_segment(self, name: str) -> bytes:
+        return self.__s3.read_bytes(self.__bucket_name, self.__prefix + name)
+
+    def write_segment(self, name: str, data: bytes) -> None:
+        self.__s3.put_bytes(self.__bucket_name, self.__prefix + name, data)
+
+    def delete_segments(self, names: list[str]) -> None:
+        self.__s3.delete_objects(self.__bucket_name, [self.__prefix + name for name in names])
+
+
+class LocalIndexStorage:
+    """
+    インデックスのセグメントをローカルディスクに保存するストレージ
+    S3IndexStorageの代わりにローカル実行やテストで利用する
+
+    Parameters
+    ----------
+    directory : str
+      保存先ディレクトリ
+    """
+
+    def __init__(self, directory: str):
+        self.__directory = directory
+
+    def list_segments(self) -> list[tuple[str, int]]:
+        if not os.path.isdir(self.__directory):
+            return []
+        names = sorted(name for name in os.listdir(self.__directory) if name.endswith(".json.gz"))
+        return [(name, os.path.getsize(os.path.join(self.__directory, name))) for name in names]
+
+    def read_segment(self, name: str) -> bytes:
+        with open(os.path.join(self.__directory, name), "rb") as f:
+            return f.read()
+
+    def write_segment(self, name: str, data: bytes) -> None:
+        os.makedirs(self.__directory, exist_ok=True)
+        with open(os.path.join(self.__directory, name), "wb") as f:
+            f.write(data)
+
+    def delete_segments(self, names: list[str]) -> None:
+        for name in names:
+            os.remove(os.path.join(self.__directory, name))
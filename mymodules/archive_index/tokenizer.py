@@ -0,0 +1,55 @@
+from mymodules.slack.matcher import normalize_text
+
+
+def tokenize(text: str, n: int = 2) -> set[str]:
+    """
+    テキストを文字のn-gramに分割します。
+    日本語は単語の区切りが無いため、形態素解析を使わずに全ての文字をn文字ずつに区切って索引に登録します。
+    n文字未満の検索ワード（"a"・"障" など）でも引けるように、1文字ずつのgramも一緒に登録します。
+
+    Parameters
+    ----------
+    text : str
+      分割するテキスト
+    n : int
+      n-gramの文字数
+
+    Returns
+    -------
+    set[str]
+      n-gramと1文字のgramの集合
+    """
+    text = normalize_text(text)
+    grams: set[str] = set()
+    # 空白・改行をまたぐn-gramは検索に使わないため、空白で区切ってからn-gramにする
+    for chunk in text.split():
+        grams.update(chunk)
+        for i in range(len(chunk) - n + 1):
+            grams.add(chunk[i : i + n])
+    return grams
+
+
+def query_terms(word: str, n: int = 2) -> set[str]:
+    """
+    検索ワードから、索引を引くためのn-gramを作成します。
+
+    Parameters
+    ----------
+    word : str
+      検索ワード
+    n : int
+      n-gramの文字数
+
+    Returns
+    -------
+    set[str]
+      n-gramの集合。n文字未満の部分は1文字ずつのgramにする
+    """
+    terms: set[str] = set()
+    for chunk in normalize_text(word).split():
+        if len(chunk) < n:
+            terms.update(chunk)
+            continue
+        for i in range(len(chunk) - n + 1):
+            terms.add(chunk[i : i + n])
+    return terms
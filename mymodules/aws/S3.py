@@ -1,16 +1,25 @@
+import hashlib
 from datetime import datetime
+from typing import Callable
 
-import boto3
+from mymodules.metrics import get_metrics
+
+from .runtime import get_bucket_region, get_client, get_resource
 
 
 class S3:
     """
     AWS S3を操作するクラス
+    クライアントは使う時に作成し、ウォームスタートでは前回の実行で作成したものを使い回す
     """
 
-    def __init__(self):
-        self.__s3 = boto3.resource("s3")
-        self.__s3_client = boto3.client("s3")
+    @property
+    def __s3(self):
+        return get_resource("s3")
+
+    @property
+    def __s3_client(self):
+        return get_client("s3")
 
     def write_txt(self, bucket_name: str, file_title_head: str, file_contents: str) -> str:
         """
@@ -30,12 +39,222 @@ class S3:
         str
           書き込んだファイルの公開URL
         """
-        key = f"{file_title_head}_" + datetime.now().strftime("%Y-%m-%d-%H-%M-%S") + ".txt"
+        key = self.__create_txt_key(file_title_head)
         obj = self.__s3.Object(bucket_name, key)
-        obj.put(Body=file_contents)
+        with get_metrics().phase("upload"):
+            obj.put(Body=file_contents)
         public_url = self.__get_public_url(bucket_name, key)
         return public_url
 
+    def open_txt_writer(
+        self,
+        bucket_name: str,
+        file_title_head: str,
+        part_size: int = 8 * 1024 * 1024,
+        extension: str = "txt",
+        content_type: str | None = None,
+    ) -> "S3TextWriter":
+        """
+        テキストファイルを少しずつS3に書き込むためのライターを作成する
+        書き込んだ内容がpart_sizeを超えるとマルチパートアップロードで順次アップロードするため、
+        ファイル全体をメモリに保持する必要がない
+
+        Parameters
+        ----------
+        bucket_name : str
+          保存先バケット名
+        file_title_head : str
+          保存する時のファイル名
+        part_size : int
+          マルチパートアップロードの1パートのサイズ（5MiB以上）
+        extension : str
+          ファイルの拡張子（md / html など）
+        content_type : str or None
+          オブジェクトのContent-Type
+
+        Returns
+        -------
+        S3TextWriter
+          テキストファイルのライター
+        """
+        key = self.__create_txt_key(file_title_head, extension)
+        return S3TextWriter(self.open_writer(bucket_name, key, part_size, content_type))
+
+    def open_writer(
+        self, bucket_name: str, key: str, part_size: int = 8 * 1024 * 1024, content_type: str | None = None
+    ) -> "S3ObjectWriter":
+        """
+        指定したキーのオブジェクトにバイト列を少しずつ書き込むためのライターを作成する
+
+        Parameters
+        ----------
+        bucket_name : str
+          保存先バケット名
+        key : str
+          保存先のキー
+        part_size : int
+          マルチパートアップロードの1パートのサイズ（5MiB以上）
+        content_type : str or None
+          オブジェクトのContent-Type
+
+        Returns
+        -------
+        S3ObjectWriter
+          オブジェクトのライター
+        """
+        extra_args = {"ContentType": content_type} if content_type is not None else None
+        return S3ObjectWriter(
+            self.__s3_client, bucket_name, key, part_size, lambda: self.__get_public_url(bucket_name, key), extra_args
+        )
+
+    def compose_txt(
+        self,
+        bucket_name: str,
+        file_title_head: str,
+        part_keys: list[str],
+        extension: str = "txt",
+        content_type: str | None = None,
+    ) -> str:
+        """
+        複数のテキストファイルを順に連結して1つのテキストファイルにし、連結したファイルは削除する
+        各ファイルは少しずつ読み込んでマルチパートアップロードで書き込むため、全体をメモリに保持しない
+
+        Parameters
+        ----------
+        bucket_name : str
+          バケット名（連結するファイルと保存先で共通）
+        file_title_head : str
+          保存する時のファイル名
+        part_keys : list[str]
+          連結するファイルのキーのリスト（この順に連結する）
+        extension : str
+          連結したファイルの拡張子
+        content_type : str or None
+          連結したファイルのContent-Type
+
+        Returns
+        -------
+        str
+          連結したファイルの公開URL
+        """
+        key = self.__create_txt_key(file_title_head, extension)
+        writer = self.open_writer(bucket_name, key, content_type=content_type)
+        try:
+            for part_key in part_keys:
+                body = self.__s3_client.get_object(Bucket=bucket_name, Key=part_key)["Body"]
+                for chunk in body.iter_chunks(1024 * 1024):
+                    writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        public_url = writer.close()
+        # 同じ秒に作成した場合は連結先と同じキーになるため、連結先は削除しない
+        self.delete_objects(bucket_name, [part_key for part_key in part_keys if part_key != key])
+        return public_url
+
+    def put_bytes(self, bucket_name: str, key: str, data: bytes) -> None:
+        """
+        バイト列をS3オブジェクトとして書き込む
+
+        Parameters
+        ----------
+        bucket_name : str
+          保存先バケット名
+        key : str
+          保存先のキー
+        data : bytes
+          書き込むバイト列
+        """
+        with get_metrics().phase("upload"):
+            self.__s3_client.put_object(Bucket=bucket_name, Key=key, Body=data)
+
+    def put_bytes_if_absent(self, bucket_name: str, key: str, data: bytes) -> bool:
+        """
+        同じキーのオブジェクトが無い場合のみバイト列を書き込む
+        複数の実行のうち1つだけが処理を行うための目印として使う
+
+        Parameters
+        ----------
+        bucket_name : str
+          保存先バケット名
+        key : str
+          保存先のキー
+        data : bytes
+          書き込むバイト列
+
+        Returns
+        -------
+        bool
+          書き込んだ場合はTrue。既に同じキーのオブジェクトがあった場合はFalse。
+        """
+        try:
+            self.__s3_client.put_object(Bucket=bucket_name, Key=key, Body=data, IfNoneMatch="*")
+        except self.__s3_client.exceptions.ClientError as e:
+            # 既にある場合は412、同時に書き込んだ場合は409が返る
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return False
+            raise
+        return True
+
+    def read_bytes(self, bucket_name: str, key: str) -> bytes:
+        """
+        S3オブジェクトをバイト列として読み込む
+
+        Parameters
+        ----------
+        bucket_name : str
+          バケット名
+        key : str
+          読み込むオブジェクトのキー
+
+        Returns
+        -------
+        bytes
+          オブジェクトの中身
+        """
+        return self.__s3_client.get_object(Bucket=bucket_name, Key=key)["Body"].read()
+
+    def list_objects(self, bucket_name: str, prefix: str) -> list[dict]:
+        """
+        プレフィックスに一致するオブジェクトの一覧を取得する
+
+        Parameters
+        ----------
+        bucket_name : str
+          バケット名
+        prefix : str
+          キーのプレフィックス
+
+        Returns
+        -------
+        list[dict]
+          オブジェクトの一覧（Key・Sizeなどを含む）
+        """
+        objects: list[dict] = []
+        paginator = self.__s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            objects.extend(page.get("Contents", []))
+        return objects
+
+    def delete_objects(self, bucket_name: str, keys: list[str]) -> None:
+        """
+        複数のオブジェクトを削除する
+
+        Parameters
+        ----------
+        bucket_name : str
+          バケット名
+        keys : list[str]
+          削除するオブジェクトのキーのリスト
+        """
+        # delete_objectsは1回で1000件まで
+        for i in range(0, len(keys), 1000):
+            objects = [{"Key": key} for key in keys[i : i + 1000]]
+            self.__s3_client.delete_objects(Bucket=bucket_name, Delete={"Objects": objects, "Quiet": True})
+
+    def __create_txt_key(self, file_title_head: str, extension: str = "txt") -> str:
+        return f"{file_title_head}_" + datetime.now().strftime("%Y-%m-%d-%H-%M-%S") + f".{extension}"
+
     def __get_public_url(self, bucket, target_object_path) -> str:
         """
         プライベートメソッド
@@ -53,5 +272,221 @@ class S3:
         str
           オブジェクトの公開URL
         """
-        bucket_location = self.__s3_client.get_bucket_location(Bucket=bucket)
-        return "https://{0}.s3.{1}.amazonaws.com/{2}".format(bucket, bucket_location["LocationConstraint"], target_object_path)
+        # バケットのリージョンは変わらないため、アップロードのたびに問い合わせない
+        bucket_location = get_bucket_region(bucket)
+        return "https://{0}.s3.{1}.amazonaws.com/{2}".format(bucket, bucket_location, target_object_path)
+
+
+class S3ObjectWriter:
+    """
+    バイト列を少しずつS3オブジェクトに書き込むクラス
+    S3.open_writer から作成する
+
+    Parameters
+    ----------
+    s3_client : boto3.client
+      S3クライアント
+    bucket_name : str
+      保存先バケット名
+    key : str
+      保存先のキー
+    part_size : int
+      マルチパートアップロードの1パートのサイズ
+    get_public_url : Callable[[], str]
+      書き込んだオブジェクトの公開URLを取得する関数
+    extra_args : dict or None
+      put_object / create_multipart_upload に渡す追加の引数（ContentTypeなど）
+    """
+
+    # S3のマルチパートアップロードは最後以外のパートが5MiB以上である必要がある
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name: str,
+        key: str,
+        part_size: int,
+        get_public_url: Callable[[], str],
+        extra_args: dict | None = None,
+    ):
+        if part_size < self.MIN_PART_SIZE:
+            raise ValueError(f"part_sizeは{self.MIN_PART_SIZE}バイト以上を指定してください")
+        self.__s3_client = s3_client
+        self.__bucket_name = bucket_name
+        self.__key = key
+        self.__part_size = part_size
+        self.__get_public_url = get_public_url
+        self.__extra_args = extra_args or {}
+        self.__buffer = bytearray()
+        self.__upload_id: str | None = None
+        self.__parts: list[dict] = []
+        self.__bytes_written = 0
+        self.__sha256 = hashlib.sha256()
+        self.__closed = False
+
+    @property
+    def key(self) -> str:
+        """
+        保存先のキー
+        """
+        return self.__key
+
+    @property
+    def bytes_written(self) -> int:
+        """
+        これまでに書き込んだバイト数
+        """
+        return self.__bytes_written
+
+    @property
+    def sha256(self) -> str:
+        """
+        これまでに書き込んだバイト列のSHA-256（16進数）。内容が前回と同じかどうかの判定に使う
+        """
+        return self.__sha256.hexdigest()
+
+    @property
+    def closed(self) -> bool:
+        """
+        close または abort を呼び出したかどうか。ファイルとして書き込むライブラリ（pyarrowなど）が参照する
+        """
+        return self.__closed
+
+    def write(self, data: bytes) -> int:
+        """
+        バイト列を書き込む
+
+        Parameters
+        ----------
+        data : bytes
+          書き込むバイト列
+
+        Returns
+        -------
+        int
+          書き込んだバイト数
+        """
+        self.__buffer += data
+        self.__bytes_written += len(data)
+        self.__sha256.update(data)
+        if len(self.__buffer) >= self.__part_size:
+            self.__upload_part(bytes(self.__buffer))
+            self.__buffer.clear()
+        return len(data)
+
+    def close(self) -> str:
+        """
+        残りのバイト列をアップロードしてオブジェクトを確定する
+
+        Returns
+        -------
+        str
+          書き込んだファイルの公開URL
+        """
+        with get_metrics().phase("upload"):
+            if self.__upload_id is None:
+                # part_sizeに達しなかった場合は通常のアップロードで済ませる
+                self.__s3_client.put_object(
+                    Bucket=self.__bucket_name, Key=self.__key, Body=bytes(self.__buffer), **self.__extra_args
+                )
+            else:
+                if len(self.__buffer) > 0:
+                    self.__upload_part(bytes(self.__buffer))
+                self.__s3_client.complete_multipart_upload(
+                    Bucket=self.__bucket_name,
+                    Key=self.__key,
+                    UploadId=self.__upload_id,
+                    MultipartUpload={"Parts": self.__parts},
+                )
+            self.__buffer.clear()
+            self.__closed = True
+            return self.__get_public_url()
+
+    def abort(self) -> None:
+        """
+        書き込みを中止する。開始済みのマルチパートアップロードは破棄する
+        """
+        if self.__upload_id is not None:
+            self.__s3_client.abort_multipart_upload(Bucket=self.__bucket_name, Key=self.__key, UploadId=self.__upload_id)
+            self.__upload_id = None
+        self.__buffer.clear()
+        self.__closed = True
+
+    def __upload_part(self, data: bytes) -> None:
+        with get_metrics().phase("upload"):
+            self.__send_part(data)
+
+    def __send_part(self, data: bytes) -> None:
+        if self.__upload_id is None:
+            response = self.__s3_client.create_multipart_upload(Bucket=self.__bucket_name, Key=self.__key, **self.__extra_args)
+            self.__upload_id = response["UploadId"]
+        part_number = len(self.__parts) + 1
+        response = self.__s3_client.upload_part(
+            Bucket=self.__bucket_name, Key=self.__key, UploadId=self.__upload_id, PartNumber=part_number, Body=data
+        )
+        self.__parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+
+class S3TextWriter:
+    """
+    テキストを少しずつS3オブジェクトに書き込むクラス
+    S3.open_txt_writer から作成する
+
+    Parameters
+    ----------
+    writer : S3ObjectWriter
+      書き込み先のライター
+    """
+
+    def __init__(self, writer: S3ObjectWriter):
+        self.__writer = writer
+
+    @property
+    def key(self) -> str:
+        """
+        保存先のキー
+        """
+        return self.__writer.key
+
+    @property
+    def bytes_written(self) -> int:
+        """
+        これまでに書き込んだバイト数
+        """
+        return self.__writer.bytes_written
+
+    @property
+    def sha256(self) -> str:
+        """
+        これまでに書き込んだテキスト（UTF-8）のSHA-256（16進数）
+        """
+        return self.__writer.sha256
+
+    def write(self, text: str) -> None:
+        """
+        テキストを書き込む
+
+        Parameters
+        ----------
+        text : str
+          書き込むテキスト
+        """
+        self.__writer.write(text.encode("utf-8"))
+
+    def close(self) -> str:
+        """
+        残りのテキストをアップロードしてオブジェクトを確定する
+
+        Returns
+        -------
+        str
+          書き込んだファイルの公開URL
+        """
+        return self.__writer.close()
+
+    def abort(self) -> None:
+        """
+        書き込みを中止する。開始済みのマルチパートアップロードは破棄する
+        """
+        self.__writer.abort()
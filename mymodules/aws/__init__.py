@@ -1,5 +1,71 @@
-from .parameter_store import ParameterStore as ParameterStore
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# S3 はサブモジュールと同じ名前のため、遅延させるとサブモジュールの読み込みでクラスが上書きされる。
+# boto3はクライアントを作る時まで読み込まないため、S3 は常に読み込んでも軽い
 from .S3 import S3 as S3
-from .secrets_manager import SecretsManager as SecretsManager
 
-__all__ = ["S3", "SecretsManager", "ParameterStore"]
+if TYPE_CHECKING:
+    from .checkpoint_store import LocalCheckpointStore as LocalCheckpointStore
+    from .checkpoint_store import (
+        ParameterStoreCheckpointStore as ParameterStoreCheckpointStore,
+    )
+    from .checkpoint_store import S3CheckpointStore as S3CheckpointStore
+    from .lambda_invoker import LambdaInvoker as LambdaInvoker
+    from .parameter_store import ParameterStore as ParameterStore
+    from .runtime import SecretCache as SecretCache
+    from .runtime import get_client as get_client
+    from .runtime import get_shared_secret_cache as get_shared_secret_cache
+    from .runtime import register_client as register_client
+    from .secrets_manager import SecretsManager as SecretsManager
+    from .snapshot_store import LocalSnapshotStore as LocalSnapshotStore
+    from .snapshot_store import S3SnapshotStore as S3SnapshotStore
+    from .sqs_queue import SqsQueue as SqsQueue
+
+# 公開する名前 → 定義しているモジュール。コールドスタートで使わないモジュールを読み込まないよう、初めて使われた時に読み込む
+_LAZY_EXPORTS: dict[str, str] = {
+    "SecretsManager": ".secrets_manager",
+    "ParameterStore": ".parameter_store",
+    "S3SnapshotStore": ".snapshot_store",
+    "LocalSnapshotStore": ".snapshot_store",
+    "S3CheckpointStore": ".checkpoint_store",
+    "ParameterStoreCheckpointStore": ".checkpoint_store",
+    "LocalCheckpointStore": ".checkpoint_store",
+    "LambdaInvoker": ".lambda_invoker",
+    "SqsQueue": ".sqs_queue",
+    "SecretCache": ".runtime",
+    "get_client": ".runtime",
+    "get_shared_secret_cache": ".runtime",
+    "register_client": ".runtime",
+}
+
+__all__ = [
+    "S3",
+    "SecretsManager",
+    "ParameterStore",
+    "S3SnapshotStore",
+    "LocalSnapshotStore",
+    "S3CheckpointStore",
+    "ParameterStoreCheckpointStore",
+    "LocalCheckpointStore",
+    "LambdaInvoker",
+    "SqsQueue",
+    "SecretCache",
+    "get_client",
+    "get_shared_secret_cache",
+    "register_client",
+]
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 2回目からは __getattr__ を通らないように、モジュールの属性にしておく
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_EXPORTS])
@@ -0,0 +1,160 @@
+import json
+import os
+
+from .runtime import get_client
+
+
+class S3CheckpointStore:
+    """
+    チェックポイント（処理済みの位置などの短い文字列）をS3に保存するクラス
+
+    Parameters
+    ----------
+    bucket_name : str
+      保存先バケット名
+    prefix : str
+      チェックポイントを保存するキーのプレフィックス
+    """
+
+    def __init__(self, bucket_name: str, prefix: str = "_checkpoints"):
+        self.__s3_client = get_client("s3")
+        self.__bucket_name = bucket_name
+        self.__prefix = prefix.rstrip("/")
+
+    def get(self, key: str) -> str | None:
+        """
+        チェックポイントを取得する
+
+        Parameters
+        ----------
+        key : str
+          チェックポイントのキー
+
+        Returns
+        -------
+        str or None
+          チェックポイントの値。存在しない場合はNone。
+        """
+        try:
+            response = self.__s3_client.get_object(Bucket=self.__bucket_name, Key=f"{self.__prefix}/{key}")
+        except self.__s3_client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read().decode("utf-8")
+
+    def put(self, key: str, value: str) -> None:
+        """
+        チェックポイントを保存する
+
+        Parameters
+        ----------
+        key : str
+          チェックポイントのキー
+        value : str
+          チェックポイントの値
+        """
+        self.__s3_client.put_object(Bucket=self.__bucket_name, Key=f"{self.__prefix}/{key}", Body=value.encode("utf-8"))
+
+
+class ParameterStoreCheckpointStore:
+    """
+    チェックポイント（処理済みの位置などの短い文字列）をSystems Managerのパラメータストアに保存するクラス
+
+    Parameters
+    ----------
+    region_name : str
+      AWSリージョン名
+    prefix : str
+      パラメータ名のプレフィックス
+    """
+
+    def __init__(self, region_name: str, prefix: str = "/python_slack_app/checkpoints"):
+        self.__ssm = get_client("ssm", region_name=region_name)
+        self.__prefix = prefix.rstrip("/")
+
+    def get(self, key: str) -> str | None:
+        """
+        チェックポイントを取得する
+
+        Parameters
+        ----------
+        key : str
+          チェックポイントのキー
+
+        Returns
+        -------
+        str or None
+          チェックポイントの値。存在しない場合はNone。
+        """
+        try:
+            return self.__ssm.get_parameter(Name=f"{self.__prefix}/{key}")["Parameter"]["Value"]
+        except self.__ssm.exceptions.ParameterNotFound:
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        """
+        チェックポイントを保存する
+
+        Parameters
+        ----------
+        key : str
+          チェックポイントのキー
+        value : str
+          チェックポイントの値
+        """
+        self.__ssm.put_parameter(Name=f"{self.__prefix}/{key}", Value=value, Type="String", Overwrite=True)
+
+
+class LocalCheckpointStore:
+    """
+    チェックポイントをローカルのJSONファイルに保存するクラス
+    S3CheckpointStore / ParameterStoreCheckpointStore の代わりにローカル実行やテストで利用する
+
+    Parameters
+    ----------
+    path : str
+      保存先のファイルパス
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+
+    def get(self, key: str) -> str | None:
+        """
+        チェックポイントを取得する
+
+        Parameters
+        ----------
+        key : str
+          チェックポイントのキー
+
+        Returns
+        -------
+        str or None
+          チェックポイントの値。存在しない場合はNone。
+        """
+        return self.__read().get(key)
+
+    def put(self, key: str, value: str) -> None:
+        """
+        チェックポイントを保存する
+
+        Parameters
+        ----------
+        key : str
+          チェックポイントのキー
+        value : str
+          チェックポイントの値
+        """
+        checkpoints = self.__read()
+        checkpoints[key] = value
+        directory = os.path.dirname(self.__path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        with open(self.__path, "w", encoding="utf-8") as f:
+            json.dump(checkpoints, f, ensure_ascii=False)
+
+    def __read(self) -> dict[str, str]:
+        if not os.path.exists(self.__path):
+            return {}
+        with open(self.__path, encoding="utf-8") as f:
+            return json.load(f)
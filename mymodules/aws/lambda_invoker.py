@@ -0,0 +1,34 @@
+import json
+
+from .runtime import get_client
+
+
+class LambdaInvoker:
+    """
+    AWS Lambdaの関数を呼び出すクラス
+
+    Parameters
+    ----------
+    region_name : str
+      AWSリージョン名
+    """
+
+    def __init__(self, region_name: str):
+        self.__region_name = region_name
+
+    def invoke_async(self, function_name: str, payload: dict) -> None:
+        """
+        関数を非同期に呼び出す。呼び出した関数の終了は待たない
+
+        Parameters
+        ----------
+        function_name : str
+          関数名またはARN
+        payload : dict
+          関数に渡すイベント（JSONに変換できること）
+        """
+        get_client("lambda", region_name=self.__region_name).invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        )
@@ -1,19 +1,30 @@
-import boto3
+from .runtime import SecretCache, get_client, get_shared_secret_cache
 
 
 class ParameterStore:
     """
     AWS Systems Managerのパラメータストアを操作するクラス
+    取得した値はプロセス内で共有するキャッシュに保持し、ウォームスタートでは再取得しない
 
     Parameters
     ----------
     region_name : str
       AWSリージョン名
+    cache : SecretCache or None
+      取得した値を保持するキャッシュ。指定しない場合はプロセス内で共有するキャッシュを使う
     """
 
-    def __init__(self, region_name: str):
-        # Systems Managerクライアントを作成する
-        self.__ssm = boto3.client("ssm", region_name=region_name)
+    # get_parametersで一度に取得できるパラメータの数
+    MAX_BATCH_SIZE = 10
+
+    def __init__(self, region_name: str, cache: SecretCache | None = None):
+        self.__region_name = region_name
+        self.__cache = cache if cache is not None else get_shared_secret_cache()
+
+    @property
+    def __ssm(self):
+        # Systems Managerクライアントは使う時に作成し、ウォームスタートでは使い回す
+        return get_client("ssm", region_name=self.__region_name)
 
     def get_parameter(self, parameter_name: str) -> str:
         """
@@ -29,4 +40,43 @@ class ParameterStore:
         str
           パラメータの値
         """
-        return self.__ssm.get_parameter(Name=parameter_name, WithDecryption=True)["Parameter"]["Value"]
+        return self.__cache.get_or_load(
+            self.__cache_key(parameter_name),
+            lambda: self.__ssm.get_parameter(Name=parameter_name, WithDecryption=True)["Parameter"]["Value"],
+        )
+
+    def get_parameters(self, parameter_names: list[str]) -> dict[str, str]:
+        """
+        複数のパラメータをまとめて取得する
+        キャッシュに無いパラメータのみを、10件ずつ get_parameters で取得する
+
+        Parameters
+        ----------
+        parameter_names : list[str]
+          パラメータ名のリスト
+
+        Returns
+        -------
+        dict[str, str]
+          パラメータ名 → パラメータの値 の辞書。存在しないパラメータは含まない（見つからなかったパラメータ名は出力する）
+        """
+        values: dict[str, str] = {}
+        missing: list[str] = []
+        for name in dict.fromkeys(parameter_names):
+            value = self.__cache.get(self.__cache_key(name))
+            if value is None:
+                missing.append(name)
+            else:
+                values[name] = value
+        for i in range(0, len(missing), self.MAX_BATCH_SIZE):
+            response = self.__ssm.get_parameters(Names=missing[i : i + self.MAX_BATCH_SIZE], WithDecryption=True)
+            for parameter in response["Parameters"]:
+                self.__cache.put(self.__cache_key(parameter["Name"]), parameter["Value"])
+                values[parameter["Name"]] = parameter["Value"]
+            invalid_names: list[str] = response.get("InvalidParameters", [])
+            if len(invalid_names) > 0:
+                print(f"パラメータストアに見つからないパラメータがあります: {', '.join(invalid_names)}")
+        return values
+
+    def __cache_key(self, parameter_name: str) -> str:
+        return f"ssm:{self.__region_name}:{parameter_name}"
@@ -0,0 +1,246 @@
+import threading
+import time
+from typing import Callable
+
+from mymodules.metrics import get_metrics
+
+# Lambdaのウォームスタートで使い回すため、クライアント・バケットのリージョン・シークレットはモジュールに保持する
+_clients: dict[tuple[str, str | None], object] = {}
+_resources: dict[tuple[str, str | None], object] = {}
+_bucket_regions: dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def get_client(service_name: str, region_name: str | None = None):
+    """
+    boto3のクライアントを取得します。
+    初めて使う時に作成し、以降は同じプロセスの中で使い回します。
+
+    Parameters
+    ----------
+    service_name : str
+      サービス名（例: s3, ssm）
+    region_name : str or None
+      AWSリージョン名。Noneの場合は環境の既定のリージョン
+
+    Returns
+    -------
+    boto3.client
+      クライアント
+    """
+    key = (service_name, region_name)
+    client = _clients.get(key)
+    if client is None:
+        # boto3の既定のセッションはスレッドセーフではないため、作成だけはロックする
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # boto3は読み込むだけで時間がかかるため、初めてクライアントを作る時に読み込む
+                import boto3
+
+                client = boto3.client(service_name, region_name=region_name)
+                _instrument(client)
+                _clients[key] = client
+    return client
+
+
+def _instrument(client) -> None:
+    """
+    botocoreのイベントにフックを登録し、AWSのAPIの呼び出し回数・レイテンシ・再試行回数・送受信したバイト数を記録する
+    S3 / ParameterStore / SecretsManager などのラッパーを通る全ての呼び出し（get_resource のリソースを含む）が対象になる
+    """
+    events = getattr(getattr(client, "meta", None), "events", None)
+    if events is None:
+        return
+    events.register("before-call", _before_call)
+    events.register("after-call", _after_call)
+
+
+def _before_call(model, params, context, **kwargs) -> None:
+    context["metrics_started_at"] = time.perf_counter()
+    body = params.get("body") if isinstance(params, dict) else None
+    if isinstance(body, (bytes, bytearray)):
+        get_metrics().increment("AwsBytes", _endpoint(model), len(body))
+
+
+def _after_call(http_response, parsed, model, context, **kwargs) -> None:
+    metrics = get_metrics()
+    endpoint = _endpoint(model)
+    metrics.increment("AwsCalls", endpoint)
+    if "metrics_started_at" in context:
+        metrics.observe("AwsLatency", endpoint, (time.perf_counter() - context["metrics_started_at"]) * 1000)
+    retry_attempts = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0) if isinstance(parsed, dict) else 0
+    if retry_attempts > 0:
+        metrics.increment("AwsRetries", endpoint, retry_attempts)
+    content_length = http_response.headers.get("content-length") if http_response is not None else None
+    if content_length is not None and content_length.isdigit():
+        metrics.increment("AwsBytes", endpoint, int(content_length))
+
+
+def _endpoint(model) -> str:
+    return f"{model.service_model.service_name}.{model.name}"
+
+
+def register_client(service_name: str, client, region_name: str | None = None) -> None:
+    """
+    get_client が返すクライアントを差し替えます。
+    ベンチマークなどでAWSの代わりにメモリ上のスタンドインを使う場合に利用します。
+
+    Parameters
+    ----------
+    service_name : str
+      サービス名（例: s3, ssm）
+    client : object
+      get_client が返すクライアント
+    region_name : str or None
+      AWSリージョン名
+    """
+    with _lock:
+        _clients[(service_name, region_name)] = client
+
+
+def get_resource(service_name: str, region_name: str | None = None):
+    """
+    boto3のリソースを取得します。get_client と同様に使い回し、内部のクライアントの呼び出しもメトリクスに記録します。
+
+    Parameters
+    ----------
+    service_name : str
+      サービス名（例: s3）
+    region_name : str or None
+      AWSリージョン名。Noneの場合は環境の既定のリージョン
+
+    Returns
+    -------
+    boto3.resource
+      リソース
+    """
+    key = (service_name, region_name)
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                import boto3
+
+                resource = boto3.resource(service_name, region_name=region_name)
+                # リソースの操作も内部のクライアントを通るため、クライアントと同じくメトリクスを記録する
+                _instrument(resource.meta.client)
+                _resources[key] = resource
+    return resource
+
+
+def get_bucket_region(bucket_name: str) -> str:
+    """
+    バケットのリージョンを取得します。バケットのリージョンは変わらないため、一度取得したら使い回します。
+
+    Parameters
+    ----------
+    bucket_name : str
+      バケット名
+
+    Returns
+    -------
+    str
+      バケットのリージョン（get_bucket_location の LocationConstraint）
+    """
+    region = _bucket_regions.get(bucket_name)
+    if region is None:
+        region = get_client("s3").get_bucket_location(Bucket=bucket_name)["LocationConstraint"]
+        _bucket_regions[bucket_name] = region
+    return region
+
+
+class SecretCache:
+    """
+    シークレットやパラメータの値を一定時間保持するキャッシュ
+    ParameterStore と SecretsManager で共有し、ウォームスタートではSSM・KMSを呼ばずに済ませる
+
+    Parameters
+    ----------
+    ttl_seconds : float
+      値を保持する秒数
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self.__values: dict[str, tuple[float, object]] = {}
+        self.__lock = threading.Lock()
+
+    def get(self, key: str) -> object | None:
+        """
+        保持している値を取得します。
+
+        Parameters
+        ----------
+        key : str
+          キャッシュのキー
+
+        Returns
+        -------
+        object or None
+          値。保持していない場合や期限切れの場合はNone
+        """
+        with self.__lock:
+            entry = self.__values.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            return None
+        return entry[1]
+
+    def put(self, key: str, value: object) -> None:
+        """
+        値を保持します。
+
+        Parameters
+        ----------
+        key : str
+          キャッシュのキー
+        value : object
+          値
+        """
+        with self.__lock:
+            self.__values[key] = (time.monotonic(), value)
+
+    def get_or_load(self, key: str, load: Callable[[], object]) -> object:
+        """
+        保持している値を取得し、無ければloadで取得して保持します。
+
+        Parameters
+        ----------
+        key : str
+          キャッシュのキー
+        load : Callable[[], object]
+          値を取得する関数
+
+        Returns
+        -------
+        object
+          値
+        """
+        value = self.get(key)
+        if value is None:
+            value = load()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """
+        保持している値を全て破棄します。シークレットをローテーションした時などに使います。
+        """
+        with self.__lock:
+            self.__values.clear()
+
+
+_shared_secret_cache = SecretCache()
+
+
+def get_shared_secret_cache() -> SecretCache:
+    """
+    プロセス内で共有するシークレットのキャッシュを取得します。
+
+    Returns
+    -------
+    SecretCache
+      共有のキャッシュ
+    """
+    return _shared_secret_cache
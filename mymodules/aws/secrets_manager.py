@@ -1,16 +1,22 @@
 import json
 
-import boto3
+from .runtime import SecretCache, get_client, get_shared_secret_cache
 
 
 class SecretsManager:
     """
     AWS Secrets Managerを操作するクラス
+    取得したシークレットはプロセス内で共有するキャッシュに保持し、ウォームスタートでは再取得しない
     """
 
-    def __init__(self, region_name: str):
-        # Secrets Managerクライアントを作成する
-        self.__secrets_client = boto3.client("secretsmanager", region_name=region_name)
+    def __init__(self, region_name: str, cache: SecretCache | None = None):
+        self.__region_name = region_name
+        self.__cache = cache if cache is not None else get_shared_secret_cache()
+
+    @property
+    def __secrets_client(self):
+        # Secrets Managerクライアントは使う時に作成し、ウォームスタートでは使い回す
+        return get_client("secretsmanager", region_name=self.__region_name)
 
     def get_secret(self, secret_category: str, secret_name: str) -> str | None:
         """
@@ -29,9 +35,11 @@ class SecretsManager:
           シークレットの値。シークレットが見つからない場合や空の値の場合はNoneを返します。
 
         """
-        # シークレットの値を取得する
-        response = self.__secrets_client.get_secret_value(SecretId=secret_category)
-        secrets: dict = json.loads(response["SecretString"])
+        # シークレットの値を取得する（同じカテゴリのシークレットは1回の取得で済ませる）
+        secrets: dict = self.__cache.get_or_load(
+            f"secretsmanager:{self.__region_name}:{secret_category}",
+            lambda: json.loads(self.__secrets_client.get_secret_value(SecretId=secret_category)["SecretString"]),
+        )
         token: str = secrets[secret_name]
         if token == "":
             return None
@@ -0,0 +1,233 @@
+import json
+import os
+import time
+
+from .runtime import get_client
+
+
+class S3SnapshotStore:
+    """
+    小さなJSONスナップショットをS3に保存・読み込みするクラス
+
+    Parameters
+    ----------
+    bucket_name : str
+      保存先バケット名
+    prefix : str
+      スナップショットを保存するキーのプレフィックス
+    """
+
+    def __init__(self, bucket_name: str, prefix: str = "_snapshots"):
+        self.__s3_client = get_client("s3")
+        self.__bucket_name = bucket_name
+        self.__prefix = prefix.rstrip("/")
+
+    def load(self, name: str) -> dict | None:
+        """
+        スナップショットを読み込む
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+
+        Returns
+        -------
+        dict or None
+          スナップショットの中身。存在しない場合はNone。
+        """
+        try:
+            response = self.__s3_client.get_object(Bucket=self.__bucket_name, Key=self.__key(name))
+        except self.__s3_client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def save(self, name: str, data: dict) -> None:
+        """
+        スナップショットを保存する
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        data : dict
+          保存する内容（JSONに変換できること）
+        """
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.__s3_client.put_object(Bucket=self.__bucket_name, Key=self.__key(name), Body=body)
+
+    def delete(self, name: str) -> None:
+        """
+        スナップショットを削除する。存在しない場合は何もしない
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        """
+        self.__s3_client.delete_object(Bucket=self.__bucket_name, Key=self.__key(name))
+
+    def acquire_lease(self, name: str, ttl_seconds: float) -> bool:
+        """
+        スナップショットを使う権利（リース）を取得する。複数の実行のうち1つだけが同じスナップショットを使うための目印にする
+        他の実行が期限内のリースを持っている場合は取得できない。期限切れのリースは、読み込んだ時から変わっていない場合のみ置き換える
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        ttl_seconds : float
+          リースの有効期間（秒）。途中で異常終了した実行のリースは、この時間が過ぎると他の実行が取得できる
+
+        Returns
+        -------
+        bool
+          取得できた場合はTrue
+        """
+        key = self.__key(f"{name}.lease")
+        body = json.dumps({"expires_at": time.time() + ttl_seconds}).encode("utf-8")
+        if self.__put_if(key, body, IfNoneMatch="*"):
+            return True
+        try:
+            response = self.__s3_client.get_object(Bucket=self.__bucket_name, Key=key)
+        except self.__s3_client.exceptions.NoSuchKey:
+            # 他の実行がちょうど手放した場合は、次の実行に任せる
+            return False
+        if json.loads(response["Body"].read())["expires_at"] > time.time():
+            return False
+        return self.__put_if(key, body, IfMatch=response["ETag"])
+
+    def release_lease(self, name: str) -> None:
+        """
+        acquire_lease で取得したリースを手放す
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        """
+        self.__s3_client.delete_object(Bucket=self.__bucket_name, Key=self.__key(f"{name}.lease"))
+
+    def __put_if(self, key: str, body: bytes, **condition: str) -> bool:
+        try:
+            self.__s3_client.put_object(Bucket=self.__bucket_name, Key=key, Body=body, **condition)
+        except self.__s3_client.exceptions.ClientError as e:
+            # 条件を満たさない場合は412、同時に書き込んだ場合は409が返る
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return False
+            raise
+        return True
+
+    def __key(self, name: str) -> str:
+        return f"{self.__prefix}/{name}.json"
+
+
+class LocalSnapshotStore:
+    """
+    小さなJSONスナップショットをローカルディスクに保存・読み込みするクラス
+    S3SnapshotStoreの代わりにローカル実行やテストで利用する
+
+    Parameters
+    ----------
+    directory : str
+      保存先ディレクトリ
+    """
+
+    def __init__(self, directory: str):
+        self.__directory = directory
+
+    def load(self, name: str) -> dict | None:
+        """
+        スナップショットを読み込む
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+
+        Returns
+        -------
+        dict or None
+          スナップショットの中身。存在しない場合はNone。
+        """
+        path = self.__path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, name: str, data: dict) -> None:
+        """
+        スナップショットを保存する
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        data : dict
+          保存する内容（JSONに変換できること）
+        """
+        os.makedirs(self.__directory, exist_ok=True)
+        # 書き込み途中のファイルを読まれないように一時ファイル経由で置き換える
+        tmp_path = self.__path(name) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.__path(name))
+
+    def delete(self, name: str) -> None:
+        """
+        スナップショットを削除する。存在しない場合は何もしない
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        """
+        if os.path.exists(self.__path(name)):
+            os.remove(self.__path(name))
+
+    def acquire_lease(self, name: str, ttl_seconds: float) -> bool:
+        """
+        スナップショットを使う権利（リース）を取得する。他のプロセスが期限内のリースを持っている場合は取得できない
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        ttl_seconds : float
+          リースの有効期間（秒）
+
+        Returns
+        -------
+        bool
+          取得できた場合はTrue
+        """
+        os.makedirs(self.__directory, exist_ok=True)
+        path = self.__path(f"{name}.lease")
+        content = {"expires_at": time.time() + ttl_seconds}
+        try:
+            with open(path, "x", encoding="utf-8") as f:
+                json.dump(content, f)
+            return True
+        except FileExistsError:
+            pass
+        with open(path, encoding="utf-8") as f:
+            if json.load(f)["expires_at"] > time.time():
+                return False
+        # 期限切れのリースは置き換える（ローカル実行では同じスナップショットを同時に使わない前提で、条件付きにしない）
+        self.save(f"{name}.lease", content)
+        return True
+
+    def release_lease(self, name: str) -> None:
+        """
+        acquire_lease で取得したリースを手放す
+
+        Parameters
+        ----------
+        name : str
+          スナップショット名
+        """
+        self.delete(f"{name}.lease")
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.__directory, f"{name}.json")
@@ -0,0 +1,44 @@
+import json
+
+from .runtime import get_client
+
+
+class SqsQueue:
+    """
+    Amazon SQSのキューにメッセージを送るクラス
+
+    Parameters
+    ----------
+    queue_url : str
+      キューのURL
+    region_name : str
+      AWSリージョン名
+    """
+
+    def __init__(self, queue_url: str, region_name: str):
+        self.__queue_url = queue_url
+        self.__region_name = region_name
+
+    def send_messages(self, bodies: list[dict]) -> None:
+        """
+        メッセージをまとめて送る。send_message_batch は1回で10件までのため、10件ずつに分けて送る
+
+        Parameters
+        ----------
+        bodies : list[dict]
+          送るメッセージの本文のリスト（JSONに変換できること）
+        """
+        sqs = get_client("sqs", region_name=self.__region_name)
+        for i in range(0, len(bodies), 10):
+            entries = [
+                {"Id": str(index), "MessageBody": json.dumps(body, ensure_ascii=False)}
+                for index, body in enumerate(bodies[i : i + 10])
+            ]
+            response = sqs.send_message_batch(QueueUrl=self.__queue_url, Entries=entries)
+            # 一部のメッセージのみ失敗した場合は、失敗したものだけを1回だけ送り直す
+            failed_ids = {failed["Id"] for failed in response.get("Failed", [])}
+            if len(failed_ids) > 0:
+                retry_entries = [entry for entry in entries if entry["Id"] in failed_ids]
+                response = sqs.send_message_batch(QueueUrl=self.__queue_url, Entries=retry_entries)
+                if len(response.get("Failed", [])) > 0:
+                    raise RuntimeError(f"SQSへのメッセージの送信に失敗しました: {response['Failed']}")
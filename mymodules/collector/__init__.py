@@ -0,0 +1,21 @@
+from .channel_collector import ChannelCollector as ChannelCollector
+from .channel_collector import ChannelResult as ChannelResult
+from .channel_collector import CheckpointStore as CheckpointStore
+from .channel_collector import create_checkpoint_key as create_checkpoint_key
+from .manifest import ManifestStore as ManifestStore
+from .manifest import ReportManifest as ReportManifest
+from .resume import ResumeState as ResumeState
+from .resume import ResumeStore as ResumeStore
+from .time_budget import TimeBudget as TimeBudget
+
+__all__ = [
+    "ChannelCollector",
+    "ChannelResult",
+    "CheckpointStore",
+    "ManifestStore",
+    "ReportManifest",
+    "ResumeState",
+    "ResumeStore",
+    "TimeBudget",
+    "create_checkpoint_key",
+]
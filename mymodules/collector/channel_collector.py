@@ -0,0 +1,452 @@
+import hashlib
+import importlib.util
+import time
+from dataclasses import dataclass, field
+from typing import Protocol
+
+from mymodules.archive_index import ArchiveIndex, ArchiveIndexSink
+from mymodules.aws import S3
+from mymodules.metrics import get_metrics
+from mymodules.output import (
+    DeltaReportSink,
+    JsonlGzArchiveSink,
+    OutputSink,
+    ParquetArchiveSink,
+    ReportRenderer,
+    TextReportSink,
+    create_run_id,
+    thread_state,
+)
+from mymodules.output.report import HashingTextWriter
+from mymodules.slack import KeywordMatcher, Slack
+from mymodules.slack.ts import newer_ts
+
+from .manifest import ManifestStore, ReportManifest
+from .resume import ResumeState, ResumeStore
+from .time_budget import TimeBudget
+
+
+class CheckpointStore(Protocol):
+    """
+    処理済みの位置を保存するストアのインターフェース
+    mymodules.aws の S3CheckpointStore / ParameterStoreCheckpointStore / LocalCheckpointStore がこれを満たす
+    """
+
+    def get(self, key: str) -> str | None:
+        ...
+
+    def put(self, key: str, value: str) -> None:
+        ...
+
+
+@dataclass
+class ChannelResult:
+    """
+    1チャンネル分の収集結果
+
+    Attributes
+    ----------
+    channel : dict
+      チャンネル情報
+    message_count : int
+      検索ワードに一致したメッセージの数
+    public_url : str or None
+      保存したファイルの公開URL。一致したメッセージが無かった場合はNone。
+    checkpoint_key : str
+      チェックポイントのキー
+    latest_ts : str or None
+      今回取得した中で最新のメッセージのts
+    archive_keys : list[str]
+      保存したアーカイブ（JSON Lines / Parquet）のキーのリスト
+    suspended : bool
+      時間切れで収集を中断した場合はTrue。次回の実行で続きから再開する
+    unchanged : bool
+      レポートの内容が前回と同じだったため保存しなかった場合はTrue。public_url は前回のファイルを指す
+    delta : bool
+      前回から増えたスレッドと返信のみを保存した場合はTrue
+    manifest : ReportManifest or None
+      通知が終わってから記録する、今回のレポートのマニフェスト
+    busy : bool
+      他の実行が同じチャンネルを収集していたため、収集しなかった場合はTrue
+    failed : bool
+      収集中にエラーが発生した場合はTrue。次回の実行で同じ範囲を取得し直す
+    """
+
+    channel: dict
+    message_count: int
+    public_url: str | None
+    checkpoint_key: str
+    latest_ts: str | None
+    archive_keys: list[str] = field(default_factory=list)
+    suspended: bool = False
+    unchanged: bool = False
+    delta: bool = False
+    manifest: ReportManifest | None = None
+    busy: bool = False
+    failed: bool = False
+
+
+class ChannelCollector:
+    """
+    チャンネルから検索ワードを含むメッセージとスレッドの返信を集め、S3に保存するクラスです。
+    複数のチャンネルを並行して収集できるよう、1回の collect の中で状態を持ちません。
+
+    Parameters
+    ----------
+    slack : Slack
+      Slackのユースケース
+    s3 : S3
+      保存先のS3
+    bucket_name : str
+      保存先バケット名
+    matcher : KeywordMatcher
+      検索ワード
+    search_hours : int
+      チェックポイントが無い場合に検索する時間範囲（何時間前まで検索するか）
+    thread_fetch_concurrency : int
+      スレッドの返信・ユーザー情報を並行して取得する数
+    checkpoint_store : CheckpointStore or None
+      前回処理した位置を保存するストア。指定しない場合は毎回search_hours分を全て取得する。
+    full_backfill : bool
+      Trueの場合はチェックポイントを無視してsearch_hours分を全て取得し直す
+    archive_formats : list[str] or None
+      テキストのレポートとは別に保存するアーカイブの形式（"jsonl" / "parquet"）
+    archive_prefix : str
+      アーカイブを保存するキーのプレフィックス
+    archive_index : ArchiveIndex or None
+      指定した場合は収集したメッセージを転置インデックスにも追加する
+    resume_store : ResumeStore or None
+      時間切れで中断した収集の状態を保存するストア。指定しない場合は中断しない
+    time_budget : TimeBudget or None
+      Lambdaの残り時間。残り時間が少なくなったらページの区切りで収集を中断し、状態をresume_storeに保存する
+    renderer : ReportRenderer or None
+      レポートの書式。指定しない場合はテキスト
+    manifest_store : ManifestStore or None
+      前回保存したレポートの内容のハッシュを記録するストア。指定した場合、内容が前回と同じレポートは保存しない
+    report_mode : str
+      "full"（毎回レポート全体を保存する）/ "delta"（前回から増えたスレッドと返信のみを、前回の全体のファイルを示して保存する）。
+      "delta" は manifest_store を指定した場合のみ有効
+    delta_full_interval_seconds : int
+      report_modeが"delta"の場合に、レポート全体を保存し直す間隔（秒）
+    resume_lease_seconds : float
+      resume_storeを指定した場合に、収集するチャンネルのリースを持つ時間（秒）。Lambdaのタイムアウトより長くする
+    """
+
+    def __init__(
+        self,
+        slack: Slack,
+        s3: S3,
+        bucket_name: str,
+        matcher: KeywordMatcher,
+        search_hours: int,
+        thread_fetch_concurrency: int = 4,
+        checkpoint_store: CheckpointStore | None = None,
+        full_backfill: bool = False,
+        archive_formats: list[str] | None = None,
+        archive_prefix: str = "archive",
+        archive_index: ArchiveIndex | None = None,
+        resume_store: ResumeStore | None = None,
+        time_budget: TimeBudget | None = None,
+        renderer: ReportRenderer | None = None,
+        manifest_store: ManifestStore | None = None,
+        report_mode: str = "full",
+        delta_full_interval_seconds: int = 7 * 86400,
+        resume_lease_seconds: float = 900,
+    ):
+        if report_mode not in ("full", "delta"):
+            raise ValueError(f"レポートの保存方法の指定が不正です: {report_mode}")
+        for archive_format in archive_formats or []:
+            if archive_format not in ("jsonl", "parquet"):
+                raise ValueError(f"アーカイブの形式が不正です: {archive_format}")
+            # pyarrowはrequirements.txtに含めていないため、収集を始める前に設定の誤りとして扱う
+            if archive_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+                raise ValueError("アーカイブの形式にparquetを指定する場合は、pyarrowをLambdaのパッケージに追加してください")
+        self.__slack = slack
+        self.__s3 = s3
+        self.__bucket_name = bucket_name
+        self.__matcher = matcher
+        self.__search_hours = search_hours
+        self.__thread_fetch_concurrency = thread_fetch_concurrency
+        self.__checkpoint_store = checkpoint_store
+        self.__full_backfill = full_backfill
+        self.__archive_formats = archive_formats or []
+        self.__archive_prefix = archive_prefix
+        self.__archive_index = archive_index
+        self.__resume_store = resume_store
+        self.__time_budget = time_budget
+        self.__renderer = renderer or ReportRenderer()
+        self.__manifest_store = manifest_store
+        self.__report_mode = report_mode
+        self.__delta_full_interval_seconds = delta_full_interval_seconds
+        self.__resume_lease_seconds = resume_lease_seconds
+        self.__run_id = create_run_id()
+
+    def collect(self, channel: dict, file_title_head: str) -> ChannelResult:
+        """
+        チャンネルからメッセージをページごとに取得し、取得したページから順にS3へ書き込みます。
+        resume_storeを指定した場合は、中断した収集の再呼び出しと次回の定期実行が同じ状態から同時に再開しないよう、
+        チャンネルのリースを取得してから収集します。他の実行がリースを持っている場合は収集しません。
+        リースは中断した場合はすぐに、収集し終えた場合は commit_checkpoint で手放します。
+
+        Parameters
+        ----------
+        channel : dict
+          収集するチャンネルの情報
+        file_title_head : str
+          保存する時のファイル名
+
+        Returns
+        -------
+        ChannelResult
+          収集結果
+        """
+        checkpoint_key = create_checkpoint_key(channel["id"], self.__matcher.words)
+        if self.__resume_store is None:
+            return self.__collect(channel, file_title_head, checkpoint_key)
+        if not self.__resume_store.acquire_lease(checkpoint_key, self.__resume_lease_seconds):
+            print(f"{channel['name']}は他の実行が収集中のため、今回は収集しません")
+            return ChannelResult(channel, 0, None, checkpoint_key, None, busy=True)
+        try:
+            result = self.__collect(channel, file_title_head, checkpoint_key)
+        except BaseException:
+            self.__resume_store.release_lease(checkpoint_key)
+            raise
+        if result.suspended:
+            self.__resume_store.release_lease(checkpoint_key)
+        return result
+
+    def __collect(self, channel: dict, file_title_head: str, checkpoint_key: str) -> ChannelResult:
+        # 前回の実行が時間切れで中断していた場合は、中断した位置から再開する
+        resume = self.__load_resume_state(checkpoint_key)
+        # 中断した収集を再開した場合は前回のファイルの後ろに連結するため、見出しを書かず、前回と別のファイル名にする
+        part_title_head = (
+            file_title_head if len(resume.part_keys) == 0 else f"{file_title_head}_part{len(resume.part_keys) + 1}"
+        )
+        # 前回のレポートと比べるのは、1回の実行で収集し終えた場合のみ
+        manifest = self.__load_manifest(checkpoint_key) if len(resume.part_keys) == 0 else None
+        delta_base: ReportManifest | None = None
+        if self.__report_mode == "delta" and manifest is not None:
+            if time.time() - manifest.full_saved_at < self.__delta_full_interval_seconds:
+                delta_base = manifest
+        # 差分のみを保存する場合、レポート全体は前回と比べるためのハッシュを求めるだけで保存しない
+        text_sink = TextReportSink(
+            self.__s3,
+            self.__bucket_name,
+            part_title_head,
+            self.__renderer,
+            include_header=len(resume.part_keys) == 0,
+            writer=HashingTextWriter() if delta_base is not None else None,
+        )
+        delta_sink: DeltaReportSink | None = None
+        if delta_base is not None:
+            delta_sink = DeltaReportSink(
+                TextReportSink(
+                    self.__s3,
+                    self.__bucket_name,
+                    f"{file_title_head}_delta",
+                    self.__renderer,
+                    note=f"前回からの差分です。全体: {delta_base.full_url}",
+                ),
+                delta_base.threads,
+            )
+        archive_sinks = self.__create_archive_sinks()
+        index_sinks: list[OutputSink] = []
+        if self.__archive_index is not None:
+            index_sinks.append(ArchiveIndexSink(self.__archive_index, f"{self.__run_id}-{channel['id']}"))
+        report_sinks: list[OutputSink] = [text_sink] if delta_sink is None else [text_sink, delta_sink]
+        sinks: list[OutputSink] = [*report_sinks, *archive_sinks, *index_sinks]
+        report_threads: dict[str, str] = {}
+        processed_ts = set(resume.processed_ts)
+        message_count = 0
+        suspended = False
+        metrics = get_metrics()
+        pages = self.__slack.iter_search_pages(
+            channel, self.__matcher, resume.oldest_ts, self.__search_hours, resume.frontier_ts
+        )
+        try:
+            while True:
+                with metrics.phase("fetch"):
+                    page = next(pages, None)
+                if page is None:
+                    break
+                messages, page_latest_ts, page_oldest_ts = page
+                resume.latest_ts = newer_ts(resume.latest_ts, page_latest_ts)
+                if page_oldest_ts is not None:
+                    resume.frontier_ts = page_oldest_ts
+                # 中断する前に書き込んだメッセージは除く
+                if len(processed_ts) > 0:
+                    messages = [message for message in messages if message["ts"] not in processed_ts]
+                if len(messages) > 0:
+                    message_count += len(messages)
+                    self.__write_page(channel, messages, sinks)
+                    if self.__manifest_store is not None:
+                        report_threads.update((message["ts"], thread_state(message)) for message in messages)
+                    if self.__resume_store is not None:
+                        processed_ts.update(message["ts"] for message in messages)
+                # Lambdaの残り時間が少なくなったら、ページの区切りで中断する
+                if self.__resume_store is not None and self.__time_budget is not None and self.__time_budget.exhausted():
+                    suspended = True
+                    break
+        except BaseException:
+            for sink in sinks:
+                sink.abort()
+            raise
+
+        # 今回書き込んだ分のアップロードを完了する
+        # 内容が前回と同じ場合（差分のみを保存する場合は差分が無い場合）は、何も保存しない
+        public_url: str | None = None
+        unchanged = not suspended and manifest is not None and message_count > 0
+        unchanged = unchanged and (
+            text_sink.sha256 == manifest.sha256 or (delta_sink is not None and delta_sink.message_count == 0)
+        )
+        with metrics.phase("render"):
+            if message_count == 0 or unchanged:
+                for sink in sinks:
+                    sink.abort()
+            else:
+                report_sink = text_sink if delta_sink is None else delta_sink
+                public_url = report_sink.close()[0]
+                resume.part_keys.append(report_sink.key)
+                resume.archive_keys += [key for sink in archive_sinks for key in sink.close()]
+                for sink in index_sinks:
+                    sink.close()
+        resume.message_count += message_count
+
+        if suspended:
+            resume.processed_ts = sorted(processed_ts, key=float)
+            self.__resume_store.save(checkpoint_key, resume.to_dict())
+            print(f"時間切れのため{channel['name']}の収集を中断しました（{resume.message_count}件まで収集済み）")
+            return ChannelResult(
+                channel, resume.message_count, None, checkpoint_key, resume.latest_ts, resume.archive_keys, suspended=True
+            )
+        if resume.message_count == 0:
+            return ChannelResult(channel, 0, None, checkpoint_key, resume.latest_ts)
+        if unchanged:
+            print(f"{channel['name']}のレポートは前回から変わっていないため、保存しませんでした")
+            unchanged_manifest = ReportManifest(
+                text_sink.sha256, manifest.public_url, manifest.full_url, manifest.full_saved_at, report_threads
+            )
+            return ChannelResult(
+                channel,
+                resume.message_count,
+                manifest.public_url,
+                checkpoint_key,
+                resume.latest_ts,
+                unchanged=True,
+                manifest=unchanged_manifest,
+            )
+        if len(resume.part_keys) > 1 or public_url is None:
+            # 中断した実行ごとに書き込んだテキストのレポートを1つのファイルにまとめる
+            with metrics.phase("upload"):
+                template = self.__renderer.template
+                public_url = self.__s3.compose_txt(
+                    self.__bucket_name, file_title_head, resume.part_keys, template.extension, template.content_type
+                )
+        # 中断して複数の実行に分けた場合は、レポート全体のハッシュを求められないため記録しない
+        new_manifest: ReportManifest | None = None
+        if self.__manifest_store is not None and len(resume.part_keys) == 1 and public_url is not None:
+            if delta_base is not None:
+                new_manifest = ReportManifest(
+                    text_sink.sha256, public_url, delta_base.full_url, delta_base.full_saved_at, report_threads
+                )
+            else:
+                new_manifest = ReportManifest(text_sink.sha256, public_url, public_url, time.time(), report_threads)
+        return ChannelResult(
+            channel,
+            resume.message_count,
+            public_url,
+            checkpoint_key,
+            resume.latest_ts,
+            resume.archive_keys,
+            delta=delta_sink is not None and len(resume.part_keys) == 1,
+            manifest=new_manifest,
+        )
+
+    def __load_manifest(self, checkpoint_key: str) -> ReportManifest | None:
+        if self.__manifest_store is None:
+            return None
+        data = self.__manifest_store.load(checkpoint_key)
+        return ReportManifest.from_dict(data) if data is not None else None
+
+    def __load_resume_state(self, checkpoint_key: str) -> ResumeState:
+        if self.__resume_store is not None:
+            state = self.__resume_store.load(checkpoint_key)
+            if state is not None:
+                return ResumeState.from_dict(state)
+        oldest_ts: str | None = None
+        if self.__checkpoint_store is not None and not self.__full_backfill:
+            oldest_ts = self.__checkpoint_store.get(checkpoint_key)
+        return ResumeState(oldest_ts, oldest_ts)
+
+    def __write_page(self, channel: dict, messages: list[dict], sinks: list[OutputSink]) -> None:
+        metrics = get_metrics()
+        # 返信があるスレッドのみ、返信をまとめて並行に取得する
+        with metrics.phase("threads"):
+            threads = self.__slack.get_thread_replies(channel, messages, max_workers=self.__thread_fetch_concurrency)
+
+        # 投稿者のユーザー情報を一度にまとめて取得する
+        with metrics.phase("users"):
+            user_ids = [message["user"] for message in messages if "user" in message]
+            user_ids += [reply["user"] for replies in threads for reply in replies if "user" in reply]
+            users = self.__slack.get_users(user_ids, max_workers=self.__thread_fetch_concurrency)
+
+        # 全ての出力先に書き込む（S3へのアップロードの時間は upload に数える）
+        with metrics.phase("render"):
+            for sink in sinks:
+                sink.write_batch(channel, messages, threads, users)
+
+    def __create_archive_sinks(self) -> list[OutputSink]:
+        sinks: list[OutputSink] = []
+        for archive_format in self.__archive_formats:
+            if archive_format == "jsonl":
+                sinks.append(JsonlGzArchiveSink(self.__s3, self.__bucket_name, self.__archive_prefix, self.__run_id))
+            elif archive_format == "parquet":
+                sinks.append(ParquetArchiveSink(self.__s3, self.__bucket_name, self.__archive_prefix, self.__run_id))
+        return sinks
+
+    def commit_checkpoint(self, result: ChannelResult) -> None:
+        """
+        収集結果の最新のtsを、次回の起点として記録します。保存と通知が終わってから呼び出してください。
+
+        Parameters
+        ----------
+        result : ChannelResult
+          収集結果
+        """
+        # 中断した収集はまだ終わっていないため、次回の起点を進めない。他の実行が収集中・収集に失敗したチャンネルも同じ
+        if result.suspended or result.busy or result.failed:
+            return
+        if self.__checkpoint_store is not None and result.latest_ts is not None:
+            self.__checkpoint_store.put(result.checkpoint_key, result.latest_ts)
+        # 通知が終わってから、次回と比べるためのマニフェストを記録する
+        # レポートを保存したのにマニフェストが無い（中断して複数の実行に分けた）場合は、次回は全体を保存し直す
+        if self.__manifest_store is not None and result.message_count > 0:
+            if result.manifest is not None:
+                self.__manifest_store.save(result.checkpoint_key, result.manifest.to_dict())
+            else:
+                self.__manifest_store.delete(result.checkpoint_key)
+        # 起点を記録してから、中断した状態を消してリースを手放す
+        if self.__resume_store is not None:
+            self.__resume_store.delete(result.checkpoint_key)
+            self.__resume_store.release_lease(result.checkpoint_key)
+
+
+def create_checkpoint_key(channel_id: str, search_words: list[str]) -> str:
+    """
+    チャンネルと検索ワードの組み合わせごとのチェックポイントのキーを作成します。
+    検索ワードの順番が変わっても同じキーになるように並び替えてからハッシュ化します。
+
+    Parameters
+    ----------
+    channel_id : str
+      チャンネルID
+    search_words : list[str]
+      検索ワードのリスト
+
+    Returns
+    -------
+    str
+      チェックポイントのキー
+    """
+    words_hash = hashlib.sha256("\n".join(sorted(set(search_words))).encode("utf-8")).hexdigest()[:16]
+    return f"{channel_id}-{words_hash}"
@@ -0,0 +1,51 @@
+from dataclasses import asdict, dataclass, field
+from typing import Protocol
+
+
+class ManifestStore(Protocol):
+    """
+    前回保存したレポートのマニフェストを保存するストアのインターフェース
+    mymodules.aws の S3SnapshotStore / LocalSnapshotStore がこれを満たす
+    """
+
+    def load(self, name: str) -> dict | None:
+        ...
+
+    def save(self, name: str, data: dict) -> None:
+        ...
+
+    def delete(self, name: str) -> None:
+        ...
+
+
+@dataclass
+class ReportManifest:
+    """
+    前回保存したレポートの内容の記録。内容が前回と同じかどうかの判定と、差分のみのレポートの作成に使う
+
+    Attributes
+    ----------
+    sha256 : str
+      前回のレポート全体の内容のSHA-256
+    public_url : str
+      前回保存したレポート（全体または差分）の公開URL
+    full_url : str
+      前回保存したレポート全体の公開URL。差分のみのレポートはこのファイルからの続きになる
+    full_saved_at : float
+      レポート全体を保存したUNIX時間
+    threads : dict[str, str]
+      前回のレポートに含めた親メッセージのts → スレッドの状態（mymodules.output.thread_state）
+    """
+
+    sha256: str
+    public_url: str
+    full_url: str
+    full_saved_at: float
+    threads: dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReportManifest":
+        return cls(**data)
@@ -0,0 +1,63 @@
+from dataclasses import asdict, dataclass, field
+from typing import Protocol
+
+
+class ResumeStore(Protocol):
+    """
+    時間切れで中断した収集の状態を保存するストアのインターフェース
+    mymodules.aws の S3SnapshotStore / LocalSnapshotStore がこれを満たす
+    """
+
+    def load(self, name: str) -> dict | None:
+        ...
+
+    def save(self, name: str, data: dict) -> None:
+        ...
+
+    def delete(self, name: str) -> None:
+        ...
+
+    def acquire_lease(self, name: str, ttl_seconds: float) -> bool:
+        ...
+
+    def release_lease(self, name: str) -> None:
+        ...
+
+
+@dataclass
+class ResumeState:
+    """
+    時間切れで中断した収集の状態
+
+    Attributes
+    ----------
+    oldest_ts : str or None
+      中断した収集を始めた時の起点のts（チェックポイント）
+    latest_ts : str or None
+      中断するまでに取得した中で最新のメッセージのts
+    frontier_ts : str or None
+      中断するまでに取得した中で最古のメッセージのts。再開する時はこれより古いメッセージのみを取得する
+    message_count : int
+      中断するまでに検索ワードに一致したメッセージの数
+    processed_ts : list[str]
+      中断するまでに書き込んだメッセージのts。再開した時に同じメッセージを二重に書き込まないために使う
+    part_keys : list[str]
+      中断するまでに書き込んだテキストのレポートのキー。収集が終わった時に順に連結する
+    archive_keys : list[str]
+      中断するまでに保存したアーカイブのキー
+    """
+
+    oldest_ts: str | None
+    latest_ts: str | None
+    frontier_ts: str | None = None
+    message_count: int = 0
+    processed_ts: list[str] = field(default_factory=list)
+    part_keys: list[str] = field(default_factory=list)
+    archive_keys: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ResumeState":
+        return cls(**data)
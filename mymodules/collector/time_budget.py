@@ -0,0 +1,33 @@
+class TimeBudget:
+    """
+    Lambdaの残り時間を見て、タイムアウトする前に処理を中断するかどうかを判断するクラス
+
+    Parameters
+    ----------
+    context : object
+      AWS Lambdaのコンテキストオブジェクト（get_remaining_time_in_millis を持つもの）
+    reserve_seconds : float
+      中断した状態の保存・アップロードの完了に残しておく秒数。残り時間がこれを下回ったら中断する
+    """
+
+    def __init__(self, context, reserve_seconds: float = 60):
+        self.__context = context
+        self.__reserve_seconds = reserve_seconds
+
+    @property
+    def remaining_seconds(self) -> float:
+        """
+        Lambdaがタイムアウトするまでの残り秒数
+        """
+        return self.__context.get_remaining_time_in_millis() / 1000
+
+    def exhausted(self) -> bool:
+        """
+        残り時間がreserve_secondsを下回ったかどうか
+
+        Returns
+        -------
+        bool
+          中断すべき場合はTrue
+        """
+        return self.remaining_seconds < self.__reserve_seconds
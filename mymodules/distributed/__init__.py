@@ -0,0 +1,5 @@
+from .collection import DistributedCollection as DistributedCollection
+from .queue import LocalFileQueue as LocalFileQueue
+from .queue import WorkQueue as WorkQueue
+
+__all__ = ["DistributedCollection", "LocalFileQueue", "WorkQueue"]
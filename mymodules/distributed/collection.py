@@ -0,0 +1,244 @@
+import gzip
+import json
+import uuid
+
+from mymodules.aws import S3
+from mymodules.collector import ChannelResult, CheckpointStore, create_checkpoint_key
+from mymodules.metrics import get_metrics
+from mymodules.output import ReportRenderer, create_run_id
+from mymodules.slack import KeywordMatcher, Slack
+from mymodules.slack.ts import newer_ts
+
+from .queue import WorkQueue
+
+
+class DistributedCollection:
+    """
+    スレッドの返信の取得を、キューを介して複数の実行に分けて行う収集です。
+    1つの実行の時間とレートリミットの枠に収まらない量のスレッドを、ワーカーを増やして並行に取得できます。
+
+    1. producer: チャンネルの履歴をページごとに取得し、検索ワードに一致した親メッセージをバッチとしてS3に置き、キューに送る
+    2. worker: バッチごとにスレッドの返信・ユーザー情報を取得し、テキストにしてS3に置く
+    3. finalizer: 全てのバッチの結果をチャンネルごとに1つのファイルにまとめる
+
+    バッチ・結果・マニフェストは <prefix>/<job_id>/ の下に置きます。
+    キューには小さなメッセージ（ジョブID・チャンネルID・バッチ番号）のみを送り、SQSのメッセージの大きさの上限を超えないようにします。
+
+    Parameters
+    ----------
+    s3 : S3
+      バッチ・結果を置くS3
+    bucket_name : str
+      バッチ・結果と、まとめたファイルの保存先バケット名
+    prefix : str
+      バッチ・結果を置くキーのプレフィックス
+    renderer : ReportRenderer or None
+      レポートの書式。指定しない場合はテキスト
+    """
+
+    def __init__(self, s3: S3, bucket_name: str, prefix: str = "_jobs", renderer: ReportRenderer | None = None):
+        self.__s3 = s3
+        self.__bucket_name = bucket_name
+        self.__prefix = prefix.rstrip("/")
+        self.__renderer = renderer or ReportRenderer()
+
+    def produce(
+        self,
+        slack: Slack,
+        channels: list[dict],
+        file_title_heads: dict[str, str],
+        matcher: KeywordMatcher,
+        search_hours: int,
+        queue: WorkQueue,
+        checkpoint_store: CheckpointStore | None = None,
+        full_backfill: bool = False,
+    ) -> str:
+        """
+        チャンネルの履歴を取得してバッチを作り、ワーカーに送ります。
+        全てのバッチとマニフェストをS3に置いてからキューに送るため、ワーカーは常にマニフェストを読めます。
+
+        Parameters
+        ----------
+        slack : Slack
+          Slackのユースケース
+        channels : list[dict]
+          収集するチャンネルの情報のリスト
+        file_title_heads : dict[str, str]
+          チャンネルID → 保存する時のファイル名
+        matcher : KeywordMatcher
+          検索ワード
+        search_hours : int
+          チェックポイントが無い場合に検索する時間範囲（何時間前まで検索するか）
+        queue : WorkQueue
+          ワーカーに処理を渡すキュー
+        checkpoint_store : CheckpointStore or None
+          前回処理した位置を保存するストア
+        full_backfill : bool
+          Trueの場合はチェックポイントを無視してsearch_hours分を全て取得し直す
+
+        Returns
+        -------
+        str
+          ジョブID
+        """
+        job_id = f"{create_run_id()}-{uuid.uuid4().hex[:8]}"
+        manifest_channels: list[dict] = []
+        queue_messages: list[dict] = []
+        for channel in channels:
+            checkpoint_key = create_checkpoint_key(channel["id"], matcher.words)
+            oldest_ts: str | None = None
+            if checkpoint_store is not None and not full_backfill:
+                oldest_ts = checkpoint_store.get(checkpoint_key)
+            latest_ts = oldest_ts
+            batch_count = 0
+            message_count = 0
+            pages = slack.iter_search_pages(channel, matcher, oldest_ts, search_hours)
+            while True:
+                with get_metrics().phase("fetch"):
+                    page = next(pages, None)
+                if page is None:
+                    break
+                messages, page_latest_ts, _ = page
+                latest_ts = newer_ts(latest_ts, page_latest_ts)
+                if len(messages) == 0:
+                    continue
+                batch = {"channel": channel, "messages": [dict(message) for message in messages]}
+                self.__put_json(self.__batch_key(job_id, channel["id"], batch_count), batch)
+                queue_messages.append({"job_id": job_id, "channel_id": channel["id"], "batch_index": batch_count})
+                batch_count += 1
+                message_count += len(messages)
+            manifest_channels.append(
+                {
+                    "channel": channel,
+                    "file_title_head": file_title_heads[channel["id"]],
+                    "checkpoint_key": checkpoint_key,
+                    "latest_ts": latest_ts,
+                    "batch_count": batch_count,
+                    "message_count": message_count,
+                }
+            )
+
+        manifest = {"job_id": job_id, "batch_count": len(queue_messages), "channels": manifest_channels}
+        self.__put_json(self.__manifest_key(job_id), manifest)
+        queue.send_messages(queue_messages)
+        print(f"ジョブ{job_id}: {len(queue_messages)}件のバッチをキューに送りました")
+        return job_id
+
+    def process_batch(self, slack: Slack, body: dict, max_workers: int = 4) -> str:
+        """
+        キューから受け取った1つのバッチについて、スレッドの返信・ユーザー情報を取得してテキストにします。
+        結果のキーはバッチごとに決まっているため、同じバッチを2回処理しても結果は1つになります。
+
+        Parameters
+        ----------
+        slack : Slack
+          Slackのユースケース
+        body : dict
+          キューから受け取ったメッセージの本文
+        max_workers : int
+          スレッドの返信・ユーザー情報を並行して取得する数
+
+        Returns
+        -------
+        str
+          処理したバッチのジョブID
+        """
+        job_id: str = body["job_id"]
+        batch = self.__get_json(self.__batch_key(job_id, body["channel_id"], body["batch_index"]))
+        channel: dict = batch["channel"]
+        messages: list[dict] = batch["messages"]
+        metrics = get_metrics()
+        with metrics.phase("threads"):
+            threads = slack.get_thread_replies(channel, messages, max_workers=max_workers)
+        with metrics.phase("users"):
+            user_ids = [message["user"] for message in messages if "user" in message]
+            user_ids += [reply["user"] for replies in threads for reply in replies if "user" in reply]
+            users = slack.get_users(user_ids, max_workers=max_workers)
+        with metrics.phase("render"):
+            text = self.__renderer.render(channel, messages, threads, users)
+            # 連結した時にファイルの先頭になる最初のバッチにのみ見出しを付ける
+            if body["batch_index"] == 0:
+                text = self.__renderer.header(channel) + text
+        self.__s3.put_bytes(
+            self.__bucket_name, self.__result_key(job_id, body["channel_id"], body["batch_index"]), text.encode("utf-8")
+        )
+        return job_id
+
+    def try_claim_finalize(self, job_id: str) -> bool:
+        """
+        全てのバッチの処理が終わっていれば、まとめる処理を行う権利を取得します。
+        最後のバッチを処理した複数のワーカーが同時に呼んでも、Trueを返すのは1回だけです。
+
+        Parameters
+        ----------
+        job_id : str
+          ジョブID
+
+        Returns
+        -------
+        bool
+          まとめる処理を行うべき場合はTrue
+        """
+        manifest = self.__get_json(self.__manifest_key(job_id))
+        results = self.__s3.list_objects(self.__bucket_name, f"{self.__prefix}/{job_id}/results/")
+        if len(results) < manifest["batch_count"]:
+            return False
+        return self.__s3.put_bytes_if_absent(self.__bucket_name, f"{self.__prefix}/{job_id}/finalizing", b"")
+
+    def finalize(self, job_id: str) -> list[ChannelResult]:
+        """
+        全てのバッチの結果を、チャンネルごとにバッチの順番で1つのファイルにまとめます。
+
+        Parameters
+        ----------
+        job_id : str
+          ジョブID
+
+        Returns
+        -------
+        list[ChannelResult]
+          チャンネルごとの収集結果
+        """
+        manifest = self.__get_json(self.__manifest_key(job_id))
+        results: list[ChannelResult] = []
+        for entry in manifest["channels"]:
+            channel: dict = entry["channel"]
+            public_url: str | None = None
+            if entry["batch_count"] > 0:
+                part_keys = [self.__result_key(job_id, channel["id"], index) for index in range(entry["batch_count"])]
+                template = self.__renderer.template
+                with get_metrics().phase("upload"):
+                    public_url = self.__s3.compose_txt(
+                        self.__bucket_name, entry["file_title_head"], part_keys, template.extension, template.content_type
+                    )
+            results.append(
+                ChannelResult(channel, entry["message_count"], public_url, entry["checkpoint_key"], entry["latest_ts"])
+            )
+        return results
+
+    def cleanup(self, job_id: str) -> None:
+        """
+        ジョブのバッチ・結果・マニフェストを削除します。通知とチェックポイントの記録が終わってから呼び出してください。
+
+        Parameters
+        ----------
+        job_id : str
+          ジョブID
+        """
+        objects = self.__s3.list_objects(self.__bucket_name, f"{self.__prefix}/{job_id}/")
+        self.__s3.delete_objects(self.__bucket_name, [obj["Key"] for obj in objects])
+
+    def __put_json(self, key: str, data: dict) -> None:
+        self.__s3.put_bytes(self.__bucket_name, key, gzip.compress(json.dumps(data, ensure_ascii=False).encode("utf-8")))
+
+    def __get_json(self, key: str) -> dict:
+        return json.loads(gzip.decompress(self.__s3.read_bytes(self.__bucket_name, key)))
+
+    def __manifest_key(self, job_id: str) -> str:
+        return f"{self.__prefix}/{job_id}/manifest.json.gz"
+
+    def __batch_key(self, job_id: str, channel_id: str, batch_index: int) -> str:
+        return f"{self.__prefix}/{job_id}/batches/{channel_id}/{batch_index:06d}.json.gz"
+
+    def __result_key(self, job_id: str, channel_id: str, batch_index: int) -> str:
+        return f"{self.__prefix}/{job_id}/results/{channel_id}/{batch_index:06d}.txt"
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+from typing import Protocol
+
+
+class WorkQueue(Protocol):
+    """
+    ワーカーに処理を渡すキューのインターフェース
+    mymodules.aws の SqsQueue と LocalFileQueue がこれを満たす
+    """
+
+    def send_messages(self, bodies: list[dict]) -> None:
+        ...
+
+
+class LocalFileQueue:
+    """
+    メッセージを1件ずつファイルとしてローカルディスクに置くキュー
+    SqsQueueの代わりにローカル実行やテストで利用する。受け取ったメッセージはSQSのイベントと同じ形で返す
+
+    Parameters
+    ----------
+    directory : str
+      メッセージを置くディレクトリ
+    """
+
+    def __init__(self, directory: str):
+        self.__directory = directory
+        self.__sequence = 0
+
+    def send_messages(self, bodies: list[dict]) -> None:
+        """
+        メッセージを送る
+
+        Parameters
+        ----------
+        bodies : list[dict]
+          送るメッセージの本文のリスト（JSONに変換できること）
+        """
+        os.makedirs(self.__directory, exist_ok=True)
+        for body in bodies:
+            self.__sequence += 1
+            # 送った順に受け取れるよう、時刻と連番をファイル名にする
+            name = f"{time.time_ns():020d}-{self.__sequence:06d}.json"
+            tmp_path = os.path.join(self.__directory, name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(body, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(self.__directory, name))
+
+    def receive_event(self, max_messages: int = 10) -> dict:
+        """
+        古い順にメッセージを受け取り、SQSからLambdaに渡されるイベントと同じ形で返す
+        受け取ったメッセージは delete を呼ぶまでキューに残る
+
+        Parameters
+        ----------
+        max_messages : int
+          1回で受け取るメッセージの最大数
+
+        Returns
+        -------
+        dict
+          Records（messageId・bodyを持つメッセージのリスト）を持つイベント。キューが空の場合はRecordsが空になる
+        """
+        if not os.path.isdir(self.__directory):
+            return {"Records": []}
+        names = sorted(name for name in os.listdir(self.__directory) if name.endswith(".json"))[:max_messages]
+        records: list[dict] = []
+        for name in names:
+            with open(os.path.join(self.__directory, name), encoding="utf-8") as f:
+                records.append({"messageId": name, "body": f.read()})
+        return {"Records": records}
+
+    def delete(self, message_ids: list[str]) -> None:
+        """
+        処理が終わったメッセージをキューから消す
+
+        Parameters
+        ----------
+        message_ids : list[str]
+          receive_event で受け取ったメッセージのmessageIdのリスト
+        """
+        for message_id in message_ids:
+            path = os.path.join(self.__directory, message_id)
+            if os.path.exists(path):
+                os.remove(path)
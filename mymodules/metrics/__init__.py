@@ -0,0 +1,19 @@
+from .recorder import MetricsRecorder as MetricsRecorder
+from .recorder import get_metrics as get_metrics
+from .recorder import start_invocation as start_invocation
+from .sinks import EmfStdoutSink as EmfStdoutSink
+from .sinks import MetricsSink as MetricsSink
+from .sinks import NullSink as NullSink
+from .sinks import SummarySink as SummarySink
+from .sinks import create_metrics_sink as create_metrics_sink
+
+__all__ = [
+    "MetricsRecorder",
+    "get_metrics",
+    "start_invocation",
+    "MetricsSink",
+    "EmfStdoutSink",
+    "SummarySink",
+    "NullSink",
+    "create_metrics_sink",
+]
@@ -0,0 +1,86 @@
+import time
+
+# メトリクス名 → CloudWatchの単位
+METRIC_UNITS: dict[str, str] = {
+    "SlackApiCalls": "Count",
+    "SlackApiPages": "Count",
+    "SlackApiBytes": "Bytes",
+    "SlackApiRetries": "Count",
+    "SlackApiRateLimited": "Count",
+    "SlackApiWaitSeconds": "Seconds",
+    "SlackApiLatency": "Milliseconds",
+    "SlackCacheHits": "Count",
+    "SlackCacheIncrementalFetches": "Count",
+    "AwsCalls": "Count",
+    "AwsRetries": "Count",
+    "AwsBytes": "Bytes",
+    "AwsLatency": "Milliseconds",
+    "PhaseSeconds": "Seconds",
+    "InvocationSeconds": "Seconds",
+}
+
+
+def to_emf_documents(snapshot: dict, namespace: str, dimensions: dict[str, str] | None = None) -> list[dict]:
+    """
+    集計したメトリクスをCloudWatch Embedded Metric Format（EMF）のJSONに変換します。
+    エンドポイントごと・フェーズごとに1つのドキュメントにし、それぞれをディメンションで区別します。
+
+    Parameters
+    ----------
+    snapshot : dict
+      MetricsRecorder.snapshot の戻り値
+    namespace : str
+      CloudWatchのメトリクスの名前空間
+    dimensions : dict[str, str] or None
+      全てのドキュメントに付けるディメンション（例: 関数名）
+
+    Returns
+    -------
+    list[dict]
+      EMFのドキュメントのリスト
+    """
+    dimensions = dimensions or {}
+    timestamp = int(time.time() * 1000)
+    # エンドポイントごとに、そのエンドポイントのメトリクスをまとめる
+    by_endpoint: dict[str, dict[str, object]] = {}
+    for metric, values in snapshot["counters"].items():
+        for endpoint, value in values.items():
+            by_endpoint.setdefault(endpoint, {})[metric] = round(value, 3)
+    for metric, distributions in snapshot["distributions"].items():
+        for endpoint, distribution in distributions.items():
+            by_endpoint.setdefault(endpoint, {})[metric] = {
+                "Values": list(distribution.histogram.keys()),
+                "Counts": list(distribution.histogram.values()),
+                "Min": round(distribution.min, 3),
+                "Max": round(distribution.max, 3),
+                "Count": distribution.count,
+                "Sum": round(distribution.sum, 3),
+            }
+
+    documents = [
+        _document(namespace, timestamp, {**dimensions, "Endpoint": endpoint}, metrics)
+        for endpoint, metrics in sorted(by_endpoint.items())
+    ]
+    documents += [
+        _document(namespace, timestamp, {**dimensions, "Phase": phase}, {"PhaseSeconds": round(seconds, 3)})
+        for phase, seconds in sorted(snapshot["phases"].items())
+    ]
+    documents.append(_document(namespace, timestamp, dimensions, {"InvocationSeconds": round(snapshot["elapsed_seconds"], 3)}))
+    return documents
+
+
+def _document(namespace: str, timestamp: int, dimensions: dict[str, str], metrics: dict[str, object]) -> dict:
+    return {
+        "_aws": {
+            "Timestamp": timestamp,
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [list(dimensions.keys())],
+                    "Metrics": [{"Name": name, "Unit": METRIC_UNITS.get(name, "None")} for name in metrics],
+                }
+            ],
+        },
+        **dimensions,
+        **metrics,
+    }
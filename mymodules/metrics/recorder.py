@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# レイテンシのヒストグラムのバケットの上限（ミリ秒）。CloudWatchのEMFは1つのメトリクスに100個までの値を持てる
+LATENCY_BUCKETS_MS: tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Distribution:
+    """
+    1つのメトリクスの値の分布（件数・合計・最小・最大とヒストグラム）
+
+    Parameters
+    ----------
+    buckets : tuple[float, ...]
+      ヒストグラムのバケットの上限。上限を超えた値は最後のバケットの上限を超える値としてそのまま数える
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.__buckets = buckets
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.histogram: dict[float, int] = {}
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bucket = next((bucket for bucket in self.__buckets if value <= bucket), self.__buckets[-1] * 2)
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+
+class MetricsRecorder:
+    """
+    1回の実行の中で、APIの呼び出し回数・レイテンシ・待機時間や処理のフェーズごとの時間を集計するクラス
+    複数のスレッドから同時に呼ばれても安全に動作する
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__counters: dict[tuple[str, str], float] = {}
+        self.__distributions: dict[tuple[str, str], Distribution] = {}
+        self.__phases: dict[str, float] = {}
+        self.__started_at = time.perf_counter()
+
+    def increment(self, metric: str, endpoint: str, value: float = 1) -> None:
+        """
+        エンドポイントごとのカウンターを増やします。
+
+        Parameters
+        ----------
+        metric : str
+          メトリクス名（例: SlackApiCalls）
+        endpoint : str
+          エンドポイント名（例: conversations.history, s3.PutObject）
+        value : float
+          増やす値
+        """
+        with self.__lock:
+            key = (metric, endpoint)
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def observe(self, metric: str, endpoint: str, value: float) -> None:
+        """
+        エンドポイントごとの値の分布に値を追加します。
+
+        Parameters
+        ----------
+        metric : str
+          メトリクス名（例: SlackApiLatency）
+        endpoint : str
+          エンドポイント名
+        value : float
+          追加する値
+        """
+        with self.__lock:
+            key = (metric, endpoint)
+            if key not in self.__distributions:
+                self.__distributions[key] = Distribution()
+            self.__distributions[key].add(value)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        処理のフェーズの時間を計測します。
+        フェーズの中で別のフェーズを計測した場合、その時間は外側のフェーズから除きます（例: render中のuploadはuploadに数える）。
+        複数のスレッドで同時に計測した場合は、各スレッドの時間の合計になります。
+
+        Parameters
+        ----------
+        name : str
+          フェーズ名（例: fetch, threads, users, render, upload, post）
+        """
+        if not hasattr(self.__local, "stack"):
+            self.__local.stack = []
+        # 内側のフェーズの時間を外側のフェーズから除くため、スレッドごとに入れ子のフェーズを積む
+        stack: list[float] = self.__local.stack
+        stack.append(0.0)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            nested = stack.pop()
+            if len(stack) > 0:
+                stack[-1] += elapsed
+            with self.__lock:
+                self.__phases[name] = self.__phases.get(name, 0) + elapsed - nested
+
+    def snapshot(self) -> dict:
+        """
+        これまでに集計した値を取得します。
+
+        Returns
+        -------
+        dict
+          counters（メトリクス名 → エンドポイント → 値）、distributions（メトリクス名 → エンドポイント → Distribution）、
+          phases（フェーズ名 → 秒）、elapsed_seconds（集計を始めてからの秒数）
+        """
+        with self.__lock:
+            counters: dict[str, dict[str, float]] = {}
+            for (metric, endpoint), value in self.__counters.items():
+                counters.setdefault(metric, {})[endpoint] = value
+            distributions: dict[str, dict[str, Distribution]] = {}
+            for (metric, endpoint), distribution in self.__distributions.items():
+                distributions.setdefault(metric, {})[endpoint] = distribution
+            return {
+                "counters": counters,
+                "distributions": distributions,
+                "phases": dict(self.__phases),
+                "elapsed_seconds": time.perf_counter() - self.__started_at,
+            }
+
+
+_current = MetricsRecorder()
+
+
+def get_metrics() -> MetricsRecorder:
+    """
+    現在の実行のメトリクスを取得します。
+
+    Returns
+    -------
+    MetricsRecorder
+      現在の実行のメトリクス
+    """
+    return _current
+
+
+def start_invocation() -> MetricsRecorder:
+    """
+    新しい実行のメトリクスの集計を始めます。ウォームスタートで前回の実行の値が混ざらないよう、ハンドラーの最初に呼び出します。
+
+    Returns
+    -------
+    MetricsRecorder
+      新しい実行のメトリクス
+    """
+    global _current
+    _current = MetricsRecorder()
+    return _current
@@ -0,0 +1,102 @@
+import json
+from typing import Protocol
+
+from .emf import to_emf_documents
+
+
+class MetricsSink(Protocol):
+    """
+    集計したメトリクスの出力先のインターフェース
+    """
+
+    def emit(self, snapshot: dict) -> None:
+        """
+        MetricsRecorder.snapshot の戻り値を出力する
+        """
+        ...
+
+
+class EmfStdoutSink:
+    """
+    メトリクスをCloudWatch Embedded Metric Format（EMF）のJSONとして標準出力に書き出す出力先
+    Lambdaでは標準出力がCloudWatch Logsに送られ、EMFのJSONはそのままCloudWatchのメトリクスになる
+
+    Parameters
+    ----------
+    namespace : str
+      CloudWatchのメトリクスの名前空間
+    dimensions : dict[str, str] or None
+      全てのメトリクスに付けるディメンション
+    """
+
+    def __init__(self, namespace: str, dimensions: dict[str, str] | None = None):
+        self.__namespace = namespace
+        self.__dimensions = dimensions
+
+    def emit(self, snapshot: dict) -> None:
+        for document in to_emf_documents(snapshot, self.__namespace, self.__dimensions):
+            print(json.dumps(document, ensure_ascii=False))
+
+
+class SummarySink:
+    """
+    メトリクスを人が読みやすい表にして標準出力に書き出す出力先
+    ローカルで実行する場合に使う
+    """
+
+    def emit(self, snapshot: dict) -> None:
+        print(f"実行時間: {snapshot['elapsed_seconds']:.2f}秒")
+        print("フェーズごとの時間（並行して実行した分は合計）:")
+        for phase, seconds in sorted(snapshot["phases"].items(), key=lambda item: -item[1]):
+            print(f"  {phase:<12} {seconds:8.2f}秒")
+        endpoints = sorted(
+            {endpoint for values in snapshot["counters"].values() for endpoint in values}
+            | {endpoint for values in snapshot["distributions"].values() for endpoint in values}
+        )
+        print("エンドポイントごとの集計:")
+        for endpoint in endpoints:
+            counters = {
+                metric: values[endpoint] for metric, values in sorted(snapshot["counters"].items()) if endpoint in values
+            }
+            line = " ".join(f"{metric}={value:g}" for metric, value in counters.items())
+            for metric, distributions in sorted(snapshot["distributions"].items()):
+                if endpoint in distributions:
+                    distribution = distributions[endpoint]
+                    line += f" {metric}(平均/最大)={distribution.sum / distribution.count:.1f}/{distribution.max:.1f}"
+            print(f"  {endpoint:<28} {line}")
+
+
+class NullSink:
+    """
+    メトリクスを出力しない出力先
+    """
+
+    def emit(self, snapshot: dict) -> None:
+        pass
+
+
+def create_metrics_sink(name: str, namespace: str, dimensions: dict[str, str] | None = None) -> MetricsSink:
+    """
+    METRICS_SINKの設定に応じたメトリクスの出力先を作成します。
+
+    Parameters
+    ----------
+    name : str
+      "emf" / "summary" / "none" のいずれか
+    namespace : str
+      CloudWatchのメトリクスの名前空間
+    dimensions : dict[str, str] or None
+      全てのメトリクスに付けるディメンション
+
+    Returns
+    -------
+    MetricsSink
+      メトリクスの出力先
+    """
+    if name == "emf":
+        return EmfStdoutSink(namespace, dimensions)
+    if name == "summary":
+        return SummarySink()
+    if name == "none":
+        return NullSink()
+    raise ValueError(f"METRICS_SINKの値が不正です: {name}")
@@ -0,0 +1,21 @@
+from .archive import JsonlGzArchiveSink as JsonlGzArchiveSink
+from .archive import ParquetArchiveSink as ParquetArchiveSink
+from .report import ReportRenderer as ReportRenderer
+from .report import create_report_template as create_report_template
+from .sinks import DeltaReportSink as DeltaReportSink
+from .sinks import OutputSink as OutputSink
+from .sinks import TextReportSink as TextReportSink
+from .sinks import create_run_id as create_run_id
+from .sinks import thread_state as thread_state
+
+__all__ = [
+    "OutputSink",
+    "TextReportSink",
+    "DeltaReportSink",
+    "JsonlGzArchiveSink",
+    "ParquetArchiveSink",
+    "ReportRenderer",
+    "create_report_template",
+    "create_run_id",
+    "thread_state",
+]
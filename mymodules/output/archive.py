@@ -0,0 +1,298 @@
+import gzip
+import json
+
+from mymodules.aws import S3
+from mymodules.aws.S3 import S3ObjectWriter
+
+from .records import iter_records, partition_date
+
+
+def archive_key(prefix: str, channel_name: str, dt: str, run_id: str, extension: str) -> str:
+    """
+    Hive形式（channel=/dt=）のパーティションでアーカイブのキーを作成します。
+    Athenaなどでチャンネル・日付ごとに読み込む範囲を絞り込めます。
+
+    Parameters
+    ----------
+    prefix : str
+      キーのプレフィックス
+    channel_name : str
+      チャンネル名
+    dt : str
+      日付（YYYY-MM-DD）
+    run_id : str
+      実行ID
+    extension : str
+      拡張子（例: jsonl.gz）
+
+    Returns
+    -------
+    str
+      アーカイブのキー
+    """
+    return f"{prefix.rstrip('/')}/channel={channel_name}/dt={dt}/part-{run_id}.{extension}"
+
+
+class _GzipPartition:
+    """
+    1つのパーティションに対応する、gzip圧縮しながらS3へ書き込むストリーム
+    """
+
+    def __init__(self, writer: S3ObjectWriter):
+        self.writer = writer
+        self.gzip_file = gzip.GzipFile(fileobj=writer, mode="wb")
+
+
+class JsonlGzArchiveSink:
+    """
+    収集したメッセージと返信を、gzip圧縮したJSON Lines形式でS3に保存する出力先
+    パーティション（チャンネル・日付）ごとに1つのオブジェクトに書き込む
+
+    収集は新しいメッセージから順に進むため、書き込み中のパーティションが max_open_partitions を超えたら
+    最後に書き込んでから最も時間の経ったパーティションを確定する。
+    確定した後にそのパーティションのレコードが来た場合（古いメッセージへの新しい返信など）は、別のオブジェクトに書き込む
+
+    Parameters
+    ----------
+    s3 : S3
+      保存先のS3
+    bucket_name : str
+      保存先バケット名
+    prefix : str
+      キーのプレフィックス
+    run_id : str
+      実行ID。同じパーティションに書き込む他の実行のオブジェクトと区別する
+    max_open_partitions : int
+      同時に書き込むパーティションの数の上限
+    """
+
+    def __init__(self, s3: S3, bucket_name: str, prefix: str, run_id: str, max_open_partitions: int = 4):
+        if max_open_partitions < 1:
+            raise ValueError(f"max_open_partitionsの値が不正です: {max_open_partitions}")
+        self.__s3 = s3
+        self.__bucket_name = bucket_name
+        self.__prefix = prefix
+        self.__run_id = run_id
+        self.__max_open_partitions = max_open_partitions
+        # 最後に書き込んだ順に並べる
+        self.__partitions: dict[tuple[str, str], _GzipPartition] = {}
+        self.__opened_counts: dict[tuple[str, str], int] = {}
+        self.__keys: list[str] = []
+
+    def write_batch(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> None:
+        """
+        メッセージと返信をレコードにして、対応するパーティションに書き込みます。
+        """
+        for record in iter_records(channel, messages, threads, users):
+            partition = self.__get_partition(channel["name"], partition_date(record["ts"]))
+            partition.gzip_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def close(self) -> list[str]:
+        """
+        全てのパーティションの書き込みを確定します。
+
+        Returns
+        -------
+        list[str]
+          書き込んだオブジェクトのキーのリスト
+        """
+        for partition_key in list(self.__partitions):
+            self.__close_partition(partition_key)
+        keys, self.__keys = self.__keys, []
+        self.__opened_counts.clear()
+        return keys
+
+    def abort(self) -> None:
+        """
+        全てのパーティションの書き込みを中止し、確定済みのオブジェクトを削除します。
+        """
+        for partition in self.__partitions.values():
+            partition.writer.abort()
+        self.__partitions.clear()
+        if len(self.__keys) > 0:
+            self.__s3.delete_objects(self.__bucket_name, self.__keys)
+        self.__keys = []
+        self.__opened_counts.clear()
+
+    def __get_partition(self, channel_name: str, dt: str) -> _GzipPartition:
+        partition_key = (channel_name, dt)
+        partition = self.__partitions.pop(partition_key, None)
+        if partition is None:
+            if len(self.__partitions) >= self.__max_open_partitions:
+                self.__close_partition(next(iter(self.__partitions)))
+            opened_count = self.__opened_counts.get(partition_key, 0)
+            self.__opened_counts[partition_key] = opened_count + 1
+            run_id = self.__run_id if opened_count == 0 else f"{self.__run_id}-{opened_count}"
+            key = archive_key(self.__prefix, channel_name, dt, run_id, "jsonl.gz")
+            writer = self.__s3.open_writer(self.__bucket_name, key, content_type="application/x-ndjson")
+            partition = _GzipPartition(writer)
+        self.__partitions[partition_key] = partition
+        return partition
+
+    def __close_partition(self, partition_key: tuple[str, str]) -> None:
+        partition = self.__partitions.pop(partition_key)
+        partition.gzip_file.close()
+        partition.writer.close()
+        self.__keys.append(partition.writer.key)
+
+
+class _ParquetPartition:
+    """
+    1つのパーティションに対応する、行グループごとにParquetファイルをS3へ書き込むストリーム
+    """
+
+    def __init__(self, writer: S3ObjectWriter):
+        import pyarrow.parquet
+
+        self.writer = writer
+        self.parquet_writer = pyarrow.parquet.ParquetWriter(writer, _parquet_schema(), compression="zstd")
+        self.records: list[dict] = []
+
+    def flush(self) -> None:
+        """
+        保持しているレコードを1つの行グループとして書き込む
+        """
+        import pyarrow
+
+        if len(self.records) > 0:
+            self.parquet_writer.write_table(pyarrow.Table.from_pylist(self.records, schema=_parquet_schema()))
+            self.records = []
+
+
+class ParquetArchiveSink:
+    """
+    収集したメッセージと返信を、列指向のParquet形式でS3に保存する出力先
+    パーティション（チャンネル・日付）ごとに1つのオブジェクトに書き込む
+
+    Parquetは列ごとにまとめて書き込むため、row_group_size 件たまるまではレコードをメモリに保持し、1つの行グループとして書き込む。
+    収集は新しいメッセージから順に進むため、書き込み中のパーティションが max_open_partitions を超えたら
+    最後に書き込んでから最も時間の経ったパーティションを確定する。
+    確定した後にそのパーティションのレコードが来た場合（古いメッセージへの新しい返信など）は、別のオブジェクトに書き込む
+    pyarrowがインストールされている場合のみ利用できる
+
+    Parameters
+    ----------
+    s3 : S3
+      保存先のS3
+    bucket_name : str
+      保存先バケット名
+    prefix : str
+      キーのプレフィックス
+    run_id : str
+      実行ID。同じパーティションに書き込む他の実行のオブジェクトと区別する
+    max_open_partitions : int
+      同時に書き込むパーティションの数の上限
+    row_group_size : int
+      1つの行グループに含めるレコードの数
+    """
+
+    def __init__(
+        self,
+        s3: S3,
+        bucket_name: str,
+        prefix: str,
+        run_id: str,
+        max_open_partitions: int = 4,
+        row_group_size: int = 10_000,
+    ):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet形式で保存するにはpyarrowをインストールしてください") from e
+        if max_open_partitions < 1:
+            raise ValueError(f"max_open_partitionsの値が不正です: {max_open_partitions}")
+        if row_group_size < 1:
+            raise ValueError(f"row_group_sizeの値が不正です: {row_group_size}")
+        self.__s3 = s3
+        self.__bucket_name = bucket_name
+        self.__prefix = prefix
+        self.__run_id = run_id
+        self.__max_open_partitions = max_open_partitions
+        self.__row_group_size = row_group_size
+        # 最後に書き込んだ順に並べる
+        self.__partitions: dict[tuple[str, str], _ParquetPartition] = {}
+        self.__opened_counts: dict[tuple[str, str], int] = {}
+        self.__keys: list[str] = []
+
+    def write_batch(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> None:
+        """
+        メッセージと返信をレコードにして、対応するパーティションに追加します。
+        """
+        for record in iter_records(channel, messages, threads, users):
+            partition = self.__get_partition(channel["name"], partition_date(record["ts"]))
+            partition.records.append(record)
+            if len(partition.records) >= self.__row_group_size:
+                partition.flush()
+
+    def close(self) -> list[str]:
+        """
+        全てのパーティションの書き込みを確定します。
+
+        Returns
+        -------
+        list[str]
+          書き込んだオブジェクトのキーのリスト
+        """
+        for partition_key in list(self.__partitions):
+            self.__close_partition(partition_key)
+        keys, self.__keys = self.__keys, []
+        self.__opened_counts.clear()
+        return keys
+
+    def abort(self) -> None:
+        """
+        全てのパーティションの書き込みを中止し、確定済みのオブジェクトを削除します。
+        """
+        for partition in self.__partitions.values():
+            partition.writer.abort()
+        self.__partitions.clear()
+        if len(self.__keys) > 0:
+            self.__s3.delete_objects(self.__bucket_name, self.__keys)
+        self.__keys = []
+        self.__opened_counts.clear()
+
+    def __get_partition(self, channel_name: str, dt: str) -> _ParquetPartition:
+        partition_key = (channel_name, dt)
+        partition = self.__partitions.pop(partition_key, None)
+        if partition is None:
+            if len(self.__partitions) >= self.__max_open_partitions:
+                self.__close_partition(next(iter(self.__partitions)))
+            opened_count = self.__opened_counts.get(partition_key, 0)
+            self.__opened_counts[partition_key] = opened_count + 1
+            run_id = self.__run_id if opened_count == 0 else f"{self.__run_id}-{opened_count}"
+            key = archive_key(self.__prefix, channel_name, dt, run_id, "parquet")
+            writer = self.__s3.open_writer(self.__bucket_name, key, content_type="application/vnd.apache.parquet")
+            partition = _ParquetPartition(writer)
+        self.__partitions[partition_key] = partition
+        return partition
+
+    def __close_partition(self, partition_key: tuple[str, str]) -> None:
+        partition = self.__partitions.pop(partition_key)
+        partition.flush()
+        partition.parquet_writer.close()
+        partition.writer.close()
+        self.__keys.append(partition.writer.key)
+
+
+def _parquet_schema():
+    """
+    Parquetのスキーマ。パーティションごとに型が変わらないように明示する
+    """
+    import pyarrow
+
+    return pyarrow.schema(
+        [
+            ("channel_id", pyarrow.string()),
+            ("channel_name", pyarrow.string()),
+            ("ts", pyarrow.string()),
+            ("datetime", pyarrow.string()),
+            ("user", pyarrow.string()),
+            ("user_name", pyarrow.string()),
+            ("text", pyarrow.string()),
+            ("thread_ts", pyarrow.string()),
+            ("parent_ts", pyarrow.string()),
+            ("is_reply", pyarrow.bool_()),
+            ("reply_count", pyarrow.int64()),
+            ("matched_words", pyarrow.list_(pyarrow.string())),
+        ]
+    )
@@ -0,0 +1,67 @@
+import datetime
+from typing import Iterator
+
+# 日付のパーティションや表示に使うタイムゾーン（日本時間）
+JST = datetime.timezone(datetime.timedelta(hours=9), "JST")
+
+
+def iter_records(channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> Iterator[dict]:
+    """
+    親メッセージとスレッドの返信を、アーカイブ用のフラットなレコードに変換します。
+
+    Parameters
+    ----------
+    channel : dict
+      チャンネル情報
+    messages : list[dict]
+      親メッセージのリスト
+    threads : list[list[dict]]
+      親メッセージごとの返信のリスト
+    users : dict[str, dict]
+      ユーザーID → ユーザー情報 の辞書
+
+    Yields
+    ------
+    dict
+      1メッセージ分のレコード。返信の場合は parent_ts に親メッセージのtsが入る。
+    """
+    for message, replies in zip(messages, threads):
+        yield _to_record(channel, message, users, parent_ts=None)
+        for reply in replies:
+            yield _to_record(channel, reply, users, parent_ts=message["ts"])
+
+
+def partition_date(ts: str) -> str:
+    """
+    tsから日本時間の日付（YYYY-MM-DD）を求めます。
+
+    Parameters
+    ----------
+    ts : str
+      メッセージのts
+
+    Returns
+    -------
+    str
+      日付
+    """
+    return datetime.datetime.fromtimestamp(float(ts), JST).strftime("%Y-%m-%d")
+
+
+def _to_record(channel: dict, message: dict, users: dict[str, dict], parent_ts: str | None) -> dict:
+    user_id = message.get("user")
+    user = users.get(user_id) if user_id is not None else None
+    return {
+        "channel_id": channel["id"],
+        "channel_name": channel["name"],
+        "ts": message["ts"],
+        "datetime": datetime.datetime.fromtimestamp(float(message["ts"]), JST).isoformat(),
+        "user": user_id,
+        "user_name": user.get("real_name") if user is not None else None,
+        "text": message.get("text", ""),
+        "thread_ts": message.get("thread_ts"),
+        "parent_ts": parent_ts,
+        "is_reply": parent_ts is not None,
+        "reply_count": message.get("reply_count"),
+        "matched_words": message.get("matched_words", []),
+    }
@@ -0,0 +1,25 @@
+from .batch import ReportBatch as ReportBatch
+from .renderer import ReportRenderer as ReportRenderer
+from .templates import HtmlReportTemplate as HtmlReportTemplate
+from .templates import MarkdownReportTemplate as MarkdownReportTemplate
+from .templates import ReportTemplate as ReportTemplate
+from .templates import TextReportTemplate as TextReportTemplate
+from .templates import create_report_template as create_report_template
+from .timestamps import TimestampFormatter as TimestampFormatter
+from .writer import BufferedTextWriter as BufferedTextWriter
+from .writer import HashingTextWriter as HashingTextWriter
+from .writer import TextWriter as TextWriter
+
+__all__ = [
+    "ReportBatch",
+    "ReportRenderer",
+    "ReportTemplate",
+    "TextReportTemplate",
+    "MarkdownReportTemplate",
+    "HtmlReportTemplate",
+    "create_report_template",
+    "TimestampFormatter",
+    "BufferedTextWriter",
+    "HashingTextWriter",
+    "TextWriter",
+]
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+
+from .timestamps import TimestampFormatter
+
+
+@dataclass
+class ReportBatch:
+    """
+    レポートに書き込む1ページ分のメッセージ
+    日時とユーザー名は書き込む前にまとめて解決しておき、テンプレートは辞書を引くだけにする
+
+    Attributes
+    ----------
+    channel : dict
+      チャンネル情報
+    messages : list[dict]
+      親メッセージのリスト
+    threads : list[list[dict]]
+      親メッセージごとの返信のリスト
+    times : dict[str, str]
+      ts → 日時の文字列
+    user_names : dict[str, str]
+      ユーザーID → 表示名
+    """
+
+    channel: dict
+    messages: list[dict]
+    threads: list[list[dict]]
+    times: dict[str, str]
+    user_names: dict[str, str]
+
+    @classmethod
+    def resolve(
+        cls,
+        channel: dict,
+        messages: list[dict],
+        threads: list[list[dict]],
+        users: dict[str, dict],
+        formatter: TimestampFormatter,
+    ) -> "ReportBatch":
+        """
+        取得したメッセージ・返信・ユーザー情報から、日時とユーザー名を解決したバッチを作成します。
+
+        Parameters
+        ----------
+        channel : dict
+          チャンネル情報
+        messages : list[dict]
+          親メッセージのリスト
+        threads : list[list[dict]]
+          親メッセージごとの返信のリスト
+        users : dict[str, dict]
+          ユーザーID → ユーザー情報 の辞書
+        formatter : TimestampFormatter
+          tsを日時の文字列に変換するフォーマッター
+
+        Returns
+        -------
+        ReportBatch
+          解決済みのバッチ
+        """
+        all_messages = [*messages, *(reply for replies in threads for reply in replies)]
+        times = formatter.format_many(message["ts"] for message in all_messages)
+        user_names: dict[str, str] = {}
+        for message in all_messages:
+            user_id = message.get("user")
+            if user_id is not None and user_id not in user_names:
+                user = users.get(user_id)
+                # ユーザー情報が取れなかった場合（削除済みのユーザーなど）はIDをそのまま表示する
+                user_names[user_id] = (user.get("real_name") if user is not None else None) or user_id
+        return cls(channel, messages, threads, times, user_names)
+
+    def user_name(self, message: dict) -> str:
+        """
+        メッセージの投稿者の表示名。ボットの投稿などユーザーが無い場合はusernameかbot_idを返す
+        """
+        user_id = message.get("user")
+        if user_id is not None:
+            return self.user_names[user_id]
+        return message.get("username") or message.get("bot_id") or ""
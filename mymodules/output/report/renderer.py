@@ -0,0 +1,86 @@
+from .batch import ReportBatch
+from .templates import ReportTemplate, TextReportTemplate
+from .timestamps import TimestampFormatter
+
+
+class ReportRenderer:
+    """
+    取得したメッセージをレポートの文字列にするクラス
+    書き込み先を持たないため、S3を使わずに書式の変換だけを計測できる
+
+    Parameters
+    ----------
+    template : ReportTemplate or None
+      レポートの書式。指定しない場合はテキスト
+    formatter : TimestampFormatter or None
+      tsを日時の文字列に変換するフォーマッター。指定しない場合は日本時間
+    """
+
+    def __init__(self, template: ReportTemplate | None = None, formatter: TimestampFormatter | None = None):
+        self.__template = template or TextReportTemplate()
+        self.__formatter = formatter or TimestampFormatter()
+
+    @property
+    def template(self) -> ReportTemplate:
+        """
+        レポートの書式
+        """
+        return self.__template
+
+    def header(self, channel: dict) -> str:
+        """
+        ファイルの先頭に書く文字列を返します。
+
+        Parameters
+        ----------
+        channel : dict
+          チャンネル情報
+
+        Returns
+        -------
+        str
+          ファイルの先頭に書く文字列
+        """
+        return self.__template.header(channel)
+
+    def note(self, text: str) -> str:
+        """
+        見出しの後に書く注記の文字列を返します。
+
+        Parameters
+        ----------
+        text : str
+          注記の内容
+
+        Returns
+        -------
+        str
+          レポートの書式にした注記
+        """
+        return self.__template.note(text)
+
+    def render(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> str:
+        """
+        1ページ分のメッセージとスレッドの返信を、レポートの文字列にします。
+        断片をリストに集めて最後に1回だけ連結するため、メッセージの数に比例した時間で終わります。
+
+        Parameters
+        ----------
+        channel : dict
+          チャンネル情報
+        messages : list[dict]
+          親メッセージのリスト
+        threads : list[list[dict]]
+          親メッセージごとの返信のリスト
+        users : dict[str, dict]
+          ユーザーID → ユーザー情報 の辞書
+
+        Returns
+        -------
+        str
+          レポートの文字列
+        """
+        batch = ReportBatch.resolve(channel, messages, threads, users, self.__formatter)
+        fragments: list[str] = []
+        self.__template.render(batch, fragments)
+        return "".join(fragments)
@@ -0,0 +1,139 @@
+import html
+from typing import Protocol
+
+from .batch import ReportBatch
+
+
+class ReportTemplate(Protocol):
+    """
+    レポートの書式のインターフェース
+    header はファイルの先頭に1回だけ、render はバッチごとに呼ぶ。ファイルの末尾に書く内容は持たない
+    （中断・分散した収集では複数のファイルを連結するため、末尾の内容があると途中に入ってしまう）
+    """
+
+    extension: str
+    content_type: str
+
+    def header(self, channel: dict) -> str:
+        ...
+
+    def note(self, text: str) -> str:
+        """
+        見出しの後に書く注記（差分のみのレポートで、前回の全体のファイルを示すなど）
+        """
+        ...
+
+    def render(self, batch: ReportBatch, fragments: list[str]) -> None:
+        """
+        バッチの内容を文字列の断片にしてfragmentsに追加する
+        """
+        ...
+
+
+class TextReportTemplate:
+    """
+    従来のテキストのレポートの書式
+    """
+
+    extension = "txt"
+    content_type = "text/plain; charset=utf-8"
+
+    def header(self, channel: dict) -> str:
+        return ""
+
+    def note(self, text: str) -> str:
+        return f"{text}\n\n"
+
+    def render(self, batch: ReportBatch, fragments: list[str]) -> None:
+        append = fragments.append
+        times = batch.times
+        for message, replies in zip(batch.messages, batch.threads):
+            append(f"{times[message['ts']]}\n{batch.user_name(message)}\n{message.get('text', '')}\n")
+            for reply in replies:
+                append(f"     {times[reply['ts']]}\n     {batch.user_name(reply)}\n     {reply.get('text', '')}\n")
+            append("\n")
+
+
+class MarkdownReportTemplate:
+    """
+    Markdownのレポートの書式。親メッセージを見出しに、返信を引用にする
+    """
+
+    extension = "md"
+    content_type = "text/markdown; charset=utf-8"
+
+    def header(self, channel: dict) -> str:
+        return f"# #{channel['name']}\n\n"
+
+    def note(self, text: str) -> str:
+        return f"*{text}*\n\n"
+
+    def render(self, batch: ReportBatch, fragments: list[str]) -> None:
+        append = fragments.append
+        times = batch.times
+        for message, replies in zip(batch.messages, batch.threads):
+            append(f"### {times[message['ts']]} {batch.user_name(message)}\n\n{message.get('text', '')}\n\n")
+            for reply in replies:
+                text = reply.get("text", "").replace("\n", "\n> ")
+                append(f"> **{batch.user_name(reply)}** {times[reply['ts']]}\n> {text}\n\n")
+
+
+class HtmlReportTemplate:
+    """
+    ブラウザで読むためのHTMLのレポートの書式
+    """
+
+    extension = "html"
+    content_type = "text/html; charset=utf-8"
+
+    def header(self, channel: dict) -> str:
+        name = html.escape(channel["name"])
+        return (
+            '<!DOCTYPE html>\n<html lang="ja">\n<meta charset="utf-8">\n'
+            f"<title>#{name}</title>\n"
+            "<style>article{margin:1em 0;border-bottom:1px solid #ddd}.reply{margin-left:2em;color:#333}"
+            "time{color:#666;margin-right:.5em}p{white-space:pre-wrap;margin:.2em 0}</style>\n"
+            f"<h1>#{name}</h1>\n"
+        )
+
+    def note(self, text: str) -> str:
+        return f'<p class="note">{html.escape(text)}</p>\n'
+
+    def render(self, batch: ReportBatch, fragments: list[str]) -> None:
+        append = fragments.append
+        times = batch.times
+        escape = html.escape
+        for message, replies in zip(batch.messages, batch.threads):
+            append(
+                f"<article><time>{times[message['ts']]}</time><b>{escape(batch.user_name(message))}</b>"
+                f"<p>{escape(message.get('text', ''))}</p>\n"
+            )
+            for reply in replies:
+                append(
+                    f'<div class="reply"><time>{times[reply["ts"]]}</time><b>{escape(batch.user_name(reply))}</b>'
+                    f"<p>{escape(reply.get('text', ''))}</p></div>\n"
+                )
+            append("</article>\n")
+
+
+def create_report_template(name: str) -> ReportTemplate:
+    """
+    REPORT_FORMATの設定に応じたレポートの書式を作成します。
+
+    Parameters
+    ----------
+    name : str
+      "text" / "markdown" / "html" のいずれか
+
+    Returns
+    -------
+    ReportTemplate
+      レポートの書式
+    """
+    if name == "text":
+        return TextReportTemplate()
+    if name == "markdown":
+        return MarkdownReportTemplate()
+    if name == "html":
+        return HtmlReportTemplate()
+    raise ValueError(f"REPORT_FORMATの値が不正です: {name}")
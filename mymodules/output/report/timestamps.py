@@ -0,0 +1,69 @@
+import datetime
+from typing import Iterable
+
+from ..records import JST
+
+
+class TimestampFormatter:
+    """
+    Slackのtsを、固定のタイムゾーンの日時の文字列（例: 2024/01/01 12:00:00）にまとめて変換するクラス
+    日付の部分は日ごとに1回だけ作り、時刻の部分は整数の計算で求めるため、datetimeをメッセージごとに作らない
+
+    Parameters
+    ----------
+    timezone : datetime.timezone
+      表示に使うタイムゾーン。夏時間の無い固定のオフセットであること
+    date_format : str
+      日付の部分の書式（strftimeの書式）
+    """
+
+    def __init__(self, timezone: datetime.timezone = JST, date_format: str = "%Y/%m/%d"):
+        offset = timezone.utcoffset(None)
+        if offset is None:
+            raise ValueError("タイムゾーンは固定のオフセットを指定してください")
+        self.__offset_seconds = int(offset.total_seconds())
+        self.__date_format = date_format
+        self.__dates: dict[int, str] = {}
+
+    def format_many(self, ts_list: Iterable[str]) -> dict[str, str]:
+        """
+        複数のtsをまとめて変換します。
+
+        Parameters
+        ----------
+        ts_list : Iterable[str]
+          メッセージのtsのリスト（重複していてもよい）
+
+        Returns
+        -------
+        dict[str, str]
+          ts → 日時の文字列 の辞書
+        """
+        formatted: dict[str, str] = {}
+        for ts in ts_list:
+            if ts not in formatted:
+                formatted[ts] = self.format(ts)
+        return formatted
+
+    def format(self, ts: str) -> str:
+        """
+        1つのtsを変換します。
+
+        Parameters
+        ----------
+        ts : str
+          メッセージのts
+
+        Returns
+        -------
+        str
+          日時の文字列
+        """
+        day, second_of_day = divmod(int(float(ts)) + self.__offset_seconds, 86400)
+        date = self.__dates.get(day)
+        if date is None:
+            date = (datetime.date(1970, 1, 1) + datetime.timedelta(days=day)).strftime(self.__date_format)
+            self.__dates[day] = date
+        hour, rest = divmod(second_of_day, 3600)
+        minute, second = divmod(rest, 60)
+        return f"{date} {hour:02d}:{minute:02d}:{second:02d}"
@@ -0,0 +1,137 @@
+import hashlib
+from typing import Protocol
+
+
+class TextWriter(Protocol):
+    """
+    テキストの書き込み先のインターフェース
+    mymodules.aws の S3TextWriter がこれを満たす
+    """
+
+    @property
+    def key(self) -> str:
+        ...
+
+    @property
+    def sha256(self) -> str:
+        ...
+
+    def write(self, text: str) -> None:
+        ...
+
+    def close(self) -> str:
+        ...
+
+    def abort(self) -> None:
+        ...
+
+
+class BufferedTextWriter:
+    """
+    書き込んだ文字列をためておき、一定の大きさになってからまとめて書き込み先に渡すライター
+    小さな文字列ごとにエンコード・コピーをしないようにする
+
+    Parameters
+    ----------
+    writer : TextWriter
+      書き込み先
+    buffer_size : int
+      ためておく文字数の上限。これを超えたら書き込み先に渡す
+    """
+
+    def __init__(self, writer: TextWriter, buffer_size: int = 1024 * 1024):
+        self.__writer = writer
+        self.__buffer_size = buffer_size
+        self.__buffer: list[str] = []
+        self.__buffered = 0
+
+    @property
+    def key(self) -> str:
+        """
+        保存先のキー
+        """
+        return self.__writer.key
+
+    @property
+    def sha256(self) -> str:
+        """
+        これまでに書き込んだテキスト（UTF-8）のSHA-256（16進数）
+        """
+        self.flush()
+        return self.__writer.sha256
+
+    def write(self, text: str) -> None:
+        """
+        文字列を書き込みます。
+
+        Parameters
+        ----------
+        text : str
+          書き込む文字列
+        """
+        self.__buffer.append(text)
+        self.__buffered += len(text)
+        if self.__buffered >= self.__buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        ためている文字列を書き込み先に渡します。
+        """
+        if len(self.__buffer) > 0:
+            self.__writer.write("".join(self.__buffer))
+            self.__buffer.clear()
+            self.__buffered = 0
+
+    def close(self) -> str:
+        """
+        ためている文字列を書き込み、書き込み先を確定します。
+
+        Returns
+        -------
+        str
+          書き込み先の close の戻り値（公開URL）
+        """
+        self.flush()
+        return self.__writer.close()
+
+    def abort(self) -> None:
+        """
+        ためている文字列を捨て、書き込みを中止します。
+        """
+        self.__buffer.clear()
+        self.__buffered = 0
+        self.__writer.abort()
+
+
+class HashingTextWriter:
+    """
+    書き込んだテキストのSHA-256のみを求め、どこにも保存しないライター
+    差分のみを保存する場合に、保存しない全体の内容が前回と同じかどうかを判定するために使う
+    """
+
+    def __init__(self):
+        self.__sha256 = hashlib.sha256()
+
+    @property
+    def key(self) -> str:
+        """
+        保存先のキー（保存しないため常に空）
+        """
+        return ""
+
+    @property
+    def sha256(self) -> str:
+        """
+        これまでに書き込んだテキスト（UTF-8）のSHA-256（16進数）
+        """
+        return self.__sha256.hexdigest()
+
+    def write(self, text: str) -> None:
+        self.__sha256.update(text.encode("utf-8"))
+
+    def close(self) -> str:
+        return ""
+
+    def abort(self) -> None:
+        pass
@@ -0,0 +1,210 @@
+import datetime
+from typing import Protocol
+
+from mymodules.aws import S3
+
+from .report import BufferedTextWriter, ReportRenderer, TextWriter
+
+
+class OutputSink(Protocol):
+    """
+    収集したメッセージの出力先のインターフェース
+    収集したページごとに write_batch を呼び、最後に close（失敗した場合は abort）を呼ぶ
+    """
+
+    def write_batch(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> None:
+        ...
+
+    def close(self) -> list[str]:
+        """
+        出力を確定し、書き込んだオブジェクトのURLまたはキーのリストを返す
+        """
+        ...
+
+    def abort(self) -> None:
+        ...
+
+
+class TextReportSink:
+    """
+    人が読むためのレポート（テキスト / Markdown / HTML）を1つのファイルとしてS3に書き込む出力先
+
+    Parameters
+    ----------
+    s3 : S3
+      保存先のS3
+    bucket_name : str
+      保存先バケット名
+    file_title_head : str
+      保存する時のファイル名
+    renderer : ReportRenderer or None
+      レポートの書式。指定しない場合はテキスト
+    include_header : bool
+      Falseの場合はファイルの先頭の見出しを書かない（後で別のファイルの後ろに連結する場合）
+    note : str or None
+      見出しの後に書く注記
+    writer : TextWriter or None
+      書き込み先。指定しない場合はS3に新しいファイルを作成する
+    """
+
+    def __init__(
+        self,
+        s3: S3,
+        bucket_name: str,
+        file_title_head: str,
+        renderer: ReportRenderer | None = None,
+        include_header: bool = True,
+        note: str | None = None,
+        writer: TextWriter | None = None,
+    ):
+        self.__renderer = renderer or ReportRenderer()
+        template = self.__renderer.template
+        if writer is None:
+            writer = s3.open_txt_writer(
+                bucket_name, file_title_head, extension=template.extension, content_type=template.content_type
+            )
+        self.__writer = BufferedTextWriter(writer)
+        self.__write_header = include_header
+        self.__note = note
+
+    @property
+    def key(self) -> str:
+        """
+        保存先のキー
+        """
+        return self.__writer.key
+
+    @property
+    def sha256(self) -> str:
+        """
+        これまでに書き込んだレポートの内容のSHA-256（16進数）
+        """
+        return self.__writer.sha256
+
+    def write_batch(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> None:
+        """
+        メッセージとスレッドの返信をレポートの書式にして書き込みます。
+        """
+        if self.__write_header:
+            self.__writer.write(self.__renderer.header(channel))
+            if self.__note is not None:
+                self.__writer.write(self.__renderer.note(self.__note))
+            self.__write_header = False
+        self.__writer.write(self.__renderer.render(channel, messages, threads, users))
+
+    def close(self) -> list[str]:
+        """
+        レポートのファイルを確定します。
+
+        Returns
+        -------
+        list[str]
+          書き込んだファイルの公開URL
+        """
+        return [self.__writer.close()]
+
+    def abort(self) -> None:
+        """
+        書き込みを中止します。
+        """
+        self.__writer.abort()
+
+
+class DeltaReportSink:
+    """
+    前回のレポートから増えた部分（新しいスレッドと、前回より後の返信）のみを書き込む出力先
+
+    Parameters
+    ----------
+    sink : TextReportSink
+      差分を書き込む出力先
+    previous_threads : dict[str, str]
+      前回のレポートに含めた親メッセージのts → thread_state の値
+    """
+
+    def __init__(self, sink: TextReportSink, previous_threads: dict[str, str]):
+        self.__sink = sink
+        self.__previous_threads = previous_threads
+        self.__message_count = 0
+
+    @property
+    def message_count(self) -> int:
+        """
+        差分として書き込んだ親メッセージの数
+        """
+        return self.__message_count
+
+    @property
+    def key(self) -> str:
+        """
+        差分のファイルのオブジェクトキー
+        """
+        return self.__sink.key
+
+    def write_batch(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> None:
+        """
+        前回のレポートから増えたスレッドと返信のみを書き込みます。
+        """
+        delta_messages: list[dict] = []
+        delta_threads: list[list[dict]] = []
+        for message, replies in zip(messages, threads):
+            previous_state = self.__previous_threads.get(message["ts"])
+            if previous_state is None:
+                delta_messages.append(message)
+                delta_threads.append(replies)
+            elif previous_state != thread_state(message):
+                # 前回の最新の返信より後の返信のみを書き込む
+                delta_messages.append(message)
+                delta_threads.append(
+                    [reply for reply in replies if previous_state == "" or float(reply["ts"]) > float(previous_state)]
+                )
+        if len(delta_messages) > 0:
+            self.__message_count += len(delta_messages)
+            self.__sink.write_batch(channel, delta_messages, delta_threads, users)
+
+    def close(self) -> list[str]:
+        """
+        差分のファイルを確定します。
+
+        Returns
+        -------
+        list[str]
+          書き込んだファイルの公開URL
+        """
+        return self.__sink.close()
+
+    def abort(self) -> None:
+        """
+        書き込みを中止します。
+        """
+        self.__sink.abort()
+
+
+def thread_state(message: dict) -> str:
+    """
+    親メッセージのスレッドの状態を、前回のレポートと比べるための文字列にします。
+    返信が増えると latest_reply が変わるため、最新の返信のtsを使います（返信が無い場合は空文字列）。
+
+    Parameters
+    ----------
+    message : dict
+      親メッセージ
+
+    Returns
+    -------
+    str
+      スレッドの状態
+    """
+    return message.get("latest_reply", "")
+
+
+def create_run_id() -> str:
+    """
+    1回の実行で書き込むオブジェクトを区別するためのIDを作成します。
+
+    Returns
+    -------
+    str
+      実行ID（例: 20240101T120000）
+    """
+    return datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
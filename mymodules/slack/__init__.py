@@ -1,3 +1,53 @@
-from .slack_usecase import SlackUsecase as Slack
+import importlib
+from typing import TYPE_CHECKING, Any
 
-__all__ = ["Slack"]
+if TYPE_CHECKING:
+    from .matcher import KeywordMatcher as KeywordMatcher
+    from .matcher import compile_matcher as compile_matcher
+    from .message import SlackMessage as SlackMessage
+    from .rate_limiter import SlackRateLimiter as SlackRateLimiter
+    from .slack_infrastructure import SlackApiError as SlackApiError
+    from .slack_usecase import SlackUsecase as Slack
+    from .transport import RequestsTransport as RequestsTransport
+    from .transport import SlackTransport as SlackTransport
+    from .transport import get_shared_transport as get_shared_transport
+
+# 公開する名前 → (定義しているモジュール, モジュールの中の名前)
+# mymodules.slack.matcher だけを使う場合などに、収集の処理まで読み込まないよう、初めて使われた時に読み込む
+_LAZY_EXPORTS: dict[str, tuple[str, str]] = {
+    "Slack": (".slack_usecase", "SlackUsecase"),
+    "SlackApiError": (".slack_infrastructure", "SlackApiError"),
+    "SlackMessage": (".message", "SlackMessage"),
+    "KeywordMatcher": (".matcher", "KeywordMatcher"),
+    "compile_matcher": (".matcher", "compile_matcher"),
+    "SlackRateLimiter": (".rate_limiter", "SlackRateLimiter"),
+    "SlackTransport": (".transport", "SlackTransport"),
+    "RequestsTransport": (".transport", "RequestsTransport"),
+    "get_shared_transport": (".transport", "get_shared_transport"),
+}
+
+__all__ = [
+    "Slack",
+    "SlackApiError",
+    "SlackMessage",
+    "KeywordMatcher",
+    "compile_matcher",
+    "SlackRateLimiter",
+    "SlackTransport",
+    "RequestsTransport",
+    "get_shared_transport",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_EXPORTS[name]
+    value = getattr(importlib.import_module(module_name, __name__), attribute)
+    # 2回目からは __getattr__ を通らないように、モジュールの属性にしておく
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_EXPORTS])
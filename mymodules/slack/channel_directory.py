@@ -0,0 +1,148 @@
+import time
+from typing import Callable
+
+from .snapshot import SnapshotStore
+
+# ウォームスタートしたLambdaで再利用するためのモジュールスコープのキャッシュ
+# キーはワークスペース（トークン）ごとのキャッシュキー
+_shared_indexes: dict[str, "_ChannelIndex"] = {}
+
+
+class _ChannelIndex:
+    """
+    チャンネル名・チャンネルIDからチャンネル情報を引くための索引
+    """
+
+    def __init__(self, channels: list[dict], built_at: float):
+        self.channels = channels
+        self.built_at = built_at
+        self.by_name: dict[str, dict] = {channel["name"]: channel for channel in channels}
+        self.by_id: dict[str, dict] = {channel["id"]: channel for channel in channels}
+
+
+class ChannelDirectory:
+    """
+    チャンネル名→ID、ID→チャンネルの索引を一度だけ作成し、TTLの間使い回すクラスです。
+    索引はモジュールスコープに保持されるため、ウォームスタートしたLambdaでも再利用されます。
+
+    Parameters
+    ----------
+    fetch_channels : Callable[[], list[dict]]
+      全てのチャンネルを取得する関数（conversations.list）
+    cache_key : str
+      モジュールスコープのキャッシュおよびスナップショットを区別するキー
+    ttl_seconds : int
+      索引の有効期間（秒）
+    snapshot_store : SnapshotStore or None
+      索引を保存・復元するストア。指定しない場合はメモリ上のみで保持する。
+    """
+
+    # 見つからなかったチャンネルのために索引を作り直す最短間隔（秒）
+    MISS_REFRESH_INTERVAL_SECONDS = 60
+
+    def __init__(
+        self,
+        fetch_channels: Callable[[], list[dict]],
+        cache_key: str = "default",
+        ttl_seconds: int = 3600,
+        snapshot_store: SnapshotStore | None = None,
+    ):
+        self.__fetch_channels = fetch_channels
+        self.__cache_key = cache_key
+        self.__ttl_seconds = ttl_seconds
+        self.__snapshot_store = snapshot_store
+
+    def get_by_name(self, channel_name: str) -> dict | None:
+        """
+        チャンネル名からチャンネル情報を取得します。
+
+        Parameters
+        ----------
+        channel_name : str
+          チャンネル名
+
+        Returns
+        -------
+        dict or None
+          チャンネル情報。見つからなかった場合はNone。
+        """
+        index = self.__get_index()
+        channel = index.by_name.get(channel_name)
+        if channel is None and self.__can_refresh_on_miss(index):
+            # 索引作成後に作られたチャンネルの可能性があるため作り直す
+            channel = self.refresh().by_name.get(channel_name)
+        return channel
+
+    def get_by_id(self, channel_id: str) -> dict | None:
+        """
+        チャンネルIDからチャンネル情報を取得します。
+
+        Parameters
+        ----------
+        channel_id : str
+          チャンネルID
+
+        Returns
+        -------
+        dict or None
+          チャンネル情報。見つからなかった場合はNone。
+        """
+        index = self.__get_index()
+        channel = index.by_id.get(channel_id)
+        if channel is None and self.__can_refresh_on_miss(index):
+            channel = self.refresh().by_id.get(channel_id)
+        return channel
+
+    def get_all(self) -> list[dict]:
+        """
+        索引にある全てのチャンネルの情報を取得します。
+
+        Returns
+        -------
+        list[dict]
+          全てのチャンネルの情報を含むリスト。
+        """
+        return self.__get_index().channels
+
+    def refresh(self) -> _ChannelIndex:
+        """
+        Slack APIから全てのチャンネルを取得し直して索引を作り直します。
+
+        Returns
+        -------
+        _ChannelIndex
+          作り直した索引
+        """
+        index = _ChannelIndex(self.__fetch_channels(), time.time())
+        _shared_indexes[self.__cache_key] = index
+        if self.__snapshot_store is not None:
+            self.__snapshot_store.save(self.__snapshot_name(), {"built_at": index.built_at, "channels": index.channels})
+        return index
+
+    def __get_index(self) -> _ChannelIndex:
+        # メモリ上の索引 → スナップショット → Slack API の順に探す
+        index = _shared_indexes.get(self.__cache_key)
+        if index is not None and self.__is_fresh(index):
+            return index
+        index = self.__load_snapshot()
+        if index is not None and self.__is_fresh(index):
+            _shared_indexes[self.__cache_key] = index
+            return index
+        return self.refresh()
+
+    def __load_snapshot(self) -> _ChannelIndex | None:
+        if self.__snapshot_store is None:
+            return None
+        snapshot = self.__snapshot_store.load(self.__snapshot_name())
+        if snapshot is None:
+            return None
+        return _ChannelIndex(snapshot["channels"], snapshot["built_at"])
+
+    def __is_fresh(self, index: _ChannelIndex) -> bool:
+        return time.time() - index.built_at < self.__ttl_seconds
+
+    def __can_refresh_on_miss(self, index: _ChannelIndex) -> bool:
+        return time.time() - index.built_at >= self.MISS_REFRESH_INTERVAL_SECONDS
+
+    def __snapshot_name(self) -> str:
+        return f"channels-{self.__cache_key}"
@@ -0,0 +1,220 @@
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+# カタカナ（ァ〜ヶ）をひらがなに変換する表
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+
+def normalize_text(text: str, nfkc: bool = True, ignore_case: bool = True, fold_kana: bool = True) -> str:
+    """
+    検索用にテキストを正規化します。
+
+    Parameters
+    ----------
+    text : str
+      正規化するテキスト
+    nfkc : bool
+      NFKC正規化を行うか（全角英数・半角カナなどを統一する）
+    ignore_case : bool
+      大文字・小文字を区別しないか
+    fold_kana : bool
+      カタカナをひらがなに統一するか
+
+    Returns
+    -------
+    str
+      正規化したテキスト
+    """
+    if nfkc:
+        text = unicodedata.normalize("NFKC", text)
+    if ignore_case:
+        text = text.casefold()
+    if fold_kana:
+        text = text.translate(_KATAKANA_TO_HIRAGANA)
+    return text
+
+
+class _AhoCorasick:
+    """
+    複数のパターンを1回の走査で探すためのAho-Corasickオートマトン
+    """
+
+    def __init__(self, patterns: list[str]):
+        # 状態ごとの遷移・失敗時の遷移先・その状態で見つかるパターンの番号
+        self.__goto: list[dict[str, int]] = [{}]
+        self.__fail: list[int] = [0]
+        self.__output: list[list[int]] = [[]]
+        for index, pattern in enumerate(patterns):
+            self.__add(pattern, index)
+        self.__build()
+
+    def iter_matches(self, text: str):
+        """
+        テキスト中で見つかったパターンを (パターンの番号, 終了位置) の形で返す
+        """
+        goto = self.__goto
+        fail = self.__fail
+        output = self.__output
+        state = 0
+        for position, char in enumerate(text):
+            while state != 0 and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield index, position + 1
+
+    def __add(self, pattern: str, index: int) -> None:
+        state = 0
+        for char in pattern:
+            if char not in self.__goto[state]:
+                self.__goto.append({})
+                self.__fail.append(0)
+                self.__output.append([])
+                self.__goto[state][char] = len(self.__goto) - 1
+            state = self.__goto[state][char]
+        self.__output[state].append(index)
+
+    def __build(self) -> None:
+        # 幅優先で失敗時の遷移先を決める
+        queue: deque[int] = deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.__goto[state].items():
+                queue.append(next_state)
+                fallback = self.__fail[state]
+                while fallback != 0 and char not in self.__goto[fallback]:
+                    fallback = self.__fail[fallback]
+                self.__fail[next_state] = self.__goto[fallback].get(char, 0)
+                self.__output[next_state] = self.__output[next_state] + self.__output[self.__fail[next_state]]
+
+
+class KeywordMatcher:
+    """
+    複数の検索ワードを一度にコンパイルし、メッセージに含まれる検索ワードを探すクラスです。
+    検索ワードが多い場合はAho-Corasickのオートマトンで、本文を1回走査するだけで全ての検索ワードを探します。
+
+    Parameters
+    ----------
+    words : list[str]
+      検索ワードのリスト
+    mode : str
+      "substring"（部分一致）/ "word"（前後が半角英数字でない場合のみ一致）/ "regex"（検索ワードを正規表現として扱う）
+    normalize : bool
+      NFKC正規化・大文字小文字・カタカナとひらがなの違いを無視して比較するか。
+      "regex" の場合は正規表現をNFKC正規化・小文字化すると \\D や [A-Z] の意味が変わるため、
+      本文のみを正規化し、大文字小文字は re.IGNORECASE で無視する（正規表現はカタカナをひらがなに揃えるのみ）
+    """
+
+    # 検索ワードがこの数以下の場合は、オートマトンを使わずに文字列の in で探す方が速い
+    AUTOMATON_MIN_WORDS = 8
+
+    def __init__(self, words: list[str], mode: str = "substring", normalize: bool = False):
+        if mode not in ("substring", "word", "regex"):
+            raise ValueError(f"検索モードが不正です: {mode}")
+        self.__words = [word for word in dict.fromkeys(words) if word != ""]
+        self.__mode = mode
+        self.__normalize = normalize
+        self.__automaton: _AhoCorasick | None = None
+        self.__regexes: list[re.Pattern] = []
+        if mode == "regex":
+            self.__patterns = [word.translate(_KATAKANA_TO_HIRAGANA) if normalize else word for word in self.__words]
+            flags = re.IGNORECASE if normalize else 0
+            self.__regexes = [re.compile(pattern, flags) for pattern in self.__patterns]
+        else:
+            self.__patterns = [self.__prepare(word) for word in self.__words]
+            if mode == "word" or len(self.__patterns) > self.AUTOMATON_MIN_WORDS:
+                self.__automaton = _AhoCorasick(self.__patterns)
+
+    @property
+    def words(self) -> list[str]:
+        """
+        検索ワードのリスト
+        """
+        return list(self.__words)
+
+    def match(self, text: str) -> list[str]:
+        """
+        テキストに含まれる検索ワードを返します。
+
+        Parameters
+        ----------
+        text : str
+          検索対象のテキスト
+
+        Returns
+        -------
+        list[str]
+          テキストに含まれる検索ワードのリスト（検索ワードの順番）。含まれない場合は空のリスト。
+        """
+        text = self.__prepare(text)
+        if self.__mode == "regex":
+            return [word for word, regex in zip(self.__words, self.__regexes) if regex.search(text)]
+        if self.__automaton is None:
+            return [word for word, pattern in zip(self.__words, self.__patterns) if pattern in text]
+        found: set[int] = set()
+        for index, end in self.__automaton.iter_matches(text):
+            if index in found:
+                continue
+            if self.__mode == "word" and not _is_word_boundary(text, end - len(self.__patterns[index]), end):
+                continue
+            found.add(index)
+        return [self.__words[index] for index in sorted(found)]
+
+    def matches(self, text: str) -> bool:
+        """
+        テキストに検索ワードのいずれかが含まれるかを判定します。
+
+        Parameters
+        ----------
+        text : str
+          検索対象のテキスト
+
+        Returns
+        -------
+        bool
+          検索ワードのいずれかが含まれる場合はTrue
+        """
+        return len(self.match(text)) > 0
+
+    def __prepare(self, text: str) -> str:
+        if not self.__normalize:
+            return text
+        # 正規表現の場合、大文字小文字は re.IGNORECASE で無視する
+        return normalize_text(text, ignore_case=self.__mode != "regex")
+
+
+def _is_word_boundary(text: str, start: int, end: int) -> bool:
+    """
+    text[start:end] の前後が半角英数字でないかを判定する
+    """
+    before_ok = start == 0 or not _is_word_char(text[start - 1])
+    after_ok = end == len(text) or not _is_word_char(text[end])
+    return before_ok and after_ok
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and (char.isalnum() or char == "_")
+
+
+@lru_cache(maxsize=16)
+def compile_matcher(words: tuple[str, ...], mode: str = "substring", normalize: bool = False) -> KeywordMatcher:
+    """
+    KeywordMatcherを作成します。同じ設定の場合はウォームスタートしたLambdaでもコンパイル済みのものを再利用します。
+
+    Parameters
+    ----------
+    words : tuple[str, ...]
+      検索ワード
+    mode : str
+      "substring" / "word" / "regex"
+    normalize : bool
+      NFKC正規化・大文字小文字・カタカナとひらがなの違いを無視して比較するか
+
+    Returns
+    -------
+    KeywordMatcher
+      コンパイル済みのKeywordMatcher
+    """
+    return KeywordMatcher(list(words), mode=mode, normalize=normalize)
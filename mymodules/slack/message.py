@@ -0,0 +1,137 @@
+from collections.abc import Mapping
+from typing import Any, Iterator
+
+# SlackMessage が保持する、Slack APIのメッセージの項目
+MESSAGE_FIELDS = ("ts", "user", "text", "thread_ts", "reply_count", "latest_reply", "username", "bot_id", "subtype")
+# 収集の途中で付け加える項目
+_EXTRA_FIELDS = ("matched_words", "thread_unknown")
+_KEYS = frozenset(MESSAGE_FIELDS + _EXTRA_FIELDS)
+
+
+class SlackMessage(Mapping):
+    """
+    Slack APIのメッセージのうち、収集に使う項目のみを保持するコンパクトなメッセージです。
+
+    conversations.history などのメッセージには blocks・attachments・reactions など収集に使わない項目が多く含まれ、
+    大きなチャンネルではそれらがメモリの大半を占めます。ページを受け取った直後にこの形に変換し、使わない項目は捨てます。
+
+    辞書と同じように message["ts"]・message.get("text", "")・"reply_count" in message の形で読めるため、
+    これまで辞書を受け取っていた処理はそのまま使えます。値が無い（None）項目は、辞書にキーが無い場合と同じに扱います。
+    dict(message) で辞書に戻せます。
+
+    Parameters
+    ----------
+    ts : str
+      メッセージのts
+    raw : dict or None
+      元のメッセージ。keep_raw を指定して変換した場合のみ保持する
+    """
+
+    __slots__ = MESSAGE_FIELDS + _EXTRA_FIELDS + ("raw",)
+
+    def __init__(
+        self,
+        ts: str,
+        user: str | None = None,
+        text: str | None = None,
+        thread_ts: str | None = None,
+        reply_count: int | None = None,
+        latest_reply: str | None = None,
+        username: str | None = None,
+        bot_id: str | None = None,
+        subtype: str | None = None,
+        matched_words: list[str] | None = None,
+        thread_unknown: bool | None = None,
+        raw: dict | None = None,
+    ):
+        self.ts = ts
+        self.user = user
+        self.text = text
+        self.thread_ts = thread_ts
+        self.reply_count = reply_count
+        self.latest_reply = latest_reply
+        self.username = username
+        self.bot_id = bot_id
+        self.subtype = subtype
+        self.matched_words = matched_words
+        self.thread_unknown = thread_unknown
+        self.raw = raw
+
+    @classmethod
+    def from_dict(cls, data: Mapping, keep_raw: bool = False) -> "SlackMessage":
+        """
+        Slack APIのメッセージの辞書から作成します。
+
+        Parameters
+        ----------
+        data : Mapping
+          Slack APIのメッセージ
+        keep_raw : bool
+          Trueの場合は元のメッセージも保持する
+
+        Returns
+        -------
+        SlackMessage
+          使う項目のみを保持したメッセージ
+        """
+        get = data.get
+        return cls(
+            get("ts"),
+            get("user"),
+            get("text"),
+            get("thread_ts"),
+            get("reply_count"),
+            get("latest_reply"),
+            get("username"),
+            get("bot_id"),
+            get("subtype"),
+            get("matched_words"),
+            get("thread_unknown"),
+            dict(data) if keep_raw else None,
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, key) if key in _KEYS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in _KEYS:
+            raise KeyError(f"SlackMessageに無い項目です: {key}")
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in _KEYS and getattr(self, key) is not None  # type: ignore[arg-type]
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key in MESSAGE_FIELDS + _EXTRA_FIELDS if getattr(self, key) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"SlackMessage({dict(self)!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key) if key in _KEYS else None
+        return default if value is None else value
+
+
+def compact_messages(messages: list[dict], keep_raw: bool = False) -> list[SlackMessage]:
+    """
+    Slack APIのメッセージのリストを、SlackMessage のリストに変換します。
+
+    Parameters
+    ----------
+    messages : list[dict]
+      Slack APIのメッセージのリスト
+    keep_raw : bool
+      Trueの場合は元のメッセージも保持する
+
+    Returns
+    -------
+    list[SlackMessage]
+      使う項目のみを保持したメッセージのリスト
+    """
+    return [SlackMessage.from_dict(message, keep_raw) for message in messages]
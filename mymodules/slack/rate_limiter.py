@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+
+# Slack APIのメソッドごとの1分あたりの上限回数（Web APIのTierに対応）
+# https://api.slack.com/docs/rate-limits
+SLACK_METHOD_RATE_LIMITS: dict[str, int] = {
+    "conversations.list": 20,  # Tier 2
+    "users.list": 20,  # Tier 2
+    "search.messages": 20,  # Tier 2
+    "conversations.history": 50,  # Tier 3
+    "conversations.replies": 50,  # Tier 3
+    "users.info": 100,  # Tier 4
+    "chat.postMessage": 60,  # Special（1チャンネルあたり毎秒1回程度）
+}
+
+# 表に無いメソッドはTier 3として扱う
+DEFAULT_RATE_LIMIT_PER_MINUTE = 50
+
+
+class TokenBucket:
+    """
+    トークンバケットで一定の速度にリクエストを抑えるクラス
+    複数のスレッドから同時に呼ばれても安全に動作する
+
+    Parameters
+    ----------
+    rate_per_minute : float
+      1分あたりに補充されるトークンの数
+    burst : int
+      バケットに貯められるトークンの最大数
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.__rate_per_second = rate_per_minute / 60
+        self.__capacity = float(burst)
+        self.__tokens = float(burst)
+        self.__updated_at = time.monotonic()
+        self.__blocked_until = 0.0
+        self.__lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        トークンを1つ取得する。トークンが無い場合は補充されるまで待機する
+
+        Returns
+        -------
+        float
+          待機した秒数
+        """
+        waited = 0.0
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__refill(now)
+                if now >= self.__blocked_until and self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return waited
+                wait_seconds = max(self.__blocked_until - now, (1 - self.__tokens) / self.__rate_per_second)
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+
+    def block(self, seconds: float) -> None:
+        """
+        レートリミットに達した場合に、指定秒数の間トークンの払い出しを止める
+        以降、このバケットを使う全てのスレッドが解除まで待機する
+
+        Parameters
+        ----------
+        seconds : float
+          払い出しを止める秒数（Retry-After）
+        """
+        with self.__lock:
+            self.__blocked_until = max(self.__blocked_until, time.monotonic() + seconds)
+            self.__tokens = 0.0
+
+    def __refill(self, now: float) -> None:
+        elapsed = now - self.__updated_at
+        self.__tokens = min(self.__capacity, self.__tokens + elapsed * self.__rate_per_second)
+        self.__updated_at = now
+
+
+class SlackRateLimiter:
+    """
+    Slack APIのメソッドごとにトークンバケットを持ち、上限を超えないようにリクエストの間隔を調整するクラスです。
+    429になってから待機するのではなく、事前に間隔を空けることでペナルティの待機を避けます。
+
+    Parameters
+    ----------
+    rate_limits : dict[str, int] or None
+      メソッド名 → 1分あたりの上限回数。指定したメソッドのみ SLACK_METHOD_RATE_LIMITS を上書きする
+    burst : int
+      各メソッドで連続して送信できるリクエストの最大数
+    max_retries : int
+      5xx・ネットワークエラーの場合に再試行する最大回数
+    max_rate_limit_retries : int
+      429の場合に再試行する最大回数
+    backoff_base_seconds : float
+      再試行の待機時間の基準（秒）。再試行ごとに2倍になる
+    backoff_max_seconds : float
+      再試行の待機時間の上限（秒）
+    """
+
+    def __init__(
+        self,
+        rate_limits: dict[str, int] | None = None,
+        burst: int = 5,
+        max_retries: int = 5,
+        max_rate_limit_retries: int = 10,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 30.0,
+    ):
+        self.__rate_limits = {**SLACK_METHOD_RATE_LIMITS, **(rate_limits or {})}
+        self.__burst = burst
+        self.__buckets: dict[str, TokenBucket] = {}
+        self.__lock = threading.Lock()
+        self.__wait_seconds: dict[str, float] = {}
+        self.max_retries = max_retries
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.__backoff_base_seconds = backoff_base_seconds
+        self.__backoff_max_seconds = backoff_max_seconds
+
+    @property
+    def total_wait_seconds(self) -> float:
+        """
+        レートリミットと再試行のために待機した合計秒数
+        共有のレートリミッターではプロセス内の累計になる。1回の実行の値はメトリクスの SlackApiWaitSeconds を使う
+        """
+        with self.__lock:
+            return sum(self.__wait_seconds.values())
+
+    @property
+    def wait_seconds_by_method(self) -> dict[str, float]:
+        """
+        メソッドごとの待機した秒数（プロセス内の累計）
+        """
+        with self.__lock:
+            return dict(self.__wait_seconds)
+
+    def acquire(self, api_method: str) -> float:
+        """
+        指定したメソッドのリクエストを送信してよくなるまで待機する
+
+        Parameters
+        ----------
+        api_method : str
+          Slack APIのメソッド名（例: conversations.history）
+
+        Returns
+        -------
+        float
+          待機した秒数
+        """
+        waited = self.__get_bucket(api_method).acquire()
+        self.__record_wait(api_method, waited)
+        return waited
+
+    def on_rate_limited(self, api_method: str, retry_after_seconds: float) -> None:
+        """
+        429が返ってきた場合に、そのメソッドのリクエストをRetry-Afterの間止める
+
+        Parameters
+        ----------
+        api_method : str
+          Slack APIのメソッド名
+        retry_after_seconds : float
+          Retry-Afterヘッダーの秒数
+        """
+        self.__get_bucket(api_method).block(retry_after_seconds)
+
+    def backoff(self, api_method: str, attempt: int) -> float:
+        """
+        5xx・ネットワークエラーの再試行前に、上限付きの指数バックオフ（フルジッター）で待機する
+
+        Parameters
+        ----------
+        api_method : str
+          Slack APIのメソッド名
+        attempt : int
+          何回目の再試行か（0始まり）
+
+        Returns
+        -------
+        float
+          待機した秒数
+        """
+        wait_seconds = random.uniform(0, min(self.__backoff_max_seconds, self.__backoff_base_seconds * 2**attempt))
+        time.sleep(wait_seconds)
+        self.__record_wait(api_method, wait_seconds)
+        return wait_seconds
+
+    def __get_bucket(self, api_method: str) -> TokenBucket:
+        with self.__lock:
+            if api_method not in self.__buckets:
+                rate = self.__rate_limits.get(api_method, DEFAULT_RATE_LIMIT_PER_MINUTE)
+                self.__buckets[api_method] = TokenBucket(rate, self.__burst)
+            return self.__buckets[api_method]
+
+    def __record_wait(self, api_method: str, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self.__lock:
+            self.__wait_seconds[api_method] = self.__wait_seconds.get(api_method, 0.0) + seconds
+
+
+# ウォームスタートしたLambdaや、複数チャンネルの収集でレートリミットの枠を共有するためのモジュールスコープのリミッター
+_shared_rate_limiters: dict[str, SlackRateLimiter] = {}
+_shared_rate_limiters_lock = threading.Lock()
+
+
+def get_shared_rate_limiter(cache_key: str) -> SlackRateLimiter:
+    """
+    ワークスペース（トークン）ごとに1つだけ作成される SlackRateLimiter を取得します。
+
+    Parameters
+    ----------
+    cache_key : str
+      ワークスペースごとのキャッシュキー
+
+    Returns
+    -------
+    SlackRateLimiter
+      共有のレートリミッター
+    """
+    with _shared_rate_limiters_lock:
+        if cache_key not in _shared_rate_limiters:
+            _shared_rate_limiters[cache_key] = SlackRateLimiter()
+        return _shared_rate_limiters[cache_key]
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from typing import Iterator, Protocol
+from urllib.parse import parse_qs, urlparse
+
+from .matcher import KeywordMatcher
+from .message import SlackMessage
+from .sharded_history import ShardedHistoryCrawler
+from .slack_infrastructure import SlackInfrastructure
+
+
+class SearchBackend(Protocol):
+    """
+    チャンネル内のメッセージを検索するバックエンドのインターフェース
+    """
+
+    def iter_pages(
+        self, channel: dict, matcher: KeywordMatcher, oldest_ts: str | None, search_hours: int, latest_ts: str | None = None
+    ) -> Iterator[tuple[list[dict], str | None, str | None]]:
+        """
+        検索結果をページごとに (一致したメッセージのリスト, そのページで最新のts, そのページで最古のts) の形で返す
+        latest_ts は途中から再開する場合のヒントで、これより古いメッセージのみを取得すればよいことを示す
+        最古のtsは、新しい順に取得するバックエンドのみが返す（それ以外はNone）
+        """
+        ...
+
+
+class HistoryScanBackend:
+    """
+    conversations.history でチャンネルの履歴を全て取得し、手元で検索ワードに絞り込むバックエンド
+
+    Parameters
+    ----------
+    slack_infrastructure : SlackInfrastructure
+      Slack APIを呼び出すインフラストラクチャ
+    crawler : ShardedHistoryCrawler or None
+      履歴を期間ごとに並行して取得するクローラー。指定しない場合はカーソルで1ページずつ取得する。
+    """
+
+    def __init__(self, slack_infrastructure: SlackInfrastructure, crawler: ShardedHistoryCrawler | None = None):
+        self.__slack_infrastructure = slack_infrastructure
+        self.__crawler = crawler
+
+    def iter_pages(
+        self, channel: dict, matcher: KeywordMatcher, oldest_ts: str | None, search_hours: int, latest_ts: str | None = None
+    ) -> Iterator[tuple[list[dict], str | None, str | None]]:
+        """
+        conversations.history のページごとに検索ワードで絞り込んだ結果を返します。
+
+        Parameters
+        ----------
+        channel : dict
+          チャンネル情報
+        matcher : KeywordMatcher
+          検索ワード
+        oldest_ts : str or None
+          前回処理した最新のメッセージのts。Noneの場合はsearch_hours時間前から検索する。
+        search_hours : int
+          oldest_tsがNoneの場合に検索する時間範囲（何時間前まで検索するか）
+        latest_ts : str or None
+          途中から再開する場合に、このtsより古いメッセージのみを取得する
+
+        Yields
+        ------
+        tuple[list[dict], str or None, str or None]
+          1ページ分の検索結果のメッセージのリストと、そのページで最新・最古のメッセージのts。
+          conversations.history は新しい順に返すため、最古のtsより新しいメッセージは全て取得済みになる。
+        """
+        oldest = oldest_ts if oldest_ts is not None else _hours_ago_unixtime(search_hours)
+        if self.__crawler is not None:
+            history = self.__crawler.iter_pages(channel["id"], oldest, latest_ts)
+        else:
+            history = self.__slack_infrastructure.iter_channel_history(channel["id"], oldest, latest_ts)
+        for messages in history:
+            # oldestと同じtsのメッセージは前回処理済みなので除く
+            messages = [message for message in messages if message["ts"] != oldest_ts]
+            # 検索ワードに一致しなかったメッセージも含めて、最新のtsを次回の起点にする
+            page_latest_ts = max((message["ts"] for message in messages), key=float, default=None)
+            page_oldest_ts = min((message["ts"] for message in messages), key=float, default=None)
+            yield filter_messages(messages, matcher), page_latest_ts, page_oldest_ts
+
+
+class SearchApiBackend:
+    """
+    search.messages でSlack側で検索し、一致したメッセージのみを取得するバックエンド
+    検索ワードが少なく、チャンネルの履歴が多い場合に取得するデータ量を大きく減らせる
+
+    search.messages はユーザートークン（search:read）が必要なため、ボットトークンとは別のインフラストラクチャを渡す。
+    Slackの検索は単語単位のため、取得した結果は手元でも検索ワードに絞り込み、履歴を全て取得した場合と同じ条件に揃える。
+    スレッドの返信は conversations.history に含まれないため、検索結果からも除く。
+
+    Parameters
+    ----------
+    slack_infrastructure : SlackInfrastructure
+      ユーザートークンで作成したインフラストラクチャ
+    """
+
+    def __init__(self, slack_infrastructure: SlackInfrastructure):
+        self.__slack_infrastructure = slack_infrastructure
+
+    def iter_pages(
+        self, channel: dict, matcher: KeywordMatcher, oldest_ts: str | None, search_hours: int, latest_ts: str | None = None
+    ) -> Iterator[tuple[list[dict], str | None, str | None]]:
+        """
+        検索ワードごとに search.messages を呼び、ページごとに検索結果を返します。
+
+        Parameters
+        ----------
+        channel : dict
+          チャンネル情報
+        matcher : KeywordMatcher
+          検索ワード
+        oldest_ts : str or None
+          前回処理した最新のメッセージのts。Noneの場合はsearch_hours時間前から検索する。
+        search_hours : int
+          oldest_tsがNoneの場合に検索する時間範囲（何時間前まで検索するか）
+        latest_ts : str or None
+          search.messages は古い順に返すため使わない。再開した場合に処理済みのメッセージを除くのは呼び出し側で行う
+
+        Yields
+        ------
+        tuple[list[dict], str or None, None]
+          1ページ分の検索結果のメッセージのリストと、そのページで最新のメッセージのts。
+          検索結果は新しい順に並ばないため、最古のtsは常にNoneになる。
+        """
+        oldest = float(oldest_ts) if oldest_ts is not None else float(_hours_ago_unixtime(search_hours))
+        # after: は日付単位で「その日より後」のため、1日前の日付を指定して細かい範囲は手元で絞り込む
+        after_date = (datetime.fromtimestamp(oldest) - timedelta(days=1)).strftime("%Y-%m-%d")
+        # Slackの検索にはORが無いため、検索ワードごとに検索して重複を除く
+        seen_ts: set[str] = set()
+        for word in matcher.words:
+            query = f'in:#{channel["name"]} after:{after_date} "{word}"'
+            for matches in self.__slack_infrastructure.iter_search_messages(query):
+                messages: list[dict] = []
+                for match in matches:
+                    if match["ts"] in seen_ts or float(match["ts"]) <= oldest or _is_thread_reply(match):
+                        continue
+                    seen_ts.add(match["ts"])
+                    messages.append(_to_history_message(match))
+                page_latest_ts = max((message["ts"] for message in messages), key=float, default=None)
+                yield filter_messages(messages, matcher), page_latest_ts, None
+
+
+def filter_messages(messages: list[dict], matcher: KeywordMatcher) -> list[dict]:
+    """
+    検索ワードを含むメッセージのみを返します。一致した検索ワードは "matched_words" に記録します。
+
+    Parameters
+    ----------
+    messages : list[dict]
+      メッセージのリスト
+    matcher : KeywordMatcher
+      検索ワード
+
+    Returns
+    -------
+    list[dict]
+      検索ワードを含むメッセージのリスト
+    """
+    matched_messages: list[dict] = []
+    for message in messages:
+        matched_words = matcher.match(message.get("text", ""))
+        if len(matched_words) > 0:
+            message["matched_words"] = matched_words
+            matched_messages.append(message)
+    return matched_messages
+
+
+def _hours_ago_unixtime(hours: int) -> int:
+    return int((datetime.now() - timedelta(hours=hours)).timestamp())
+
+
+def _is_thread_reply(match: dict) -> bool:
+    """
+    search.messages の結果がスレッドの返信かどうかをパーマリンクから判定する
+    """
+    thread_ts = parse_qs(urlparse(match.get("permalink", "")).query).get("thread_ts")
+    return thread_ts is not None and thread_ts[0] != match["ts"]
+
+
+def _to_history_message(match: dict) -> SlackMessage:
+    """
+    search.messages の結果を conversations.history のメッセージと同じ形に揃える
+    検索結果にはスレッドの情報が含まれないため、返信の有無が分からないことを印を付けて示す
+    """
+    message = SlackMessage.from_dict(match)
+    message.thread_unknown = True
+    return message
@@ -0,0 +1,230 @@
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from .slack_infrastructure import SlackInfrastructure
+
+
+@dataclass(eq=False)
+class _Shard:
+    """
+    履歴を取得する期間の1区間。oldest・latest はどちらも含まない（Slack APIと同じ）マイクロ秒単位のts
+
+    frontier は次に取得するページの latest で、区間の中でこれより新しいメッセージは全て取得済みであることを示す
+    """
+
+    oldest: int
+    latest: int
+    frontier: int = 0
+    started: bool = False
+    running: bool = False
+    done: bool = False
+    pages: list[list[dict]] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.frontier = self.latest
+
+
+class ShardedHistoryCrawler:
+    """
+    conversations.history を期間ごとの区間に分け、区間ごとに並行して取得するクローラーです。
+
+    カーソルによるページ送りは前のページの結果が無いと次を要求できないため、長い期間の履歴の取得は直列になります。
+    区間ごとに oldest・latest を指定して取得すれば、区間どうしは互いに待たずに取得できます。
+
+    - まず期間全体を1つの区間として最新の1ページを取得する。期間が短く1ページに収まれば、直列の取得と同じ1回で終わる
+    - ページが上限まで埋まった区間は、空いているワーカーの数と、これまでの密度から見込んだ残りのページ数だけ残りの期間を分ける
+    - まだ取得を始めていない隣り合う区間は、これまでの密度から1ページに収まると見込めればまとめて1回で取得する
+
+    取得したページは、区間をまたいでも新しい順に並ぶように区間の順番で返します。
+    区間は重ならないように分けるため、同じメッセージが2回返ることはありません。
+    リクエストの間隔はインフラストラクチャのレートリミッターが調整するため、並行数を増やしてもレートリミットは超えません。
+
+    Parameters
+    ----------
+    slack_infrastructure : SlackInfrastructure
+      Slack APIを呼び出すインフラストラクチャ
+    max_workers : int
+      並行して取得する区間の数
+    min_shard_seconds : int
+      区間の長さの下限（秒）。これより短くは分けない
+    page_limit : int
+      1ページのメッセージの最大数
+    """
+
+    def __init__(
+        self,
+        slack_infrastructure: SlackInfrastructure,
+        max_workers: int = 4,
+        min_shard_seconds: int = 3600,
+        page_limit: int = 1000,
+    ):
+        self.__slack_infrastructure = slack_infrastructure
+        self.__max_workers = max(1, max_workers)
+        self.__min_shard_micros = max(1, min_shard_seconds) * 1_000_000
+        self.__page_limit = page_limit
+
+    def iter_pages(self, channel_id: str, oldest: int | str, latest: str | None = None) -> Iterator[list[dict]]:
+        """
+        指定した期間のチャンネルの履歴を、区間ごとに並行して取得し、新しい順にページごとに返します。
+
+        Parameters
+        ----------
+        channel_id : str
+          取得したいチャンネルのID
+        oldest : int or str
+          このUNIX時間（メッセージのtsも指定可）より新しいメッセージのみを取得する
+        latest : str or None
+          このtsより古いメッセージのみを取得する。指定しない場合は現在までのメッセージを取得する。
+
+        Yields
+        ------
+        list[dict]
+          1ページ分のメッセージのリスト（新しい順）。空のページは返さない。
+        """
+        oldest_micros = _to_micros(oldest)
+        # 取得中に投稿されたメッセージは次回の実行で取得されるため、開始時点を上限にしてよい
+        latest_micros = _to_micros(latest) if latest is not None else int((time.time() + 1) * 1_000_000)
+        if latest_micros <= oldest_micros + 1:
+            return
+        # 区間は新しい順に並べる
+        shards = [_Shard(oldest_micros, latest_micros)]
+        density = _Density()
+        executor = ThreadPoolExecutor(max_workers=self.__max_workers)
+        futures: dict[Future, _Shard] = {}
+        try:
+            while True:
+                self.__schedule(channel_id, shards, futures, executor, density)
+                if len(futures) == 0:
+                    break
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    shard = futures.pop(future)
+                    messages, has_more = future.result()
+                    self.__receive(shard, messages, has_more, density)
+                    if not shard.done:
+                        self.__split(shard, shards, futures, density)
+                # 先頭から、取得し終えた区間のページを順に返す
+                while len(shards) > 0:
+                    head = shards[0]
+                    while len(head.pages) > 0:
+                        yield head.pages.pop(0)
+                    if not head.done:
+                        break
+                    shards.pop(0)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __schedule(
+        self,
+        channel_id: str,
+        shards: list[_Shard],
+        futures: dict[Future, _Shard],
+        executor: ThreadPoolExecutor,
+        density: "_Density",
+    ) -> None:
+        """
+        空いているワーカーに、新しい区間から順に次のページの取得を割り当てる
+        """
+        for index, shard in enumerate(shards):
+            if len(futures) >= self.__max_workers:
+                return
+            if shard.running or shard.done:
+                continue
+            if not shard.started:
+                self.__merge_pending(shards, index, density)
+            shard.started = True
+            shard.running = True
+            future = executor.submit(
+                self.__slack_infrastructure.get_channel_history_page,
+                channel_id,
+                _to_ts(shard.oldest),
+                _to_ts(shard.frontier),
+                self.__page_limit,
+            )
+            futures[future] = shard
+
+    def __merge_pending(self, shards: list[_Shard], index: int, density: "_Density") -> None:
+        """
+        まだ取得を始めていない隣の古い区間を、1ページに収まると見込める間まとめる
+        """
+        shard = shards[index]
+        while index + 1 < len(shards) and not shards[index + 1].started:
+            older = shards[index + 1]
+            expected = density.expected_count(shard.latest - older.oldest)
+            if expected is None or expected >= self.__page_limit // 2:
+                return
+            shard.oldest = older.oldest
+            shards.pop(index + 1)
+
+    def __receive(self, shard: _Shard, messages: list[dict], has_more: bool, density: "_Density") -> None:
+        """
+        取得した1ページを区間に追加し、次に取得する位置を進める
+        """
+        shard.running = False
+        # 区間の外のメッセージは他の区間が返すため除く
+        messages = [message for message in messages if shard.oldest < _to_micros(message["ts"]) < shard.frontier]
+        if len(messages) > 0:
+            shard.pages.append(messages)
+        if not has_more or len(messages) == 0:
+            density.add(len(messages), shard.frontier - shard.oldest)
+            shard.done = True
+            return
+        next_frontier = min(_to_micros(message["ts"]) for message in messages)
+        density.add(len(messages), shard.frontier - next_frontier)
+        shard.frontier = next_frontier
+
+    def __split(self, shard: _Shard, shards: list[_Shard], futures: dict[Future, _Shard], density: "_Density") -> None:
+        """
+        ページが上限まで埋まった区間の残りの期間を、空いているワーカーと見込んだページ数に合わせて分ける
+        """
+        waiting = sum(1 for other in shards if other is not shard and not other.running and not other.done)
+        remaining = shard.frontier - shard.oldest
+        expected = density.expected_count(remaining)
+        if expected is None:
+            return
+        shard_count = min(
+            self.__max_workers - len(futures) - waiting,
+            math.ceil(expected / self.__page_limit),
+            remaining // self.__min_shard_micros,
+        )
+        if shard_count < 2:
+            return
+        edges = [shard.frontier - remaining * index // shard_count for index in range(shard_count + 1)]
+        shard.oldest = edges[1]
+        # 区間どうしの境目ちょうどのメッセージは、古い方の区間に含める
+        position = shards.index(shard)
+        shards[position + 1 : position + 1] = [_Shard(edges[index + 1], edges[index] + 1) for index in range(1, shard_count)]
+
+
+class _Density:
+    """
+    これまでに取得した区間の、1秒あたりのメッセージ数
+    """
+
+    def __init__(self):
+        self.__count = 0
+        self.__micros = 0
+
+    def add(self, count: int, micros: int) -> None:
+        self.__count += count
+        self.__micros += micros
+
+    def expected_count(self, micros: int) -> float | None:
+        if self.__micros <= 0:
+            return None
+        return self.__count * micros / self.__micros
+
+
+def _to_micros(ts: int | str) -> int:
+    """
+    Slackのts（"1700000000.000100" 形式）やUNIX時間を、誤差の無いようにマイクロ秒の整数にする
+    """
+    seconds, _, fraction = str(ts).partition(".")
+    return int(seconds) * 1_000_000 + int((fraction + "000000")[:6])
+
+
+def _to_ts(micros: int) -> str:
+    return f"{micros // 1_000_000}.{micros % 1_000_000:06d}"
@@ -1,3 +1,5 @@
+import os
+
 from .slack_infrastructure import SlackInfrastructure
 from .slack_usecase import SlackUsecase
 
@@ -7,8 +9,8 @@ class SlackInfraMyTest:
     SlackInfrastructureのテスト用クラス
     """
 
-    def __init__(self):
-        self.__slack = SlackInfrastructure()
+    def __init__(self, slack_token: str):
+        self.__slack = SlackInfrastructure(slack_token)
 
     def channel_history(self):
         """
@@ -54,8 +56,8 @@ class SlackUsecaseMyTest:
     SlackUsecaseのテスト用クラス
     """
 
-    def __init__(self):
-        self.__slack = SlackUsecase()
+    def __init__(self, slack_token: str):
+        self.__slack = SlackUsecase(slack_token)
 
     def search_messages(self):
         messages = self.__slack.search_messages("public-channel", ["こんにちは", "a", "API"], 10000)
@@ -63,22 +65,27 @@ class SlackUsecaseMyTest:
             print(message["text"])
 
 
-# slack_infraの簡易的なテスト
-slack_infra_test = SlackInfraMyTest()
-print("=================slack_infraの簡易的なテスト=================")
-print("新卒チャンネルから最新のメッセージを取得")
-slack_infra_test.channel_history()
-print("\n" + "ユーザー情報を取得")
-slack_infra_test.get_user_info()
-# print("\n" + "新卒チャンネルにメッセージを送信")
-# slack_infra_test.post_message()
-print("\n" + "スレッドのメッセージを取得")
-slack_infra_test.get_thread_history()
-print("\n" + "=========================================================")
-
-# slack_usecaseの簡易的なテスト
-slack_usecase_test = SlackUsecaseMyTest()
-print("=================slack_usecaseの簡易的なテスト=================")
-print("新卒チャンネルから「こんにちは」「こんばんは」「API」を含むメッセージを取得")
-slack_usecase_test.search_messages()
-print("\n" + "=========================================================")
+if __name__ == "__main__":
+    # 実際のワークスペースにアクセスするため、import時には実行しない
+    # 使い方: SLACK_API_TOKEN=xoxb-... python -m mymodules.slack.slack_infra_mytest
+    slack_token = os.environ["SLACK_API_TOKEN"]
+
+    # slack_infraの簡易的なテスト
+    slack_infra_test = SlackInfraMyTest(slack_token)
+    print("=================slack_infraの簡易的なテスト=================")
+    print("新卒チャンネルから最新のメッセージを取得")
+    slack_infra_test.channel_history()
+    print("\n" + "ユーザー情報を取得")
+    slack_infra_test.get_user_info()
+    # print("\n" + "新卒チャンネルにメッセージを送信")
+    # slack_infra_test.post_message()
+    print("\n" + "スレッドのメッセージを取得")
+    slack_infra_test.get_thread_history()
+    print("\n" + "=========================================================")
+
+    # slack_usecaseの簡易的なテスト
+    slack_usecase_test = SlackUsecaseMyTest(slack_token)
+    print("=================slack_usecaseの簡易的なテスト=================")
+    print("新卒チャンネルから「こんにちは」「こんばんは」「API」を含むメッセージを取得")
+    slack_usecase_test.search_messages()
+    print("\n" + "=========================================================")
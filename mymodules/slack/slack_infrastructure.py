@@ -1,26 +1,91 @@
+import hashlib
 import time
+from typing import Iterator
 
-import requests
+from mymodules.metrics import get_metrics
+
+from .channel_directory import ChannelDirectory
+from .message import SlackMessage, compact_messages
+from .rate_limiter import SlackRateLimiter, get_shared_rate_limiter
+from .snapshot import SnapshotStore
+from .transport import SlackTransport, get_shared_transport
 
 
 class SlackInfrastructure:
     """
     Slack APIを利用するためのインフラストラクチャを提供するクラスです。
+
+    Parameters
+    ----------
+    slack_token : str
+      SlackのAPIトークン
+    channel_ttl_seconds : int
+      チャンネル索引の有効期間（秒）
+    snapshot_store : SnapshotStore or None
+      チャンネル索引などのスナップショットを保存するストア。指定しない場合はメモリ上のみで保持する。
+    transport : SlackTransport or None
+      HTTPリクエストを送信するトランスポート。指定しない場合は共有のコネクションプールを使う。
+    api_base_url : str
+      Slack APIのベースURL。テストやベンチマークではローカルの偽サーバーを指定する。
+    rate_limiter : SlackRateLimiter or None
+      リクエストの間隔を調整するレートリミッター。指定しない場合はワークスペースごとに共有のものを使う。
+    keep_raw_messages : bool
+      Trueの場合は取得したメッセージの元の辞書も SlackMessage.raw に保持する。
+      Falseの場合は blocks・attachments など収集に使わない項目はページを受け取った直後に捨てる。
     """
 
-    def __init__(self, slack_token: str):
+    def __init__(
+        self,
+        slack_token: str,
+        channel_ttl_seconds: int = 3600,
+        snapshot_store: SnapshotStore | None = None,
+        transport: SlackTransport | None = None,
+        api_base_url: str = "https://slack.com/api",
+        rate_limiter: SlackRateLimiter | None = None,
+        keep_raw_messages: bool = False,
+    ):
         if slack_token is None:
             raise ValueError("SLACK_API_TOKENが設定されていません")
         self.__token = slack_token
         self.__headersAuth = {
             "Authorization": "Bearer " + str(self.__token),
         }
+        self.__transport = transport if transport is not None else get_shared_transport()
+        self.__keep_raw_messages = keep_raw_messages
+
+        api_base_url = api_base_url.rstrip("/")
+        self.__history_url = f"{api_base_url}/conversations.history"
+        self.__channel_list_url = f"{api_base_url}/conversations.list"
+        self.__post_message_url = f"{api_base_url}/chat.postMessage"
+        self.__thread_url = f"{api_base_url}/conversations.replies"
+        self.__user_info_url = f"{api_base_url}/users.info"
+        self.__user_list_url = f"{api_base_url}/users.list"
+        self.__search_messages_url = f"{api_base_url}/search.messages"
+
+        # ワークスペースごとにキャッシュを分けるため、トークンのハッシュをキーにする
+        self.__cache_key = hashlib.sha256(str(self.__token).encode("utf-8")).hexdigest()[:16]
+        self.__channel_directory = ChannelDirectory(
+            self.get_all_channels,
+            cache_key=self.__cache_key,
+            ttl_seconds=channel_ttl_seconds,
+            snapshot_store=snapshot_store,
+        )
+        # 複数スレッドから同時に呼ばれた場合でも、レートリミットの枠と待機は全スレッドで共有する
+        self.__rate_limiter = rate_limiter if rate_limiter is not None else get_shared_rate_limiter(self.__cache_key)
+
+    @property
+    def rate_limiter(self) -> SlackRateLimiter:
+        """
+        SlackAPIのリクエストの間隔を調整するレートリミッター
+        """
+        return self.__rate_limiter
 
-        self.__history_url = "https://slack.com/api/conversations.history"
-        self.__channel_list_url = "https://slack.com/api/conversations.list"
-        self.__post_message_url = "https://slack.com/api/chat.postMessage"
-        self.__thread_url = "https://slack.com/api/conversations.replies"
-        self.__user_info_url = "https://slack.com/api/users.info"
+    @property
+    def cache_key(self) -> str:
+        """
+        ワークスペースごとのキャッシュを区別するためのキー
+        """
+        return self.__cache_key
 
     def get_a_channel(self, channel_name: str) -> dict | None:
         """
@@ -36,14 +101,39 @@ class SlackInfrastructure:
         dict or None
           指定されたチャンネル名に一致するチャンネルの情報。見つからなかった場合はNone。
         """
-        channels = self.get_all_channels()
-        return next(
-            (channel for channel in channels if channel["name"] == channel_name),
-        )
+        return self.__channel_directory.get_by_name(channel_name)
+
+    def get_channel_by_id(self, channel_id: str) -> dict | None:
+        """
+        指定されたチャンネルIDに一致するチャンネルを取得します。
+
+        Parameters
+        ----------
+        channel_id : str
+          取得したいチャンネルのID
+
+        Returns
+        -------
+        dict or None
+          指定されたチャンネルIDに一致するチャンネルの情報。見つからなかった場合はNone。
+        """
+        return self.__channel_directory.get_by_id(channel_id)
+
+    def get_indexed_channels(self) -> list[dict]:
+        """
+        索引にある全てのチャンネルの情報を取得します。索引が有効な間はSlack APIを呼びません。
+
+        Returns
+        -------
+        list[dict]
+          全てのチャンネルの情報を含むリスト。
+        """
+        return self.__channel_directory.get_all()
 
     def get_all_channels(self) -> list[dict]:
         """
-        全てのチャンネルの情報を取得します。
+        全てのチャンネルの情報をSlack APIから取得します。
+        チャンネル名での検索には索引を使う get_a_channel を利用してください。
 
         Returns
         -------
@@ -59,7 +149,7 @@ class SlackInfrastructure:
         channels = [channel for response in responses for channel in response["channels"]]
         return channels
 
-    def get_channel_history(self, channel_id: str, from_unixtime: int | None = None) -> list[dict]:
+    def get_channel_history(self, channel_id: str, from_unixtime: int | str | None = None) -> list[SlackMessage]:
         """
         指定されたチャンネルの履歴を取得します。
 
@@ -67,26 +157,82 @@ class SlackInfrastructure:
         ----------
         channel_id : str
           取得したいチャンネルのID
-        from_unixtime : int or None
-          取得するメッセージの最古のUNIX時間。指定しない場合はNone。
+        from_unixtime : int or str or None
+          取得するメッセージの最古のUNIX時間（メッセージのtsも指定可）。指定しない場合はNone。
 
         Returns
         -------
-        list[dict]
+        list[SlackMessage]
           指定されたチャンネルの履歴を含むリスト。
         """
-        messages: list[dict] = []
+        messages = [message for page in self.iter_channel_history(channel_id, from_unixtime) for message in page]
+        return messages
+
+    def iter_channel_history(
+        self, channel_id: str, from_unixtime: int | str | None = None, latest_ts: str | None = None
+    ) -> Iterator[list[SlackMessage]]:
+        """
+        指定されたチャンネルの履歴を、ページごとに取得します。
+
+        Parameters
+        ----------
+        channel_id : str
+          取得したいチャンネルのID
+        from_unixtime : int or str or None
+          取得するメッセージの最古のUNIX時間（メッセージのtsも指定可）。指定しない場合はNone。
+        latest_ts : str or None
+          このtsより古いメッセージのみを取得する（このtsのメッセージは含まない）。指定しない場合は最新のメッセージから取得する。
+
+        Yields
+        ------
+        list[SlackMessage]
+          1ページ分のメッセージのリスト
+        """
         params: dict = {
             "channel": channel_id,
             "limit": 1000,
         }
         if from_unixtime is not None:
             params["oldest"] = from_unixtime
-        responses = self.__fetchSlackApi(self.__history_url, "get", params=params)
-        messages = [message for response in responses for message in response["messages"]]
-        return messages
+        if latest_ts is not None:
+            params["latest"] = latest_ts
+        for response in self.__iterSlackApi(self.__history_url, "get", params=params):
+            yield compact_messages(response["messages"], self.__keep_raw_messages)
 
-    def get_thread_history(self, channel: dict, original_message: dict) -> list[dict]:
+    def get_channel_history_page(
+        self, channel_id: str, oldest: str | None = None, latest: str | None = None, limit: int = 1000
+    ) -> tuple[list[SlackMessage], bool]:
+        """
+        指定した期間のチャンネルの履歴を、カーソルを使わずに1ページだけ取得します。
+        conversations.history は新しい順に返すため、次のページは latest に今回の最古のtsを指定して取得できます。
+        カーソルと違って期間だけで続きを表せるため、期間を分けて並行に取得する場合に使います。
+
+        Parameters
+        ----------
+        channel_id : str
+          取得したいチャンネルのID
+        oldest : str or None
+          このtsより新しいメッセージのみを取得する（このtsのメッセージは含まない）
+        latest : str or None
+          このtsより古いメッセージのみを取得する（このtsのメッセージは含まない）
+        limit : int
+          1ページのメッセージの最大数
+
+        Returns
+        -------
+        tuple[list[SlackMessage], bool]
+          1ページ分のメッセージのリスト（新しい順）と、この期間にまだメッセージが残っているかどうか
+        """
+        params: dict = {"channel": channel_id, "limit": limit}
+        if oldest is not None:
+            params["oldest"] = oldest
+        if latest is not None:
+            params["latest"] = latest
+        responseJson = self.__requestSlackApi("conversations.history", self.__history_url, "get", params)
+        get_metrics().increment("SlackApiPages", "conversations.history")
+        return compact_messages(responseJson["messages"], self.__keep_raw_messages), responseJson.get("has_more") is True
+
+    def get_thread_history(self, channel: dict, original_message: dict, oldest: str | None = None) -> list[SlackMessage]:
         """
         指定されたスレッドの履歴を取得します。
 
@@ -96,19 +242,27 @@ class SlackInfrastructure:
           スレッドが存在するチャンネルの情報
         original_message : dict
           スレッドの親メッセージ
+        oldest : str or None
+          このtsより新しい返信のみを取得する。指定しない場合はスレッドの全ての返信を取得する。
 
         Returns
         -------
-        list[dict]
+        list[SlackMessage]
           指定されたスレッドの履歴。
         """
-        messages: list[dict] = []
+        messages: list[SlackMessage] = []
         params: dict = {
             "channel": channel["id"],
             "ts": original_message["ts"],
         }
+        if oldest is not None:
+            params["oldest"] = oldest
         responses = self.__fetchSlackApi(self.__thread_url, "get", params=params)
-        messages = [message for response in responses for message in response["messages"]]
+        messages = [
+            SlackMessage.from_dict(message, self.__keep_raw_messages)
+            for response in responses
+            for message in response["messages"]
+        ]
         return messages
 
     def post_message(self, channel: dict, text: str, original_message: dict | None = None) -> dict:
@@ -168,6 +322,56 @@ class SlackInfrastructure:
         user_info = responses[0]["user"]
         return user_info
 
+    def get_all_users(self) -> list[dict]:
+        """
+        ワークスペースの全てのユーザーの情報を取得します。
+
+        Returns
+        -------
+        list[dict]
+          全てのユーザーの情報を含むリスト。
+        """
+        params: dict = {
+            "limit": 200,
+        }
+        responses = self.__fetchSlackApi(self.__user_list_url, "get", params=params)
+        users = [user for response in responses for user in response["members"]]
+        return users
+
+    def iter_search_messages(self, query: str) -> Iterator[list[dict]]:
+        """
+        search.messages で検索した結果を、ページごとに取得します。
+        ユーザートークン（search:read）で作成したインスタンスでのみ利用できます。
+
+        Parameters
+        ----------
+        query : str
+          検索クエリ（例: in:#channel after:2024-01-01 "word"）
+
+        Yields
+        ------
+        list[dict]
+          1ページ分の検索結果のメッセージのリスト
+        """
+        params: dict = {
+            "query": query,
+            "count": 100,
+            "sort": "timestamp",
+            "sort_dir": "asc",
+            "cursor": "*",
+        }
+        while True:
+            responseJson = self.__requestSlackApi("search.messages", self.__search_messages_url, "get", params)
+            get_metrics().increment("SlackApiPages", "search.messages")
+            yield responseJson["messages"]["matches"]
+            # search.messages はカーソルを response_metadata か messages.pagination で返す
+            next_cursor = responseJson.get("response_metadata", {}).get("next_cursor") or responseJson["messages"].get(
+                "pagination", {}
+            ).get("next_cursor")
+            if not next_cursor:
+                break
+            params["cursor"] = next_cursor
+
     def __fetchSlackApi(self, url: str, method: str, params: dict) -> list[dict]:
         """
         SlackAPIを叩いてデータを取得する関数。
@@ -188,30 +392,44 @@ class SlackInfrastructure:
 
         Raises
         ------
-        Exception
+        SlackApiError
+          SlackAPIのレスポンスがエラーの場合に発生する例外
+        """
+        return list(self.__iterSlackApi(url, method, params))
+
+    def __iterSlackApi(self, url: str, method: str, params: dict) -> Iterator[dict]:
+        """
+        SlackAPIを叩いて、ページごとにレスポンスを返すジェネレーター。
+        次のページは前のページが処理されてから取得するため、全ページをメモリに保持しない。
+
+        Parameters
+        ----------
+        url : str
+          SlackAPIのURL
+        method : str
+          HTTPメソッド
+        params : dict
+          SlackAPIに渡すパラメータ
+
+        Yields
+        ------
+        dict
+          SlackAPIのレスポンス（1ページ分）
+
+        Raises
+        ------
+        SlackApiError
           SlackAPIのレスポンスがエラーの場合に発生する例外
         """
         cursor = None
-        responses: list[dict] = []
-        # 再帰処理で全てのデータを取得する
+        api_method = url.rsplit("/", 1)[-1]
+        # 次のページが無くなるまで全てのデータを取得する
         while True:
             if cursor is not None:
                 params["cursor"] = cursor
 
-            # SlackAPIを叩く（成功するまで再試行する）
-            while True:
-                response = requests.request(method=method, url=url, headers=self.__headersAuth, params=params)
-                responseJson = response.json()
-                if responseJson["ok"] is True:
-                    break
-                else:
-                    if response.status_code == 429:
-                        # レートリミットに達した場合、リセットまで待機
-                        reset_time = int(response.headers["Retry-After"])
-                        print(f"{reset_time}秒待機した後にリトライします。")
-                        time.sleep(reset_time)
-                    else:
-                        raise Exception(f"SlackAPIのレスポンスがエラーです: {responseJson['error']}: {responseJson['response_metadata']}")
+            responseJson = self.__requestSlackApi(api_method, url, method, params)
+            get_metrics().increment("SlackApiPages", api_method)
 
             # ページネーションの処理
             if "has_more" in responseJson:
@@ -219,8 +437,88 @@ class SlackInfrastructure:
                     cursor = responseJson["response_metadata"]["next_cursor"]
                 else:
                     cursor = None
+            else:
+                # conversations.list / users.list は has_more を返さず、next_cursor のみで次のページを示す
+                cursor = responseJson.get("response_metadata", {}).get("next_cursor") or None
 
-            responses.append(responseJson)
+            yield responseJson
             if cursor is None:
                 break
-        return responses
+
+    def __requestSlackApi(self, api_method: str, url: str, method: str, params: dict) -> dict:
+        """
+        SlackAPIを1回叩いてレスポンスを取得する関数。
+        レートリミットの範囲内に収まるように待機してから送信し、429・5xx・ネットワークエラーの場合は上限回数まで再試行する。
+
+        Parameters
+        ----------
+        api_method : str
+          SlackAPIのメソッド名
+        url : str
+          SlackAPIのURL
+        method : str
+          HTTPメソッド
+        params : dict
+          SlackAPIに渡すパラメータ
+
+        Returns
+        -------
+        dict
+          SlackAPIのレスポンス
+
+        Raises
+        ------
+        SlackApiError
+          SlackAPIのレスポンスがエラーの場合、または再試行の上限に達した場合に発生する例外
+        """
+        metrics = get_metrics()
+        attempt = 0
+        rate_limited_count = 0
+        while True:
+            metrics.increment("SlackApiWaitSeconds", api_method, self.__rate_limiter.acquire(api_method))
+            metrics.increment("SlackApiCalls", api_method)
+            started_at = time.perf_counter()
+            try:
+                response = self.__transport.request(method, url, self.__headersAuth, params)
+            except OSError as e:
+                # 接続エラー・タイムアウトは時間を空けて再試行する
+                if attempt >= self.__rate_limiter.max_retries:
+                    raise SlackApiError(f"SlackAPIへの接続に失敗しました: {api_method}: {e}") from e
+                metrics.increment("SlackApiRetries", api_method)
+                metrics.increment("SlackApiWaitSeconds", api_method, self.__rate_limiter.backoff(api_method, attempt))
+                attempt += 1
+                continue
+            metrics.observe("SlackApiLatency", api_method, (time.perf_counter() - started_at) * 1000)
+            metrics.increment("SlackApiBytes", api_method, len(response.content))
+
+            if response.status_code == 429:
+                # レートリミットに達した場合、同じメソッドを使う全てのスレッドをリセットまで待機させる
+                # 待機した時間は次の acquire で SlackApiWaitSeconds に数える
+                if rate_limited_count >= self.__rate_limiter.max_rate_limit_retries:
+                    raise SlackApiError(f"SlackAPIのレートリミットの再試行回数の上限に達しました: {api_method}")
+                reset_time = int(response.headers.get("Retry-After", "1"))
+                print(f"{reset_time}秒待機した後にリトライします。")
+                metrics.increment("SlackApiRateLimited", api_method)
+                self.__rate_limiter.on_rate_limited(api_method, reset_time)
+                rate_limited_count += 1
+                continue
+            if response.status_code >= 500:
+                if attempt >= self.__rate_limiter.max_retries:
+                    raise SlackApiError(f"SlackAPIがサーバーエラーを返しました: {api_method}: {response.status_code}")
+                metrics.increment("SlackApiRetries", api_method)
+                metrics.increment("SlackApiWaitSeconds", api_method, self.__rate_limiter.backoff(api_method, attempt))
+                attempt += 1
+                continue
+
+            responseJson = response.json()
+            if responseJson["ok"] is not True:
+                raise SlackApiError(
+                    f"SlackAPIのレスポンスがエラーです: {responseJson.get('error')}: {responseJson.get('response_metadata')}"
+                )
+            return responseJson
+
+
+class SlackApiError(Exception):
+    """
+    SlackAPIがエラーを返した場合に発生する例外です。
+    """
@@ -1,27 +1,200 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
+from typing import Iterable, Iterator
 
+from mymodules.metrics import get_metrics
+
+from .matcher import KeywordMatcher
+from .rate_limiter import SlackRateLimiter
+from .search_backend import (
+    HistoryScanBackend,
+    SearchApiBackend,
+    SearchBackend,
+    filter_messages,
+)
+from .sharded_history import ShardedHistoryCrawler
 from .slack_infrastructure import SlackInfrastructure
+from .snapshot import SnapshotStore
+from .thread_cache import ThreadCache
+from .thread_planner import plan_thread_fetches
+from .transport import SlackTransport
+from .ts import newer_ts
+from .user_directory import UserDirectory
 
 
 class SlackUsecase:
     """
     Slackの機能を利用するためのユースケースクラスです。
+
+    Parameters
+    ----------
+    slack_token : str
+      SlackのAPIトークン
+    channel_ttl_seconds : int
+      チャンネル索引の有効期間（秒）
+    snapshot_store : SnapshotStore or None
+      チャンネル索引・ユーザー情報のスナップショットを保存するストア。指定しない場合はメモリ上のみで保持する。
+    user_ttl_seconds : int
+      ユーザー情報の有効期間（秒）
+    bulk_user_threshold : int or None
+      未取得のユーザーがこの人数以上の場合、users.listでまとめて取得する。Noneの場合は常にusers.infoを使う。
+    transport : SlackTransport or None
+      HTTPリクエストを送信するトランスポート。指定しない場合は共有のコネクションプールを使う。
+    api_base_url : str
+      Slack APIのベースURL。テストやベンチマークではローカルの偽サーバーを指定する。
+    search_backend : str
+      メッセージの検索方法。"history"（conversations.historyを全件取得して手元で絞り込む）/
+      "search"（search.messagesで検索する）/ "auto"（検索する期間がauto_search_min_hours以上ならsearch.messagesを使う）
+    search_token : str or None
+      search.messages に使うユーザートークン（search:read）。指定しない場合は常に"history"になる。
+    auto_search_min_hours : int
+      search_backendが"auto"の場合に、search.messages を使う検索期間の下限（時間）
+    rate_limiter : SlackRateLimiter or None
+      ボットトークンのリクエストの間隔を調整するレートリミッター。指定しない場合はワークスペースごとに共有のものを使う。
+    history_crawl_concurrency : int
+      conversations.history を期間ごとに分けて並行に取得する数。1の場合はカーソルで1ページずつ取得する。
+    history_shard_seconds : int
+      並行に取得する場合に、期間を分ける区間の長さの下限（秒）
+    thread_cache_store : SnapshotStore or None
+      スレッドの返信をキャッシュして保存するストア。指定した場合、返信が増えていないスレッドは conversations.replies を呼ばない。
+    thread_cache_max_entries : int
+      チャンネルごとにキャッシュするスレッドの数の上限
+    thread_cache_max_age_seconds : int
+      最後に使ってからこの秒数を過ぎたスレッドはキャッシュから捨てる
+    keep_raw_messages : bool
+      Trueの場合は取得したメッセージの元の辞書も SlackMessage.raw に保持する。既定では収集に使う項目のみを保持する。
     """
 
-    def __init__(self, slack_token: str):
-        self.__users: list[dict] = []
-        self.__slack_infrastructure = SlackInfrastructure(slack_token)
+    def __init__(
+        self,
+        slack_token: str,
+        channel_ttl_seconds: int = 3600,
+        snapshot_store: SnapshotStore | None = None,
+        user_ttl_seconds: int = 86400,
+        bulk_user_threshold: int | None = None,
+        transport: SlackTransport | None = None,
+        api_base_url: str = "https://slack.com/api",
+        search_backend: str = "history",
+        search_token: str | None = None,
+        auto_search_min_hours: int = 24 * 7,
+        rate_limiter: SlackRateLimiter | None = None,
+        history_crawl_concurrency: int = 1,
+        history_shard_seconds: int = 3600,
+        thread_cache_store: SnapshotStore | None = None,
+        thread_cache_max_entries: int = 2000,
+        thread_cache_max_age_seconds: int = 30 * 86400,
+        keep_raw_messages: bool = False,
+    ):
+        if search_backend not in ("history", "search", "auto"):
+            raise ValueError(f"検索方法の指定が不正です: {search_backend}")
+        self.__slack_infrastructure = SlackInfrastructure(
+            slack_token,
+            channel_ttl_seconds=channel_ttl_seconds,
+            snapshot_store=snapshot_store,
+            transport=transport,
+            api_base_url=api_base_url,
+            rate_limiter=rate_limiter,
+            keep_raw_messages=keep_raw_messages,
+        )
+        self.__user_directory = UserDirectory(
+            self.__slack_infrastructure.get_user_info,
+            self.__slack_infrastructure.get_all_users,
+            cache_key=self.__slack_infrastructure.cache_key,
+            ttl_seconds=user_ttl_seconds,
+            bulk_threshold=bulk_user_threshold,
+            snapshot_store=snapshot_store,
+        )
+        self.__search_backend = search_backend
+        self.__auto_search_min_hours = auto_search_min_hours
+        crawler: ShardedHistoryCrawler | None = None
+        if history_crawl_concurrency > 1:
+            crawler = ShardedHistoryCrawler(
+                self.__slack_infrastructure,
+                max_workers=history_crawl_concurrency,
+                min_shard_seconds=history_shard_seconds,
+            )
+        self.__history_scan_backend = HistoryScanBackend(self.__slack_infrastructure, crawler=crawler)
+        self.__thread_cache: ThreadCache | None = None
+        if thread_cache_store is not None:
+            self.__thread_cache = ThreadCache(
+                thread_cache_store,
+                cache_key=self.__slack_infrastructure.cache_key,
+                max_entries=thread_cache_max_entries,
+                max_age_seconds=thread_cache_max_age_seconds,
+            )
+        self.__search_api_backend: SearchApiBackend | None = None
+        if search_token is not None:
+            # レートリミットの枠はボットトークンと別になるため、インフラストラクチャも別に作る
+            self.__search_api_backend = SearchApiBackend(
+                SlackInfrastructure(
+                    search_token, channel_ttl_seconds=channel_ttl_seconds, transport=transport, api_base_url=api_base_url
+                )
+            )
+
+    @property
+    def rate_limiter(self) -> SlackRateLimiter:
+        """
+        SlackAPIのリクエストの間隔を調整するレートリミッター
+        """
+        return self.__slack_infrastructure.rate_limiter
 
-    def search_messages(self, channel_name: str, search_words: list[str], search_hours: int) -> list[dict]:
+    def resolve_channel(self, channel: str | dict) -> dict:
+        """
+        チャンネル名からチャンネル情報を取得します。
+        既に取得済みのチャンネル情報が渡された場合はそのまま返します。
+
+        Parameters
+        ----------
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
+
+        Returns
+        -------
+        dict
+          チャンネル情報
+
+        Raises
+        ------
+        ValueError
+          チャンネルが見つからなかった場合に発生します。
+        """
+        if isinstance(channel, dict):
+            return channel
+        channel_info = self.__slack_infrastructure.get_a_channel(channel)
+        if channel_info is None:
+            raise ValueError(f"チャンネル「{channel}」が見つかりませんでした")
+        return channel_info
+
+    def find_channels(self, pattern: str) -> list[dict]:
+        """
+        チャンネル名がパターンに一致するチャンネルを全て取得します。
+
+        Parameters
+        ----------
+        pattern : str
+          チャンネル名のパターン（例: "proj-*"）。fnmatch形式で指定する。
+
+        Returns
+        -------
+        list[dict]
+          パターンに一致したチャンネル情報のリスト（チャンネル名順）
+        """
+        channels = [
+            channel for channel in self.__slack_infrastructure.get_indexed_channels() if fnmatchcase(channel["name"], pattern)
+        ]
+        return sorted(channels, key=lambda channel: channel["name"])
+
+    def search_messages(self, channel: str | dict, search_words: list[str] | KeywordMatcher, search_hours: int) -> list[dict]:
         """
         指定したチャンネル内のメッセージを検索します。
 
         Parameters
         ----------
-        channel_name : str
-          チャンネル名
-        search_words : list[str]
-          検索する単語のリスト
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
+        search_words : list[str] or KeywordMatcher
+          検索する単語のリスト、またはコンパイル済みのKeywordMatcher
         search_hours : int
           検索する時間範囲（何時間前まで検索するか）
 
@@ -30,23 +203,107 @@ class SlackUsecase:
         list[dict]
           検索結果のメッセージのリスト
         """
-        channel = self.__slack_infrastructure.get_a_channel(channel_name)
-        if channel is None:
-            raise ValueError(f"チャンネル「{channel_name}」が見つかりませんでした")
+        channel = self.resolve_channel(channel)
         # search_hours時間前のunixtimeを計算する
         from_unixtime = int((datetime.now() - timedelta(hours=search_hours)).timestamp())
         messages = self.__slack_infrastructure.get_channel_history(channel["id"], from_unixtime)
-        messages = [message for message in messages if any(word in message["text"] for word in search_words)]
+        messages = filter_messages(messages, _to_matcher(search_words))
         return messages
 
-    def get_thread_history(self, channel_name: str, original_message: dict) -> list[dict]:
+    def search_messages_since(
+        self, channel: str | dict, search_words: list[str] | KeywordMatcher, oldest_ts: str | None, search_hours: int = 10000
+    ) -> tuple[list[dict], str | None]:
+        """
+        指定したチャンネル内で、oldest_tsより新しいメッセージのみを検索します。
+        前回の実行で処理した最新のtsを渡すことで、差分のみを取得できます。
+
+        Parameters
+        ----------
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
+        search_words : list[str] or KeywordMatcher
+          検索する単語のリスト、またはコンパイル済みのKeywordMatcher
+        oldest_ts : str or None
+          前回処理した最新のメッセージのts。Noneの場合はsearch_hours時間前から検索する。
+        search_hours : int
+          oldest_tsがNoneの場合に検索する時間範囲（何時間前まで検索するか）
+
+        Returns
+        -------
+        tuple[list[dict], str or None]
+          検索結果のメッセージのリストと、今回取得した中で最新のメッセージのts。
+          新しいメッセージが無かった場合、最新のtsはoldest_tsをそのまま返す。
+        """
+        messages: list[dict] = []
+        latest_ts = oldest_ts
+        for page_messages, page_latest_ts, _ in self.iter_search_pages(channel, search_words, oldest_ts, search_hours):
+            messages.extend(page_messages)
+            latest_ts = newer_ts(latest_ts, page_latest_ts)
+        return messages, latest_ts
+
+    def iter_search_pages(
+        self,
+        channel: str | dict,
+        search_words: list[str] | KeywordMatcher,
+        oldest_ts: str | None,
+        search_hours: int = 10000,
+        latest_ts: str | None = None,
+    ) -> Iterator[tuple[list[dict], str | None, str | None]]:
+        """
+        search_messages_since と同じ検索を、取得したページごとに行います。
+        ページを取得するたびに検索ワードで絞り込むため、チャンネルの履歴全体をメモリに保持しません。
+        検索には設定に応じて conversations.history の全件取得か search.messages のどちらかを使います。
+
+        Parameters
+        ----------
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
+        search_words : list[str] or KeywordMatcher
+          検索する単語のリスト、またはコンパイル済みのKeywordMatcher
+        oldest_ts : str or None
+          前回処理した最新のメッセージのts。Noneの場合はsearch_hours時間前から検索する。
+        search_hours : int
+          oldest_tsがNoneの場合に検索する時間範囲（何時間前まで検索するか）
+        latest_ts : str or None
+          途中で中断した収集を再開する場合に、処理済みの範囲を飛ばすためのts。
+          conversations.history で検索する場合はこのtsより古いメッセージのみを取得する。
+
+        Yields
+        ------
+        tuple[list[dict], str or None, str or None]
+          1ページ分の検索結果のメッセージのリストと、そのページで最新・最古のメッセージのts。
+          search.messages で検索した場合、最新のtsは検索ワードに一致したメッセージの中で最新のtsになり、最古のtsはNoneになる。
+        """
+        channel = self.resolve_channel(channel)
+        matcher = _to_matcher(search_words)
+        backend = self.__choose_search_backend(oldest_ts, search_hours)
+        yield from backend.iter_pages(channel, matcher, oldest_ts, search_hours, latest_ts)
+
+    def __choose_search_backend(self, oldest_ts: str | None, search_hours: int) -> SearchBackend:
+        """
+        設定と検索する期間から、検索に使うバックエンドを選ぶ。
+        Slack APIからはチャンネルのメッセージ数が分からないため、"auto"では検索する期間の長さで履歴の量を見積もる。
+        """
+        if self.__search_api_backend is None or self.__search_backend == "history":
+            return self.__history_scan_backend
+        if self.__search_backend == "search":
+            return self.__search_api_backend
+        if oldest_ts is None:
+            window_hours = float(search_hours)
+        else:
+            window_hours = (datetime.now().timestamp() - float(oldest_ts)) / 3600
+        if window_hours >= self.__auto_search_min_hours:
+            return self.__search_api_backend
+        return self.__history_scan_backend
+
+    def get_thread_history(self, channel: str | dict, original_message: dict) -> list[dict]:
         """
         指定したチャンネル内のスレッドの履歴を取得します。
 
         Parameters
         ----------
-        channel_name : str
-          チャンネル名
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
         original_message : dict
           スレッドの親メッセージ
 
@@ -55,12 +312,103 @@ class SlackUsecase:
         list[dict]
           スレッドの履歴のリスト
         """
-        channel = self.__slack_infrastructure.get_a_channel(channel_name)
-        if channel is None:
-            raise ValueError(f"チャンネル「{channel_name}」が見つかりませんでした")
-        messages = self.__slack_infrastructure.get_thread_history(channel, original_message)
+        channel = self.resolve_channel(channel)
+        messages = self.__fetch_thread(channel, original_message)
+        self.__save_thread_cache(channel)
         return messages
 
+    def get_thread_histories(
+        self, channel: str | dict, original_messages: list[dict], max_workers: int = 4
+    ) -> list[list[dict]]:
+        """
+        指定したチャンネル内の複数のスレッドの履歴を並行して取得します。
+        結果は original_messages と同じ順番で返します。
+
+        Parameters
+        ----------
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
+        original_messages : list[dict]
+          スレッドの親メッセージのリスト
+        max_workers : int
+          同時に実行するリクエストの最大数
+
+        Returns
+        -------
+        list[list[dict]]
+          親メッセージごとのスレッドの履歴のリスト
+        """
+        channel = self.resolve_channel(channel)
+        if max_workers <= 1 or len(original_messages) <= 1:
+            threads = [self.__fetch_thread(channel, message) for message in original_messages]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # mapは入力と同じ順番で結果を返すため、出力の順番は変わらない
+                threads = list(executor.map(lambda message: self.__fetch_thread(channel, message), original_messages))
+        self.__save_thread_cache(channel)
+        return threads
+
+    def __fetch_thread(self, channel: dict, original_message: dict) -> list[dict]:
+        """
+        スレッドの履歴を取得する。キャッシュがあれば、親メッセージの latest_reply・reply_count で返信が増えたかを判定し、
+        増えていなければAPIを呼ばず、増えていれば記録した latest_reply より新しい返信のみを取得する。
+        """
+        # search.messages の結果など、スレッドの情報が無い親メッセージは増えたかどうか判定できない
+        if self.__thread_cache is None or "latest_reply" not in original_message:
+            return self.__slack_infrastructure.get_thread_history(channel, original_message)
+        cached_replies, oldest = self.__thread_cache.get(channel["id"], original_message)
+        if cached_replies is not None and oldest is None:
+            get_metrics().increment("SlackCacheHits", "conversations.replies")
+            return [original_message, *cached_replies]
+        if cached_replies is not None:
+            get_metrics().increment("SlackCacheIncrementalFetches", "conversations.replies")
+            thread = self.__slack_infrastructure.get_thread_history(channel, original_message, oldest=oldest)
+            cached_ts = {reply["ts"] for reply in cached_replies}
+            replies = cached_replies + [
+                message for message in thread if message["ts"] != original_message["ts"] and message["ts"] not in cached_ts
+            ]
+            # 返信が削除された場合など、件数が合わなければ全ての返信を取得し直す
+            if len(replies) == original_message.get("reply_count"):
+                self.__thread_cache.put(channel["id"], original_message, replies)
+                return [original_message, *replies]
+        thread = self.__slack_infrastructure.get_thread_history(channel, original_message)
+        self.__thread_cache.put(
+            channel["id"], original_message, [message for message in thread if message["ts"] != original_message["ts"]]
+        )
+        return thread
+
+    def __save_thread_cache(self, channel: dict) -> None:
+        if self.__thread_cache is not None:
+            self.__thread_cache.save(channel["id"])
+
+    def get_thread_replies(self, channel: str | dict, original_messages: list[dict], max_workers: int = 4) -> list[list[dict]]:
+        """
+        指定したチャンネル内の親メッセージごとに、スレッドの返信のみを取得します。
+        返信が無いメッセージについてはAPIを呼ばず、親メッセージも再取得しません。
+
+        Parameters
+        ----------
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
+        original_messages : list[dict]
+          conversations.history で取得した親メッセージのリスト
+        max_workers : int
+          同時に実行するリクエストの最大数
+
+        Returns
+        -------
+        list[list[dict]]
+          original_messages と同じ順番の、親メッセージを除いた返信のリスト
+        """
+        plan = plan_thread_fetches(original_messages)
+        print(f"スレッドの取得: {len(plan.fetch_targets)}件を取得し、{plan.saved_calls}件のAPI呼び出しを省略しました。")
+        threads = self.get_thread_histories(channel, plan.fetch_targets, max_workers=max_workers)
+        replies_by_ts: dict[str, list[dict]] = {
+            parent["ts"]: [message for message in thread if message["ts"] != parent["ts"]]
+            for parent, thread in zip(plan.fetch_targets, threads)
+        }
+        return [replies_by_ts.get(message["ts"], []) for message in original_messages]
+
     def get_user(self, user_id: str) -> dict:
         """
         指定したユーザーの情報を取得します。
@@ -75,27 +423,45 @@ class SlackUsecase:
         dict
           ユーザー情報
         """
-        # 既に取得済みのユーザー情報を取得
-        user = next((user for user in self.__users if user["id"] == user_id), None)
-        if user is not None:
-            return user
-        # 取得済みでない場合はAPIを叩いて取得
-        new_user = self.__slack_infrastructure.get_user_info(user_id)
-        self.__users.append(new_user)
-        return new_user
+        return self.__user_directory.get(user_id)
+
+    def get_users(self, user_ids: Iterable[str], max_workers: int = 4) -> dict[str, dict]:
+        """
+        指定した複数のユーザーの情報をまとめて取得します。
+
+        Parameters
+        ----------
+        user_ids : Iterable[str]
+          ユーザーIDのリスト（重複していてもよい）
+        max_workers : int
+          users.infoを同時に実行する最大数
+
+        Returns
+        -------
+        dict[str, dict]
+          ユーザーID → ユーザー情報 の辞書
+        """
+        return self.__user_directory.resolve(user_ids, max_workers=max_workers)
 
-    def post_message(self, channel_name: str, message: str) -> None:
+    def post_message(self, channel: str | dict, message: str) -> None:
         """
         指定したチャンネルにメッセージを投稿します。
 
         Parameters
         ----------
-        channel_name : str
-          チャンネル名
+        channel : str or dict
+          チャンネル名、またはチャンネル情報
         message : str
           投稿するメッセージ
         """
-        channel = self.__slack_infrastructure.get_a_channel(channel_name)
-        if channel is None:
-            raise ValueError(f"チャンネル「{channel_name}」が見つかりませんでした")
+        channel = self.resolve_channel(channel)
         self.__slack_infrastructure.post_message(channel, message)
+
+
+def _to_matcher(search_words: list[str] | KeywordMatcher) -> KeywordMatcher:
+    """
+    検索ワードのリストをKeywordMatcherに変換する。既にKeywordMatcherの場合はそのまま返す。
+    """
+    if isinstance(search_words, KeywordMatcher):
+        return search_words
+    return KeywordMatcher(search_words)
@@ -0,0 +1,14 @@
+from typing import Protocol
+
+
+class SnapshotStore(Protocol):
+    """
+    ディレクトリやキャッシュのスナップショットを保存するストアのインターフェース
+    mymodules.aws の S3SnapshotStore / LocalSnapshotStore がこれを満たす
+    """
+
+    def load(self, name: str) -> dict | None:
+        ...
+
+    def save(self, name: str, data: dict) -> None:
+        ...
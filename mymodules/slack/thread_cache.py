@@ -0,0 +1,153 @@
+import threading
+import time
+
+from .message import compact_messages
+from .snapshot import SnapshotStore
+
+# ウォームスタートしたLambdaで再利用するためのモジュールスコープのキャッシュ
+# キャッシュキーごとに チャンネルID → スレッドのts → エントリー を保持する
+_shared_threads: dict[str, dict[str, dict[str, dict]]] = {}
+
+
+class ThreadCache:
+    """
+    スレッドの返信を (チャンネルID, スレッドのts) をキーに保持するキャッシュです。
+    返信のリストと一緒に、取得した時点の親メッセージの latest_reply・reply_count を記録します。
+
+    親メッセージの latest_reply・reply_count が記録と同じであれば、返信は増えていないため conversations.replies を呼ばずに済みます。
+    変わっていれば、記録した latest_reply より新しい返信のみを取得して追加できます。
+
+    チャンネルごとに1つのスナップショットとして保存し、最後に使ってから max_age_seconds を過ぎたエントリーと、
+    max_entries を超えた分の最近使っていないエントリーは保存する時に捨てます。
+
+    Parameters
+    ----------
+    snapshot_store : SnapshotStore or None
+      スレッドの返信を保存・復元するストア。指定しない場合はメモリ上のみで保持する。
+    cache_key : str
+      モジュールスコープのキャッシュおよびスナップショットを区別するキー
+    max_entries : int
+      チャンネルごとに保持するスレッドの数の上限
+    max_age_seconds : int
+      最後に使ってからこの秒数を過ぎたスレッドは捨てる
+    """
+
+    def __init__(
+        self,
+        snapshot_store: SnapshotStore | None = None,
+        cache_key: str = "default",
+        max_entries: int = 2000,
+        max_age_seconds: int = 30 * 86400,
+    ):
+        self.__snapshot_store = snapshot_store
+        self.__cache_key = cache_key
+        self.__max_entries = max_entries
+        self.__max_age_seconds = max_age_seconds
+        self.__channels = _shared_threads.setdefault(cache_key, {})
+        self.__loaded_channels: set[str] = set()
+        self.__dirty_channels: set[str] = set()
+        self.__lock = threading.Lock()
+
+    def get(self, channel_id: str, parent: dict) -> tuple[list[dict] | None, str | None]:
+        """
+        親メッセージのスレッドの返信を、キャッシュから取得します。
+
+        Parameters
+        ----------
+        channel_id : str
+          チャンネルID
+        parent : dict
+          conversations.history で取得した親メッセージ
+
+        Returns
+        -------
+        tuple[list[dict] or None, str or None]
+          返信が増えていなければ (キャッシュした返信のリスト, None)。
+          増えていれば (キャッシュした返信のリスト, 記録したlatest_reply) で、これより新しい返信のみを取得すればよい。
+          キャッシュに無ければ (None, None)。
+        """
+        with self.__lock:
+            threads = self.__load(channel_id)
+            entry = threads.get(parent["ts"])
+            if entry is None:
+                return None, None
+            entry["used_at"] = time.time()
+            self.__dirty_channels.add(channel_id)
+            if entry["latest_reply"] == parent.get("latest_reply") and entry["reply_count"] == parent.get("reply_count"):
+                return entry["replies"], None
+            return entry["replies"], entry["latest_reply"]
+
+    def put(self, channel_id: str, parent: dict, replies: list[dict]) -> None:
+        """
+        親メッセージのスレッドの返信をキャッシュに登録します。
+
+        Parameters
+        ----------
+        channel_id : str
+          チャンネルID
+        parent : dict
+          conversations.history で取得した親メッセージ
+        replies : list[dict]
+          親メッセージを除いた返信のリスト（古い順）
+        """
+        with self.__lock:
+            threads = self.__load(channel_id)
+            threads[parent["ts"]] = {
+                "latest_reply": parent.get("latest_reply"),
+                "reply_count": parent.get("reply_count"),
+                "replies": replies,
+                "used_at": time.time(),
+            }
+            self.__dirty_channels.add(channel_id)
+
+    def save(self, channel_id: str) -> None:
+        """
+        古いエントリーを捨ててから、チャンネルのキャッシュをスナップショットとして保存します。
+        前回保存してから変更が無い場合は何もしません。
+
+        Parameters
+        ----------
+        channel_id : str
+          チャンネルID
+        """
+        with self.__lock:
+            if channel_id not in self.__dirty_channels:
+                return
+            self.__dirty_channels.discard(channel_id)
+            threads = self.__evict(self.__load(channel_id))
+            self.__channels[channel_id] = threads
+            # 他のスレッドが書き込んでいても安全なように、保存する内容はロックの中でコピーしておく
+            snapshot = {
+                "threads": [
+                    {"ts": ts, **entry, "replies": [dict(reply) for reply in entry["replies"]]} for ts, entry in threads.items()
+                ]
+            }
+        if self.__snapshot_store is not None:
+            self.__snapshot_store.save(self.__snapshot_name(channel_id), snapshot)
+
+    def __evict(self, threads: dict[str, dict]) -> dict[str, dict]:
+        expires_at = time.time() - self.__max_age_seconds
+        entries = [(ts, entry) for ts, entry in threads.items() if entry["used_at"] >= expires_at]
+        # 最近使ったものから max_entries 件を残す
+        entries.sort(key=lambda item: item[1]["used_at"], reverse=True)
+        return dict(entries[: self.__max_entries])
+
+    def __load(self, channel_id: str) -> dict[str, dict]:
+        # スナップショットの読み込みはチャンネルごとに最初の1回のみ
+        threads = self.__channels.setdefault(channel_id, {})
+        if channel_id in self.__loaded_channels or self.__snapshot_store is None:
+            return threads
+        self.__loaded_channels.add(channel_id)
+        snapshot = self.__snapshot_store.load(self.__snapshot_name(channel_id))
+        if snapshot is None:
+            return threads
+        for entry in snapshot["threads"]:
+            ts = entry.pop("ts")
+            entry["replies"] = compact_messages(entry["replies"])
+            # メモリ上により新しい情報があればそちらを優先する
+            if ts not in threads or threads[ts]["used_at"] < entry["used_at"]:
+                threads[ts] = entry
+        return threads
+
+    def __snapshot_name(self, channel_id: str) -> str:
+        return f"threads-{self.__cache_key}-{channel_id}"
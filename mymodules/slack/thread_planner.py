@@ -0,0 +1,67 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ThreadFetchPlan:
+    """
+    conversations.replies の取得計画
+
+    Attributes
+    ----------
+    parents : list[dict]
+      計画の対象となった親メッセージのリスト（入力の順番）
+    fetch_targets : list[dict]
+      返信の取得が必要な親メッセージのリスト
+    """
+
+    parents: list[dict]
+    fetch_targets: list[dict] = field(default_factory=list)
+
+    @property
+    def saved_calls(self) -> int:
+        """
+        返信の取得を省略できたAPI呼び出しの数
+        """
+        return len(self.parents) - len(self.fetch_targets)
+
+
+def needs_replies_fetch(message: dict) -> bool:
+    """
+    conversations.history のメッセージについて、返信の取得が必要かどうかを判定します。
+
+    Parameters
+    ----------
+    message : dict
+      conversations.history で取得したメッセージ
+
+    Returns
+    -------
+    bool
+      スレッドの親で、返信が1件以上ある場合はTrue
+    """
+    # search.messages の結果など、スレッドの情報が無いメッセージは取得してみるまで分からない
+    if message.get("thread_unknown") is True:
+        return True
+    thread_ts = message.get("thread_ts")
+    # スレッドに属さないメッセージ、またはチャンネルにも投稿された返信（thread_broadcast）は親ではない
+    if thread_ts is None or thread_ts != message["ts"]:
+        return False
+    # reply_countが無い場合でもlatest_replyがあれば返信がある
+    return message.get("reply_count", 0) > 0 or "latest_reply" in message
+
+
+def plan_thread_fetches(messages: list[dict]) -> ThreadFetchPlan:
+    """
+    conversations.history の内容から、返信の取得が必要な親メッセージを選びます。
+
+    Parameters
+    ----------
+    messages : list[dict]
+      conversations.history で取得したメッセージのリスト
+
+    Returns
+    -------
+    ThreadFetchPlan
+      返信の取得計画
+    """
+    return ThreadFetchPlan(parents=messages, fetch_targets=[message for message in messages if needs_replies_fetch(message)])
@@ -0,0 +1,99 @@
+import threading
+from typing import TYPE_CHECKING, Any, Protocol
+
+if TYPE_CHECKING:
+    import requests
+
+
+class SlackTransport(Protocol):
+    """
+    Slack APIへのHTTPリクエストを送信するトランスポートのインターフェース
+    テストやベンチマークではローカルの偽サーバーに向けたものに差し替えられる
+    """
+
+    def request(self, method: str, url: str, headers: dict, params: dict) -> Any:
+        """
+        HTTPリクエストを送信し、status_code / headers / content / json() を持つレスポンスを返す
+        """
+        ...
+
+
+class RequestsTransport:
+    """
+    requests.Session のコネクションプールを使い回してSlack APIを呼び出すトランスポート
+    Keep-Aliveで接続を再利用するため、リクエストごとのTCP・TLSハンドシェイクが不要になる
+
+    Parameters
+    ----------
+    pool_size : int
+      コネクションプールの最大接続数。並行して実行するリクエスト数以上にする
+    connect_timeout : float
+      接続のタイムアウト（秒）
+    read_timeout : float
+      レスポンスの読み込みのタイムアウト（秒）
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 5.0, read_timeout: float = 30.0):
+        # requestsは読み込むだけで時間がかかるため、トランスポートを作る時に読み込む
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.__timeout = (connect_timeout, read_timeout)
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+        self.__session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def request(self, method: str, url: str, headers: dict, params: dict) -> "requests.Response":
+        """
+        HTTPリクエストを送信する
+
+        Parameters
+        ----------
+        method : str
+          HTTPメソッド
+        url : str
+          リクエスト先のURL
+        headers : dict
+          リクエストヘッダー
+        params : dict
+          クエリパラメータ
+
+        Returns
+        -------
+        requests.Response
+          レスポンス
+        """
+        return self.__session.request(method=method, url=url, headers=headers, params=params, timeout=self.__timeout)
+
+
+# ウォームスタートしたLambdaで接続を使い回すためのモジュールスコープのトランスポート
+_shared_transports: dict[tuple[int, float, float], RequestsTransport] = {}
+_shared_transports_lock = threading.Lock()
+
+
+def get_shared_transport(pool_size: int = 10, connect_timeout: float = 5.0, read_timeout: float = 30.0) -> RequestsTransport:
+    """
+    設定ごとに1つだけ作成される RequestsTransport を取得します。
+    同じ設定であれば、ウォームスタートしたLambdaの次の呼び出しでも同じ接続を再利用します。
+
+    Parameters
+    ----------
+    pool_size : int
+      コネクションプールの最大接続数
+    connect_timeout : float
+      接続のタイムアウト（秒）
+    read_timeout : float
+      レスポンスの読み込みのタイムアウト（秒）
+
+    Returns
+    -------
+    RequestsTransport
+      共有のトランスポート
+    """
+    key = (pool_size, connect_timeout, read_timeout)
+    with _shared_transports_lock:
+        if key not in _shared_transports:
+            _shared_transports[key] = RequestsTransport(pool_size, connect_timeout, read_timeout)
+        return _shared_transports[key]
@@ -0,0 +1,22 @@
+def newer_ts(a: str | None, b: str | None) -> str | None:
+    """
+    2つのSlackのts（"1700000000.000100" 形式）のうち新しい方を返します。
+    どちらかがNoneの場合はもう一方を返します。
+
+    Parameters
+    ----------
+    a : str or None
+      比較するts
+    b : str or None
+      比較するts
+
+    Returns
+    -------
+    str or None
+      新しい方のts
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a if float(a) >= float(b) else b
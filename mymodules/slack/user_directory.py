@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from .snapshot import SnapshotStore
+
+# ウォームスタートしたLambdaで再利用するためのモジュールスコープのキャッシュ
+# キャッシュキーごとに ユーザーID → (取得時刻, ユーザー情報) を保持する
+_shared_users: dict[str, dict[str, tuple[float, dict]]] = {}
+# 複数チャンネルを並行して収集する場合に、同じユーザーを重複して取得しないための排他制御
+_fetch_lock = threading.Lock()
+
+
+class UserDirectory:
+    """
+    ユーザーIDをキーにした辞書でユーザー情報を保持するクラスです。
+    取得したユーザー情報はモジュールスコープに保持されるため、ウォームスタートしたLambdaでも再利用されます。
+
+    Parameters
+    ----------
+    fetch_user : Callable[[str], dict]
+      1人のユーザー情報を取得する関数（users.info）
+    fetch_all_users : Callable[[], list[dict]]
+      全てのユーザー情報を取得する関数（users.list）
+    cache_key : str
+      モジュールスコープのキャッシュおよびスナップショットを区別するキー
+    ttl_seconds : int
+      ユーザー情報の有効期間（秒）
+    bulk_threshold : int or None
+      未取得のユーザーがこの人数以上の場合、users.listでまとめて取得する。Noneの場合は常にusers.infoを使う。
+    snapshot_store : SnapshotStore or None
+      ユーザー情報を保存・復元するストア。指定しない場合はメモリ上のみで保持する。
+    """
+
+    def __init__(
+        self,
+        fetch_user: Callable[[str], dict],
+        fetch_all_users: Callable[[], list[dict]],
+        cache_key: str = "default",
+        ttl_seconds: int = 86400,
+        bulk_threshold: int | None = None,
+        snapshot_store: SnapshotStore | None = None,
+    ):
+        self.__fetch_user = fetch_user
+        self.__fetch_all_users = fetch_all_users
+        self.__cache_key = cache_key
+        self.__ttl_seconds = ttl_seconds
+        self.__bulk_threshold = bulk_threshold
+        self.__snapshot_store = snapshot_store
+        self.__snapshot_loaded = False
+        self.__users = _shared_users.setdefault(cache_key, {})
+
+    def get(self, user_id: str) -> dict:
+        """
+        指定したユーザーの情報を取得します。
+
+        Parameters
+        ----------
+        user_id : str
+          ユーザーID
+
+        Returns
+        -------
+        dict
+          ユーザー情報
+        """
+        return self.resolve([user_id])[user_id]
+
+    def resolve(self, user_ids: Iterable[str], max_workers: int = 4) -> dict[str, dict]:
+        """
+        複数のユーザーの情報をまとめて取得します。
+        未取得のユーザーはusers.infoを並行して呼ぶか、bulk_threshold以上であればusers.listで一度に取得します。
+
+        Parameters
+        ----------
+        user_ids : Iterable[str]
+          ユーザーIDのリスト
+        max_workers : int
+          users.infoを同時に実行する最大数
+
+        Returns
+        -------
+        dict[str, dict]
+          ユーザーID → ユーザー情報 の辞書
+        """
+        self.__load_snapshot()
+        unique_ids = list(dict.fromkeys(user_ids))
+        missing_ids = [user_id for user_id in unique_ids if not self.__is_fresh(user_id)]
+        if len(missing_ids) > 0:
+            with _fetch_lock:
+                self.__fetch_missing(missing_ids, max_workers)
+        return {user_id: self.__users[user_id][1] for user_id in unique_ids}
+
+    def __fetch_missing(self, user_ids: list[str], max_workers: int) -> None:
+        # 待機している間に他のスレッドが取得した可能性があるため、改めて未取得のユーザーを調べる
+        missing_ids = [user_id for user_id in user_ids if not self.__is_fresh(user_id)]
+        if len(missing_ids) > 0:
+            if self.__bulk_threshold is not None and len(missing_ids) >= self.__bulk_threshold:
+                self.prefetch_all()
+                # users.listに含まれないユーザー（削除済み・他ワークスペースなど）のみ個別に取得する
+                missing_ids = [user_id for user_id in missing_ids if not self.__is_fresh(user_id)]
+            self.__fetch_users(missing_ids, max_workers)
+            self.save_snapshot()
+
+    def prefetch_all(self) -> None:
+        """
+        users.listで全てのユーザー情報を取得し、キャッシュに登録します。
+        """
+        fetched_at = time.time()
+        for user in self.__fetch_all_users():
+            self.__users[user["id"]] = (fetched_at, user)
+
+    def save_snapshot(self) -> None:
+        """
+        キャッシュしているユーザー情報をスナップショットとして保存します。
+        """
+        if self.__snapshot_store is None:
+            return
+        # 他のスレッドが書き込んでいても安全なように、先に一覧をコピーしてから変換する
+        entries = list(self.__users.values())
+        users = [{"fetched_at": fetched_at, "user": user} for fetched_at, user in entries]
+        self.__snapshot_store.save(self.__snapshot_name(), {"users": users})
+
+    def __fetch_users(self, user_ids: list[str], max_workers: int) -> None:
+        if len(user_ids) == 0:
+            return
+        if max_workers <= 1 or len(user_ids) == 1:
+            users = [self.__fetch_user(user_id) for user_id in user_ids]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                users = list(executor.map(self.__fetch_user, user_ids))
+        fetched_at = time.time()
+        for user_id, user in zip(user_ids, users):
+            self.__users[user_id] = (fetched_at, user)
+
+    def __load_snapshot(self) -> None:
+        # スナップショットの読み込みは最初の1回のみ
+        if self.__snapshot_loaded or self.__snapshot_store is None:
+            return
+        self.__snapshot_loaded = True
+        snapshot = self.__snapshot_store.load(self.__snapshot_name())
+        if snapshot is None:
+            return
+        for entry in snapshot["users"]:
+            user_id = entry["user"]["id"]
+            # メモリ上により新しい情報があればそちらを優先する
+            if user_id not in self.__users or self.__users[user_id][0] < entry["fetched_at"]:
+                self.__users[user_id] = (entry["fetched_at"], entry["user"])
+
+    def __is_fresh(self, user_id: str) -> bool:
+        entry = self.__users.get(user_id)
+        return entry is not None and time.time() - entry[0] < self.__ttl_seconds
+
+    def __snapshot_name(self) -> str:
+        return f"users-{self.__cache_key}"
@@ -1,14 +1,127 @@
-import datetime
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 
-from mymodules.aws import S3, ParameterStore
-from mymodules.slack import Slack
+from mymodules.archive_index import ArchiveIndex, S3IndexStorage
+from mymodules.aws import (
+    S3,
+    LambdaInvoker,
+    LocalCheckpointStore,
+    LocalSnapshotStore,
+    ParameterStore,
+    ParameterStoreCheckpointStore,
+    S3CheckpointStore,
+    S3SnapshotStore,
+    SqsQueue,
+    get_shared_secret_cache,
+)
+from mymodules.collector import (
+    ChannelCollector,
+    ChannelResult,
+    TimeBudget,
+    create_checkpoint_key,
+)
+from mymodules.distributed import DistributedCollection, LocalFileQueue
+from mymodules.metrics import create_metrics_sink, get_metrics, start_invocation
+from mymodules.output import ReportRenderer, create_report_template
+from mymodules.slack import (
+    KeywordMatcher,
+    Slack,
+    SlackRateLimiter,
+    compile_matcher,
+    get_shared_transport,
+)
+
+SEARCH_HOURS: int = 10000
+S3_BUCKET_NAME: str = "slack-task-temp-bucket-nakashima-takeo"
+S3_FILE_TITLE_HEAD: str = "slack"
+
+
+def _create_checkpoint_store(backend: str, region: str, bucket_name: str):
+    """
+    CHECKPOINT_BACKENDの設定に応じたチェックポイントストアを作成します。
+
+    Parameters
+    ----------
+    backend : str
+      "s3" / "ssm" / "local" / "none" のいずれか
+    region : str
+      AWSリージョン名
+    bucket_name : str
+      backendが"s3"の場合の保存先バケット名
+
+    Returns
+    -------
+    S3CheckpointStore or ParameterStoreCheckpointStore or LocalCheckpointStore or None
+      チェックポイントストア。"none"の場合はNone。
+    """
+    if backend == "s3":
+        return S3CheckpointStore(bucket_name)
+    if backend == "ssm":
+        return ParameterStoreCheckpointStore(region)
+    if backend == "local":
+        return LocalCheckpointStore(os.environ.get("CHECKPOINT_LOCAL_PATH", "/tmp/slack_checkpoints.json"))
+    if backend == "none":
+        return None
+    raise ValueError(f"CHECKPOINT_BACKENDの値が不正です: {backend}")
+
+
+def _create_thread_cache_store(backend: str, bucket_name: str) -> S3SnapshotStore | LocalSnapshotStore | None:
+    """
+    THREAD_CACHE_BACKENDの設定に応じた、スレッドの返信のキャッシュの保存先を作成します。
+
+    Parameters
+    ----------
+    backend : str
+      "s3" / "local" / "none" のいずれか
+    bucket_name : str
+      backendが"s3"の場合の保存先バケット名
+
+    Returns
+    -------
+    S3SnapshotStore or LocalSnapshotStore or None
+      キャッシュの保存先。"none"の場合はNone。
+    """
+    if backend == "s3":
+        return S3SnapshotStore(bucket_name, prefix="_threads")
+    if backend == "local":
+        return LocalSnapshotStore(os.environ.get("THREAD_CACHE_LOCAL_DIR", "/tmp/slack_threads"))
+    if backend == "none":
+        return None
+    raise ValueError(f"THREAD_CACHE_BACKENDの値が不正です: {backend}")
+
+
+def _create_manifest_store(backend: str, bucket_name: str) -> S3SnapshotStore | LocalSnapshotStore | None:
+    """
+    REPORT_DEDUP_BACKENDの設定に応じた、前回保存したレポートのマニフェストの保存先を作成します。
+
+    Parameters
+    ----------
+    backend : str
+      "s3" / "local" / "none" のいずれか
+    bucket_name : str
+      backendが"s3"の場合の保存先バケット名
+
+    Returns
+    -------
+    S3SnapshotStore or LocalSnapshotStore or None
+      マニフェストの保存先。"none"の場合はNone。
+    """
+    if backend == "s3":
+        return S3SnapshotStore(bucket_name, prefix="_manifests")
+    if backend == "local":
+        return LocalSnapshotStore(os.environ.get("REPORT_DEDUP_LOCAL_DIR", "/tmp/slack_manifests"))
+    if backend == "none":
+        return None
+    raise ValueError(f"REPORT_DEDUP_BACKENDの値が不正です: {backend}")
 
 
 def save_slack_messages_to_s3(event, context) -> None:
     """
     Slackからメッセージを取得し、指定されたS3バケットに保存します。
     また、そのS3のリンクを指定されたSlackチャンネルに投稿します。
+    複数のチャンネルを指定した場合は、チャンネルごとに並行して収集し、結果をまとめて1回投稿します。
 
     Parameters
     ----------
@@ -38,56 +151,504 @@ def save_slack_messages_to_s3(event, context) -> None:
     --------
     >>> save_slack_messages_to_s3(event, context)
     """
-    # SlackTokenを取得する
-    region = os.environ["REGION"]
-    parameter_store = ParameterStore(region)
-    slack_token: str = parameter_store.get_parameter("python_slack_app_token")
-    if slack_token is None:
-        raise ValueError("SLACK_API_TOKENが設定されていません")
+    _run_with_metrics(_save_slack_messages_to_s3, event, context)
 
-    # Slackクラスを作成する
-    slack = Slack(slack_token)
+
+def _run_with_metrics(handler: Callable[[Any, Any], Any], event, context) -> Any:
+    """
+    ハンドラーの本体を実行します。
+    Slack API・AWSの呼び出しと処理のフェーズごとの時間を集計し、最後にCloudWatchのメトリクスとして出力します。
+
+    Parameters
+    ----------
+    handler : Callable
+        ハンドラーの本体
+    event : dict
+        AWS Lambdaのイベントオブジェクト
+    context : dict
+        AWS Lambdaのコンテキストオブジェクト
+
+    Returns
+    -------
+    Any
+        ハンドラーの本体の戻り値
+    """
+    metrics = start_invocation()
+    try:
+        return handler(event, context)
+    finally:
+        function_name: str = getattr(context, "function_name", None) or "local"
+        metrics_sink = create_metrics_sink(
+            os.environ.get("METRICS_SINK", "emf"),
+            os.environ.get("METRICS_NAMESPACE", "PythonSlackTask"),
+            {"FunctionName": function_name},
+        )
+        snapshot = metrics.snapshot()
+        # 共有のレートリミッターはウォームスタートで前回の実行の待機時間も数えているため、今回の実行の値を出力する
+        wait_seconds: dict[str, float] = snapshot["counters"].get("SlackApiWaitSeconds", {})
+        print(f"レートリミットによる待機時間: {sum(wait_seconds.values()):.1f}秒 {wait_seconds}")
+        metrics_sink.emit(snapshot)
+
+
+def _save_slack_messages_to_s3(event, context) -> None:
+    """
+    save_slack_messages_to_s3 の本体です。
+
+    Parameters
+    ----------
+    event : dict
+        AWS Lambdaのイベントオブジェクト
+    context : dict
+        AWS Lambdaのコンテキストオブジェクト
+    """
+    region = os.environ["REGION"]
+    slack = _create_slack(region)
+    thread_fetch_concurrency: int = int(os.environ.get("THREAD_FETCH_CONCURRENCY", "4"))
+    channel_concurrency: int = int(os.environ.get("CHANNEL_CONCURRENCY", "2"))
 
     # Slackの各種設定を取得する
-    source_channel_name: str = os.environ["SOURCE_CHANNEL_NAME"]
     report_channel_name: str = os.environ["REPORT_CHANNEL_NAME"]
     search_words: list[str] = os.environ["SEARCH_WORDS"].split(",")
-    search_hours: int = 10000
-    s3_bucket_name: str = "slack-task-temp-bucket-nakashima-takeo"
-    s3_file_title_head: str = "slack"
+    matcher = _create_matcher(search_words)
+    search_hours: int = SEARCH_HOURS
+    s3_bucket_name: str = S3_BUCKET_NAME
+    # 前回処理した最新のtsから差分のみを取得する。full_backfillを指定した場合はsearch_hours分を全て取得し直す
+    checkpoint_store = _create_checkpoint_store(os.environ.get("CHECKPOINT_BACKEND", "none"), region, s3_bucket_name)
+    full_backfill: bool = os.environ.get("FULL_BACKFILL", "false").lower() == "true"
+    if isinstance(event, dict) and "full_backfill" in event:
+        full_backfill = bool(event["full_backfill"])
 
-    # slackからメッセージを取得する
-    messages = slack.search_messages(source_channel_name, search_words, search_hours)
-    if len(messages) == 0:
-        print("メッセージはありませんでした")
-        return
+    # チャンネル情報はメッセージごとに引き直さず、最初に一度だけ取得する
+    source_channels = _resolve_source_channels(slack)
+    report_channel = slack.resolve_channel(report_channel_name)
 
-    # メッセージを一つのstringに整える
-    messages_text: str = ""
-    for message in messages:
-        thread_messages = slack.get_thread_history(source_channel_name, message)
-        messages_text += datetime.datetime.fromtimestamp(float(message["ts"])).strftime("%Y/%m/%d %H:%M:%S") + "\n"
-        messages_text += slack.get_user(message["user"])["real_name"] + "\n"
-        messages_text += message["text"] + "\n"
-        for thread_message in thread_messages:
-            if thread_message["ts"] == message["ts"]:
-                continue
-            messages_text += (
-                "     " + datetime.datetime.fromtimestamp(float(thread_message["ts"])).strftime("%Y/%m/%d %H:%M:%S") + "\n"
-            )
-            messages_text += "     " + slack.get_user(thread_message["user"])["real_name"] + "\n"
-            messages_text += "     " + thread_message["text"] + "\n"
-        messages_text += "\n"
-
-    # S3にテキストファイルをアップロードする
+    # ARCHIVE_INDEXが有効な場合は、収集したメッセージを転置インデックスにも追加する
     s3 = S3()
-    public_url = s3.write_txt(s3_bucket_name, s3_file_title_head, messages_text)
+    archive_index: ArchiveIndex | None = None
+    if os.environ.get("ARCHIVE_INDEX", "false").lower() == "true":
+        archive_index = ArchiveIndex(
+            S3IndexStorage(s3, s3_bucket_name, os.environ.get("ARCHIVE_INDEX_PREFIX", "index")),
+            max_segments=int(os.environ.get("ARCHIVE_INDEX_MAX_SEGMENTS", "8")),
+        )
+
+    # Lambdaの残り時間が少なくなったら収集を中断し、状態をS3に保存して次の実行で再開する
+    time_budget: TimeBudget | None = None
+    if hasattr(context, "get_remaining_time_in_millis"):
+        time_budget = TimeBudget(context, float(os.environ.get("TIME_BUDGET_RESERVE_SECONDS", "60")))
+    resume_store: S3SnapshotStore | None = None
+    if os.environ.get("RESUME_ON_TIMEOUT", "true").lower() == "true":
+        resume_store = S3SnapshotStore(s3_bucket_name, prefix="_resume")
+
+    # チャンネルごとにメッセージを集めてS3へ保存する
+    # チャンネル索引・ユーザー情報・コネクションプール・レートリミットの枠は全チャンネルで共有する
+    collector = ChannelCollector(
+        slack,
+        s3,
+        s3_bucket_name,
+        matcher,
+        search_hours,
+        thread_fetch_concurrency=thread_fetch_concurrency,
+        checkpoint_store=checkpoint_store,
+        full_backfill=full_backfill,
+        archive_formats=[f.strip() for f in os.environ.get("ARCHIVE_FORMATS", "").split(",") if f.strip() != ""],
+        archive_prefix=os.environ.get("ARCHIVE_PREFIX", "archive"),
+        archive_index=archive_index,
+        resume_store=resume_store,
+        time_budget=time_budget,
+        renderer=_create_renderer(),
+        manifest_store=_create_manifest_store(os.environ.get("REPORT_DEDUP_BACKEND", "none"), s3_bucket_name),
+        report_mode=os.environ.get("REPORT_MODE", "full"),
+        delta_full_interval_seconds=int(float(os.environ.get("REPORT_DELTA_FULL_INTERVAL_HOURS", "168")) * 3600),
+        resume_lease_seconds=float(os.environ.get("RESUME_LEASE_SECONDS", "900")),
+    )
+
+    def collect(channel: dict) -> ChannelResult:
+        # 1チャンネルの失敗で他のチャンネルの収集・通知を止めないよう、失敗したチャンネルは結果に印を付けて続ける
+        try:
+            return collector.collect(channel, _create_file_title_head(channel, source_channels))
+        except Exception as e:
+            print(f"{channel['name']}の収集に失敗しました: {e!r}")
+            get_metrics().increment("ChannelFailures", channel["name"])
+            return ChannelResult(channel, 0, None, create_checkpoint_key(channel["id"], matcher.words), None, failed=True)
+
+    with ThreadPoolExecutor(max_workers=channel_concurrency) as executor:
+        results: list[ChannelResult] = list(executor.map(collect, source_channels))
+
+    # 全チャンネルのセグメントを追加し終えてから、必要に応じてセグメントを統合する
+    if archive_index is not None:
+        archive_index.compact()
+
+    # 中断したチャンネルがあれば、続きを収集する実行を始める
+    if any(result.suspended for result in results):
+        _schedule_resume(event, context, region)
+
+    # 中断したチャンネルは、収集が終わった実行でまとめて通知する
+    # 前回から変わっていないチャンネルは、REPORT_UNCHANGED_NOTIFYがskipの場合は通知しない
+    # 収集に失敗したチャンネルも、次回取得し直すことが分かるように通知する
+    found_results = [result for result in results if result.message_count > 0 and not result.suspended]
+    if os.environ.get("REPORT_UNCHANGED_NOTIFY", "short") == "skip":
+        found_results = [result for result in found_results if not result.unchanged]
+    found_results += [result for result in results if result.failed]
+    if len(found_results) == 0:
+        print("メッセージはありませんでした")
+        for result in results:
+            collector.commit_checkpoint(result)
+        return
 
     # Slackにメッセージを投稿する
-    slack_text: str = (
-        f"チャンネル: {source_channel_name}\n"
+    _post_report(slack, report_channel, search_words, found_results)
+
+    # 保存と通知が終わってから、次回の起点となるtsを記録する
+    with get_metrics().phase("checkpoint"):
+        for result in results:
+            collector.commit_checkpoint(result)
+
+
+def produce_slack_messages(event, context) -> None:
+    """
+    分散して収集する場合の最初の処理です。
+    チャンネルの履歴を取得し、検索ワードに一致した親メッセージをバッチにしてワーカーのキューに送ります。
+    スレッドの返信の取得は expand_slack_threads が、結果のまとめと投稿は finalize_slack_messages が行います。
+
+    Parameters
+    ----------
+    event : dict
+        AWS Lambdaのイベントオブジェクト
+    context : dict
+        AWS Lambdaのコンテキストオブジェクト
+    """
+    _run_with_metrics(_produce_slack_messages, event, context)
+
+
+def _produce_slack_messages(event, context) -> None:
+    region = os.environ["REGION"]
+    slack = _create_slack(region)
+    matcher = _create_matcher(os.environ["SEARCH_WORDS"].split(","))
+    checkpoint_store = _create_checkpoint_store(os.environ.get("CHECKPOINT_BACKEND", "none"), region, S3_BUCKET_NAME)
+    full_backfill: bool = os.environ.get("FULL_BACKFILL", "false").lower() == "true"
+    if isinstance(event, dict) and "full_backfill" in event:
+        full_backfill = bool(event["full_backfill"])
+    source_channels = _resolve_source_channels(slack)
+
+    collection = DistributedCollection(S3(), S3_BUCKET_NAME, renderer=_create_renderer())
+    job_id = collection.produce(
+        slack,
+        source_channels,
+        {channel["id"]: _create_file_title_head(channel, source_channels) for channel in source_channels},
+        matcher,
+        SEARCH_HOURS,
+        _create_work_queue(region),
+        checkpoint_store=checkpoint_store,
+        full_backfill=full_backfill,
+    )
+    # 一致したメッセージが無くワーカーが動かない場合は、ここで結果をまとめる
+    if collection.try_claim_finalize(job_id):
+        _finalize_slack_messages({"job_id": job_id}, context)
+
+
+def expand_slack_threads(event, context) -> dict:
+    """
+    分散して収集する場合のワーカーです。SQSから受け取ったバッチごとに、スレッドの返信・ユーザー情報を取得してS3に置きます。
+    最後のバッチを処理したワーカーが、結果のまとめと投稿を始めます。
+    FINALIZER_FUNCTION_NAMEが設定されている場合はその関数を非同期に呼び出し、そうでない場合はこの実行の中で行います。
+
+    Parameters
+    ----------
+    event : dict
+        SQSから渡されるイベントオブジェクト（Records）
+    context : dict
+        AWS Lambdaのコンテキストオブジェクト
+
+    Returns
+    -------
+    dict
+        処理に失敗したメッセージのリスト（batchItemFailures）。失敗したメッセージのみがSQSで再試行される
+    """
+    return _run_with_metrics(_expand_slack_threads, event, context)
+
+
+def _expand_slack_threads(event, context) -> dict:
+    region = os.environ["REGION"]
+    slack = _create_slack(region)
+    thread_fetch_concurrency: int = int(os.environ.get("THREAD_FETCH_CONCURRENCY", "4"))
+    collection = DistributedCollection(S3(), S3_BUCKET_NAME, renderer=_create_renderer())
+    failures: list[dict] = []
+    job_ids: list[str] = []
+    for record in event["Records"]:
+        try:
+            job_ids.append(collection.process_batch(slack, json.loads(record["body"]), max_workers=thread_fetch_concurrency))
+        except Exception as e:
+            print(f"バッチの処理に失敗しました: {record['messageId']} {e!r}")
+            failures.append({"itemIdentifier": record["messageId"]})
+
+    for job_id in dict.fromkeys(job_ids):
+        if not collection.try_claim_finalize(job_id):
+            continue
+        finalizer_function_name: str | None = os.environ.get("FINALIZER_FUNCTION_NAME")
+        if finalizer_function_name:
+            LambdaInvoker(region).invoke_async(finalizer_function_name, {"job_id": job_id})
+        else:
+            _finalize_slack_messages({"job_id": job_id}, context)
+    return {"batchItemFailures": failures}
+
+
+def finalize_slack_messages(event, context) -> None:
+    """
+    分散して収集する場合の最後の処理です。
+    全てのバッチの結果をチャンネルごとに1つのファイルにまとめて投稿し、次回の起点となるtsを記録します。
+
+    Parameters
+    ----------
+    event : dict
+        ジョブID（job_id）を持つイベントオブジェクト
+    context : dict
+        AWS Lambdaのコンテキストオブジェクト
+    """
+    _run_with_metrics(_finalize_slack_messages, event, context)
+
+
+def _finalize_slack_messages(event, context) -> None:
+    region = os.environ["REGION"]
+    slack = _create_slack(region)
+    search_words: list[str] = os.environ["SEARCH_WORDS"].split(",")
+    checkpoint_store = _create_checkpoint_store(os.environ.get("CHECKPOINT_BACKEND", "none"), region, S3_BUCKET_NAME)
+    collection = DistributedCollection(S3(), S3_BUCKET_NAME, renderer=_create_renderer())
+    results = collection.finalize(event["job_id"])
+
+    found_results = [result for result in results if result.message_count > 0]
+    if len(found_results) > 0:
+        _post_report(slack, slack.resolve_channel(os.environ["REPORT_CHANNEL_NAME"]), search_words, found_results)
+    else:
+        print("メッセージはありませんでした")
+    # 保存と通知が終わってから、次回の起点となるtsを記録する
+    if checkpoint_store is not None:
+        with get_metrics().phase("checkpoint"):
+            for result in results:
+                if result.latest_ts is not None:
+                    checkpoint_store.put(result.checkpoint_key, result.latest_ts)
+    collection.cleanup(event["job_id"])
+
+
+def _create_work_queue(region: str):
+    """
+    ワーカーに処理を渡すキューを作成します。
+    WORK_QUEUE_URLが設定されている場合はSQSを、WORK_QUEUE_DIRが設定されている場合はローカルのディレクトリを使います。
+
+    Parameters
+    ----------
+    region : str
+        AWSリージョン名
+
+    Returns
+    -------
+    SqsQueue or LocalFileQueue
+        キュー
+    """
+    if os.environ.get("WORK_QUEUE_URL"):
+        return SqsQueue(os.environ["WORK_QUEUE_URL"], region)
+    if os.environ.get("WORK_QUEUE_DIR"):
+        return LocalFileQueue(os.environ["WORK_QUEUE_DIR"])
+    raise ValueError("WORK_QUEUE_URLかWORK_QUEUE_DIRを設定してください")
+
+
+def _create_slack(region: str) -> Slack:
+    """
+    SlackTokenを取得し、環境変数の設定に応じたSlackのユースケースを作成します。
+
+    Parameters
+    ----------
+    region : str
+        AWSリージョン名
+
+    Returns
+    -------
+    Slack
+        Slackのユースケース
+    """
+    # SlackTokenを取得する
+    # search.messagesで検索する場合のユーザートークン（search:read）も1回の呼び出しでまとめて取得する
+    # 取得した値は一定時間キャッシュし、ウォームスタートではSSM・KMSを呼ばない
+    get_shared_secret_cache().ttl_seconds = float(os.environ.get("SECRET_CACHE_TTL_SECONDS", "300"))
+    parameter_store = ParameterStore(region)
+    search_token_parameter_name: str | None = os.environ.get("SEARCH_TOKEN_PARAMETER_NAME")
+    parameter_names = ["python_slack_app_token"] + ([search_token_parameter_name] if search_token_parameter_name else [])
+    parameters = parameter_store.get_parameters(parameter_names)
+    slack_token: str | None = parameters.get("python_slack_app_token")
+    if slack_token is None:
+        raise ValueError("SLACK_API_TOKENが設定されていません")
+
+    # Slackクラスを作成する
+    # SNAPSHOT_BUCKET_NAMEが設定されている場合はチャンネル索引をS3にも保存する
+    snapshot_bucket_name: str | None = os.environ.get("SNAPSHOT_BUCKET_NAME")
+    snapshot_store = S3SnapshotStore(snapshot_bucket_name) if snapshot_bucket_name else None
+    channel_ttl_seconds: int = int(os.environ.get("CHANNEL_DIRECTORY_TTL_SECONDS", "3600"))
+    user_ttl_seconds: int = int(os.environ.get("USER_DIRECTORY_TTL_SECONDS", "86400"))
+    # BULK_USER_THRESHOLD人以上のユーザーが未取得の場合はusers.listでまとめて取得する
+    bulk_user_threshold: int | None = int(os.environ["BULK_USER_THRESHOLD"]) if "BULK_USER_THRESHOLD" in os.environ else None
+    # コネクションプールは並行数に合わせ、ウォームスタートでも使い回す
+    thread_fetch_concurrency: int = int(os.environ.get("THREAD_FETCH_CONCURRENCY", "4"))
+    channel_concurrency: int = int(os.environ.get("CHANNEL_CONCURRENCY", "2"))
+    # HISTORY_CRAWL_CONCURRENCYが2以上の場合は、チャンネルの履歴を期間ごとに分けて並行に取得する
+    history_crawl_concurrency: int = int(os.environ.get("HISTORY_CRAWL_CONCURRENCY", "1"))
+    transport = get_shared_transport(
+        pool_size=max(thread_fetch_concurrency, history_crawl_concurrency) * channel_concurrency,
+        connect_timeout=float(os.environ.get("SLACK_CONNECT_TIMEOUT_SECONDS", "5")),
+        read_timeout=float(os.environ.get("SLACK_READ_TIMEOUT_SECONDS", "30")),
+    )
+    # search.messagesで検索する場合はユーザートークン（search:read）を使う
+    search_token: str | None = parameters.get(search_token_parameter_name) if search_token_parameter_name else None
+    if search_token_parameter_name and search_token is None:
+        raise ValueError(f"SEARCH_TOKEN_PARAMETER_NAMEのパラメータが見つかりません: {search_token_parameter_name}")
+    # SLACK_RATE_LIMITSが設定されている場合は、メソッドごとの1分あたりの上限回数を上書きする
+    rate_limiter: SlackRateLimiter | None = None
+    if os.environ.get("SLACK_RATE_LIMITS"):
+        rate_limiter = SlackRateLimiter(rate_limits=json.loads(os.environ["SLACK_RATE_LIMITS"]))
+    slack = Slack(
+        slack_token,
+        rate_limiter=rate_limiter,
+        search_backend=os.environ.get("SEARCH_BACKEND", "history"),
+        search_token=search_token,
+        transport=transport,
+        api_base_url=os.environ.get("SLACK_API_BASE_URL", "https://slack.com/api"),
+        channel_ttl_seconds=channel_ttl_seconds,
+        snapshot_store=snapshot_store,
+        user_ttl_seconds=user_ttl_seconds,
+        bulk_user_threshold=bulk_user_threshold,
+        history_crawl_concurrency=history_crawl_concurrency,
+        history_shard_seconds=int(os.environ.get("HISTORY_SHARD_SECONDS", "3600")),
+        # THREAD_CACHE_BACKENDが設定されている場合は、返信が増えていないスレッドの conversations.replies を省略する
+        thread_cache_store=_create_thread_cache_store(os.environ.get("THREAD_CACHE_BACKEND", "none"), S3_BUCKET_NAME),
+        thread_cache_max_entries=int(os.environ.get("THREAD_CACHE_MAX_ENTRIES", "2000")),
+        thread_cache_max_age_seconds=int(os.environ.get("THREAD_CACHE_MAX_AGE_DAYS", "30")) * 86400,
+    )
+    return slack
+
+
+def _create_matcher(search_words: list[str]) -> KeywordMatcher:
+    """
+    検索ワードをコンパイルします。ウォームスタートでは前回コンパイルしたものを使い回します。
+
+    Parameters
+    ----------
+    search_words : list[str]
+        検索ワードのリスト
+
+    Returns
+    -------
+    KeywordMatcher
+        コンパイル済みの検索ワード
+    """
+    return compile_matcher(
+        tuple(search_words),
+        mode=os.environ.get("SEARCH_MATCH_MODE", "substring"),
+        normalize=os.environ.get("SEARCH_NORMALIZE", "false").lower() == "true",
+    )
+
+
+def _create_renderer() -> ReportRenderer:
+    """
+    REPORT_FORMATの設定に応じた書式で、日本時間で日時を表示するレポートのレンダラーを作成します。
+
+    Returns
+    -------
+    ReportRenderer
+        レポートのレンダラー
+    """
+    return ReportRenderer(create_report_template(os.environ.get("REPORT_FORMAT", "text")))
+
+
+def _create_file_title_head(channel: dict, source_channels: list[dict]) -> str:
+    """
+    チャンネルごとの保存する時のファイル名を作成します。1チャンネルのみの場合は従来通りのファイル名にします。
+    """
+    return S3_FILE_TITLE_HEAD if len(source_channels) == 1 else f"{S3_FILE_TITLE_HEAD}_{channel['name']}"
+
+
+def _post_report(slack: Slack, report_channel: dict, search_words: list[str], found_results: list[ChannelResult]) -> None:
+    """
+    メッセージが見つかったチャンネルごとの件数と保存したファイルのURLを、まとめて1回投稿します。
+
+    Parameters
+    ----------
+    slack : Slack
+        Slackのユースケース
+    report_channel : dict
+        投稿先のチャンネル情報
+    search_words : list[str]
+        検索ワードのリスト
+    found_results : list[ChannelResult]
+        メッセージが見つかったチャンネルの収集結果
+    """
+    slack_text: str = "\n\n".join(_format_report_entry(result, search_words) for result in found_results)
+    with get_metrics().phase("post"):
+        slack.post_message(report_channel, slack_text)
+
+
+def _format_report_entry(result: ChannelResult, search_words: list[str]) -> str:
+    """
+    1チャンネル分の通知の文面を作成します。前回から変わっていない場合・収集に失敗した場合は短い文面にします。
+    """
+    if result.failed:
+        return f"チャンネル: {result.channel['name']}\n" + "収集に失敗しました。次回の実行で取得し直します。"
+    if result.unchanged:
+        return f"チャンネル: {result.channel['name']}\n" + f"前回から変更はありません: {result.public_url}"
+    return (
+        f"チャンネル: {result.channel['name']}\n"
         + f"検索ワード: {search_words}\n"
-        + f"{len(messages)}件のスレッドが見つかりました。\n"
-        + f"ダウンロードはこちら: {public_url}"
+        + f"{result.message_count}件のスレッドが見つかりました。\n"
+        + (f"前回からの差分はこちら: {result.public_url}" if result.delta else f"ダウンロードはこちら: {result.public_url}")
     )
-    slack.post_message(report_channel_name, slack_text)
+
+
+def _schedule_resume(event, context, region: str) -> None:
+    """
+    中断した収集の続きを行う実行を始めます。
+    RESUME_MODEが"reinvoke"の場合は同じ関数を非同期に呼び出し、"schedule"の場合は次回の定期実行で再開します。
+    再呼び出しが止まらなくなることを防ぐため、続けて再呼び出しする回数はMAX_RESUME_INVOCATIONSまでにします。
+
+    Parameters
+    ----------
+    event : dict
+        AWS Lambdaのイベントオブジェクト
+    context : dict
+        AWS Lambdaのコンテキストオブジェクト
+    region : str
+        AWSリージョン名
+    """
+    resume_count: int = int(event.get("resume_count", 0)) if isinstance(event, dict) else 0
+    max_resume_invocations: int = int(os.environ.get("MAX_RESUME_INVOCATIONS", "10"))
+    if os.environ.get("RESUME_MODE", "schedule") != "reinvoke" or getattr(context, "invoked_function_arn", None) is None:
+        print("中断した収集は次回の実行で再開します")
+        return
+    if resume_count >= max_resume_invocations:
+        print(f"再呼び出しが{max_resume_invocations}回続いたため、中断した収集は次回の実行で再開します")
+        return
+    payload = {**(event if isinstance(event, dict) else {}), "resume_count": resume_count + 1}
+    LambdaInvoker(region).invoke_async(context.invoked_function_arn, payload)
+    print(f"中断した収集を再開するため関数を再度呼び出しました（{resume_count + 1}回目）")
+
+
+def _resolve_source_channels(slack: Slack) -> list[dict]:
+    """
+    情報取得先のチャンネルを取得します。
+    SOURCE_CHANNEL_PATTERNが設定されている場合はパターンに一致する全てのチャンネルを、
+    そうでない場合はSOURCE_CHANNEL_NAME（カンマ区切りで複数指定可）のチャンネルを対象にします。
+
+    Parameters
+    ----------
+    slack : Slack
+      Slackのユースケース
+
+    Returns
+    -------
+    list[dict]
+      情報取得先のチャンネル情報のリスト
+    """
+    source_channel_pattern: str | None = os.environ.get("SOURCE_CHANNEL_PATTERN")
+    if source_channel_pattern:
+        channels = slack.find_channels(source_channel_pattern)
+        if len(channels) == 0:
+            raise ValueError(f"パターン「{source_channel_pattern}」に一致するチャンネルが見つかりませんでした")
+        return channels
+    source_channel_names = [name.strip() for name in os.environ["SOURCE_CHANNEL_NAME"].split(",") if name.strip() != ""]
+    return [slack.resolve_channel(name) for name in dict.fromkeys(source_channel_names)]
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+
+from mymodules.archive_index import ArchiveIndex, LocalIndexStorage, S3IndexStorage
+from mymodules.aws import S3
+
+
+def query_archive_index(event, context) -> dict:
+    """
+    収集済みのメッセージの転置インデックスから、検索ワードを含むメッセージを検索します。
+    Slack APIは呼び出さないため、過去に収集した範囲であれば何度でもすぐに検索し直せます。
+
+    Parameters
+    ----------
+    event : dict
+        AWS Lambdaのイベントオブジェクト。
+        words（検索ワードのリスト）、oldest / latest（tsの範囲）、channel（チャンネル名）を指定します。
+    context : dict
+        AWS Lambdaのコンテキストオブジェクト
+
+    Returns
+    -------
+    dict
+        一致したメッセージの件数（count）とメッセージのリスト（messages）
+
+    Examples
+    --------
+    >>> query_archive_index({"words": ["障害"], "channel": "public-channel"}, context)
+    """
+    words: list[str] = event["words"] if isinstance(event["words"], list) else event["words"].split(",")
+    storage = S3IndexStorage(
+        S3(),
+        os.environ.get("ARCHIVE_INDEX_BUCKET_NAME", "slack-task-temp-bucket-nakashima-takeo"),
+        os.environ.get("ARCHIVE_INDEX_PREFIX", "index"),
+    )
+    messages = ArchiveIndex(storage).search(words, event.get("oldest"), event.get("latest"), event.get("channel"))
+    return {"count": len(messages), "messages": messages}
+
+
+def main() -> None:
+    """
+    ローカルから転置インデックスを検索するためのコマンドです。
+
+    Examples
+    --------
+    $ python -m src.query_archive_index --words 障害,エラー --channel public-channel
+    $ python -m src.query_archive_index --words 障害 --local-dir /tmp/slack_index
+    """
+    parser = argparse.ArgumentParser(description="収集済みのメッセージをインデックスから検索します")
+    parser.add_argument("--words", required=True, help="検索ワード（カンマ区切り）")
+    parser.add_argument("--oldest", help="このts以降のメッセージのみを検索する")
+    parser.add_argument("--latest", help="このts以前のメッセージのみを検索する")
+    parser.add_argument("--channel", help="検索するチャンネル名")
+    parser.add_argument("--bucket", default="slack-task-temp-bucket-nakashima-takeo", help="インデックスを保存したバケット名")
+    parser.add_argument("--prefix", default="index", help="インデックスを保存したキーのプレフィックス")
+    parser.add_argument("--local-dir", help="指定した場合はS3ではなくローカルのディレクトリのインデックスを検索する")
+    args = parser.parse_args()
+
+    if args.local_dir:
+        storage = LocalIndexStorage(args.local_dir)
+    else:
+        storage = S3IndexStorage(S3(), args.bucket, args.prefix)
+    words = [word for word in args.words.split(",") if word != ""]
+    for message in ArchiveIndex(storage).search(words, args.oldest, args.latest, args.channel):
+        print(json.dumps(message, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+from typing import Iterator
+
+import pytest
+
+# リポジトリのルートと src/ から mymodules・ハンドラーを読み込めるようにする
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from benchmarks.fake_aws import InMemoryS3Client, InMemorySSMClient  # noqa: E402
+from benchmarks.fake_slack import FakeSlackServer  # noqa: E402
+from benchmarks.scenarios import UNLIMITED_RATE_LIMITS, Scenario  # noqa: E402
+
+REGION = "ap-northeast-1"
+
+
+@pytest.fixture
+def aws(monkeypatch) -> Iterator[SimpleNamespace]:
+    """
+    mymodules.aws が使うS3・SSMのクライアントを、ベンチマークのメモリ上のスタンドインに差し替える
+    Slackのトークンはテストごとに変え、チャンネル索引・ユーザー情報などのモジュールスコープのキャッシュを分ける
+    """
+    from mymodules.aws import get_shared_secret_cache, runtime
+
+    s3 = InMemoryS3Client(region_name=REGION)
+    ssm = InMemorySSMClient({"python_slack_app_token": f"xoxb-{uuid.uuid4().hex}"})
+    monkeypatch.setitem(runtime._clients, ("s3", None), s3)
+    monkeypatch.setitem(runtime._clients, ("ssm", REGION), ssm)
+    get_shared_secret_cache().clear()
+    yield SimpleNamespace(s3=s3, ssm=ssm)
+    get_shared_secret_cache().clear()
+
+
+@pytest.fixture
+def slack_server(monkeypatch, aws):
+    """
+    偽のSlack APIサーバーを起動し、ハンドラーを実行するための環境変数を設定する関数
+    ベンチマークのシナリオと同じく、チャンネルごとのメッセージの数と上書きする環境変数を指定する
+    チャンネル名は bench-0, bench-1, ...、投稿先は bench-report になる
+    """
+    servers: list[FakeSlackServer] = []
+
+    def start(channel_sizes: list[int], env: dict[str, str] | None = None, **kwargs) -> FakeSlackServer:
+        scenario = Scenario("test", "", channel_sizes, env=env or {}, filler_channel_count=0, **kwargs)
+        server = FakeSlackServer(scenario.create_config()).start()
+        servers.append(server)
+        handler_env = {
+            **scenario.create_env(),
+            "SLACK_API_BASE_URL": server.url,
+            "SLACK_RATE_LIMITS": json.dumps(UNLIMITED_RATE_LIMITS),
+            "METRICS_SINK": "none",
+            "NO_PROXY": "127.0.0.1,localhost",
+            "no_proxy": "127.0.0.1,localhost",
+        }
+        for name, value in handler_env.items():
+            monkeypatch.setenv(name, value)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
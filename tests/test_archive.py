@@ -0,0 +1,163 @@
+import gzip
+import importlib.util
+import io
+import json
+
+import pytest
+
+import get_slack_message
+from mymodules.output.archive import JsonlGzArchiveSink, ParquetArchiveSink
+from mymodules.output.records import partition_date
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+requires_pyarrow = pytest.mark.skipif(pyarrow is None, reason="pyarrowがインストールされていない")
+SINK_CLASSES = [JsonlGzArchiveSink, pytest.param(ParquetArchiveSink, marks=requires_pyarrow)]
+
+CHANNEL = {"id": "C1", "name": "general"}
+DAY = 86400
+
+
+class _Writer:
+    def __init__(self, objects: dict[str, bytes], key: str):
+        self.__objects = objects
+        self.key = key
+        self.closed = False
+        self.buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        return len(data)
+
+    def close(self) -> None:
+        self.__objects[self.key] = bytes(self.buffer)
+        self.closed = True
+
+    def abort(self) -> None:
+        self.closed = True
+
+
+class _FakeS3:
+    """
+    open_writer / delete_objects のみを持つS3の代わり。書き込み中のライターの数も記録する
+    """
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.writers: list[_Writer] = []
+        self.max_open_writers = 0
+
+    def open_writer(self, bucket_name: str, key: str, content_type: str | None = None) -> _Writer:
+        writer = _Writer(self.objects, key)
+        self.writers.append(writer)
+        self.max_open_writers = max(self.max_open_writers, len([w for w in self.writers if not w.closed]))
+        return writer
+
+    def delete_objects(self, bucket_name: str, keys: list[str]) -> None:
+        for key in keys:
+            self.objects.pop(key, None)
+
+
+def _messages(days: int, per_day: int = 3) -> list[dict]:
+    # 収集と同じく新しいメッセージから順に並べる
+    base = 1_700_000_000
+    return [
+        {"ts": f"{base + day * DAY + i}.000100", "user": "U1", "text": f"day {day} #{i}"}
+        for day in reversed(range(days))
+        for i in reversed(range(per_day))
+    ]
+
+
+def _write_pages(sink, messages: list[dict], page_size: int = 4) -> None:
+    for i in range(0, len(messages), page_size):
+        page = messages[i : i + page_size]
+        sink.write_batch(CHANNEL, page, [[] for _ in page], {})
+
+
+def _read_jsonl(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in gzip.decompress(data).splitlines()]
+
+
+@pytest.mark.parametrize("sink_class", SINK_CLASSES)
+def test_sink_limits_open_partitions(sink_class):
+    s3 = _FakeS3()
+    sink = sink_class(s3, "bucket", "archive", "run", max_open_partitions=2)
+    messages = _messages(days=10)
+    _write_pages(sink, messages)
+    keys = sink.close()
+
+    assert s3.max_open_writers <= 2
+    assert len(keys) == 10
+    assert sorted(keys) == sorted(s3.objects)
+    assert all(key.startswith("archive/channel=general/dt=") for key in keys)
+
+
+def test_jsonl_sink_writes_records_to_their_partition():
+    s3 = _FakeS3()
+    sink = JsonlGzArchiveSink(s3, "bucket", "archive", "run", max_open_partitions=1)
+    messages = _messages(days=3)
+    _write_pages(sink, messages)
+    sink.close()
+
+    for key, data in s3.objects.items():
+        records = _read_jsonl(data)
+        assert {f"dt={partition_date(record['ts'])}" for record in records} == {key.split("/")[2]}
+    assert sum(len(_read_jsonl(data)) for data in s3.objects.values()) == len(messages)
+
+
+def test_jsonl_sink_reopens_closed_partition_as_new_object():
+    s3 = _FakeS3()
+    sink = JsonlGzArchiveSink(s3, "bucket", "archive", "run", max_open_partitions=1)
+    newer, older = _messages(days=2, per_day=1)
+    for message in [newer, older, newer]:
+        sink.write_batch(CHANNEL, [message], [[]], {})
+    keys = sink.close()
+
+    dt = partition_date(newer["ts"])
+    assert f"archive/channel=general/dt={dt}/part-run.jsonl.gz" in keys
+    assert f"archive/channel=general/dt={dt}/part-run-1.jsonl.gz" in keys
+    assert len(keys) == 3
+
+
+@pytest.mark.parametrize("sink_class", SINK_CLASSES)
+def test_sink_abort_deletes_closed_partitions(sink_class):
+    s3 = _FakeS3()
+    sink = sink_class(s3, "bucket", "archive", "run", max_open_partitions=1)
+    _write_pages(sink, _messages(days=3))
+    assert len(s3.objects) > 0
+    sink.abort()
+
+    assert s3.objects == {}
+    assert all(writer.closed for writer in s3.writers)
+
+
+@requires_pyarrow
+def test_parquet_sink_writes_row_groups():
+    s3 = _FakeS3()
+    sink = ParquetArchiveSink(s3, "bucket", "archive", "run", row_group_size=2)
+    messages = _messages(days=1, per_day=5)
+    _write_pages(sink, messages)
+    (key,) = sink.close()
+
+    parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(s3.objects[key]))
+    assert parquet_file.metadata.num_row_groups == 3
+    assert sorted(parquet_file.read().column("ts").to_pylist()) == sorted(message["ts"] for message in messages)
+
+
+@pytest.mark.parametrize("sink_class", SINK_CLASSES)
+def test_sink_rejects_invalid_max_open_partitions(sink_class):
+    with pytest.raises(ValueError):
+        sink_class(_FakeS3(), "bucket", "archive", "run", max_open_partitions=0)
+
+
+def test_parquet_without_pyarrow_fails_before_collection(aws, slack_server, monkeypatch):
+    server = slack_server([100], env={"ARCHIVE_FORMATS": "jsonl,parquet"})
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name, *args: None if name == "pyarrow" else find_spec(name, *args))
+
+    with pytest.raises(ValueError, match="pyarrow"):
+        get_slack_message.save_slack_messages_to_s3({}, None)
+    assert "conversations.history" not in server.stats()["calls"]
@@ -0,0 +1,112 @@
+from mymodules.archive_index import ArchiveIndex, ArchiveIndexSink, LocalIndexStorage
+from mymodules.archive_index.tokenizer import query_terms, tokenize
+
+
+def _record(ts: str, text: str, channel_id: str = "C1") -> dict:
+    return {"channel_id": channel_id, "channel_name": "general", "ts": ts, "user_name": "user", "text": text}
+
+
+def test_tokenize_includes_unigrams_and_bigrams():
+    assert tokenize("障害が") == {"障", "害", "が", "障害", "害が"}
+
+
+def test_tokenize_does_not_cross_whitespace():
+    assert "eb" not in tokenize("apple bee")
+
+
+def test_query_terms_uses_bigrams_for_long_words():
+    assert query_terms("障害") == {"障害"}
+
+
+def test_query_terms_falls_back_to_unigrams_for_short_words():
+    assert query_terms("a") == {"a"}
+    assert query_terms("障") == {"障"}
+
+
+def test_search_one_character_word(tmp_path):
+    index = ArchiveIndex(LocalIndexStorage(str(tmp_path)))
+    index.add([_record("1.000001", "apple pie"), _record("2.000001", "orange")], "seg1")
+
+    assert [doc["ts"] for doc in index.search(["a"])] == ["1.000001", "2.000001"]
+    assert [doc["ts"] for doc in index.search(["p"])] == ["1.000001"]
+
+
+def test_search_one_character_kanji(tmp_path):
+    index = ArchiveIndex(LocalIndexStorage(str(tmp_path)))
+    index.add([_record("1.000001", "障害が発生"), _record("2.000001", "復旧しました")], "seg1")
+
+    results = ArchiveIndex(LocalIndexStorage(str(tmp_path))).search(["障", "旧"])
+    assert [(doc["ts"], doc["matched_words"]) for doc in results] == [("1.000001", ["障"]), ("2.000001", ["旧"])]
+
+
+def test_search_normalizes_width_and_case(tmp_path):
+    index = ArchiveIndex(LocalIndexStorage(str(tmp_path)))
+    index.add([_record("1.000001", "ＥＲＲＯＲが発生")], "seg1")
+
+    assert [doc["ts"] for doc in index.search(["error"])] == ["1.000001"]
+
+
+def test_search_prefers_newer_segment(tmp_path):
+    index = ArchiveIndex(LocalIndexStorage(str(tmp_path)))
+    index.add([_record("1.000001", "障害が発生")], "seg1")
+    index.add([_record("1.000001", "復旧しました")], "seg2")
+
+    assert index.search(["障害"]) == []
+    assert [doc["text"] for doc in index.search(["復旧"])] == ["復旧しました"]
+
+
+def test_search_reads_only_query_gram_shards(tmp_path):
+    storage = LocalIndexStorage(str(tmp_path))
+    ArchiveIndex(storage).add(
+        [_record(f"{i}.000001", f"message {i}") for i in range(1, 50)] + [_record("99.000001", "障害")], "seg1"
+    )
+    read: list[str] = []
+    read_segment = storage.read_segment
+    storage.read_segment = lambda name: read.append(name) or read_segment(name)
+
+    assert [doc["ts"] for doc in ArchiveIndex(storage).search(["障害"])] == ["99.000001"]
+    assert len([name for name in read if ".postings-" in name]) == 1
+    assert len([name for name in read if ".docs-" in name]) == 1
+
+
+def test_search_filters_by_channel_and_ts(tmp_path):
+    index = ArchiveIndex(LocalIndexStorage(str(tmp_path)))
+    records = [_record("1.000001", "障害"), _record("2.000001", "障害"), _record("3.000001", "障害", channel_id="C2")]
+    records[2]["channel_name"] = "random"
+    index.add(records, "seg1")
+
+    assert [doc["ts"] for doc in index.search(["障害"], oldest="1.5", latest="3.5")] == ["2.000001", "3.000001"]
+    assert [doc["ts"] for doc in index.search(["障害"], channel_name="random")] == ["3.000001"]
+
+
+def test_sink_flushes_segments_every_max_docs(tmp_path):
+    index = ArchiveIndex(LocalIndexStorage(str(tmp_path)))
+    sink = ArchiveIndexSink(index, "run-C1", max_docs=2)
+    channel = {"id": "C1", "name": "general"}
+    messages = [{"ts": f"{i}.000001", "user": "U1", "text": f"障害 {i}"} for i in range(1, 6)]
+    sink.write_batch(channel, messages, [[] for _ in messages], {})
+
+    assert sink.close() == ["run-C1-000", "run-C1-001", "run-C1-002"]
+    assert [doc["ts"] for doc in index.search(["障害"])] == [message["ts"] for message in messages]
+
+
+def test_sink_abort_deletes_written_segments(tmp_path):
+    storage = LocalIndexStorage(str(tmp_path))
+    sink = ArchiveIndexSink(ArchiveIndex(storage), "run-C1", max_docs=1)
+    messages = [{"ts": f"{i}.000001", "user": "U1", "text": "障害"} for i in range(1, 3)]
+    sink.write_batch({"id": "C1", "name": "general"}, messages, [[], []], {})
+    sink.abort()
+
+    assert storage.list_segments() == []
+
+
+def test_compact_merges_segments(tmp_path):
+    storage = LocalIndexStorage(str(tmp_path))
+    index = ArchiveIndex(storage, max_segments=1)
+    index.add([_record("1.000001", "障害が発生")], "seg0")
+    index.add([_record("1.000001", "復旧しました")], "seg1")
+    index.add([_record("2.000001", "障害が再発")], "seg2")
+
+    assert index.compact()
+    assert len([name for name, _ in storage.list_segments() if name.endswith(".ids.json.gz")]) == 1
+    assert [doc["text"] for doc in index.search(["障害", "復旧"])] == ["復旧しました", "障害が再発"]
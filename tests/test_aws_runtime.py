@@ -0,0 +1,20 @@
+from botocore.stub import ANY, Stubber
+
+from mymodules.aws import S3, runtime
+from mymodules.metrics import start_invocation
+
+
+def test_resource_calls_are_instrumented(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(runtime, "_resources", {})
+    monkeypatch.setattr(runtime, "_bucket_regions", {"bucket": "ap-northeast-1"})
+    metrics = start_invocation()
+    client = runtime.get_resource("s3").meta.client
+
+    with Stubber(client) as stubber:
+        stubber.add_response("put_object", {"ETag": '"1"'}, {"Bucket": "bucket", "Key": ANY, "Body": "障害"})
+        # write_txt はリソース経由で書き込む
+        S3().write_txt("bucket", "report", "障害")
+
+    assert metrics.snapshot()["counters"]["AwsCalls"] == {"s3.PutObject": 1}
@@ -0,0 +1,94 @@
+import uuid
+
+import pytest
+
+from mymodules.aws.snapshot_store import LocalSnapshotStore
+from mymodules.slack import channel_directory
+from mymodules.slack.channel_directory import ChannelDirectory
+
+
+class _FakeChannelsApi:
+    """
+    conversations.list の呼び出し回数を記録する Slack API の代わり
+    """
+
+    def __init__(self, *names: str):
+        self.names = list(names)
+        self.calls = 0
+
+    def fetch_channels(self) -> list[dict]:
+        self.calls += 1
+        return [{"id": f"C{number}", "name": name} for number, name in enumerate(self.names)]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def cache_key() -> str:
+    # モジュールスコープの索引をテストごとに分ける
+    return uuid.uuid4().hex
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(channel_directory.time, "time", clock.time)
+    return clock
+
+
+def test_index_is_shared_until_ttl_expires(cache_key, clock):
+    api = _FakeChannelsApi("general")
+    assert ChannelDirectory(api.fetch_channels, cache_key, ttl_seconds=3600).get_by_name("general")["id"] == "C0"
+
+    # 別のインスタンス（ウォームスタートした次の実行）でも索引を使い回す
+    clock.now += 3599
+    assert ChannelDirectory(api.fetch_channels, cache_key, ttl_seconds=3600).get_by_id("C0")["name"] == "general"
+    assert api.calls == 1
+
+    api.names.append("random")
+    clock.now += 1
+    assert ChannelDirectory(api.fetch_channels, cache_key, ttl_seconds=3600).get_all()[-1]["name"] == "random"
+    assert api.calls == 2
+
+
+def test_unknown_name_refreshes_once(cache_key, clock):
+    api = _FakeChannelsApi("general")
+    directory = ChannelDirectory(api.fetch_channels, cache_key)
+    directory.get_all()
+
+    # 索引を作った直後は作り直さない
+    assert directory.get_by_name("new-channel") is None
+    assert api.calls == 1
+
+    api.names.append("new-channel")
+    clock.now += ChannelDirectory.MISS_REFRESH_INTERVAL_SECONDS
+    assert directory.get_by_name("new-channel")["id"] == "C1"
+    assert directory.get_by_name("missing") is None
+    assert directory.get_by_id("C9") is None
+    assert api.calls == 2
+
+
+def test_snapshot_is_used_on_cold_start(cache_key, clock, tmp_path):
+    ChannelDirectory(
+        _FakeChannelsApi("general").fetch_channels, cache_key, snapshot_store=LocalSnapshotStore(str(tmp_path))
+    ).get_all()
+    channel_directory._shared_indexes.pop(cache_key)
+
+    api = _FakeChannelsApi("general", "random")
+    directory = ChannelDirectory(
+        api.fetch_channels, cache_key, ttl_seconds=3600, snapshot_store=LocalSnapshotStore(str(tmp_path))
+    )
+    assert [channel["name"] for channel in directory.get_all()] == ["general"]
+    assert api.calls == 0
+
+    # 有効期間を過ぎたスナップショットは使わない
+    channel_directory._shared_indexes.pop(cache_key)
+    clock.now += 3600
+    assert [channel["name"] for channel in directory.get_all()] == ["general", "random"]
+    assert api.calls == 1
@@ -0,0 +1,45 @@
+import get_slack_message
+from mymodules.aws import S3CheckpointStore
+from mymodules.collector import create_checkpoint_key
+from mymodules.output.sinks import TextReportSink
+
+BUCKET = get_slack_message.S3_BUCKET_NAME
+
+
+def _report_keys(s3) -> list[str]:
+    (page,) = s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET)
+    return sorted(content["Key"] for content in page.get("Contents", []) if not content["Key"].startswith("_"))
+
+
+def test_failed_channel_does_not_affect_other_channels(aws, slack_server, monkeypatch):
+    server = slack_server([2500, 1500], env={"CHECKPOINT_BACKEND": "s3", "CHANNEL_CONCURRENCY": "1"})
+    posted: list[list] = []
+    monkeypatch.setattr(get_slack_message, "_post_report", lambda slack, channel, words, results: posted.append(results))
+
+    # 2番目のチャンネルは、レポートを書き始めた後で失敗させる
+    write_batch = TextReportSink.write_batch
+
+    def failing_write_batch(self, channel, messages, threads, users):
+        write_batch(self, channel, messages, threads, users)
+        if channel["id"] == "CB0000001":
+            raise RuntimeError("write failed")
+
+    monkeypatch.setattr(TextReportSink, "write_batch", failing_write_batch)
+    get_slack_message.save_slack_messages_to_s3({}, None)
+
+    ((ok, failed),) = posted
+    assert (ok.channel["name"], ok.message_count, ok.failed) == ("bench-0", 250, False)
+    assert (failed.channel["name"], failed.failed) == ("bench-1", True)
+    assert "収集に失敗しました" in get_slack_message._format_report_entry(failed, ["障害"])
+
+    # 失敗したチャンネルの書きかけのレポートは残さず、成功したチャンネルのレポートは全件を含む
+    (key,) = _report_keys(aws.s3)
+    assert "bench-0" in key
+    report = aws.s3.get_object(Bucket=BUCKET, Key=key)["Body"].read().decode("utf-8")
+    assert report.count("障害が発生しました") == 250
+    assert "bench-1" not in report
+
+    # 成功したチャンネルのみ次回の起点を進め、失敗したチャンネルは次回同じ範囲を取得し直す
+    store = S3CheckpointStore(BUCKET)
+    assert store.get(create_checkpoint_key("CB0000000", ["障害", "エラー"])) == server.config.channels[0].ts(2499)
+    assert store.get(create_checkpoint_key("CB0000001", ["障害", "エラー"])) is None
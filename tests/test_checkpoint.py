@@ -0,0 +1,106 @@
+import pytest
+from conftest import REGION
+
+import get_slack_message
+from mymodules.aws import (
+    LocalCheckpointStore,
+    ParameterStoreCheckpointStore,
+    S3CheckpointStore,
+)
+from mymodules.collector import create_checkpoint_key
+
+BUCKET = get_slack_message.S3_BUCKET_NAME
+WORDS = ["障害", "エラー"]
+
+
+def _checkpoint(channel_id: str) -> str | None:
+    return S3CheckpointStore(BUCKET).get(create_checkpoint_key(channel_id, WORDS))
+
+
+def test_checkpoint_key_is_per_channel_and_word_set():
+    key = create_checkpoint_key("C1", ["障害", "エラー"])
+
+    assert create_checkpoint_key("C1", ["エラー", "障害", "障害"]) == key
+    assert create_checkpoint_key("C2", ["障害", "エラー"]) != key
+    assert create_checkpoint_key("C1", ["障害"]) != key
+
+
+@pytest.mark.parametrize(
+    "backend, store_class",
+    [("s3", S3CheckpointStore), ("ssm", ParameterStoreCheckpointStore), ("local", LocalCheckpointStore)],
+)
+def test_create_checkpoint_store_round_trips(aws, monkeypatch, tmp_path, backend, store_class):
+    monkeypatch.setenv("CHECKPOINT_LOCAL_PATH", str(tmp_path / "checkpoints.json"))
+    store = get_slack_message._create_checkpoint_store(backend, REGION, BUCKET)
+
+    assert isinstance(store, store_class)
+    assert store.get("C1-key") is None
+    store.put("C1-key", "1700000000.000100")
+    assert store.get("C1-key") == "1700000000.000100"
+
+
+def test_create_checkpoint_store_backends_write_where_iam_allows(aws):
+    get_slack_message._create_checkpoint_store("s3", REGION, BUCKET).put("C1-key", "1.0")
+    get_slack_message._create_checkpoint_store("ssm", REGION, BUCKET).put("C1-key", "1.0")
+
+    assert aws.s3.get_object(Bucket=BUCKET, Key="_checkpoints/C1-key")["Body"].read() == b"1.0"
+    assert aws.ssm.get_parameter(Name="/python_slack_app/checkpoints/C1-key")["Parameter"]["Value"] == "1.0"
+
+
+def test_create_checkpoint_store_none_and_invalid(aws):
+    assert get_slack_message._create_checkpoint_store("none", REGION, BUCKET) is None
+    with pytest.raises(ValueError):
+        get_slack_message._create_checkpoint_store("dynamodb", REGION, BUCKET)
+
+
+def test_next_run_fetches_only_messages_after_checkpoint(slack_server):
+    server = slack_server([2500, 1500], env={"CHECKPOINT_BACKEND": "s3"})
+    first, second = server.config.channels[:2]
+    first.message_count = 2480
+    get_slack_message.save_slack_messages_to_s3({}, None)
+
+    # チャンネルごとに、そのチャンネルで最新のメッセージのtsを記録する
+    assert _checkpoint(first.id) == first.ts(2479)
+    assert _checkpoint(second.id) == second.ts(1499)
+
+    # 前回より後に投稿された20件（返信のあるスレッドが1件）のみを取得する
+    first.message_count = 2500
+    server.reset_stats()
+    get_slack_message.save_slack_messages_to_s3({}, None)
+
+    calls = server.stats()["calls"]
+    assert calls["conversations.history"] == 2
+    assert calls["conversations.replies"] == 1
+    assert calls["chat.postMessage"] == 1
+    assert _checkpoint(first.id) == first.ts(2499)
+    assert _checkpoint(second.id) == second.ts(1499)
+
+
+def test_full_backfill_ignores_checkpoint(slack_server):
+    server = slack_server([2500], env={"CHECKPOINT_BACKEND": "s3"})
+    get_slack_message.save_slack_messages_to_s3({}, None)
+    server.reset_stats()
+    get_slack_message.save_slack_messages_to_s3({"full_backfill": True}, None)
+
+    assert server.stats()["calls"]["conversations.history"] == 3
+
+
+def test_checkpoint_is_not_advanced_when_run_fails(aws, slack_server, monkeypatch):
+    # 失敗した実行のリースが切れるのを待たずに再実行できるよう、中断と再開（リース）を使わない
+    server = slack_server([2500, 1500], env={"CHECKPOINT_BACKEND": "s3", "RESUME_ON_TIMEOUT": "false"})
+
+    def failing_post(*args):
+        raise RuntimeError("chat.postMessage failed")
+
+    monkeypatch.setattr(get_slack_message, "_post_report", failing_post)
+    with pytest.raises(RuntimeError):
+        get_slack_message.save_slack_messages_to_s3({}, None)
+    assert _checkpoint("CB0000000") is None
+    assert _checkpoint("CB0000001") is None
+
+    # 次の実行は前回と同じ範囲を取得し直す
+    monkeypatch.setattr(get_slack_message, "_post_report", lambda *args: None)
+    server.reset_stats()
+    get_slack_message.save_slack_messages_to_s3({}, None)
+    assert server.stats()["calls"]["conversations.history"] == 5
+    assert _checkpoint("CB0000000") == server.config.channels[0].ts(2499)
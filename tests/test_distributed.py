@@ -0,0 +1,104 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.stub import ANY, Stubber
+from conftest import REGION
+
+import get_slack_message
+from mymodules.aws import S3, runtime
+from mymodules.distributed import DistributedCollection, LocalFileQueue
+
+BUCKET = get_slack_message.S3_BUCKET_NAME
+
+
+def _produce(slack_server, tmp_path, channel_sizes: list[int]) -> LocalFileQueue:
+    queue_dir = str(tmp_path / "queue")
+    slack_server(channel_sizes, env={"WORK_QUEUE_DIR": queue_dir})
+    get_slack_message.produce_slack_messages({}, None)
+    return LocalFileQueue(queue_dir)
+
+
+def _read_json(s3, key: str) -> dict:
+    return json.loads(gzip.decompress(s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()))
+
+
+def _keys(s3, prefix: str) -> list[str]:
+    (page,) = s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix)
+    return [content["Key"] for content in page["Contents"]]
+
+
+def test_producer_sends_one_queue_message_per_batch(aws, slack_server, tmp_path):
+    queue = _produce(slack_server, tmp_path, [2500, 1500])
+    bodies = [json.loads(record["body"]) for record in queue.receive_event(max_messages=100)["Records"]]
+
+    (job_id,) = {body["job_id"] for body in bodies}
+    # 履歴の1ページ（1000件）ごとに1つのバッチになる
+    assert [(body["channel_id"], body["batch_index"]) for body in bodies] == [
+        ("CB0000000", 0),
+        ("CB0000000", 1),
+        ("CB0000000", 2),
+        ("CB0000001", 0),
+        ("CB0000001", 1),
+    ]
+    manifest = _read_json(aws.s3, f"_jobs/{job_id}/manifest.json.gz")
+    assert manifest["batch_count"] == len(bodies)
+    for entry, size in zip(manifest["channels"], [2500, 1500]):
+        channel_id = entry["channel"]["id"]
+        batches = [
+            _read_json(aws.s3, f"_jobs/{job_id}/batches/{channel_id}/{index:06d}.json.gz")
+            for index in range(entry["batch_count"])
+        ]
+        timestamps = [message["ts"] for batch in batches for message in batch["messages"]]
+        # 検索ワードは10件に1件含まれ、全てのバッチを合わせると一致したメッセージを1回ずつ含む
+        assert len(timestamps) == len(set(timestamps)) == entry["message_count"] == size // 10
+
+
+def test_workers_finalize_once(aws, slack_server, tmp_path):
+    queue_dir = str(tmp_path / "queue")
+    server = slack_server([2500, 1500], env={"WORK_QUEUE_DIR": queue_dir, "CHECKPOINT_BACKEND": "s3"})
+    get_slack_message.produce_slack_messages({}, None)
+    records = LocalFileQueue(queue_dir).receive_event(max_messages=100)["Records"]
+
+    # バッチごとに別のワーカーとして同時に処理し、最後のバッチを処理したワーカーが重なるようにする
+    with ThreadPoolExecutor(max_workers=len(records)) as executor:
+        responses = list(
+            executor.map(lambda record: get_slack_message.expand_slack_threads({"Records": [record]}, None), records)
+        )
+
+    assert all(response == {"batchItemFailures": []} for response in responses)
+    assert server.stats()["calls"]["chat.postMessage"] == 1
+    assert sorted(key.split("_")[1] for key in _keys(aws.s3, "slack_")) == ["bench-0", "bench-1"]
+    assert _keys(aws.s3, "_jobs/") == []
+
+
+def test_only_one_finalizer_claim_succeeds(aws, slack_server, tmp_path):
+    queue = _produce(slack_server, tmp_path, [2500])
+    bodies = [json.loads(record["body"]) for record in queue.receive_event(max_messages=100)["Records"]]
+    job_id = bodies[0]["job_id"]
+    collection = DistributedCollection(S3(), BUCKET)
+    slack = get_slack_message._create_slack(REGION)
+
+    for body in bodies[:-1]:
+        collection.process_batch(slack, body)
+    assert not collection.try_claim_finalize(job_id)
+    collection.process_batch(slack, bodies[-1])
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        claims = list(executor.map(lambda _: collection.try_claim_finalize(job_id), range(8)))
+
+    assert claims.count(True) == 1
+
+
+def test_finalize_claim_passes_sdk_validation(monkeypatch):
+    # 条件付き書き込みに対応していないbotocoreでは、送る前にParamValidationErrorになる
+    client = boto3.client("s3", region_name=REGION, aws_access_key_id="test", aws_secret_access_key="test")
+    monkeypatch.setitem(runtime._clients, ("s3", None), client)
+
+    with Stubber(client) as stubber:
+        expected_params = {"Bucket": BUCKET, "Key": "_jobs/job/finalizing", "Body": ANY, "IfNoneMatch": "*"}
+        stubber.add_response("put_object", {"ETag": '"1"'}, expected_params)
+        stubber.add_client_error("put_object", "PreconditionFailed", http_status_code=412, expected_params=expected_params)
+
+        assert S3().put_bytes_if_absent(BUCKET, "_jobs/job/finalizing", b"")
+        assert not S3().put_bytes_if_absent(BUCKET, "_jobs/job/finalizing", b"")
@@ -0,0 +1,35 @@
+import pytest
+
+from get_slack_message import _run_with_metrics
+from mymodules.metrics import get_metrics
+
+
+def _handler(wait_seconds: float):
+    def handler(event, context):
+        get_metrics().increment("SlackApiWaitSeconds", "conversations.history", wait_seconds)
+
+    return handler
+
+
+def test_wait_seconds_are_reported_per_invocation(monkeypatch, capsys):
+    monkeypatch.setenv("METRICS_SINK", "none")
+    _run_with_metrics(_handler(1.5), {}, None)
+    _run_with_metrics(_handler(0.5), {}, None)
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("レートリミットによる待機時間")]
+    assert lines == [
+        "レートリミットによる待機時間: 1.5秒 {'conversations.history': 1.5}",
+        "レートリミットによる待機時間: 0.5秒 {'conversations.history': 0.5}",
+    ]
+
+
+def test_wait_seconds_are_reported_when_handler_fails(monkeypatch, capsys):
+    monkeypatch.setenv("METRICS_SINK", "none")
+
+    def failing_handler(event, context):
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        _run_with_metrics(failing_handler, {}, None)
+
+    assert "レートリミットによる待機時間: 0.0秒 {}" in capsys.readouterr().out
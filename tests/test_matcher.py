@@ -0,0 +1,78 @@
+import pytest
+
+from mymodules.slack.matcher import KeywordMatcher, _AhoCorasick, normalize_text
+
+
+@pytest.mark.parametrize(
+    "pattern, text, expected",
+    [
+        (r"ERR\D", "err: disk full", True),
+        (r"ERR\D", "err1", False),
+        (r"[A-Z]{3}-\d+", "チケット abc-12 を参照", True),
+        (r"\W障害", "本番 障害", True),
+        (r"\W障害", "本番障害", False),
+    ],
+)
+def test_regex_normalize_keeps_pattern_semantics(pattern, text, expected):
+    matcher = KeywordMatcher([pattern], mode="regex", normalize=True)
+
+    assert matcher.matches(text) is expected
+
+
+def test_regex_normalize_ignores_width_and_kana():
+    matcher = KeywordMatcher(["ERROR", "カタカナ"], mode="regex", normalize=True)
+
+    assert matcher.match("ｅｒｒｏｒ と かたかな") == ["ERROR", "カタカナ"]
+
+
+def test_regex_without_normalize_is_case_sensitive():
+    matcher = KeywordMatcher(["ERROR"], mode="regex")
+
+    assert not matcher.matches("error")
+
+
+def test_normalize_text_folds_width_case_and_kana():
+    assert normalize_text("ＥＲＲＯＲ ｶﾀｶﾅ") == "error かたかな"
+
+
+def test_normalize_text_options_can_be_disabled():
+    assert normalize_text("ＡカナB", nfkc=False, ignore_case=False, fold_kana=False) == "ＡカナB"
+    assert normalize_text("ＡカナB", ignore_case=False, fold_kana=False) == "AカナB"
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = _AhoCorasick(["he", "she", "his", "hers"])
+
+    assert sorted(automaton.iter_matches("ushers")) == [(0, 4), (1, 4), (3, 6)]
+
+
+@pytest.mark.parametrize("word_count", [2, KeywordMatcher.AUTOMATON_MIN_WORDS + 1])
+def test_substring_match_keeps_word_order(word_count):
+    words = ["障害", "エラー"] + [f"dummy{i}" for i in range(word_count - 2)]
+    matcher = KeywordMatcher(words)
+
+    assert matcher.match("エラーで障害が発生") == ["障害", "エラー"]
+    assert matcher.match("正常") == []
+
+
+def test_word_mode_requires_boundaries():
+    matcher = KeywordMatcher(["err"], mode="word")
+
+    assert matcher.matches("err: disk full")
+    assert matcher.matches("障害err発生")
+    assert not matcher.matches("error")
+
+
+def test_substring_normalize_ignores_width_case_and_kana():
+    matcher = KeywordMatcher(["エラー", "Error"], normalize=True)
+
+    assert matcher.match("ｴﾗｰ と えらー と ＥＲＲＯＲ") == ["エラー", "Error"]
+
+
+def test_matcher_drops_empty_and_duplicate_words():
+    assert KeywordMatcher(["a", "", "a", "b"]).words == ["a", "b"]
+
+
+def test_matcher_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        KeywordMatcher(["a"], mode="fuzzy")
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from test_archive import CHANNEL, _FakeS3, _read_jsonl
+
+from mymodules.output.archive import JsonlGzArchiveSink
+from mymodules.slack.message import SlackMessage, compact_messages
+
+RAW = {
+    "type": "message",
+    "ts": "1700000000.000100",
+    "user": "U1",
+    "text": "障害が発生しました",
+    "thread_ts": "1700000000.000100",
+    "reply_count": 2,
+    "latest_reply": "1700000001.000100",
+    "blocks": [{"type": "rich_text"}],
+    "reactions": [{"name": "eyes", "count": 1}],
+}
+
+
+def test_reads_like_a_dict():
+    message = SlackMessage.from_dict(RAW)
+
+    assert message["ts"] == "1700000000.000100"
+    assert message.get("text", "") == "障害が発生しました"
+    assert message.get("bot_id") is None
+    assert message.get("bot_id", "none") == "none"
+    assert "reply_count" in message
+    assert "bot_id" not in message
+    # 収集に使わない項目は保持しない
+    assert "blocks" not in message
+    assert message.get("blocks") is None
+
+
+def test_missing_key_raises_key_error():
+    message = SlackMessage.from_dict(RAW)
+
+    with pytest.raises(KeyError):
+        message["bot_id"]
+    with pytest.raises(KeyError):
+        message["blocks"]
+    with pytest.raises(KeyError):
+        message["blocks"] = []
+
+
+def test_len_and_iteration_follow_field_order():
+    message = SlackMessage.from_dict(RAW)
+    message["matched_words"] = ["障害"]
+
+    assert list(message) == ["ts", "user", "text", "thread_ts", "reply_count", "latest_reply", "matched_words"]
+    assert len(message) == 7
+    assert dict(message) == {
+        "ts": "1700000000.000100",
+        "user": "U1",
+        "text": "障害が発生しました",
+        "thread_ts": "1700000000.000100",
+        "reply_count": 2,
+        "latest_reply": "1700000001.000100",
+        "matched_words": ["障害"],
+    }
+
+
+def test_keep_raw_holds_original_message():
+    (message,) = compact_messages([RAW], keep_raw=True)
+
+    assert message.raw == RAW
+    assert message.raw is not RAW
+
+
+def test_json_round_trip_through_dict():
+    message = SlackMessage.from_dict(RAW)
+
+    assert SlackMessage.from_dict(json.loads(json.dumps(dict(message)))) == message
+
+
+def test_archive_sink_writes_same_records_as_dict():
+    def archive(messages: list, threads: list) -> list[dict]:
+        s3 = _FakeS3()
+        sink = JsonlGzArchiveSink(s3, "bucket", "archive", "run")
+        sink.write_batch(CHANNEL, messages, threads, {"U1": {"real_name": "山田 太郎"}})
+        sink.close()
+        return [record for data in s3.objects.values() for record in _read_jsonl(data)]
+
+    reply = {"ts": "1700000001.000100", "user": "U1", "text": "返信", "thread_ts": "1700000000.000100"}
+    records = archive([SlackMessage.from_dict(RAW)], [[SlackMessage.from_dict(reply)]])
+
+    assert records == archive([RAW], [[reply]])
+    assert [record["user_name"] for record in records] == ["山田 太郎", "山田 太郎"]
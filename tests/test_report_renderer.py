@@ -0,0 +1,82 @@
+import datetime
+import time
+
+import pytest
+
+from mymodules.output.report import ReportRenderer, TimestampFormatter
+
+CHANNEL = {"id": "C1", "name": "general"}
+USERS = {"U1": {"real_name": "山田 太郎"}, "U2": {"real_name": "佐藤 花子"}}
+
+
+def _legacy_render(messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> str:
+    """
+    レポートの書式を選べるようにする前の、テキストのレポートの作り方（ホストのローカル時刻で表示していた）
+    """
+    lines: list[str] = []
+    for message, thread_messages in zip(messages, threads):
+        lines.append(datetime.datetime.fromtimestamp(float(message["ts"])).strftime("%Y/%m/%d %H:%M:%S") + "\n")
+        lines.append(users[message["user"]]["real_name"] + "\n")
+        lines.append(message["text"] + "\n")
+        for thread_message in thread_messages:
+            lines.append(
+                "     " + datetime.datetime.fromtimestamp(float(thread_message["ts"])).strftime("%Y/%m/%d %H:%M:%S") + "\n"
+            )
+            lines.append("     " + users[thread_message["user"]]["real_name"] + "\n")
+            lines.append("     " + thread_message["text"] + "\n")
+        lines.append("\n")
+    return "".join(lines)
+
+
+@pytest.fixture
+def tokyo_local_time(monkeypatch):
+    # 以前のレポートはLambdaのローカル時刻で表示していたため、日本時間のホストで作った場合と比べる
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.parametrize(
+    "ts, expected",
+    [
+        ("1700000000.123456", "2023/11/15 07:13:20"),
+        # UTCでは前日の15:00が、日本時間の0時になる
+        ("1699974000.000000", "2023/11/15 00:00:00"),
+        ("1699973999.999999", "2023/11/14 23:59:59"),
+    ],
+)
+def test_timestamps_are_rendered_in_jst(ts, expected):
+    assert TimestampFormatter().format(ts) == expected
+
+
+def test_format_many_returns_each_ts_once():
+    formatted = TimestampFormatter().format_many(["1700000000.000100", "1700000000.000100", "1700000060.000100"])
+
+    assert formatted == {"1700000000.000100": "2023/11/15 07:13:20", "1700000060.000100": "2023/11/15 07:14:20"}
+
+
+def test_default_template_matches_legacy_text_report(tokyo_local_time):
+    messages = [
+        {"ts": "1699973999.000100", "user": "U1", "text": "障害が発生しました"},
+        {"ts": "1700000000.000200", "user": "U2", "text": "エラーです\n2行目"},
+    ]
+    threads = [
+        [
+            {"ts": "1699974001.000100", "user": "U2", "text": "確認します"},
+            {"ts": "1699974100.000100", "user": "U1", "text": "復旧しました"},
+        ],
+        [],
+    ]
+    rendered = ReportRenderer().render(CHANNEL, messages, threads, USERS)
+
+    assert ReportRenderer().header(CHANNEL) == ""
+    assert rendered == _legacy_render(messages, threads, USERS)
+    assert rendered.startswith("2023/11/14 23:59:59\n山田 太郎\n障害が発生しました\n     2023/11/15 00:00:01\n")
+
+
+def test_missing_user_falls_back_to_user_id():
+    rendered = ReportRenderer().render(CHANNEL, [{"ts": "1700000000.000100", "user": "U9", "text": "x"}], [[]], {})
+
+    assert rendered == "2023/11/15 07:13:20\nU9\nx\n\n"
@@ -0,0 +1,89 @@
+from mymodules.slack.matcher import KeywordMatcher
+from mymodules.slack.search_backend import HistoryScanBackend, SearchApiBackend
+
+CHANNEL = {"id": "C1", "name": "general"}
+OLDEST = "1700000000.000000"
+WORDS = ["障害", "エラー"]
+
+# 同じチャンネルの履歴（返信を含む）。スレッドの返信は conversations.history には含まれない
+PARENTS = [
+    {"ts": "1699999999.000100", "user": "U1", "text": "前回処理済みの障害"},
+    {"ts": "1700000001.000100", "user": "U1", "text": "障害が発生しました", "thread_ts": "1700000001.000100", "reply_count": 1},
+    {"ts": "1700000002.000100", "user": "U2", "text": "障害によるエラーです"},
+    {"ts": "1700000003.000100", "user": "U3", "text": "関係の無いメッセージ"},
+    {"ts": "1700000004.000100", "user": "U1", "text": "エラーログ"},
+    # Slackの検索は単語単位のため "エラー" で見つかるが、手元の検索条件（部分一致）には一致しない
+    {"ts": "1700000005.000100", "user": "U2", "text": "えらー"},
+]
+REPLIES = [{"ts": "1700000001.000200", "user": "U2", "text": "障害の返信", "thread_ts": "1700000001.000100"}]
+
+
+class _FakeInfrastructure:
+    """
+    conversations.history と search.messages のみを持つ SlackInfrastructure の代わり
+    search.messages は2件ずつのページで古い順に返す
+    """
+
+    def __init__(self):
+        self.queries: list[str] = []
+
+    def iter_channel_history(self, channel_id: str, from_unixtime: str | None = None, latest_ts: str | None = None):
+        messages = [dict(message) for message in PARENTS if float(message["ts"]) > float(from_unixtime)]
+        yield sorted(messages, key=lambda message: float(message["ts"]), reverse=True)
+
+    def iter_search_messages(self, query: str):
+        self.queries.append(query)
+        word = query.rsplit(" ", 1)[-1].strip('"')
+        matches = [
+            {**message, "channel": {"id": CHANNEL["id"]}, "permalink": _permalink(message)}
+            for message in sorted(PARENTS + REPLIES, key=lambda message: float(message["ts"]))
+            if word in message["text"] or (word == "エラー" and message["text"] == "えらー")
+        ]
+        for start in range(0, len(matches), 2):
+            yield matches[start : start + 2]
+
+
+def _permalink(message: dict) -> str:
+    url = f"https://example.slack.com/archives/C1/p{message['ts'].replace('.', '')}"
+    if "thread_ts" in message:
+        url += f"?thread_ts={message['thread_ts']}&cid=C1"
+    return url
+
+
+def _collect(backend) -> list[dict]:
+    pages = backend.iter_pages(CHANNEL, KeywordMatcher(WORDS), OLDEST, 24)
+    return [message for messages, _, _ in pages for message in messages]
+
+
+def test_search_api_returns_each_message_once_without_replies():
+    infrastructure = _FakeInfrastructure()
+    messages = _collect(SearchApiBackend(infrastructure))
+
+    # 両方の検索ワードを含むメッセージは、2つの検索結果にあっても1回だけ返す
+    assert [message["ts"] for message in messages] == ["1700000001.000100", "1700000002.000100", "1700000004.000100"]
+    assert messages[1]["matched_words"] == ["障害", "エラー"]
+    assert all(message.get("thread_unknown") is True for message in messages)
+    assert len(infrastructure.queries) == 2
+
+
+def test_search_api_matches_history_scan():
+    history = _collect(HistoryScanBackend(_FakeInfrastructure()))
+    search = _collect(SearchApiBackend(_FakeInfrastructure()))
+
+    def summary(messages: list[dict]) -> list[tuple]:
+        return sorted((message["ts"], message["text"], tuple(message["matched_words"])) for message in messages)
+
+    assert summary(search) == summary(history)
+
+
+def test_search_api_page_latest_ts_includes_unmatched_messages():
+    pages = list(SearchApiBackend(_FakeInfrastructure()).iter_pages(CHANNEL, KeywordMatcher(WORDS), OLDEST, 24))
+
+    # 手元の検索条件に一致しなかったメッセージも、次回の起点になる最新のtsには含める
+    assert [latest for _, latest, _ in pages if latest is not None] == [
+        "1700000001.000100",
+        "1700000002.000100",
+        "1700000004.000100",
+        "1700000005.000100",
+    ]
+    assert all(oldest is None for _, _, oldest in pages)
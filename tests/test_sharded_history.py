@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from mymodules.slack.sharded_history import ShardedHistoryCrawler, _to_micros
+
+BASE = 1_700_000_000
+
+
+class _FakeInfrastructure:
+    """
+    get_channel_history_page のみを持つ SlackInfrastructure の代わり
+    古い区間ほど遅く返し、区間の取得が終わる順番と返す順番が異なるようにする
+    """
+
+    def __init__(self, timestamps: list[str], delay_seconds: float = 0.002):
+        self.__messages = sorted(({"ts": ts, "text": ts} for ts in timestamps), key=lambda m: _to_micros(m["ts"]), reverse=True)
+        self.__delay_seconds = delay_seconds
+        self.__lock = threading.Lock()
+        self.calls: list[tuple[str, str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_channel_history_page(self, channel_id: str, oldest: str, latest: str, limit: int) -> tuple[list[dict], bool]:
+        with self.__lock:
+            self.calls.append((oldest, latest))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        oldest_micros, latest_micros = _to_micros(oldest), _to_micros(latest)
+        time.sleep(self.__delay_seconds * (1 + (latest_micros // 1_000_000 - BASE) % 3))
+        with self.__lock:
+            self.in_flight -= 1
+        messages = [m for m in self.__messages if oldest_micros < _to_micros(m["ts"]) < latest_micros]
+        return messages[:limit], len(messages) > limit
+
+
+def _crawl(timestamps: list[str], **kwargs) -> tuple[list[list[dict]], _FakeInfrastructure]:
+    infrastructure = _FakeInfrastructure(timestamps)
+    crawler = ShardedHistoryCrawler(infrastructure, **{"max_workers": 4, "min_shard_seconds": 1, "page_limit": 10, **kwargs})
+    pages = list(crawler.iter_pages("C1", BASE, f"{BASE + 100_000}.000000"))
+    return pages, infrastructure
+
+
+@pytest.mark.parametrize(
+    "timestamps",
+    [
+        # 一様に並んだメッセージ
+        [f"{BASE + i * 100}.000100" for i in range(500)],
+        # 新しい期間に偏ったメッセージと、同じ秒の中に並んだメッセージ
+        [f"{BASE + 90_000 + i}.000100" for i in range(300)] + [f"{BASE + 10}.{i:06d}" for i in range(1, 50)],
+    ],
+)
+def test_pages_are_newest_first_without_duplicates(timestamps):
+    pages, infrastructure = _crawl(timestamps)
+    returned = [message["ts"] for page in pages for message in page]
+
+    assert returned == sorted(timestamps, key=_to_micros, reverse=True)
+    assert all(len(page) > 0 for page in pages)
+    assert 1 < infrastructure.max_in_flight <= 4
+
+
+def test_split_boundary_message_is_returned_once():
+    # 区間の境目になりやすい、期間の中央ちょうどのメッセージを含める
+    timestamps = [f"{BASE + i * 1000}.000000" for i in range(1, 100)] + [f"{BASE + 50_000}.000000"]
+    timestamps = list(dict.fromkeys(timestamps))
+    pages, _ = _crawl(timestamps, page_limit=5)
+    returned = [message["ts"] for page in pages for message in page]
+
+    assert returned == sorted(timestamps, key=_to_micros, reverse=True)
+
+
+def test_short_period_is_fetched_in_one_call():
+    timestamps = [f"{BASE + i}.000100" for i in range(5)]
+    pages, infrastructure = _crawl(timestamps)
+
+    assert [message["ts"] for page in pages for message in page] == timestamps[::-1]
+    assert len(infrastructure.calls) == 1
+
+
+def test_latest_excludes_newer_messages():
+    timestamps = [f"{BASE + i * 100}.000100" for i in range(50)]
+    infrastructure = _FakeInfrastructure(timestamps)
+    crawler = ShardedHistoryCrawler(infrastructure, max_workers=4, min_shard_seconds=1, page_limit=10)
+    returned = [message["ts"] for page in crawler.iter_pages("C1", BASE, timestamps[20]) for message in page]
+
+    assert returned == timestamps[:20][::-1]
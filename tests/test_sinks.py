@@ -0,0 +1,91 @@
+from mymodules.output.report import HashingTextWriter
+from mymodules.output.sinks import DeltaReportSink, TextReportSink, thread_state
+
+CHANNEL = {"id": "C1", "name": "general"}
+
+
+class _RecordingSink:
+    """
+    書き込まれた内容を記録する TextReportSink の代わり
+    """
+
+    key = "reports/delta.txt"
+
+    def __init__(self):
+        self.batches: list[tuple[list[dict], list[list[dict]]]] = []
+        self.closed = False
+        self.aborted = False
+
+    def write_batch(self, channel: dict, messages: list[dict], threads: list[list[dict]], users: dict[str, dict]) -> None:
+        self.batches.append((messages, threads))
+
+    def close(self) -> list[str]:
+        self.closed = True
+        return ["https://example.com/delta.txt"]
+
+    def abort(self) -> None:
+        self.aborted = True
+
+
+def _thread(ts: str, *reply_timestamps: str) -> tuple[dict, list[dict]]:
+    message = {"ts": ts, "text": f"parent {ts}"}
+    if len(reply_timestamps) > 0:
+        message.update(latest_reply=reply_timestamps[-1], reply_count=len(reply_timestamps))
+    return message, [{"ts": reply_ts, "text": f"reply {reply_ts}"} for reply_ts in reply_timestamps]
+
+
+def _write(sink, *threads: tuple[dict, list[dict]]) -> None:
+    sink.write_batch(CHANNEL, [message for message, _ in threads], [replies for _, replies in threads], {})
+
+
+def test_thread_state_uses_latest_reply():
+    assert thread_state({"ts": "1.0", "latest_reply": "3.0"}) == "3.0"
+    assert thread_state({"ts": "1.0"}) == ""
+
+
+def test_delta_writes_new_threads_and_new_replies_only():
+    recording = _RecordingSink()
+    previous = {"1.0": "1.5", "2.0": "2.5", "3.0": ""}
+    sink = DeltaReportSink(recording, previous)
+    _write(
+        sink,
+        _thread("1.0", "1.5"),  # 前回から変わっていない
+        _thread("2.0", "2.5", "2.7"),  # 返信が増えた
+        _thread("3.0", "3.5"),  # 前回は返信が無かった
+        _thread("4.0", "4.5"),  # 新しいスレッド
+    )
+
+    ((messages, threads),) = recording.batches
+    assert [message["ts"] for message in messages] == ["2.0", "3.0", "4.0"]
+    assert [[reply["ts"] for reply in replies] for replies in threads] == [["2.7"], ["3.5"], ["4.5"]]
+    assert sink.message_count == 3
+
+
+def test_delta_skips_write_when_nothing_changed():
+    recording = _RecordingSink()
+    sink = DeltaReportSink(recording, {"1.0": "1.5"})
+    _write(sink, _thread("1.0", "1.5"))
+
+    assert recording.batches == []
+    assert sink.message_count == 0
+
+
+def test_delta_delegates_close_and_abort():
+    recording = _RecordingSink()
+    sink = DeltaReportSink(recording, {})
+
+    assert sink.key == "reports/delta.txt"
+    assert sink.close() == ["https://example.com/delta.txt"]
+    sink.abort()
+    assert recording.closed and recording.aborted
+
+
+def test_report_hash_depends_only_on_content():
+    def report_hash(*threads: tuple[dict, list[dict]]) -> str:
+        sink = TextReportSink(None, "bucket", "report", writer=HashingTextWriter())
+        _write(sink, *threads)
+        sink.close()
+        return sink.sha256
+
+    assert report_hash(_thread("1.0", "1.5")) == report_hash(_thread("1.0", "1.5"))
+    assert report_hash(_thread("1.0", "1.5")) != report_hash(_thread("1.0", "1.5", "1.7"))
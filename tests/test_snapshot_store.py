@@ -0,0 +1,101 @@
+import io
+import json
+import os
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import ANY, Stubber
+
+from benchmarks.fake_aws import InMemoryS3Client
+from mymodules.aws import runtime
+from mymodules.aws.snapshot_store import LocalSnapshotStore, S3SnapshotStore
+
+# PutObjectの条件付き書き込み（IfNoneMatch・IfMatch）の両方に対応した最初のbotocoreのバージョン
+CONDITIONAL_WRITE_BOTOCORE = (1, 35, 69)
+REQUIREMENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "requirements.txt")
+
+
+@pytest.fixture
+def s3_client(monkeypatch) -> InMemoryS3Client:
+    client = InMemoryS3Client()
+    monkeypatch.setitem(runtime._clients, ("s3", None), client)
+    return client
+
+
+@pytest.fixture(params=["local", "s3"])
+def store(request, tmp_path):
+    if request.param == "local":
+        return LocalSnapshotStore(str(tmp_path))
+    request.getfixturevalue("s3_client")
+    return S3SnapshotStore("bucket")
+
+
+def test_lease_is_exclusive_until_released(store):
+    assert store.acquire_lease("C1", ttl_seconds=60)
+    assert not store.acquire_lease("C1", ttl_seconds=60)
+    assert store.acquire_lease("C2", ttl_seconds=60)
+    store.release_lease("C1")
+    assert store.acquire_lease("C1", ttl_seconds=60)
+
+
+def test_expired_lease_can_be_taken_over(store):
+    assert store.acquire_lease("C1", ttl_seconds=-1)
+    assert store.acquire_lease("C1", ttl_seconds=60)
+    assert not store.acquire_lease("C1", ttl_seconds=60)
+
+
+def test_lease_does_not_touch_snapshot(store):
+    store.save("C1", {"oldest_ts": "1.0"})
+    store.acquire_lease("C1", ttl_seconds=60)
+    store.release_lease("C1")
+
+    assert store.load("C1") == {"oldest_ts": "1.0"}
+
+
+def test_s3_expired_lease_is_taken_over_only_once(s3_client, monkeypatch):
+    assert S3SnapshotStore("bucket").acquire_lease("C1", ttl_seconds=-1)
+    get_object = s3_client.get_object
+
+    def racing_get_object(**kwargs):
+        response = get_object(**kwargs)
+        # 期限切れのリースを読み込んだ直後に、他の実行が先に置き換える
+        monkeypatch.setattr(s3_client, "get_object", get_object)
+        assert S3SnapshotStore("bucket").acquire_lease("C1", ttl_seconds=60)
+        return response
+
+    monkeypatch.setattr(s3_client, "get_object", racing_get_object)
+    assert not S3SnapshotStore("bucket").acquire_lease("C1", ttl_seconds=60)
+
+
+def test_s3_lease_requests_pass_sdk_validation(monkeypatch):
+    # 条件付き書き込みに対応していないbotocoreでは、送る前にParamValidationErrorになる
+    client = boto3.client("s3", region_name="ap-northeast-1", aws_access_key_id="test", aws_secret_access_key="test")
+    monkeypatch.setitem(runtime._clients, ("s3", None), client)
+    key = "_snapshots/C1.lease.json"
+    expired = json.dumps({"expires_at": 0}).encode("utf-8")
+
+    with Stubber(client) as stubber:
+        stubber.add_client_error(
+            "put_object",
+            service_error_code="PreconditionFailed",
+            http_status_code=412,
+            expected_params={"Bucket": "bucket", "Key": key, "Body": ANY, "IfNoneMatch": "*"},
+        )
+        stubber.add_response(
+            "get_object",
+            {"Body": StreamingBody(io.BytesIO(expired), len(expired)), "ETag": '"1"'},
+            {"Bucket": "bucket", "Key": key},
+        )
+        stubber.add_response("put_object", {"ETag": '"2"'}, {"Bucket": "bucket", "Key": key, "Body": ANY, "IfMatch": '"1"'})
+
+        assert S3SnapshotStore("bucket").acquire_lease("C1", ttl_seconds=60)
+        stubber.assert_no_pending_responses()
+
+
+def test_requirements_pin_sdk_with_conditional_writes():
+    with open(REQUIREMENTS_PATH, encoding="utf-8") as f:
+        pins = dict(line.strip().split("==") for line in f if "==" in line)
+
+    for package in ("boto3", "botocore"):
+        assert tuple(int(part) for part in pins[package].split(".")) >= CONDITIONAL_WRITE_BOTOCORE
@@ -0,0 +1,106 @@
+import itertools
+import uuid
+
+import pytest
+
+from mymodules.aws.snapshot_store import LocalSnapshotStore
+from mymodules.slack import thread_cache
+from mymodules.slack.thread_cache import ThreadCache
+
+
+def _parent(ts: str, latest_reply: str, reply_count: int) -> dict:
+    return {"ts": ts, "latest_reply": latest_reply, "reply_count": reply_count}
+
+
+def _replies(*timestamps: str) -> list[dict]:
+    return [{"ts": ts, "user": "U1", "text": f"reply {ts}"} for ts in timestamps]
+
+
+@pytest.fixture
+def cache_key() -> str:
+    # モジュールスコープのキャッシュをテストごとに分ける
+    return uuid.uuid4().hex
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # 使った順番で used_at が必ず増えるようにする
+    ticks = itertools.count(1_700_000_000)
+    monkeypatch.setattr(thread_cache.time, "time", lambda: next(ticks))
+
+
+def test_miss_returns_none(cache_key):
+    cache = ThreadCache(cache_key=cache_key)
+
+    assert cache.get("C1", _parent("1.0", "2.0", 1)) == (None, None)
+
+
+def test_hit_when_thread_is_unchanged(cache_key):
+    cache = ThreadCache(cache_key=cache_key)
+    parent = _parent("1.0", "2.0", 1)
+    cache.put("C1", parent, _replies("2.0"))
+
+    replies, oldest = cache.get("C1", parent)
+    assert [reply["ts"] for reply in replies] == ["2.0"]
+    assert oldest is None
+
+
+def test_incremental_when_thread_has_new_replies(cache_key):
+    cache = ThreadCache(cache_key=cache_key)
+    cache.put("C1", _parent("1.0", "2.0", 1), _replies("2.0"))
+
+    replies, oldest = cache.get("C1", _parent("1.0", "3.0", 2))
+    assert [reply["ts"] for reply in replies] == ["2.0"]
+    assert oldest == "2.0"
+
+
+def test_shared_across_instances_with_same_key(cache_key):
+    parent = _parent("1.0", "2.0", 1)
+    ThreadCache(cache_key=cache_key).put("C1", parent, _replies("2.0"))
+
+    assert ThreadCache(cache_key=cache_key).get("C1", parent)[0] is not None
+    assert ThreadCache(cache_key=uuid.uuid4().hex).get("C1", parent) == (None, None)
+
+
+def test_snapshot_round_trip(cache_key, tmp_path):
+    parent = _parent("1.0", "2.0", 1)
+    cache = ThreadCache(LocalSnapshotStore(str(tmp_path)), cache_key=cache_key)
+    cache.put("C1", parent, _replies("2.0"))
+    cache.save("C1")
+    # 別のプロセス（コールドスタート）として、スナップショットのみから復元する
+    thread_cache._shared_threads.pop(cache_key)
+
+    replies, oldest = ThreadCache(LocalSnapshotStore(str(tmp_path)), cache_key=cache_key).get("C1", parent)
+    assert [reply["text"] for reply in replies] == ["reply 2.0"]
+    assert oldest is None
+
+
+def test_save_evicts_least_recently_used_entries(cache_key, tmp_path, clock):
+    store = LocalSnapshotStore(str(tmp_path))
+    cache = ThreadCache(store, cache_key=cache_key, max_entries=2)
+    parents = [_parent(f"{i}.0", f"{i}.5", 1) for i in range(1, 4)]
+    for parent in parents:
+        cache.put("C1", parent, _replies(parent["latest_reply"]))
+    # 最初のスレッドを使い直すと、2番目のスレッドが最も使われていないものになる
+    cache.get("C1", parents[0])
+    cache.save("C1")
+
+    assert [entry["ts"] for entry in store.load(f"threads-{cache_key}-C1")["threads"]] == ["1.0", "3.0"]
+    assert cache.get("C1", parents[1]) == (None, None)
+
+
+def test_save_evicts_expired_entries(cache_key, tmp_path):
+    store = LocalSnapshotStore(str(tmp_path))
+    cache = ThreadCache(store, cache_key=cache_key, max_age_seconds=-1)
+    cache.put("C1", _parent("1.0", "2.0", 1), _replies("2.0"))
+    cache.save("C1")
+
+    assert store.load(f"threads-{cache_key}-C1") == {"threads": []}
+
+
+def test_save_skips_unchanged_channel(cache_key, tmp_path):
+    store = LocalSnapshotStore(str(tmp_path))
+    cache = ThreadCache(store, cache_key=cache_key)
+    cache.save("C1")
+
+    assert store.load(f"threads-{cache_key}-C1") is None
@@ -0,0 +1,31 @@
+from mymodules.slack.thread_planner import needs_replies_fetch, plan_thread_fetches
+
+
+def test_only_parents_with_replies_are_planned():
+    messages = [
+        {"ts": "1.0", "text": "返信の無いメッセージ"},
+        {"ts": "2.0", "thread_ts": "2.0", "reply_count": 2, "latest_reply": "2.2"},
+        {"ts": "3.0", "thread_ts": "3.0", "reply_count": 0},
+        # チャンネルにも投稿された返信（thread_broadcast）
+        {"ts": "4.1", "thread_ts": "4.0", "subtype": "thread_broadcast"},
+        # reply_countが無くてもlatest_replyがあれば返信がある
+        {"ts": "5.0", "thread_ts": "5.0", "latest_reply": "5.1"},
+    ]
+    plan = plan_thread_fetches(messages)
+
+    assert [message["ts"] for message in plan.fetch_targets] == ["2.0", "5.0"]
+    assert plan.parents == messages
+    assert plan.saved_calls == 3
+
+
+def test_message_without_thread_information_is_fetched():
+    # search.messages の結果はスレッドの情報が無いため、取得してみるまで返信の有無が分からない
+    assert needs_replies_fetch({"ts": "1.0", "thread_unknown": True})
+    assert not needs_replies_fetch({"ts": "1.0"})
+
+
+def test_empty_history_has_no_targets():
+    plan = plan_thread_fetches([])
+
+    assert plan.fetch_targets == []
+    assert plan.saved_calls == 0
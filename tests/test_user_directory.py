@@ -0,0 +1,98 @@
+import uuid
+
+import pytest
+
+from mymodules.aws.snapshot_store import LocalSnapshotStore
+from mymodules.slack import user_directory
+from mymodules.slack.user_directory import UserDirectory
+
+
+class _FakeUsersApi:
+    """
+    users.info / users.list の呼び出しを記録する Slack API の代わり
+    """
+
+    def __init__(self, user_ids: list[str]):
+        self.__user_ids = user_ids
+        self.info_calls: list[str] = []
+        self.list_calls = 0
+
+    def fetch_user(self, user_id: str) -> dict:
+        self.info_calls.append(user_id)
+        return {"id": user_id, "name": f"info-{user_id}"}
+
+    def fetch_all_users(self) -> list[dict]:
+        self.list_calls += 1
+        return [{"id": user_id, "name": f"list-{user_id}"} for user_id in self.__user_ids]
+
+
+@pytest.fixture
+def cache_key() -> str:
+    # モジュールスコープのキャッシュをテストごとに分ける
+    return uuid.uuid4().hex
+
+
+def _directory(api: _FakeUsersApi, cache_key: str, **kwargs) -> UserDirectory:
+    return UserDirectory(api.fetch_user, api.fetch_all_users, cache_key=cache_key, **kwargs)
+
+
+def test_few_missing_users_are_fetched_with_users_info(cache_key):
+    api = _FakeUsersApi(["U1", "U2", "U3"])
+    users = _directory(api, cache_key, bulk_threshold=3).resolve(["U1", "U2", "U1"])
+
+    assert [user["name"] for user in users.values()] == ["info-U1", "info-U2"]
+    assert sorted(api.info_calls) == ["U1", "U2"]
+    assert api.list_calls == 0
+
+
+def test_many_missing_users_are_fetched_with_users_list(cache_key):
+    api = _FakeUsersApi(["U1", "U2", "U3"])
+    users = _directory(api, cache_key, bulk_threshold=3).resolve(["U1", "U2", "U3", "U9"])
+
+    assert [user["name"] for user in users.values()] == ["list-U1", "list-U2", "list-U3", "info-U9"]
+    assert api.list_calls == 1
+    # users.listに含まれないユーザーのみを個別に取得する
+    assert api.info_calls == ["U9"]
+
+
+def test_without_threshold_users_list_is_not_used(cache_key):
+    api = _FakeUsersApi(["U1", "U2", "U3"])
+    _directory(api, cache_key).resolve(["U1", "U2", "U3"])
+
+    assert api.list_calls == 0
+    assert sorted(api.info_calls) == ["U1", "U2", "U3"]
+
+
+def test_fresh_users_are_not_fetched_again(cache_key):
+    api = _FakeUsersApi([])
+    _directory(api, cache_key).get("U1")
+    _directory(api, cache_key).get("U1")
+
+    assert api.info_calls == ["U1"]
+
+
+def test_snapshot_round_trip(cache_key, tmp_path):
+    _directory(_FakeUsersApi([]), cache_key, snapshot_store=LocalSnapshotStore(str(tmp_path))).resolve(["U1", "U2"])
+    # 別のプロセス（コールドスタート）として、スナップショットのみから復元する
+    user_directory._shared_users.pop(cache_key)
+
+    api = _FakeUsersApi([])
+    users = _directory(api, cache_key, snapshot_store=LocalSnapshotStore(str(tmp_path))).resolve(["U1", "U2"])
+    assert [user["name"] for user in users.values()] == ["info-U1", "info-U2"]
+    assert api.info_calls == []
+
+
+def test_stale_snapshot_falls_back_to_api(cache_key, tmp_path, monkeypatch):
+    _directory(_FakeUsersApi([]), cache_key, snapshot_store=LocalSnapshotStore(str(tmp_path))).get("U1")
+    user_directory._shared_users.pop(cache_key)
+    # 有効期間を過ぎた時刻に復元する
+    now = user_directory.time.time()
+    monkeypatch.setattr(user_directory.time, "time", lambda: now + 86400 + 1)
+
+    api = _FakeUsersApi([])
+    directory = _directory(api, cache_key, snapshot_store=LocalSnapshotStore(str(tmp_path)))
+    assert directory.get("U1") == {"id": "U1", "name": "info-U1"}
+    assert api.info_calls == ["U1"]
+    # 取得し直したユーザー情報でスナップショットを更新する
+    saved = LocalSnapshotStore(str(tmp_path)).load(f"users-{cache_key}")["users"]
+    assert [entry["fetched_at"] for entry in saved] == [now + 86400 + 1]